@@ -0,0 +1,111 @@
+
+""" Storage of benchmark timings, plus comparison against a stored baseline to catch performance regressions """
+
+import json
+import os
+
+import numpy as np
+
+
+class BenchmarkResult():
+	""" Timings for one benchmark
+
+	Attributes (incl. @properties):
+		name (str): Unique label for the benchmark (e.g. "eos_small"); used to match results against a baseline
+		wallTimes (list): Wall time (s) for each repeat
+		nUnits (int): Units of work per repeat (e.g. 1 iteration, or 1000 table points); used to get per-unit timings
+		unitLabel (str): Description of the units (e.g. "iter", "point")
+		extraInfo (dict): Any other (json serialisable) info to report/store
+		timePerUnit (float): Median wall time per unit of work (median is less sensitive to noise than the mean)
+		unitsPerSecond (float): Throughput, 1/timePerUnit
+
+	"""
+
+	def __init__(self, name, wallTimes, nUnits=1, unitLabel="iter", extraInfo=None):
+		self.name = name
+		self.wallTimes = [float(x) for x in wallTimes]
+		self.nUnits = nUnits
+		self.unitLabel = unitLabel
+		self.extraInfo = dict() if extraInfo is None else dict(extraInfo)
+
+	@property
+	def medianTime(self):
+		return float(np.median(self.wallTimes))
+
+	@property
+	def minTime(self):
+		return float(np.min(self.wallTimes))
+
+	@property
+	def timePerUnit(self):
+		return self.medianTime / self.nUnits
+
+	@property
+	def unitsPerSecond(self):
+		return 1.0/self.timePerUnit if self.timePerUnit > 0 else np.inf
+
+	def toDict(self):
+		return {"name":self.name, "wallTimes":self.wallTimes, "nUnits":self.nUnits, "unitLabel":self.unitLabel, "extraInfo":self.extraInfo}
+
+	@classmethod
+	def fromDict(cls, inpDict):
+		return cls(inpDict["name"], inpDict["wallTimes"], nUnits=inpDict["nUnits"], unitLabel=inpDict["unitLabel"], extraInfo=inpDict["extraInfo"])
+
+	def __eq__(self, other):
+		return self.toDict() == other.toDict()
+
+
+def saveResultsToJson(results:"iter of BenchmarkResult", outPath):
+	with open(outPath,"wt") as f:
+		json.dump([x.toDict() for x in results], f, indent=1)
+
+
+def loadResultsFromJson(inpPath):
+	""" Returns dict, keys are benchmark names and values are BenchmarkResult objects """
+	with open(inpPath,"rt") as f:
+		allDicts = json.load(f)
+	return {x["name"]:BenchmarkResult.fromDict(x) for x in allDicts}
+
+
+def updateBaselineFile(results:"iter of BenchmarkResult", baselinePath):
+	""" Write results to baselinePath, keeping any stored baselines for benchmarks not in results """
+	baselines = loadResultsFromJson(baselinePath) if os.path.exists(baselinePath) else dict()
+	for x in results:
+		baselines[x.name] = x
+	saveResultsToJson(baselines.values(), baselinePath)
+
+
+def findRegressions(results:"iter of BenchmarkResult", baselines:dict, tolerance=0.2):
+	""" Find benchmarks which got slower than their baselines by more than a fractional tolerance
+
+	Args:
+		results: iter of BenchmarkResult objects
+		baselines: dict of BenchmarkResult objects, keyed by name (e.g. from loadResultsFromJson). Results without a baseline are ignored
+		tolerance: Fractional slowdown (in timePerUnit) allowed before a benchmark counts as a regression
+
+	Returns
+		regressions: list of (name, baselineTimePerUnit, timePerUnit, ratio) tuples
+	"""
+	outList = list()
+	for x in results:
+		if x.name not in baselines:
+			continue
+		baseTime = baselines[x.name].timePerUnit
+		ratio = x.timePerUnit/baseTime if baseTime > 0 else np.inf
+		if ratio > 1.0 + tolerance:
+			outList.append( (x.name, baseTime, x.timePerUnit, ratio) )
+	return outList
+
+
+def getResultsTableStr(results:"iter of BenchmarkResult", baselines=None, timeUnit="s"):
+	""" Human readable table of results (plus ratio to the baseline where available). timeUnit is one of s/ms/us/ns """
+	scaleFactor = {"s":1.0, "ms":1e3, "us":1e6, "ns":1e9}[timeUnit]
+	baselines = dict() if baselines is None else baselines
+	headerStr = "{:<40} {:>14} {:>14} {:>10}".format("benchmark", "{}/unit".format(timeUnit), "units/s", "vs base")
+	outLines = [headerStr, "-"*len(headerStr)]
+	for x in results:
+		ratioStr = "{:.3f}".format(x.timePerUnit/baselines[x.name].timePerUnit) if x.name in baselines else "-"
+		nameStr = "{} (per {})".format(x.name, x.unitLabel)
+		outLines.append( "{:<40} {:>14.4g} {:>14.4g} {:>10}".format(nameStr, x.timePerUnit*scaleFactor, x.unitsPerSecond, ratioStr) )
+	return "\n".join(outLines)
+
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+""" Stand-in for the plato programs (tb1/dft2/dft), used for benchmarking when plato isnt available. Reads a plato input file
+(and any .bdt files in a model folder) and writes the matching .out file after a configurable delay.
+
+Energies come from a Morse pair potential whose equilibrium distance is nudged by the tabulated values in the .bdt files, so
+outputs vary smoothly with both geometry and the tables being fit. The physics is not meant to be meaningful; the point is that
+every stage of a fit (writing inputs/tables, running jobs, parsing outputs, fitting) does realistic work.
+
+Use createFakePlatoExecutables (or fakePlatoOnPath) to put "tb1"/"dft2"/"dft" commands calling this script on the PATH """
+
+import argparse
+import contextlib
+import itertools as it
+import math
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+
+#Layout follows the sections read by plato_pylib.plato.parse_plato_out_files (number of atoms, cell, energies); if the
+#parser changes, this template is the only thing that needs updating
+OUT_FILE_TEMPLATE = """ Plato output file (generated by fake_plato stand-in for {platoCode})
+
+ Input file: {inpPath}
+
+ Number of atoms = {nAtoms}
+
+ Unit cell vectors (bohr):
+{cellVecStr}
+
+ Atomic positions (bohr):
+{atomPosStr}
+
+ Final results
+ Energies in Ry:
+ E0 (cohesive)                  = {e0Coh:.10f}
+ E0 (total)                     = {e0Tot:.10f}
+ E1                             = {e1:.10f}
+ Entropy                        = {entropy:.10f}
+ Total energy                   = {totalE:.10f}
+ Cohesive energy                = {cohesiveE:.10f}
+
+ Total time = {runTime:.4f} s
+"""
+
+DEF_ATOMIC_ENERGY = -7.5 #Ry, added per atom to get "total" energies
+MORSE_PARAMS = {"depth":0.2, "alpha":1.0, "eqmDist":4.44, "cutoff":10.0} #Ry/bohr
+
+
+def main(argv=None):
+	args = _getArgParser().parse_args(argv)
+	startTime = time.perf_counter()
+	inpPath = getInpPathFromPlatoArg(args.fileName)
+	geom = parseInpFileGeom(inpPath)
+	tableFactor = getTableFactorFromModelFolder(args.modelFolder) if args.modelFolder is not None else 1.0
+	energies = calcEnergies(geom, tableFactor)
+
+	time.sleep( _getDelayTime(args, inpPath, len(geom["fractCoords"])) )
+
+	outPath = os.path.splitext(inpPath)[0] + ".out"
+	writeOutFile(outPath, inpPath, args.platoCode, geom, energies, time.perf_counter()-startTime)
+	return 0
+
+
+def _getArgParser():
+	parser = argparse.ArgumentParser(description="Stand-in for plato; reads an input file and writes a .out file")
+	parser.add_argument("fileName", help="Plato input file, with or without the .in extension")
+	parser.add_argument("--plato-code", dest="platoCode", default="tb1", help="Name of the plato program being imitated")
+	parser.add_argument("--model-folder", dest="modelFolder", default=None, help="Folder containing .bdt files to read")
+	parser.add_argument("--delay", type=float, default=0.0, help="Fixed time (s) to sleep for each job")
+	parser.add_argument("--delay-per-atom", dest="delayPerAtom", type=float, default=0.0, help="Extra time (s) to sleep per atom")
+	parser.add_argument("--jitter", type=float, default=0.0, help="Random fractional variation in delay (deterministic for each input file)")
+	return parser
+
+
+def getInpPathFromPlatoArg(fileName):
+	""" plato is called with the file name minus its extension (e.g. "tb1 file"); accept either form """
+	if fileName.endswith(".in"):
+		return os.path.abspath(fileName)
+	return os.path.abspath(fileName + ".in")
+
+
+def _getDelayTime(args, inpPath, nAtoms):
+	delay = args.delay + args.delayPerAtom*nAtoms
+	if args.jitter > 0:
+		rng = np.random.RandomState( zlib.crc32(inpPath.encode()) )
+		delay *= 1.0 + args.jitter*rng.uniform(-1.0,1.0)
+	return max(delay, 0.0)
+
+
+#Parsing input files
+def parseInpFileGeom(inpPath):
+	""" Get the geometry from a plato input file
+
+	Returns
+		geom: dict with keys "cellVecs" (3x3 array, bohr), "fractCoords" (nAtoms x 3 array) and "atomSymbols" (list)
+	"""
+	with open(inpPath,"rt") as f:
+		sections = getInpFileSections(f.readlines())
+
+	cellVecs = np.eye(3)
+	if "cellvec" in sections:
+		cellVecs = np.array([[float(x) for x in line.split()[:3]] for line in sections["cellvec"][:3]])
+	if "cellsize" in sections:
+		cellSize = np.array([float(x) for x in sections["cellsize"][0].split()[:3]])
+		cellVecs = cellVecs*cellSize[:,np.newaxis]
+
+	atomLines = sections.get("atoms", list())
+	if "natom" in sections:
+		atomLines = atomLines[:int(sections["natom"][0].split()[0])]
+	coords = np.array([[float(x) for x in line.split()[:3]] for line in atomLines]).reshape(-1,3)
+	atomSymbols = [line.split()[3] if len(line.split())>3 else "X" for line in atomLines]
+
+	#Plato accepts fractional or cartesian co-ords; guess from the values rather than interpreting the format keyword
+	if (len(coords)>0) and ( (coords.min()<-1e-6) or (coords.max()>1.0+1e-6) ):
+		fractCoords = np.linalg.solve(cellVecs.T, coords.T).T
+	else:
+		fractCoords = coords
+
+	return {"cellVecs":cellVecs, "fractCoords":fractCoords, "atomSymbols":atomSymbols}
+
+
+def getInpFileSections(fileAsList):
+	""" Split plato input file lines into {keyword.lower():[value lines]}. Keywords are unindented single words """
+	outDict, currKey = dict(), None
+	for line in fileAsList:
+		if line.strip() == "" or line.strip().startswith("#"):
+			continue
+		tokens = line.split()
+		if (not line[0].isspace()) and len(tokens)==1 and tokens[0][0].isalpha():
+			currKey = tokens[0].lower()
+			outDict[currKey] = list()
+		elif currKey is not None:
+			outDict[currKey].append(line.strip())
+	return outDict
+
+
+def getTableFactorFromModelFolder(modelFolder):
+	""" Read every number in the .bdt files of modelFolder and reduce them to a single factor near 1.0 """
+	allPaths = sorted([os.path.join(modelFolder,x) for x in os.listdir(modelFolder) if x.endswith(".bdt")])
+	numbPattern = re.compile(r"[-+]?\d*\.\d+(?:[eEdD][-+]?\d+)?")
+	checkSum, nVals = 0.0, 0
+	for currPath in allPaths:
+		with open(currPath,"rt") as f:
+			vals = np.array( [float(x.replace("d","e").replace("D","e")) for x in numbPattern.findall(f.read())] )
+		checkSum += np.sum( np.abs(vals[np.isfinite(vals)]) )
+		nVals += len(vals)
+	if nVals == 0:
+		return 1.0
+	return 1.0 + 0.1*math.tanh( checkSum/nVals - 1.0 )
+
+
+#Energies
+def calcEnergies(geom, tableFactor=1.0):
+	""" Returns dict of energies (Ry) with keys matching the OUT_FILE_TEMPLATE fields """
+	nAtoms = len(geom["fractCoords"])
+	e0Coh = calcMorsePairEnergy(geom["cellVecs"], geom["fractCoords"], eqmDist=MORSE_PARAMS["eqmDist"]*tableFactor)
+	e1 = -0.01*nAtoms*(tableFactor-1.0)
+	e0Tot = e0Coh + nAtoms*DEF_ATOMIC_ENERGY
+	return {"e0Coh":e0Coh, "e0Tot":e0Tot, "e1":e1, "entropy":0.0, "totalE":e0Tot+e1, "cohesiveE":e0Coh+e1}
+
+
+def calcMorsePairEnergy(cellVecs, fractCoords, eqmDist, depth=None, alpha=None, cutoff=None):
+	depth = MORSE_PARAMS["depth"] if depth is None else depth
+	alpha = MORSE_PARAMS["alpha"] if alpha is None else alpha
+	cutoff = MORSE_PARAMS["cutoff"] if cutoff is None else cutoff
+	if len(fractCoords) == 0:
+		return 0.0
+
+	cartCoords = np.dot(fractCoords, cellVecs)
+	cellLengths = np.linalg.norm(cellVecs, axis=1)
+	nImages = [int(math.ceil(cutoff/x)) for x in cellLengths]
+	imageShifts = np.array([np.dot(idxs,cellVecs) for idxs in it.product(*[range(-n,n+1) for n in nImages])])
+
+	diffVects = cartCoords[np.newaxis,:,np.newaxis,:] + imageShifts[np.newaxis,np.newaxis,:,:] - cartCoords[:,np.newaxis,np.newaxis,:]
+	dists = np.linalg.norm(diffVects, axis=3)
+	dists = dists[(dists>1e-8) & (dists<cutoff)]
+	expTerm = np.exp( -alpha*(dists-eqmDist) )
+	return float( 0.5*np.sum(depth*(expTerm**2 - 2*expTerm)) )
+
+
+#Writing output files
+def writeOutFile(outPath, inpPath, platoCode, geom, energies, runTime):
+	cartCoords = np.dot(geom["fractCoords"], geom["cellVecs"])
+	cellVecStr = "\n".join([" {:16.8f} {:16.8f} {:16.8f}".format(*x) for x in geom["cellVecs"]])
+	atomPosStr = "\n".join([" {:16.8f} {:16.8f} {:16.8f} {}".format(*pos,sym) for pos,sym in zip(cartCoords,geom["atomSymbols"])])
+	outStr = OUT_FILE_TEMPLATE.format(platoCode=platoCode, inpPath=inpPath, nAtoms=len(cartCoords), cellVecStr=cellVecStr,
+	                                  atomPosStr=atomPosStr, runTime=runTime, **energies)
+	with open(outPath,"wt") as f:
+		f.write(outStr)
+
+
+#Putting fake plato commands on the path
+def createFakePlatoExecutables(binFolder, platoCodes=("tb1","dft2","dft"), modelFolder=None, delay=0.0, delayPerAtom=0.0, jitter=0.0):
+	""" Write executable scripts (one per plato code) that call this module
+
+	Args:
+		binFolder: Folder to write the scripts to; created if needed
+		platoCodes: Names of the commands to create
+		modelFolder: Folder containing .bdt files for the fake plato to read each run (None means tables are ignored)
+		delay: Fixed time (s) each job takes
+		delayPerAtom: Extra time (s) per atom each job takes
+		jitter: Random fractional variation in job time
+
+	Returns
+		outPaths: List of paths to the created scripts
+	"""
+	os.makedirs(binFolder, exist_ok=True)
+	extraArgs = "--delay {} --delay-per-atom {} --jitter {}".format(delay, delayPerAtom, jitter)
+	if modelFolder is not None:
+		extraArgs += " --model-folder '{}'".format(os.path.abspath(modelFolder))
+
+	outPaths = list()
+	for code in platoCodes:
+		currPath = os.path.join(os.path.abspath(binFolder), code)
+		with open(currPath,"wt") as f:
+			f.write("#!/bin/sh\nexec '{}' '{}' --plato-code {} {} \"$@\"\n".format(sys.executable, os.path.abspath(__file__), code, extraArgs))
+		os.chmod(currPath, 0o755)
+		outPaths.append(currPath)
+	return outPaths
+
+
+@contextlib.contextmanager
+def fakePlatoOnPath(binFolder, **kwargs):
+	""" Context manager; creates fake plato executables (kwargs passed to createFakePlatoExecutables) and puts them first on PATH """
+	createFakePlatoExecutables(binFolder, **kwargs)
+	startPath = os.environ.get("PATH", "")
+	os.environ["PATH"] = os.path.abspath(binFolder) + os.pathsep + startPath
+	try:
+		yield
+	finally:
+		os.environ["PATH"] = startPath
+
+
+if __name__ == '__main__':
+	sys.exit( main() )
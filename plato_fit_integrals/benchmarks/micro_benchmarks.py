@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+""" Microbenchmarks for the numerical kernels called on every objective function evaluation (analytical representations,
+tail functions and comparison functions). Inputs are generated from fixed seeds so timings are comparable between runs.
+Run from the command line with
+
+	python -m plato_fit_integrals.benchmarks.micro_benchmarks --sizes 100 1000 100000 --baseline micro_baseline.json
+
+Timings are reported per table point (ns/point) along with the peak memory allocated during one call """
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import plato_fit_integrals.benchmarks.bench_results as benchResults
+import plato_fit_integrals.core.create_analytical_reprs as aReprs
+import plato_fit_integrals.initialise.create_workflows_comp_ints as compIntsWorkFlows
+import plato_fit_integrals.initialise.obj_functs_targ_vals as objCmpFuncts
+
+
+MICRO_BENCHMARKS = dict()
+DEF_SIZES = (100, 1000, 10000, 100000)
+R_CUT, TAIL_DELTA = 10.0, 1.0
+
+
+def registerMicroBenchmark(key):
+	""" Register a function with interface (nPoints, rng)->kernel, where kernel is a zero-argument callable to time. Any
+	setup (creating inputs/objects) happens in the outer function, so isnt timed """
+	def decorate(funct):
+		MICRO_BENCHMARKS[key] = funct
+		return funct
+	return decorate
+
+
+def timeMicroBenchmark(key, nPoints, nRepeats=5, seed=0, trackAllocs=True):
+	""" Time a registered kernel
+
+	Args:
+		key: Key in MICRO_BENCHMARKS
+		nPoints: Number of table points (x-values) the kernel works on
+		nRepeats: Number of timed calls
+		seed: Seed for generating inputs
+		trackAllocs: If True, make one extra (untimed) call with tracemalloc on to find peak memory allocated by the kernel
+
+	Returns
+		result: BenchmarkResult named "{key}_{nPoints}", with nUnits=nPoints. extraInfo contains peakAllocBytes/peakAllocBytesPerPoint
+		        if trackAllocs is True
+	"""
+	kernel = MICRO_BENCHMARKS[key](nPoints, np.random.RandomState(seed))
+	kernel() #Warm-up call
+	wallTimes = list()
+	for idx in range(nRepeats):
+		startTime = time.perf_counter()
+		kernel()
+		wallTimes.append( time.perf_counter()-startTime )
+
+	extraInfo = dict()
+	if trackAllocs:
+		peakBytes = _getPeakAllocBytes(kernel)
+		extraInfo = {"peakAllocBytes":peakBytes, "peakAllocBytesPerPoint":peakBytes/nPoints}
+
+	return benchResults.BenchmarkResult("{}_{}".format(key,nPoints), wallTimes, nUnits=nPoints, unitLabel="point", extraInfo=extraInfo)
+
+
+def _getPeakAllocBytes(kernel):
+	tracemalloc.start()
+	try:
+		tracemalloc.reset_peak()
+		startBytes = tracemalloc.get_traced_memory()[0]
+		kernel()
+		peakBytes = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+	return peakBytes - startBytes
+
+
+def runMicroBenchmarks(keys=None, sizes=None, **kwargs):
+	""" Run multiple kernels (all by default) at multiple sizes (DEF_SIZES by default). kwargs passed to timeMicroBenchmark
+
+	Returns
+		results: list of BenchmarkResult objects
+	"""
+	keys = list(MICRO_BENCHMARKS.keys()) if keys is None else keys
+	sizes = DEF_SIZES if sizes is None else sizes
+	return [timeMicroBenchmark(key, nPoints, **kwargs) for key in keys for nPoints in sizes]
+
+
+#Inputs
+def _getSortedXVals(nPoints, rng, minVal=0.5, maxVal=1.2*R_CUT):
+	return np.sort( rng.uniform(minVal, maxVal, nPoints) )
+
+
+def _createCawkwellRepr():
+	return aReprs.Cawkwell17ModTailRepr(rCut=R_CUT, refR0=4.4, valAtR0=-0.2, startCoeffs=[-0.5,0.05,-0.01], tailDelta=TAIL_DELTA, nodePositions=[6.5])
+
+
+def _createExpDecayRepr():
+	return aReprs.ExpDecayFunct(r0=2.0, alpha=1.0, prefactor=2.0, rCut=R_CUT, tailDelta=TAIL_DELTA)
+
+
+def _getTargAndActVals(nPoints, rng):
+	targVals = rng.standard_normal(nPoints)
+	return targVals, targVals + 0.1*rng.standard_normal(nPoints)
+
+
+def _getTargAndActIntegTables(nPoints, rng):
+	xVals = _getSortedXVals(nPoints, rng, maxVal=R_CUT)
+	targInts = np.column_stack( [xVals, np.exp(-xVals) + 1e-3*rng.standard_normal(nPoints)] )
+	actXVals = np.linspace(0.5, R_CUT, nPoints)
+	actInts = np.column_stack( [actXVals, np.exp(-1.1*actXVals)] )
+	return targInts, actInts
+
+
+#Kernels
+@registerMicroBenchmark("cawkwell17_mod_tail")
+def _createCawkwellKernel(nPoints, rng):
+	aRepr, xVals = _createCawkwellRepr(), _getSortedXVals(nPoints, rng)
+	return lambda: aRepr.evalAtListOfXVals(xVals)
+
+
+@registerMicroBenchmark("exp_decay")
+def _createExpDecayKernel(nPoints, rng):
+	aRepr, xVals = _createExpDecayRepr(), _getSortedXVals(nPoints, rng)
+	return lambda: aRepr.evalAtListOfXVals(xVals)
+
+
+@registerMicroBenchmark("composite_repr")
+def _createCompositeKernel(nPoints, rng):
+	aRepr = aReprs.getCombinedAnalyticalReprs([_createCawkwellRepr(), _createExpDecayRepr()])
+	xVals = _getSortedXVals(nPoints, rng)
+	return lambda: aRepr.evalAtListOfXVals(xVals)
+
+
+@registerMicroBenchmark("tail_funct")
+def _createTailFunctKernel(nPoints, rng):
+	xVals = _getSortedXVals(nPoints, rng)
+	return lambda: aReprs.applyTailFunctToListOfXVals(xVals, R_CUT, TAIL_DELTA)
+
+
+@registerMicroBenchmark("vectorised_targ_val_sqrdev")
+def _createVectorisedTargValKernel(nPoints, rng):
+	cmpFunct = objCmpFuncts.createVectorisedTargValObjFunction("sqrdev")
+	targVals, actVals = _getTargAndActVals(nPoints, rng)
+	return lambda: cmpFunct(targVals, actVals)
+
+
+@registerMicroBenchmark("rmsd_ints_vs_ref")
+def _createRmsdIntsKernel(nPoints, rng):
+	cmpFunct = compIntsWorkFlows._createRmsdObjFunct()
+	targInts, actInts = _getTargAndActIntegTables(nPoints, rng)
+	return lambda: cmpFunct(targInts, actInts)
+
+
+@registerMicroBenchmark("mae_ints_vs_ref")
+def _createMaeIntsKernel(nPoints, rng):
+	cmpFunct = compIntsWorkFlows._createMaeObjFunct()
+	targInts, actInts = _getTargAndActIntegTables(nPoints, rng)
+	return lambda: cmpFunct(targInts, actInts)
+
+
+#Command line interface
+def main(argv=None):
+	parser = _getArgParser()
+	args = parser.parse_args(argv)
+	if args.saveBaseline and (args.baseline is None):
+		parser.error("--save-baseline requires --baseline")
+
+	results = runMicroBenchmarks(keys=args.kernels, sizes=args.sizes, nRepeats=args.nRepeats, seed=args.seed, trackAllocs=not args.noAllocs)
+
+	baselines = dict()
+	if (args.baseline is not None) and os.path.exists(args.baseline):
+		baselines = benchResults.loadResultsFromJson(args.baseline)
+	print( benchResults.getResultsTableStr(results, baselines, timeUnit="ns") )
+	if not args.noAllocs:
+		print("\n{:<40} {:>16} {:>16}".format("benchmark", "peak alloc (B)", "alloc B/point"))
+		for x in results:
+			print( "{:<40} {:>16d} {:>16.2f}".format(x.name, x.extraInfo["peakAllocBytes"], x.extraInfo["peakAllocBytesPerPoint"]) )
+
+	if args.saveBaseline:
+		benchResults.updateBaselineFile(results, args.baseline)
+		return 0
+
+	regressions = benchResults.findRegressions(results, baselines, tolerance=args.tolerance)
+	for name, baseTime, currTime, ratio in regressions:
+		print("REGRESSION: {} took {:.4g} ns/point vs baseline {:.4g} ns/point ({:.2f}x)".format(name, currTime*1e9, baseTime*1e9, ratio))
+	return int( len(regressions) > 0 )
+
+
+def _getArgParser():
+	parser = argparse.ArgumentParser(description="Microbenchmarks for analytical representation and comparison function kernels")
+	parser.add_argument("--kernels", nargs="+", default=None, choices=sorted(MICRO_BENCHMARKS.keys()), help="Kernels to time (default=all)")
+	parser.add_argument("--sizes", nargs="+", type=int, default=list(DEF_SIZES), help="Numbers of table points")
+	parser.add_argument("--n-repeats", dest="nRepeats", type=int, default=5, help="Timed calls per kernel/size")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--no-allocs", dest="noAllocs", action="store_true", help="Skip measuring memory allocations")
+	parser.add_argument("--baseline", default=None, help="Json file of baseline results to compare against")
+	parser.add_argument("--save-baseline", dest="saveBaseline", action="store_true", help="Store these results in the baseline file")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="Fractional slowdown vs baseline counted as a regression")
+	return parser
+
+
+if __name__ == '__main__':
+	sys.exit( main() )
+
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+""" End-to-end benchmarks for each workflow type, run against the fake_plato stand-in so they dont need plato installed.
+
+Each iteration carries out everything the optimiser triggers per objective function evaluation after the tables are written:
+deleting old outputs, running the (fake) plato jobs, parsing outputs and calculating properties. Run from the command line with
+
+	python -m plato_fit_integrals.benchmarks.run_benchmarks --sizes small medium --baseline bench_baseline.json
+
+Use --save-baseline to store the results as the new baseline; without it the exit code is 1 if any benchmark regressed """
+
+import argparse
+import contextlib
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_pylib.plato.mod_plato_inp_files as modInp
+import plato_pylib.plato.parse_plato_out_files as parsePlatoOut
+import plato_pylib.shared.ucell_class as UCell
+import plato_pylib.utils.job_running_functs as jobRun
+
+import plato_fit_integrals.benchmarks.bench_results as benchResults
+import plato_fit_integrals.benchmarks.fake_plato as fakePlato
+import plato_fit_integrals.core.coeffs_to_tables as coeffsToTables
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+import plato_fit_integrals.initialise.base_objs as baseObjs
+import plato_fit_integrals.initialise.create_cluster_binding_energy_workflows as clusterWorkFlows
+import plato_fit_integrals.initialise.create_ecurve_workflows as ecurveWorkFlows
+import plato_fit_integrals.initialise.create_eos_workflows as eosWorkFlows
+import plato_fit_integrals.initialise.create_interstit_workflows as interstitWorkFlows
+import plato_fit_integrals.initialise.create_surf_energies_workflows as surfWorkFlows
+import plato_fit_integrals.initialise.create_vacancy_workflows as vacWorkFlows
+import plato_fit_integrals.initialise.create_workflows_comp_ints as compIntsWorkFlows
+
+
+BENCHMARK_CASES = dict()
+BENCHMARK_SIZES = {"small":1, "medium":2, "large":3} #Values are scale factors passed to the functions creating workflows
+SI_LATT_PARAM = 10.26 #bohr
+
+
+def registerBenchmarkCase(key):
+	""" Register a function with interface (workFolder, sizeFactor, platoCode)->list of workflows as a benchmark """
+	def decorate(funct):
+		BENCHMARK_CASES[key] = funct
+		return funct
+	return decorate
+
+
+def runBenchmarkCase(caseKey, sizeLabel, workFolder, nIters=5, platoCode="tb1", nCores=1, modelFolder=None, delay=0.0, delayPerAtom=0.0):
+	""" Time repeated runs of the workflows for one benchmark case
+
+	Args:
+		caseKey: Key in BENCHMARK_CASES (e.g. "eos")
+		sizeLabel: Key in BENCHMARK_SIZES (e.g. "small")
+		workFolder: Folder to carry out the calculations in (a sub-folder is created for each case/size)
+		nIters: Number of times to run the workflows; each counts as one iteration of a fit
+		platoCode: Plato program to imitate
+		nCores: Number of plato jobs to run at once
+		modelFolder: Folder of .bdt files for the fake plato to read on each run (None means no tables are read)
+		delay: Time (s) each fake plato job takes, in addition to its actual run time
+		delayPerAtom: Extra time (s) per atom for each fake plato job
+
+	Returns
+		result: BenchmarkResult, with per-iteration wall times. extraInfo contains the number of plato jobs per iteration and
+		        the mean wall time of each instrumented phase
+	"""
+	caseFolder = os.path.abspath( os.path.join(workFolder, "{}_{}".format(caseKey,sizeLabel)) )
+	binFolder = os.path.join(caseFolder, "bin")
+	with fakePlato.fakePlatoOnPath(binFolder, modelFolder=modelFolder, delay=delay, delayPerAtom=delayPerAtom):
+		workFlows = BENCHMARK_CASES[caseKey](caseFolder, BENCHMARK_SIZES[sizeLabel], platoCode)
+		coordinator = wflowCoord.WorkFlowCoordinator(workFlows, nCores=nCores)
+		nPlatoJobs = len(coordinator.preRunShellComms)
+
+		phaseTimer = instrumentation.PhaseTimer(rollingWindow=nIters)
+		coordinator.phaseTimer = phaseTimer
+		iterTimes = list()
+		for idx in range(nIters):
+			phaseTimer.startIteration()
+			startTime = time.perf_counter()
+			coordinator.runAndGetPropertyValues()
+			iterTimes.append( time.perf_counter()-startTime )
+			phaseTimer.endIteration()
+
+	phaseTimes = {key:val["meanWall"] for key,val in phaseTimer.getRollingStats().items()}
+	extraInfo = {"nPlatoJobs":nPlatoJobs, "nCores":nCores, "meanPhaseWallTimes":phaseTimes}
+	return benchResults.BenchmarkResult(os.path.basename(caseFolder), iterTimes, nUnits=1, unitLabel="iter", extraInfo=extraInfo)
+
+
+def runBenchmarks(caseKeys=None, sizeLabels=None, workFolder=None, **kwargs):
+	""" Run multiple benchmark cases (all by default) at multiple sizes (all by default). kwargs are passed to runBenchmarkCase.
+	If workFolder is None, a temporary folder is used and deleted afterwards
+
+	Returns
+		results: list of BenchmarkResult objects
+	"""
+	caseKeys = list(BENCHMARK_CASES.keys()) if caseKeys is None else caseKeys
+	sizeLabels = list(BENCHMARK_SIZES.keys()) if sizeLabels is None else sizeLabels
+	with contextlib.ExitStack() as stack:
+		if workFolder is None:
+			workFolder = stack.enter_context( tempfile.TemporaryDirectory() )
+		outResults = list()
+		for caseKey in caseKeys:
+			for sizeLabel in sizeLabels:
+				outResults.append( runBenchmarkCase(caseKey, sizeLabel, workFolder, **kwargs) )
+	return outResults
+
+
+#Benchmark cases
+@registerBenchmarkCase("eos")
+def _createEosBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	lattParams = np.linspace(0.94, 1.06, 4*sizeFactor+3)*SI_LATT_PARAM
+	structDict = {"diamond":[_createDiamondSupercell(x) for x in lattParams]}
+	return [eosWorkFlows.CreateEosWorkFlow(structDict, {"diamond":dict()}, workFolder, platoCode)()]
+
+
+@registerBenchmarkCase("ecurve")
+def _createDimerCurveBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	structList = ecurveWorkFlows.createDimerDissocCurveStructs(np.linspace(3.5,8.0,8*sizeFactor), "Si", "Si")
+	return [ecurveWorkFlows.CreateStructEnergiesWorkFlow(structList, dict(), workFolder, platoCode)()]
+
+
+@registerBenchmarkCase("interstitial")
+def _createInterstitialBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	refStruct = _createDiamondSupercell(SI_LATT_PARAM, nRepeats=sizeFactor)
+	interStruct = _createDiamondSupercell(SI_LATT_PARAM, nRepeats=sizeFactor, extraFractCoords=[[0.5/sizeFactor for x in range(3)]])
+	factory = interstitWorkFlows.CreateInterstitialWorkFlow(refStruct, interStruct, workFolder, dict(), platoCode, cellDims=[sizeFactor]*3)
+	return [factory()]
+
+
+@registerBenchmarkCase("vacancy")
+def _createVacancyBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	bulkStruct = _createDiamondSupercell(SI_LATT_PARAM, nRepeats=sizeFactor)
+	vacStruct = _createDiamondSupercell(SI_LATT_PARAM, nRepeats=sizeFactor, removeIdxs=[0])
+	bulkRunner = _BenchmarkPlatoRunner(bulkStruct, workFolder, "bulk", platoCode)
+	vacRunner = _BenchmarkPlatoRunner(vacStruct, workFolder, "vacancy", platoCode)
+	return [vacWorkFlows.VacancyWorkFlow(vacRunner, bulkRunner)]
+
+
+@registerBenchmarkCase("surface")
+def _createSurfaceBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	bulkStruct = _createDiamondSupercell(SI_LATT_PARAM, nRepeats=sizeFactor)
+	surfStruct = _createDiamondSupercell(SI_LATT_PARAM, nRepeats=sizeFactor, vacuumFactor=2.0)
+	surfArea = (SI_LATT_PARAM*sizeFactor)**2
+	bulkRunner = _BenchmarkPlatoRunner(bulkStruct, workFolder, "bulk", platoCode)
+	surfRunner = _BenchmarkPlatoRunner(surfStruct, workFolder, "surface", platoCode, surfaceArea=surfArea)
+	return [surfWorkFlows.SurfaceEnergiesWorkFlow(surfRunner, bulkRunner)]
+
+
+@registerBenchmarkCase("cluster_binding")
+def _createClusterBindingBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	nMolecules, molSpacing, dimerSep, vacuum = 2*sizeFactor, 8.0, 4.4, 20.0
+	boxLength = nMolecules*molSpacing + vacuum
+	monomerStruct = _createDimersInBox([0.5*boxLength], dimerSep, boxLength)
+	clusterStruct = _createDimersInBox([0.5*vacuum + idx*molSpacing for idx in range(nMolecules)], dimerSep, boxLength)
+	monomerRunner = _BenchmarkPlatoRunner(monomerStruct, workFolder, "monomer", platoCode, nMolecules=1)
+	clusterRunner = _BenchmarkPlatoRunner(clusterStruct, workFolder, "cluster", platoCode, nMolecules=nMolecules)
+	return [clusterWorkFlows.ClusterBindingEnergyWorkFlow(clusterRunner, monomerRunner)]
+
+
+@registerBenchmarkCase("integrals_vs_ref")
+def _createIntegralsVsRefBenchWorkFlows(workFolder, sizeFactor, platoCode):
+	nPoints = 1000*(10**(sizeFactor-1))
+	rng = np.random.RandomState(0)
+	xVals = np.linspace(0.5, 10.0, nPoints)
+	refInts = np.column_stack( [xVals, np.exp(-xVals) + 1e-3*rng.standard_normal(nPoints)] )
+	intTable = SimpleNamespace(integrals=np.column_stack([xVals,np.exp(-1.1*xVals)]), shellA=None, shellB=None)
+	integHolder = coeffsToTables.IntegralsHolder([("Si","Si")], [{"pairpot":[intTable], "pairpotcorrection0":None}])
+	integInfo = coeffsToTables.IntegralTableInfo(workFolder, "pairpot", "Si", "Si")
+	return [compIntsWorkFlows.CreateWorkflowActualIntsVsRef(integHolder, refInts, integInfo)()]
+
+
+#Structures/runners used by the benchmark cases
+def _createDiamondSupercell(lattParam, nRepeats=1, vacuumFactor=1.0, removeIdxs=None, extraFractCoords=None):
+	""" Cubic diamond supercell of Si. vacuumFactor>1 stretches the cell along z (leaving atoms in place) to create a slab.
+	extraFractCoords are in fractions of the (non-stretched) supercell """
+	basis = np.array([[0.0,0.0,0.0], [0.0,0.5,0.5], [0.5,0.0,0.5], [0.5,0.5,0.0]])
+	basis = np.concatenate([basis, basis+0.25])
+	fractCoords = list()
+	for i in range(nRepeats):
+		for j in range(nRepeats):
+			for k in range(nRepeats):
+				fractCoords.extend( (basis + np.array([i,j,k]))/nRepeats )
+	fractCoords = [list(x) for idx,x in enumerate(fractCoords) if idx not in (removeIdxs or list())]
+	fractCoords.extend( [list(x) for x in (extraFractCoords or list())] )
+
+	fractCoords = [[x[0], x[1], x[2]/vacuumFactor, "Si"] for x in fractCoords]
+	cellLength = lattParam*nRepeats
+	lattVects = [[cellLength,0.0,0.0], [0.0,cellLength,0.0], [0.0,0.0,cellLength*vacuumFactor]]
+	return UCell.UnitCell.fromLattVects(lattVects, fractCoords=fractCoords)
+
+
+def _createDimersInBox(centreXVals, dimerSep, boxLength):
+	fractCoords = list()
+	for xVal in centreXVals:
+		fractCoords.append( [xVal/boxLength, 0.5, 0.5 - 0.5*dimerSep/boxLength, "Si"] )
+		fractCoords.append( [xVal/boxLength, 0.5, 0.5 + 0.5*dimerSep/boxLength, "Si"] )
+	lattVects = [[boxLength,0.0,0.0], [0.0,boxLength,0.0], [0.0,0.0,boxLength]]
+	return UCell.UnitCell.fromLattVects(lattVects, fractCoords=fractCoords)
+
+
+class _BenchmarkPlatoRunner(baseObjs.PointDefectRunnerBase):
+	""" Runs a single plato job for one structure; covers the runner interfaces needed by the vacancy, surface and cluster workflows """
+
+	def __init__(self, struct, workFolder, fileName, platoCode, surfaceArea=None, nMolecules=1):
+		self.struct = struct
+		self.workFolder = workFolder
+		self.fileName = fileName
+		self.platoCode = platoCode
+		self.surfaceArea = surfaceArea
+		self.nMolecules = nMolecules
+
+	@property
+	def workFolder(self):
+		return self._workFolder
+
+	@workFolder.setter
+	def workFolder(self, value):
+		self._workFolder = os.path.abspath(value)
+
+	@property
+	def inpPath(self):
+		return os.path.join(self.workFolder, self.fileName + ".in")
+
+	@property
+	def outPath(self):
+		return os.path.join(self.workFolder, self.fileName + ".out")
+
+	def writeFiles(self):
+		pathlib.Path(self.workFolder).mkdir(exist_ok=True, parents=True)
+		strDict = modInp.getStrDictFromOptDict(modInp.getDefOptDict(self.platoCode), self.platoCode)
+		strDict.update( modInp.getPlatoGeomDictFromUnitCell(self.struct) )
+		modInp.writePlatoOutFileFromDict(self.inpPath, strDict)
+
+	@property
+	def runComm(self):
+		with contextlib.suppress(FileNotFoundError):
+			os.remove(self.outPath)
+		return jobRun.pathListToPlatoRunComms([self.inpPath], self.platoCode)
+
+	@property
+	def nAtoms(self):
+		return len(self.struct.fractCoords)
+
+	@property
+	def totalEnergy(self):
+		return parsePlatoOut.parsePlatoOutFile(self.outPath)["energies"].electronicCohesiveE
+
+	@property
+	def ePerAtom(self):
+		return self.totalEnergy/self.nAtoms
+
+
+#Command line interface
+def main(argv=None):
+	parser = _getArgParser()
+	args = parser.parse_args(argv)
+	if args.saveBaseline and (args.baseline is None):
+		parser.error("--save-baseline requires --baseline")
+
+	results = runBenchmarks(caseKeys=args.cases, sizeLabels=args.sizes, workFolder=args.workFolder, nIters=args.nIters,
+	                        platoCode=args.platoCode, nCores=args.nCores, modelFolder=args.modelFolder, delay=args.delay,
+	                        delayPerAtom=args.delayPerAtom)
+
+	baselines = dict()
+	if (args.baseline is not None) and os.path.exists(args.baseline):
+		baselines = benchResults.loadResultsFromJson(args.baseline)
+	print( benchResults.getResultsTableStr(results, baselines) )
+
+	if args.saveBaseline:
+		benchResults.updateBaselineFile(results, args.baseline)
+		return 0
+
+	regressions = benchResults.findRegressions(results, baselines, tolerance=args.tolerance)
+	for name, baseTime, currTime, ratio in regressions:
+		print("REGRESSION: {} took {:.4g} s/iter vs baseline {:.4g} s/iter ({:.2f}x)".format(name, currTime, baseTime, ratio))
+	return int( len(regressions) > 0 )
+
+
+def _getArgParser():
+	parser = argparse.ArgumentParser(description="End-to-end workflow benchmarks using a fake plato executable")
+	parser.add_argument("--cases", nargs="+", default=None, choices=sorted(BENCHMARK_CASES.keys()), help="Benchmark cases to run (default=all)")
+	parser.add_argument("--sizes", nargs="+", default=None, choices=list(BENCHMARK_SIZES.keys()), help="Sizes to run (default=all)")
+	parser.add_argument("--n-iters", dest="nIters", type=int, default=5, help="Iterations per benchmark")
+	parser.add_argument("--plato-code", dest="platoCode", default="tb1")
+	parser.add_argument("--n-cores", dest="nCores", type=int, default=1)
+	parser.add_argument("--model-folder", dest="modelFolder", default=None, help="Folder with .bdt files for the fake plato to read")
+	parser.add_argument("--delay", type=float, default=0.0, help="Extra time (s) per fake plato job")
+	parser.add_argument("--delay-per-atom", dest="delayPerAtom", type=float, default=0.0, help="Extra time (s) per atom per fake plato job")
+	parser.add_argument("--work-folder", dest="workFolder", default=None, help="Folder for calculations (default is a temporary folder)")
+	parser.add_argument("--baseline", default=None, help="Json file of baseline results to compare against")
+	parser.add_argument("--save-baseline", dest="saveBaseline", action="store_true", help="Store these results in the baseline file")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="Fractional slowdown vs baseline counted as a regression")
+	return parser
+
+
+if __name__ == '__main__':
+	sys.exit( main() )
+
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+
+import plato_fit_integrals.benchmarks.bench_results as tCode
+
+
+class TestBenchmarkRegressions(unittest.TestCase):
+
+	def setUp(self):
+		self.baselines = {"eos_small":tCode.BenchmarkResult("eos_small", [1.0,2.0,3.0], nUnits=2),
+		                  "ecurve_small":tCode.BenchmarkResult("ecurve_small", [1.0])}
+		self.tolerance = 0.2
+
+	def testTimePerUnitUsesMedian(self):
+		self.assertAlmostEqual(1.0, self.baselines["eos_small"].timePerUnit)
+
+	def testSlowdownWithinToleranceIgnored(self):
+		results = [tCode.BenchmarkResult("eos_small", [2.2], nUnits=2)]
+		self.assertEqual(list(), tCode.findRegressions(results, self.baselines, tolerance=self.tolerance))
+
+	def testSlowdownOutsideToleranceFound(self):
+		results = [tCode.BenchmarkResult("eos_small", [3.0], nUnits=2), tCode.BenchmarkResult("ecurve_small", [0.5]),
+		           tCode.BenchmarkResult("no_baseline", [100.0])]
+		actVals = tCode.findRegressions(results, self.baselines, tolerance=self.tolerance)
+		self.assertEqual(["eos_small"], [x[0] for x in actVals])
+		self.assertAlmostEqual(1.5, actVals[0][-1])
+
+	def testUpdateBaselineFileKeepsOtherEntries(self):
+		with tempfile.TemporaryDirectory() as tempDir:
+			outPath = os.path.join(tempDir, "baseline.json")
+			tCode.saveResultsToJson(self.baselines.values(), outPath)
+			newResult = tCode.BenchmarkResult("eos_small", [5.0], extraInfo={"nPlatoJobs":4})
+			tCode.updateBaselineFile([newResult], outPath)
+			actVals = tCode.loadResultsFromJson(outPath)
+		self.assertEqual(newResult, actVals["eos_small"])
+		self.assertEqual(self.baselines["ecurve_small"], actVals["ecurve_small"])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import plato_fit_integrals.benchmarks.fake_plato as tCode
+
+PLATO_PYLIB_MISSING = subprocess.call([sys.executable, "-c", "import plato_pylib"], stderr=subprocess.DEVNULL) != 0
+
+class TestFakePlato(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.workFolder = self.tempDir.name
+		self.inpPath = os.path.join(self.workFolder, "dimer.in")
+		self.dimerSep = 4.0
+		self.boxLength = 30.0
+		self._writeInpFile()
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def _writeInpFile(self):
+		fileStr = "Format\n    0\n\nCellSize\n    {0} {0} {0}\n\nCellVec\n    1.0 0.0 0.0\n    0.0 1.0 0.0\n    0.0 0.0 1.0\n\n"
+		fileStr += "Natom\n    2\n\nAtoms\n    0.5 0.5 0.5 Si\n    0.5 0.5 {1} Si\n"
+		with open(self.inpPath,"wt") as f:
+			f.write( fileStr.format(self.boxLength, 0.5 + self.dimerSep/self.boxLength) )
+
+	def testGeomParsedFromInpFile(self):
+		geom = tCode.parseInpFileGeom(self.inpPath)
+		cartCoords = np.dot(geom["fractCoords"], geom["cellVecs"])
+		self.assertEqual(["Si","Si"], geom["atomSymbols"])
+		self.assertAlmostEqual(self.dimerSep, np.linalg.norm(cartCoords[1]-cartCoords[0]))
+
+	def testDimerEnergyMatchesMorseFormula(self):
+		geom = tCode.parseInpFileGeom(self.inpPath)
+		depth, alpha, eqmDist = [tCode.MORSE_PARAMS[x] for x in ["depth","alpha","eqmDist"]]
+		expVal = depth*( np.exp(-2*alpha*(self.dimerSep-eqmDist)) - 2*np.exp(-alpha*(self.dimerSep-eqmDist)) )
+		self.assertAlmostEqual(expVal, tCode.calcEnergies(geom)["e0Coh"])
+
+	def testTableFactorChangesWithBdtValues(self):
+		bdtPath = os.path.join(self.workFolder, "Si_Si.bdt")
+		factors = list()
+		for val in [1.0, 2.0]:
+			with open(bdtPath,"wt") as f:
+				f.write("PairPot\n 0.5 {:.4f}\n 1.0 {:.4f}\n".format(val,val))
+			factors.append( tCode.getTableFactorFromModelFolder(self.workFolder) )
+		self.assertTrue(factors[1] > factors[0])
+
+	def testExecutableWritesOutFile(self):
+		binFolder = os.path.join(self.workFolder, "bin")
+		with tCode.fakePlatoOnPath(binFolder, platoCodes=["tb1"]):
+			subprocess.check_call("cd {}; tb1 dimer".format(self.workFolder), shell=True)
+		with open(os.path.join(self.workFolder, "dimer.out"),"rt") as f:
+			outStr = f.read()
+		self.assertTrue("Number of atoms = 2" in outStr)
+		self.assertFalse(binFolder in os.environ["PATH"])
+
+	@unittest.skipIf(PLATO_PYLIB_MISSING, "plato_pylib not installed")
+	def testOutFileParsedByPlatoPylib(self):
+		import plato_pylib.plato.parse_plato_out_files as parsePlatoOut
+		geom = tCode.parseInpFileGeom(self.inpPath)
+		energies = tCode.calcEnergies(geom)
+		outPath = os.path.join(self.workFolder, "dimer.out")
+		tCode.writeOutFile(outPath, self.inpPath, "tb1", geom, energies, 0.0)
+		parsedFile = parsePlatoOut.parsePlatoOutFile(outPath)
+		self.assertEqual(2, parsedFile["numbAtoms"])
+		self.assertAlmostEqual(energies["e0Coh"], parsedFile["energies"].e0Coh) #Ry in both
+		self.assertAlmostEqual(energies["cohesiveE"], parsedFile["energies"].electronicCohesiveE)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+
+import unittest
+
+import plato_fit_integrals.benchmarks.micro_benchmarks as tCode
+
+
+class TestMicroBenchmarks(unittest.TestCase):
+
+	def setUp(self):
+		self.nPoints = 50
+		self.nRepeats = 2
+
+	def testAllKernelsRunAtSmallSize(self):
+		results = tCode.runMicroBenchmarks(sizes=[self.nPoints], nRepeats=self.nRepeats)
+		expNames = ["{}_{}".format(x,self.nPoints) for x in tCode.MICRO_BENCHMARKS.keys()]
+		self.assertEqual(expNames, [x.name for x in results])
+		self.assertTrue( all([x.nUnits==self.nPoints for x in results]) )
+
+	def testAllocsTracked(self):
+		result = tCode.timeMicroBenchmark("tail_funct", self.nPoints, nRepeats=self.nRepeats)
+		self.assertTrue(result.extraInfo["peakAllocBytes"] >= 8*self.nPoints) #At least the output array
+
+	def testKernelInputsFixedBySeed(self):
+		outVals = [tCode.MICRO_BENCHMARKS["exp_decay"](self.nPoints, tCode.np.random.RandomState(3))() for x in range(2)]
+		self.assertEqual(list(outVals[0]), list(outVals[1]))
+
+
+if __name__ == '__main__':
+	unittest.main()
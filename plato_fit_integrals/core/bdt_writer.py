@@ -0,0 +1,462 @@
+
+""" Fast writing of .bdt (integral table) files during a fit. Rather than re-implementing the format, the layout of each file is
+learnt once from plato_pylib's writer (writeBdtFileFormat4): the text is split into fixed sections and the rows of each integral
+table, and the printf-style format of those rows is inferred. Later writes only need one string-formatting call per table. A
+learnt layout is only used if it reproduces the reference writer's output exactly; otherwise the reference writer is used.
+
+All full writes are atomic (write to a temporary file in the same folder, then rename), so plato never reads a half-written file.
+Anything other than the integral values (e.g. shell info) is assumed not to change between writes of the same file.
+
+With patchInPlace=True, the y-values of correction tables (the ones changed during a fit) are written in a fixed-width format.
+After the first full write of a file, the byte offset of each of those values is known, so later writes where only correction
+values changed just overwrite those bytes through a memory map. Patching is NOT atomic, so plato must not be reading the file at
+the same time (it never is when files are written between evaluations) """
+
+import concurrent.futures
+import copy
+import mmap
+import os
+import re
+import tempfile
+
+import numpy as np
+
+import plato_fit_integrals.shared.lazy_imports as lazyImports
+
+parseTbint = lazyImports.lazyImport("plato_pylib.plato.parse_tbint_files")
+
+_FLOAT_TOKEN_REGEX = re.compile(r"^[+-]?\d+(\.(\d*))?([eE][+-]\d+)?$")
+_FIELD_REGEX = re.compile(r"(\s*)(\S+)")
+
+CORRECTION_KEYS = ("pairpotcorrection0", "hopcorrection0")
+FIXED_WIDTH_Y_FORMAT = "%19.10e" #Always 19 characters with at least one leading space for any double (incl. 3 digit exponents)
+
+
+class BdtWriter():
+	""" Writes integral dicts (as used by IntegralsHolder) to .bdt files, re-using a learnt layout for each file path
+
+	Attributes (incl. @properties):
+		nThreads (int): Max number of files written at once
+		referenceWriter: Function with interface (integDict, outPath); defines the file format. None means plato_pylib's writeBdtFileFormat4
+		patchInPlace (bool): If True, correction table y-values are written in a fixed-width format (FIXED_WIDTH_Y_FORMAT) and
+		                     overwritten in place when they are the only values that changed. Set before the first write
+		nReferenceWrites (int): Number of times the reference writer has been called (for learning layouts, or as a fallback)
+		nPatchedWrites (int): Number of writes done by patching an existing file in place
+
+	"""
+
+	def __init__(self, nThreads=1, referenceWriter=None, patchInPlace=False):
+		self.nThreads = nThreads
+		self.referenceWriter = referenceWriter
+		self.patchInPlace = patchInPlace
+		self.nReferenceWrites = 0
+		self.nPatchedWrites = 0
+		self._templates = dict() #filePath: (structureKey, BdtFileTemplate or None)
+		self._patchIndices = dict() #filePath: BdtPatchIndex for the last full write
+
+	def _getReferenceWriter(self):
+		return self.referenceWriter if self.referenceWriter is not None else parseTbint.writeBdtFileFormat4
+
+	def writeFiles(self, integDicts:list, filePaths:list):
+		""" Write each integDict to the matching file path; files are written concurrently if nThreads>1 """
+		if (self.nThreads <= 1) or (len(filePaths) <= 1):
+			[self.writeFile(integDict, filePath) for integDict,filePath in zip(integDicts,filePaths)]
+			return None
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.nThreads,len(filePaths))) as pool:
+			futures = [pool.submit(self.writeFile, integDict, filePath) for integDict,filePath in zip(integDicts,filePaths)]
+		[x.result() for x in futures] #Re-raise any errors
+
+	def writeFile(self, integDict, filePath):
+		filePath = os.path.abspath(filePath)
+		template = self._getTemplate(integDict, filePath)
+		if template is None:
+			self._patchIndices.pop(filePath, None)
+			self._writeWithReferenceWriter(integDict, filePath)
+			return None
+
+		patchIndex = self._patchIndices.pop(filePath, None)
+		if (patchIndex is not None) and patchIndex.patchFile(integDict, filePath):
+			self._patchIndices[filePath] = patchIndex
+			self.nPatchedWrites += 1
+			return None
+
+		writeTextAtomic(filePath, template.render(integDict))
+		if self.patchInPlace:
+			self._patchIndices[filePath] = createBdtPatchIndex(template, integDict, filePath)
+
+	def _getTemplate(self, integDict, filePath):
+		structureKey = getStructureKey(integDict)
+		storedKey, template = self._templates.get(filePath, (None,None))
+		if storedKey != structureKey:
+			template = createBdtFileTemplate(integDict, self._renderWithReferenceWriter, os.path.dirname(filePath))
+			if (template is not None) and self.patchInPlace:
+				template = template.getFixedWidthVersion( getTableIndicesForKeys(integDict, CORRECTION_KEYS) )
+			self._templates[filePath] = (structureKey, template)
+			self._patchIndices.pop(filePath, None)
+		return template
+
+	def _renderWithReferenceWriter(self, integDict, folder):
+		tempPath = _getTempPath(folder)
+		try:
+			self._writeWithReferenceWriter(integDict, tempPath, atomic=False)
+			with open(tempPath,"rt", newline="") as f:
+				return f.read()
+		finally:
+			os.remove(tempPath)
+
+	def _writeWithReferenceWriter(self, integDict, filePath, atomic=True):
+		self.nReferenceWrites += 1
+		if not atomic:
+			self._getReferenceWriter()(integDict, filePath)
+			return None
+		tempPath = _getTempPath(os.path.dirname(filePath))
+		try:
+			self._getReferenceWriter()(integDict, tempPath)
+			os.replace(tempPath, filePath)
+		except BaseException:
+			os.remove(tempPath)
+			raise
+
+	def clearTemplates(self):
+		""" Forget all learnt layouts (needed if non-integral data in the dicts changes) """
+		self._templates = dict()
+		self._patchIndices = dict()
+
+
+class BdtFileTemplate():
+	""" Layout of one .bdt file; fixed text sections plus (tableIdx, fieldFormats, lineEnding) entries for the integral table rows.
+	tableIdx refers to the order from getTablesFromIntegDict, fieldFormats has one printf-style format (incl. padding) per column """
+
+	def __init__(self, segments:list):
+		self.segments = list(segments)
+
+	@property
+	def fixedWidthTables(self):
+		""" Indices of tables whose y-values are written with FIXED_WIDTH_Y_FORMAT """
+		return [x[0] for x in self.segments if (not isinstance(x,str)) and (x[1][-1]==FIXED_WIDTH_Y_FORMAT)]
+
+	def render(self, integDict):
+		return "".join( self._getRenderedParts(integDict) )
+
+	def _getRenderedParts(self, integDict):
+		tables = getTablesFromIntegDict(integDict)
+		outParts = list()
+		for segment in self.segments:
+			if isinstance(segment, str):
+				outParts.append(segment)
+			else:
+				tableIdx, fieldFormats, lineEnding = segment
+				integrals = tables[tableIdx].integrals
+				rowFormat = "".join(fieldFormats) + lineEnding
+				outParts.append( (rowFormat*len(integrals)) % tuple(integrals.ravel().tolist()) )
+		return outParts
+
+	def getFixedWidthVersion(self, tableIndices):
+		""" Get a copy of this template where the y-values of tableIndices are written with FIXED_WIDTH_Y_FORMAT """
+		outSegments = list()
+		for segment in self.segments:
+			if (not isinstance(segment,str)) and (segment[0] in tableIndices):
+				tableIdx, fieldFormats, lineEnding = segment
+				segment = (tableIdx, tuple(fieldFormats[:-1]) + (FIXED_WIDTH_Y_FORMAT,), lineEnding)
+			outSegments.append(segment)
+		return BdtFileTemplate(outSegments)
+
+	def getYValueByteOffsets(self, integDict):
+		""" Get dict of tableIdx:array of byte offsets (in the rendered file) of each y-value, for all tables in fixedWidthTables.
+		Returns None if the rendered file isnt pure ascii (so characters and bytes dont match up) """
+		tables = getTablesFromIntegDict(integDict)
+		renderedParts = self._getRenderedParts(integDict)
+		if not all([x.isascii() for x in renderedParts]):
+			return None
+
+		outDict, currOffset = dict(), 0
+		fixedWidthTables = self.fixedWidthTables
+		for segment, renderedPart in zip(self.segments, renderedParts):
+			if (not isinstance(segment,str)) and (segment[0] in fixedWidthTables):
+				tableIdx, fieldFormats, lineEnding = segment
+				rowFormat = "".join(fieldFormats) + lineEnding
+				rowLengths = [len(rowFormat % tuple(row)) for row in tables[tableIdx].integrals.tolist()]
+				rowEnds = currOffset + np.cumsum(rowLengths, dtype=np.int64)
+				outDict[tableIdx] = rowEnds - len(lineEnding) - len(FIXED_WIDTH_Y_FORMAT % 0.0)
+			currOffset += len(renderedPart)
+		return outDict
+
+
+class BdtPatchIndex():
+	""" Byte offsets of the fixed-width y-values in one written file, plus everything needed to tell whether a patch is enough
+
+	Attributes (incl. @properties):
+		yValueOffsets (dict): tableIdx:array of byte offsets of each y-value
+		lastTables (list): Copies of all integral arrays as last written to the file
+		fileStat (tuple): (size, mtime_ns) of the file after the last write; used to detect the file being changed by something else
+
+	"""
+
+	def __init__(self, yValueOffsets, lastTables, fileStat):
+		self.yValueOffsets = yValueOffsets
+		self.lastTables = lastTables
+		self.fileStat = fileStat
+
+	def patchFile(self, integDict, filePath):
+		""" Overwrite the y-values of changed tables in filePath. Returns False (without changing the file) if a full write is
+		needed instead, i.e. if anything other than fixed-width y-values changed or the file was modified externally """
+		tables = [x.integrals for x in getTablesFromIntegDict(integDict)]
+		if (len(tables) != len(self.lastTables)) or (_getFileStat(filePath) != self.fileStat):
+			return False
+
+		toPatch = list()
+		for tableIdx, (currTable, lastTable) in enumerate(zip(tables, self.lastTables)):
+			if np.array_equal(currTable, lastTable):
+				continue
+			if (tableIdx not in self.yValueOffsets) or (not np.array_equal(currTable[:,:-1], lastTable[:,:-1])):
+				return False
+			toPatch.append(tableIdx)
+
+		newBytes = [_getFixedWidthYValueBytes(tables[idx][:,-1]) for idx in toPatch]
+		if any([x is None for x in newBytes]):
+			return False
+
+		if len(toPatch) > 0:
+			_writeBytesAtOffsets(filePath, [self.yValueOffsets[idx] for idx in toPatch], newBytes)
+			for idx in toPatch:
+				self.lastTables[idx] = np.array(tables[idx])
+			self.fileStat = _getFileStat(filePath)
+		return True
+
+
+def createBdtPatchIndex(template, integDict, filePath):
+	""" Create a BdtPatchIndex for filePath, which must have just been written using template.render(integDict). Returns None
+	if template has no fixed-width tables or the file cant be patched """
+	if len(template.fixedWidthTables) == 0:
+		return None
+	yValueOffsets = template.getYValueByteOffsets(integDict)
+	if yValueOffsets is None:
+		return None
+	lastTables = [np.array(x.integrals) for x in getTablesFromIntegDict(integDict)]
+	return BdtPatchIndex(yValueOffsets, lastTables, _getFileStat(filePath))
+
+
+def _getFixedWidthYValueBytes(yVals):
+	""" (nVals, width) uint8 array with the formatted values; None if any value doesnt fit the fixed width """
+	width = len(FIXED_WIDTH_Y_FORMAT % 0.0)
+	outStr = (FIXED_WIDTH_Y_FORMAT*len(yVals)) % tuple(yVals.tolist())
+	if len(outStr) != width*len(yVals):
+		return None
+	return np.frombuffer(outStr.encode("ascii"), dtype=np.uint8).reshape(len(yVals), width)
+
+
+def _writeBytesAtOffsets(filePath, offsetArrays, byteArrays):
+	with open(filePath, "r+b") as f:
+		memMap = mmap.mmap(f.fileno(), 0)
+		try:
+			fileView = np.frombuffer(memMap, dtype=np.uint8)
+			for offsets, currBytes in zip(offsetArrays, byteArrays):
+				fileView[offsets[:,np.newaxis] + np.arange(currBytes.shape[1])] = currBytes
+			del fileView #mmap cant be closed while numpy holds a reference to its buffer
+			memMap.flush()
+		finally:
+			memMap.close()
+
+
+def _getFileStat(filePath):
+	try:
+		statResult = os.stat(filePath)
+	except FileNotFoundError:
+		return None
+	return (statResult.st_size, statResult.st_mtime_ns)
+
+
+def getTablesFromIntegDict(integDict):
+	""" Get all integral tables (objects with an integrals array attribute) from an integDict, in a fixed order """
+	outTables = list()
+	for key in sorted(integDict.keys()):
+		currVal = integDict[key]
+		if isinstance(currVal, (list,tuple)):
+			outTables.extend( [x for x in currVal if hasattr(x,"integrals")] )
+	return outTables
+
+
+def getTableIndicesForKeys(integDict, keys):
+	""" Indices (in the getTablesFromIntegDict order) of all tables stored under any of keys """
+	outIndices, tableIdx = list(), 0
+	for key in sorted(integDict.keys()):
+		currVal = integDict[key]
+		if isinstance(currVal, (list,tuple)):
+			nTables = len([x for x in currVal if hasattr(x,"integrals")])
+			if key in keys:
+				outIndices.extend( range(tableIdx, tableIdx+nTables) )
+			tableIdx += nTables
+	return outIndices
+
+
+def getStructureKey(integDict):
+	""" Hashable summary of which tables are present and their sizes; a learnt layout is only valid for dicts with the same key """
+	keyParts = list()
+	for key in sorted(integDict.keys()):
+		currVal = integDict[key]
+		if isinstance(currVal, (list,tuple)):
+			keyParts.append( (key, tuple([np.shape(getattr(x,"integrals",None)) for x in currVal])) )
+		else:
+			keyParts.append( (key, currVal is None) )
+	return tuple(keyParts)
+
+
+def writeTextAtomic(filePath, text):
+	""" Write text to filePath with a single write call, via a temporary file which is then renamed to filePath """
+	tempPath = _getTempPath(os.path.dirname(os.path.abspath(filePath)))
+	try:
+		with open(tempPath, "wt", newline="") as f:
+			f.write(text)
+		os.replace(tempPath, filePath)
+	except BaseException:
+		os.remove(tempPath)
+		raise
+
+
+def _getTempPath(folder):
+	fileDescriptor, tempPath = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".bdt")
+	os.close(fileDescriptor)
+	return tempPath
+
+
+#Learning the layout
+def createBdtFileTemplate(integDict, renderFunct, folder):
+	""" Learn the layout used by renderFunct for integDict
+
+	Args:
+		integDict: dict of integrals, as used by IntegralsHolder
+		renderFunct: Function with interface (integDict, folder)->str (the file contents); folder is for any temporary files
+		folder: Passed to renderFunct
+
+	Returns
+		template: BdtFileTemplate, or None if a layout couldnt be found which reproduces renderFunct output exactly
+	"""
+	tables = getTablesFromIntegDict(integDict)
+	if any([np.ndim(x.integrals)!=2 or np.shape(x.integrals)[1]<2 for x in tables]):
+		return None
+
+	#Probe values make each tables rows easy to find (tables often have identical values, e.g. zeroed corrections)
+	probeDict = copy.deepcopy(integDict)
+	for tableIdx,table in enumerate(getTablesFromIntegDict(probeDict)):
+		nRows = len(table.integrals)
+		table.integrals[:,-1] = _getProbeYVals(tableIdx, nRows)
+
+	realText, probeText = renderFunct(integDict, folder), renderFunct(probeDict, folder)
+	realLines, probeLines = realText.splitlines(keepends=True), probeText.splitlines(keepends=True)
+	if len(realLines) != len(probeLines):
+		return None
+
+	regions = _findTableRegions(tables, probeLines)
+	if regions is None:
+		return None
+
+	segments, currLine = list(), 0
+	for startLine, nRows, tableIdx in regions:
+		fieldFormats = _inferFieldFormats(realLines[startLine:startLine+nRows] + probeLines[startLine:startLine+nRows])
+		if fieldFormats is None:
+			return None
+		segments.append( "".join(realLines[currLine:startLine]) )
+		segments.append( (tableIdx,) + fieldFormats )
+		currLine = startLine + nRows
+	segments.append( "".join(realLines[currLine:]) )
+
+	template = BdtFileTemplate(segments)
+	try:
+		if (template.render(integDict) != realText) or (template.render(probeDict) != probeText):
+			return None
+	except (TypeError, ValueError):
+		return None
+	return template
+
+
+def _getProbeYVals(tableIdx, nRows):
+	""" abs(value)//10 gives tableIdx+1; alternating signs and a different magnitude to most integrals show how values are padded """
+	signs = np.where(np.arange(nRows)%2==0, 1.0, -1.0)
+	return signs*( 10.0*(tableIdx+1) + np.arange(nRows)/max(nRows,1) )
+
+
+def _findTableRegions(tables, probeLines):
+	""" Returns sorted list of (startLine, nRows, tableIdx), or None if any table cant be found unambiguously """
+	lineVals = [_parseNumericLine(x) for x in probeLines]
+	outRegions, usedLines = list(), set()
+	for tableIdx,table in enumerate(tables):
+		matches = [x for x in range(len(lineVals)) if _tableRowsStartAt(lineVals, x, table.integrals, tableIdx)]
+		if len(matches) != 1:
+			return None
+		currLines = set(range(matches[0], matches[0]+len(table.integrals)))
+		if len(currLines.intersection(usedLines)) > 0:
+			return None
+		usedLines.update(currLines)
+		outRegions.append( (matches[0], len(table.integrals), tableIdx) )
+	return sorted(outRegions)
+
+
+def _tableRowsStartAt(lineVals, startLine, integrals, tableIdx):
+	nRows, nCols = integrals.shape
+	firstVals = lineVals[startLine]
+	if (firstVals is None) or (len(firstVals) != nCols) or (np.floor(abs(firstVals[-1])/10.0) != tableIdx+1): #Quick check before the full one
+		return False
+	if startLine+nRows > len(lineVals):
+		return False
+	rowVals = lineVals[startLine:startLine+nRows]
+	if any([(x is None) or (len(x)!=nCols) for x in rowVals]):
+		return False
+	rowVals = np.array(rowVals)
+	probeYVals = _getProbeYVals(tableIdx, nRows)
+	xValsMatch = np.allclose(rowVals[:,:-1], integrals[:,:-1], rtol=1e-4, atol=1e-4)
+	return xValsMatch and np.allclose(rowVals[:,-1], probeYVals, rtol=1e-3, atol=0.0)
+
+
+def _parseNumericLine(line):
+	try:
+		return [float(x) for x in line.split()]
+	except ValueError:
+		return None
+
+
+def _inferRowFormat(rowLines):
+	""" printf-style format (incl. line ending) reproducing each of rowLines from its values, or None if no consistent format found """
+	fieldFormats = _inferFieldFormats(rowLines)
+	return None if fieldFormats is None else "".join(fieldFormats[0]) + fieldFormats[1]
+
+
+def _inferFieldFormats(rowLines):
+	""" Returns (fieldFormats, lineEnding) with one printf-style format per column, or None if no consistent format found """
+	splitRows = [_splitRowLine(x) for x in rowLines]
+	if len(set([(len(fields),trailing) for fields,trailing in splitRows])) != 1:
+		return None
+
+	fields, trailing = splitRows[0]
+	outFormats = list()
+	for colIdx in range(len(fields)):
+		colSpaces = [row[0][colIdx][0] for row in splitRows]
+		colTokens = [row[0][colIdx][1] for row in splitRows]
+		floatSpecs = set([_getFloatSpec(x) for x in colTokens])
+		if (len(floatSpecs) != 1) or (None in floatSpecs):
+			return None
+		precision, style = floatSpecs.pop()
+		flag = "+" if any([x.startswith("+") for x in colTokens]) else ""
+		if len(set([len(s)+len(t) for s,t in zip(colSpaces,colTokens)])) == 1:
+			outFormats.append( "%{}{}.{}{}".format(flag, len(colSpaces[0])+len(colTokens[0]), precision, style) )
+		elif len(set(colSpaces)) == 1: #Constant separator; values arent padded to a fixed width
+			outFormats.append( "{}%{}.{}{}".format(colSpaces[0], flag, precision, style) )
+		else:
+			return None
+	return tuple(outFormats), trailing
+
+
+def _splitRowLine(line):
+	body = line.rstrip()
+	return tuple(_FIELD_REGEX.findall(body)), line[len(body):]
+
+
+def _getFloatSpec(token):
+	match = _FLOAT_TOKEN_REGEX.match(token)
+	if match is None:
+		return None
+	decimals, exponent = match.group(2), match.group(3)
+	precision = len(decimals) if decimals is not None else 0
+	if (match.group(1) is not None) and (precision == 0):
+		return None #e.g. "1." which printf only gives with the # flag
+	style = "f" if exponent is None else exponent[0]
+	return precision, style
@@ -0,0 +1,135 @@
+
+""" Isolated copies of the objects needed to evaluate one set of coefficients, so several candidates can be evaluated at once
+(see ObjectiveFunction.evaluateAsync). Each slot writes its tables to, and runs plato in, its own folders """
+
+import os
+import shutil
+
+
+class CandidateSlot():
+	""" Objects used to evaluate one candidate set of coefficients
+
+	Attributes (incl. @properties):
+		coeffTableConverter: CoeffsTablesConverter object, writing tables only used by this slot
+		workFlowCoordinator: WorkFlowCoordinator object, whose workflows read tables from this slot (and run in their own folders)
+		folder (str): Base folder for this slot (None if not known)
+
+	"""
+
+	def __init__(self, coeffTableConverter, workFlowCoordinator, folder=None):
+		self.coeffTableConverter = coeffTableConverter
+		self.workFlowCoordinator = workFlowCoordinator
+		self.folder = os.path.abspath(folder) if folder is not None else None
+
+	@property
+	def tablePaths(self):
+		""" Paths of the integral tables written by coeffTableConverter (empty if it doesnt expose them) """
+		integInfo = getattr(self.coeffTableConverter, "_integInfo", list())
+		return set([x.filePath for x in integInfo])
+
+	@property
+	def workFolders(self):
+		workFlows = getattr(self.workFlowCoordinator, "_workFlows", list())
+		return set([x for x in _getAllWorkFolders(workFlows) if x is not None])
+
+
+def createCandidateSlots(slotFactory, nSlots, baseFolder):
+	""" Create CandidateSlot objects, each in a separate sub-folder of baseFolder
+
+	Args:
+		slotFactory: Function with interface slotFolder->(coeffTableConverter, workFlowCoordinator). Should create the model folder
+		             (tables) and all workflow folders inside slotFolder (e.g. slotFolder/model and slotFolder/eos)
+		nSlots: Number of slots (max number of candidates evaluated at once)
+		baseFolder: Slot folders are baseFolder/slot_0, baseFolder/slot_1 etc.
+
+	Returns
+		slots: list of CandidateSlot objects
+
+	Raises:
+		ValueError: If any two slots share table paths or workflow folders
+	"""
+	outSlots = list()
+	for idx in range(nSlots):
+		slotFolder = os.path.join(os.path.abspath(baseFolder), "slot_{}".format(idx))
+		os.makedirs(slotFolder, exist_ok=True)
+		coeffTableConverter, workFlowCoordinator = slotFactory(slotFolder)
+		outSlots.append( CandidateSlot(coeffTableConverter, workFlowCoordinator, folder=slotFolder) )
+	checkSlotsAreIsolated(outSlots)
+	return outSlots
+
+
+def createCandidateSlotsFromExisting(coeffTableConverter, workFlowCoordinator, nSlots, baseFolder, modelFolder=None, workFolder=None,
+                                     datasetFunct=None, executorFactory=None):
+	""" Create CandidateSlot objects from an existing converter/coordinator. Each slot gets a copy of the model folder (in slotFolder/model),
+	a converter writing its tables there and copies of the workflows running in slotFolder/workflows
+
+	Args:
+		coeffTableConverter: CoeffsTablesConverter (or TiedCoeffsTablesConverter) object; needs a getCopyInModelFolder method
+		workFlowCoordinator: WorkFlowCoordinator object; each workflow needs a getReRootedCopy method
+		nSlots: Number of slots (max number of candidates evaluated at once)
+		baseFolder: Slot folders are baseFolder/slot_0, baseFolder/slot_1 etc.
+		modelFolder (Optional, str): Folder with the integral tables; default is the (single) folder containing the converters tables
+		workFolder (Optional, str): Folder containing all workflow folders; default is the deepest folder containing them all
+		datasetFunct (Optional, f(str)->str): Maps the path of a slots model folder to the plato "dataset" option for its workflows.
+		                                     Default is to use the path unchanged
+		executorFactory (Optional, f(nCores)->executor): Creates the executor for each slots WorkFlowCoordinator
+
+	Returns
+		slots: list of CandidateSlot objects
+
+	Raises:
+		ValueError: If modelFolder or workFolder cant be worked out, or if any two slots share table paths or workflow folders
+	"""
+	modelFolder = _getModelFolder(coeffTableConverter) if modelFolder is None else os.path.abspath(modelFolder)
+	workFolder = _getWorkRoot(workFlowCoordinator) if workFolder is None else os.path.abspath(workFolder)
+	datasetFunct = (lambda x: x) if datasetFunct is None else datasetFunct
+
+	def _slotFactory(slotFolder):
+		slotModelFolder = os.path.join(slotFolder, "model")
+		shutil.copytree(modelFolder, slotModelFolder, dirs_exist_ok=True)
+		outConverter = coeffTableConverter.getCopyInModelFolder(slotModelFolder)
+		executor = executorFactory(workFlowCoordinator.nCores) if executorFactory is not None else None
+		outCoordinator = workFlowCoordinator.getReRootedCopy(workFolder, os.path.join(slotFolder, "workflows"),
+		                                                     dataset=datasetFunct(slotModelFolder), executor=executor)
+		return outConverter, outCoordinator
+
+	return createCandidateSlots(_slotFactory, nSlots, baseFolder)
+
+
+def _getModelFolder(coeffTableConverter):
+	modelFolders = set([os.path.dirname(x.filePath) for x,unused in coeffTableConverter.getCoeffIndicesPerTable()])
+	if len(modelFolders) != 1:
+		raise ValueError("Expected integral tables in a single model folder, but found {}; pass modelFolder".format(sorted(modelFolders)))
+	return modelFolders.pop()
+
+
+def _getWorkRoot(workFlowCoordinator):
+	workFolders = [x for x in _getAllWorkFolders(workFlowCoordinator._workFlows) if x is not None]
+	if len(workFolders) == 0:
+		raise ValueError("None of the workflows have a workFolder; pass workFolder")
+	return os.path.commonpath([os.path.abspath(x) for x in workFolders])
+
+
+def _getAllWorkFolders(workFlows):
+	""" workFolder of each workflow, including those inside composite workflows (whose own workFolder is None) """
+	outFolders = list()
+	for x in workFlows:
+		outFolders.append(x.workFolder)
+		outFolders.extend( _getAllWorkFolders(getattr(x, "_workFlows", list())) )
+	return outFolders
+
+
+def checkSlotsAreIsolated(slots:"iter of CandidateSlot"):
+	""" Raises ValueError if any objects, table paths or workflow folders are shared between slots """
+	seenObjIds, seenPaths = set(), set()
+	for slot in slots:
+		currObjIds = set([id(slot.coeffTableConverter), id(slot.workFlowCoordinator)])
+		currPaths = slot.tablePaths.union(slot.workFolders)
+		shared = seenObjIds.intersection(currObjIds)
+		if len(shared) > 0:
+			raise ValueError("The same coeffTableConverter/workFlowCoordinator is used by more than one candidate slot")
+		sharedPaths = seenPaths.intersection(currPaths)
+		if len(sharedPaths) > 0:
+			raise ValueError("Candidate slots share table paths/work folders: {}".format(sorted(sharedPaths)))
+		seenObjIds.update(currObjIds)
+		seenPaths.update(currPaths)
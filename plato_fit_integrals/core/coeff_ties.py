@@ -0,0 +1,149 @@
+
+""" Tying coefficients (of one or more analytical reprs) together so they share a single free parameter. The optimiser then only
+sees the free parameters, e.g. objectiveFunction.coeffTableConverter = TiedCoeffsTablesConverter(coeffTableConverter, tiedGroups) """
+
+import copy
+
+import numpy as np
+
+
+class TiedCoeffsTablesConverter():
+	""" Wraps a CoeffsTablesConverter so that its coeffs attribute holds only the free parameters. Each group of tied coefficients
+	maps to one free parameter; untied coefficients each have their own. Free parameters are ordered by the first coefficient
+	they map to. Everything apart from coeffs (e.g. writeTables) is passed through to the wrapped converter
+
+	Attributes (incl. @properties):
+		coeffTableConverter: The wrapped CoeffsTablesConverter object
+		coeffs (np array): Values of the free parameters. Setting this sets all coefficients on coeffTableConverter
+		nFreeParams (int): Number of free parameters
+		fullToFreeIndices (np array): Index of the free parameter used for each coefficient of coeffTableConverter
+
+	"""
+
+	def __init__(self, coeffTableConverter, tiedGroups:"iter of iters"):
+		""" Initializer
+
+		Args:
+			coeffTableConverter: CoeffsTablesConverter object (or anything with a coeffs attribute)
+			tiedGroups: Each entry is an iter of indices (in coeffTableConverter.coeffs) which share one free parameter.
+			            getTiedGroupsForReprs creates these for whole analytical reprs
+
+		Raises:
+			ValueError: If an index is out of range or appears in more than one group
+		"""
+		self.coeffTableConverter = coeffTableConverter
+		self.fullToFreeIndices = getFullToFreeIndices(len(coeffTableConverter.coeffs), tiedGroups)
+		self._freeToFullIndices = np.unique(self.fullToFreeIndices, return_index=True)[1]
+
+	def __getattr__(self, name):
+		#Only called for attributes not found on this object
+		if name == "coeffTableConverter":
+			raise AttributeError(name)
+		return getattr(self.coeffTableConverter, name)
+
+	@property
+	def phaseTimer(self):
+		return self.coeffTableConverter.phaseTimer
+
+	@phaseTimer.setter
+	def phaseTimer(self, val):
+		self.coeffTableConverter.phaseTimer = val
+
+	@property
+	def tableChecks(self):
+		return self.coeffTableConverter.tableChecks
+
+	@tableChecks.setter
+	def tableChecks(self, val):
+		self.coeffTableConverter.tableChecks = val
+
+	@property
+	def nFreeParams(self):
+		return len(self._freeToFullIndices)
+
+	@property
+	def coeffs(self):
+		""" Taken from the first coefficient in each group; use coeffs=coeffs to make the rest of the group match """
+		return np.asarray(self.coeffTableConverter.coeffs, dtype=float)[self._freeToFullIndices]
+
+	@coeffs.setter
+	def coeffs(self, val):
+		if len(val) != self.nFreeParams:
+			raise TypeError("Expected {} free parameters, but {} passed".format(self.nFreeParams, len(val)))
+		self.coeffTableConverter.coeffs = self.getFullCoeffs(val)
+
+	def setCoeffsAtIndices(self, coeffIndices, vals):
+		""" Set only the free parameters at coeffIndices (and so every coefficient tied to them) """
+		freeVals = np.zeros(self.nFreeParams)
+		freeVals[coeffIndices] = vals
+		fullIndices = np.nonzero( np.isin(self.fullToFreeIndices, coeffIndices) )[0]
+		self.coeffTableConverter.setCoeffsAtIndices(fullIndices, freeVals[self.fullToFreeIndices[fullIndices]])
+
+	def getCopyInModelFolder(self, modelFolder):
+		""" As for CoeffsTablesConverter; the copy has the same ties, and wraps a copy of coeffTableConverter """
+		outObj = copy.copy(self)
+		outObj.coeffTableConverter = self.coeffTableConverter.getCopyInModelFolder(modelFolder)
+		return outObj
+
+	def getFullCoeffs(self, freeParams):
+		""" Get values for all coefficients (same format as coeffTableConverter.coeffs) from values of the free parameters. Also works
+		for a (nCandidates, nFreeParams) matrix, giving (nCandidates, nCoeffs) """
+		return np.asarray(freeParams, dtype=float)[...,self.fullToFreeIndices]
+
+	def getCoeffIndicesPerTable(self):
+		""" As for CoeffsTablesConverter, but coeffIndices are the free parameters used by each table """
+		outList = list()
+		for integInfo, coeffIndices in self.coeffTableConverter.getCoeffIndicesPerTable():
+			outList.append( (integInfo, np.unique(self.fullToFreeIndices[coeffIndices])) )
+		return outList
+
+	def getTableBlocksForCoeffMatrix(self, coeffMatrix, tableIndices=None):
+		""" As for CoeffsTablesConverter, but each row of coeffMatrix holds free parameters """
+		fullMatrix = self.getFullCoeffs( np.atleast_2d(coeffMatrix) )
+		return self.coeffTableConverter.getTableBlocksForCoeffMatrix(fullMatrix, tableIndices=tableIndices)
+
+
+def getFullToFreeIndices(nCoeffs, tiedGroups):
+	""" Get array with the index of the free parameter for each of nCoeffs coefficients (see TiedCoeffsTablesConverter) """
+	groupLabels = np.arange(nCoeffs)
+	seenIndices = set()
+	for group in tiedGroups:
+		group = [int(x) for x in group]
+		badIndices = [x for x in group if (x < 0) or (x >= nCoeffs)]
+		if len(badIndices) > 0:
+			raise ValueError("Indices {} out of range for {} coeffs".format(badIndices, nCoeffs))
+		repeatIndices = seenIndices.intersection(group)
+		if (len(repeatIndices) > 0) or (len(set(group)) != len(group)):
+			raise ValueError("Coefficient indices can only appear once in tiedGroups; repeated: {}".format(sorted(repeatIndices)))
+		seenIndices.update(group)
+		groupLabels[group] = min(group)
+
+	#Relabel so free parameters are numbered 0,1,2... in order of the first coefficient they map to
+	return np.unique(groupLabels, return_inverse=True)[1]
+
+
+def getTiedGroupsForReprs(nCoeffsPerRepr:"iter of int", reprIndexGroups:"iter of iters", coeffIndices=None):
+	""" Get tiedGroups (see TiedCoeffsTablesConverter) which tie whole analytical reprs together, e.g. the tables for A_B and B_A
+
+	Args:
+		nCoeffsPerRepr: Number of coefficients for each analytical repr, in the order used by the converter
+		reprIndexGroups: Each entry is an iter of repr indices to tie together; coefficient i of each repr shares one free parameter
+		coeffIndices(Optional): iter of coefficient indices (within each repr) to tie. Default is all of them
+
+	Returns
+		tiedGroups: list of lists of indices into the full coefficient list
+
+	Raises:
+		ValueError: If reprs in one group have different numbers of coefficients
+	"""
+	nCoeffsPerRepr = list(nCoeffsPerRepr)
+	startIndices = np.cumsum([0] + nCoeffsPerRepr)
+	outGroups = list()
+	for reprIndices in reprIndexGroups:
+		nCoeffsInGroup = set([nCoeffsPerRepr[x] for x in reprIndices])
+		if len(nCoeffsInGroup) != 1:
+			raise ValueError("Reprs {} have different numbers of coefficients; cant tie them".format(list(reprIndices)))
+		currCoeffIndices = range(nCoeffsInGroup.pop()) if coeffIndices is None else coeffIndices
+		outGroups.extend( [[int(startIndices[reprIdx]+coeffIdx) for reprIdx in reprIndices] for coeffIdx in currCoeffIndices] )
+	return outGroups
+
@@ -1,54 +1,203 @@
 
 import copy
-import itertools as it
 import os
+import threading
+
+import numpy as np
 
 import plato_pylib.plato.parse_tbint_files as parseTbint
 
+import plato_fit_integrals.core.bdt_writer as bdtWriter
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.table_checks as tableChecks
+
 class CoeffsTablesConverter():
 	
 	def __init__(self, analyticalReprs:list, integInfoTables:list, integHolder:"IntegralsHolder obj"):
 		self._analyticalReps = list(analyticalReprs)
 		self._integInfo = list(integInfoTables)
 		self._integHolder = integHolder
-
+		self.phaseTimer = instrumentation.NULL_PHASE_TIMER
+		self.bdtWriter = bdtWriter.BdtWriter() #nThreads>1 writes files concurrently; patchInPlace=True only rewrites changed correction values
+		self._coeffArray = None #All coefficients; each analytical repr holds a view of its slice (see _bindCoeffArray)
+		self._nCoeffsPerRepr = None
+		self._unboundReprIndices = list()
+		self._coeffLock = threading.Lock() #Sub-fits may set/get (disjoint) coeffs from different threads
+		self.tableChecks = list() #TableCheckBase objects (see core.table_checks); writeTables raises InfeasibleTablesError if any fail
+
+	def __getstate__(self):
+		#Copies (e.g. deepcopy) of the analytical reprs lose their views of _coeffArray, so copies need to rebind on first use
+		outState = dict(self.__dict__)
+		outState.update( {"_coeffArray":None, "_nCoeffsPerRepr":None, "_unboundReprIndices":list()} )
+		outState.pop("_coeffSlices", None)
+		outState.pop("_coeffLock", None)
+		return outState
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._coeffLock = threading.Lock()
 
 	@property
 	def coeffs(self):
-		outCoeffs = list()
-		for aRep in self._analyticalReps:
-			outCoeffs.extend(aRep.coeffs)
-		return outCoeffs
+		with self._coeffLock:
+			coeffArray = self._getCoeffArray()
+			for idx in self._unboundReprIndices:
+				coeffArray[self._coeffSlices[idx]] = self._analyticalReps[idx].coeffs
+			return coeffArray.copy()
 
 	@coeffs.setter
 	def coeffs(self,val:list):
-		startIdx = 0
-		for aRep in self._analyticalReps:
-			aRep.coeffs = val[startIdx:startIdx+aRep.nCoeffs]
-			startIdx += aRep.nCoeffs
-
-	def writeTables(self):
-		self._updateTables()
-		self._writeTables()
-
-	def _updateTables(self):
-		for x in range(len(self._integInfo)):
-			self._updateSingleTable(x)
+		with self._coeffLock:
+			coeffArray = self._getCoeffArray()
+			if len(val) != len(coeffArray):
+				raise TypeError("Expected {} coeffs, but {} passed".format(len(coeffArray), len(val)))
+			np.copyto(coeffArray, val)
+			for idx in self._unboundReprIndices:
+				self._analyticalReps[idx].coeffs = coeffArray[self._coeffSlices[idx]].tolist()
+
+	def setCoeffsAtIndices(self, coeffIndices, vals):
+		""" Set only the coefficients at coeffIndices (positions in coeffs); the rest are left alone. Lets several sub-fits share
+		one converter as long as they use disjoint coeffIndices """
+		coeffIndices = np.asarray(coeffIndices, dtype=int)
+		with self._coeffLock:
+			coeffArray = self._getCoeffArray()
+			coeffArray[coeffIndices] = vals
+			for idx in self._unboundReprIndices:
+				if np.any( (coeffIndices >= self._coeffSlices[idx].start) & (coeffIndices < self._coeffSlices[idx].stop) ):
+					self._analyticalReps[idx].coeffs = coeffArray[self._coeffSlices[idx]].tolist()
+
+	def _getCoeffArray(self):
+		nCoeffsPerRepr = [x.nCoeffs for x in self._analyticalReps]
+		if nCoeffsPerRepr != self._nCoeffsPerRepr: #First use, or an analytical repr changed its number of variables
+			self._bindCoeffArray(nCoeffsPerRepr)
+		return self._coeffArray
+
+	def _bindCoeffArray(self, nCoeffsPerRepr):
+		startIndices = np.cumsum([0] + nCoeffsPerRepr)
+		self._coeffSlices = [slice(start,end) for start,end in zip(startIndices[:-1], startIndices[1:])]
+		self._coeffArray = np.zeros(startIndices[-1], dtype=float)
+		self._unboundReprIndices = list()
+		for idx, (aRep, coeffSlice) in enumerate(zip(self._analyticalReps, self._coeffSlices)):
+			self._coeffArray[coeffSlice] = aRep.coeffs
+			if not _bindReprCoeffs(aRep, self._coeffArray[coeffSlice]):
+				self._unboundReprIndices.append(idx)
+		self._nCoeffsPerRepr = nCoeffsPerRepr
+
+	def getCopyInModelFolder(self, modelFolder):
+		""" Copy of this converter which reads/writes its tables in modelFolder (which should hold copies of the original .bdt files).
+		The copy shares phaseTimer but nothing else, so it can be used at the same time as this one (e.g. in a CandidateSlot) """
+		oldModelFolders = set([os.path.dirname(x.filePath) for x in self._integInfo])
+		outObj = copy.deepcopy(self, memo={id(self.phaseTimer):self.phaseTimer})
+		for x in outObj._integInfo:
+			x.modelFolder = modelFolder
+		if hasattr(outObj._integHolder, "bdtPaths"): #LazyIntegralsHolder; files not yet parsed need reading from modelFolder
+			bdtPaths = outObj._integHolder.bdtPaths
+			for idx,x in enumerate(bdtPaths):
+				if os.path.dirname(os.path.abspath(x)) in oldModelFolders:
+					bdtPaths[idx] = os.path.join(os.path.abspath(modelFolder), os.path.basename(x))
+		return outObj
+
+	def getCoeffIndicesPerTable(self):
+		""" Returns list of (integInfo, coeffIndices) tuples, one per integral table. coeffIndices is an int array with the positions of
+		the coefficients for that table in coeffs """
+		startIndices = np.cumsum([0] + [x.nCoeffs for x in self._analyticalReps])
+		return [(info, np.arange(start,end)) for info, start, end in zip(self._integInfo, startIndices[:-1], startIndices[1:])]
+
+	def getTableBlocksForCoeffMatrix(self, coeffMatrix, tableIndices=None):
+		""" Get integral values for many sets of coefficients at once, without changing coeffs or the stored tables
+
+		Args:
+			coeffMatrix: (nCandidates, nCoeffs) array-like; each row is a full set of coeffs (same format as the coeffs attribute)
+			tableIndices(Optional): Indices of the integral tables to calculate. Default is all of them
+
+		Returns
+			tableBlocks: list of (nCandidates, nPoints) arrays, one per table index. Row i holds the integral values (the 2nd column of
+			             the table, on its existing x-values) for coeffMatrix[i]
+
+		Raises:
+			TypeError: If the number of columns in coeffMatrix doesnt match the total number of coeffs
+		"""
+		coeffMatrix = np.atleast_2d( np.asarray(coeffMatrix, dtype=float) )
+		nCoeffsPerRepr = [x.nCoeffs for x in self._analyticalReps]
+		if coeffMatrix.shape[1] != sum(nCoeffsPerRepr):
+			raise TypeError("Expected {} coeffs, but coeffMatrix has {} columns".format(sum(nCoeffsPerRepr), coeffMatrix.shape[1]))
+		startIndices = np.cumsum([0] + nCoeffsPerRepr)
+
+		tableIndices = range(len(self._integInfo)) if tableIndices is None else tableIndices
+		outBlocks = list()
+		for idx, xVals in zip(tableIndices, self.getTableXVals(tableIndices)):
+			currCoeffs = coeffMatrix[:, startIndices[idx]:startIndices[idx+1]]
+			outBlocks.append( self._analyticalReps[idx].evalAtListOfXValsForCoeffMatrix(xVals, currCoeffs) )
+		return outBlocks
+
+	def getTableXVals(self, tableIndices=None):
+		""" Get the distances (1st column) of each integral table in tableIndices (default all of them) """
+		tableIndices = range(len(self._integInfo)) if tableIndices is None else tableIndices
+		return [self._integHolder.getIntegTableFromInfoObj(self._integInfo[idx]).integrals[:,0] for idx in tableIndices]
+
+	def writeTables(self, tableIndices=None):
+		""" Update the integral tables from the current coeffs and write them to file
+
+		Args:
+			tableIndices(Optional): Indices of the integral tables to update; only the files holding these are written. Default is all of them
+
+		Raises:
+			InfeasibleTablesError: If any updated table fails any of tableChecks. No files are written in this case
+		"""
+		tableIndices = range(len(self._integInfo)) if tableIndices is None else tableIndices
+		with self.phaseTimer.timePhase("update_tables"):
+			updatedTables = self._updateTables(tableIndices)
+		if len(self.tableChecks) > 0:
+			self._checkTables(tableIndices, updatedTables)
+		with self.phaseTimer.timePhase("write_tables"):
+			self._writeTables(tableIndices)
+
+	def _updateTables(self, tableIndices):
+		return [self._updateSingleTable(x) for x in tableIndices]
 
 	def _updateSingleTable(self,idx):
+		""" Returns the updated integrals array """
 		integStr, atomA, atomB = self._integInfo[idx].integStr, self._integInfo[idx].atomA, self._integInfo[idx].atomB
 		shellA, shellB, axAngMom = self._integInfo[idx].shellA, self._integInfo[idx].shellB, self._integInfo[idx].axAngMom
 
 		currTable = self._integHolder.getIntegTable(integStr, atomA, atomB, shellA, shellB, axAngMom)
-		currTable.integrals[:,1] = self._analyticalReps[idx].evalAtListOfXVals(currTable.integrals[:,0])
+		try:
+			self._analyticalReps[idx].evalAtListOfXVals(currTable.integrals[:,0], out=currTable.integrals[:,1])
+		except TypeError: #Repr doesnt accept out=
+			currTable.integrals[:,1] = self._analyticalReps[idx].evalAtListOfXVals(currTable.integrals[:,0])
 		self._integHolder.setIntegTable(currTable, integStr, atomA, atomB, shellA, shellB, axAngMom)
-
-	def _writeTables(self):
-		integDicts = self._integHolder.integDicts
-		filePaths = set([x.filePath for x in self._integInfo]) #Should be 1 filepath per integDicts (they hold ALL the info for one bdt)
-
-		for currDict, currPath in it.zip_longest(integDicts, filePaths):
-			parseTbint.writeBdtFileFormat4(currDict, currPath)
+		return currTable.integrals
+
+	def _checkTables(self, tableIndices, tables):
+		with self.phaseTimer.timePhase("check_tables"):
+			failures = tableChecks.getFailuresForTables(self.tableChecks, [self._integInfo[idx] for idx in tableIndices], tables)
+		if len(failures) == 0:
+			return None
+		self.phaseTimer.incrementCounter("infeasible_candidates")
+		for checkName in sorted(set([x.checkName for x in failures])):
+			self.phaseTimer.incrementCounter("failed_check_{}".format(checkName))
+		raise tableChecks.InfeasibleTablesError(failures)
+
+	def _writeTables(self, tableIndices):
+		#One file per integDict (they hold ALL the info for one bdt); only files containing fitted tables are written
+		filePathDict = dict()
+		for x in [self._integInfo[idx] for idx in tableIndices]:
+			dictIdx = self._integHolder.atomPairNames.index( (x.atomA,x.atomB) )
+			filePathDict[dictIdx] = x.filePath
+		dictIndices = sorted(filePathDict.keys())
+		integDicts = [self._integHolder.getIntegDict(idx) for idx in dictIndices]
+		self.bdtWriter.writeFiles(integDicts, [filePathDict[idx] for idx in dictIndices])
+
+
+def _bindReprCoeffs(aRep, coeffView):
+	""" Returns False if aRep doesnt support holding its coeffs in a view (its coeffs then need setting directly) """
+	if not hasattr(aRep, "bindCoeffs"):
+		return False
+	try:
+		aRep.bindCoeffs(coeffView)
+	except NotImplementedError:
+		return False
+	return True
 
 
 class IntegralTableInfo():
@@ -56,6 +205,7 @@ class IntegralTableInfo():
 
 	Attributes (incl. @properties):
 		filePath (str): Absolute path to the file containig integrals
+		modelFolder (str): Absolute path to the folder holding the file; can be set to read/write a copy of the model
 		integStr (str): Type of integral, format needs to match (case insensitive) the parsed dictionary keys from plato_pylib:parse_tbint_files
 		atomA (str): Chemical symbol for 1st atom
 		atomB (str): Chemical symbol for 2nd atom
@@ -74,6 +224,14 @@ class IntegralTableInfo():
 		self.axAngMom = axAngMom
 		self._modelFolder = os.path.abspath(modelFolder)
 
+	@property
+	def modelFolder(self):
+		return self._modelFolder
+
+	@modelFolder.setter
+	def modelFolder(self, val):
+		self._modelFolder = os.path.abspath(val)
+
 	@property
 	def filePath(self):
 		bdtName = "{}_{}.bdt".format(self.atomA,self.atomB)
@@ -89,6 +247,9 @@ class IntegralsHolder():
 		self.atomPairNames = [tuple(x) for x in atomPairNames]
 		self.integDicts = list( [ {k.lower():v for k,v in x.items()} for x in integDicts ] )
 
+	def getIntegDict(self, dictIdx):
+		""" Dict containing all integrals for the atom pair self.atomPairNames[dictIdx] """
+		return self.integDicts[dictIdx]
 
 	def getIntegTableFromInfoObj(self, integInfo, inclCorrs=True):
 		integStr, atomA, atomB = integInfo.integStr, integInfo.atomA, integInfo.atomB
@@ -99,15 +260,15 @@ class IntegralsHolder():
 		integStr, dictIdx = self._getIntegStrAndDictIdxForTable(integStr, atomA, atomB, shellA=None, shellB=None, axAngMom=None)
 
 		if self._weAreLookingForAtomBasedIntTable(shellA,shellB,axAngMom):
-			intTable = self.integDicts[dictIdx][integStr][0]
-			if _isAtomicIntTable(intTable) and len(self.integDicts[dictIdx][integStr])==1:
-				return copy.deepcopy( _getIntegTableCombinedWithCorr(integStr, self.integDicts[dictIdx], 0, inclCorrs) )
+			intTable = self.getIntegDict(dictIdx)[integStr][0]
+			if _isAtomicIntTable(intTable) and len(self.getIntegDict(dictIdx)[integStr])==1:
+				return copy.deepcopy( _getIntegTableCombinedWithCorr(integStr, self.getIntegDict(dictIdx), 0, inclCorrs) )
 			else:
 				raise ValueError("shellA/shellB/axAngMom not set despite search for orbital based integrals {}".format(integStr))
 		else:
-			integIdx = parseTbint._getIdxOfOrbBasedIntInList(shellA,shellB,axAngMom, self.integDicts[dictIdx][integStr])
+			integIdx = parseTbint._getIdxOfOrbBasedIntInList(shellA,shellB,axAngMom, self.getIntegDict(dictIdx)[integStr])
 			if integIdx is not None:
-				return copy.deepcopy( _getIntegTableCombinedWithCorr(integStr, self.integDicts[dictIdx], integIdx, inclCorrs) )
+				return copy.deepcopy( _getIntegTableCombinedWithCorr(integStr, self.getIntegDict(dictIdx), integIdx, inclCorrs) )
 			else:
 				raise ValueError("Invalid integral requested")
 
@@ -121,13 +282,13 @@ class IntegralsHolder():
 		if self._weAreLookingForAtomBasedIntTable(shellA,shellB,axAngMom):
 			integIdx = 0
 		else:
-			integIdx = parseTbint._getIdxOfOrbBasedIntInList(shellA,shellB,axAngMom, self.integDicts[dictIdx][integStr])
+			integIdx = parseTbint._getIdxOfOrbBasedIntInList(shellA,shellB,axAngMom, self.getIntegDict(dictIdx)[integStr])
 
-		_setIntegTable(newTable, self.integDicts[dictIdx], integStr, integIdx)
+		_setIntegTable(newTable, self.getIntegDict(dictIdx), integStr, integIdx)
 
 	def getAllIntegsTwoAtoms(self, atomStrA, atomStrB):
-		dictIdx = self.atomPairNames.index( (atomA,atomB) )
-		return self.integDicts[dictIdx]
+		dictIdx = self.atomPairNames.index( (atomStrA,atomStrB) )
+		return self.getIntegDict(dictIdx)
 
 
 	def _getIntegStrAndDictIdxForTable(self, integStr, atomA, atomB, shellA=None, shellB=None, axAngMom=None):
@@ -142,6 +303,48 @@ class IntegralsHolder():
 			return False
 
 
+class LazyIntegralsHolder(IntegralsHolder):
+	""" IntegralsHolder which only parses a .bdt file the first time one of its integrals is needed. Files for atom pairs with no
+	fitted tables are never parsed (or written, see CoeffsTablesConverter), so they pass through unchanged.
+
+	Attributes (incl. @properties):
+		atomPairNames (list of 2-tuples): Atom pair for each file
+		bdtPaths (list of str): Path to the .bdt file for each atom pair
+		integDicts (list of dicts): Integrals for ALL atom pairs; accessing this parses every file not yet loaded
+		loadedAtomPairs (list of 2-tuples): Atom pairs whose files have been parsed
+
+	"""
+
+	def __init__(self, atomPairNames:"iter of 2-tuples", bdtPaths:"iter of str", parseFunct=None):
+		""" Initializer
+
+		Args:
+			atomPairNames: iter of 2-tuples, e.g. [("Mg","Mg")]
+			bdtPaths: iter of paths, one per atom pair
+			parseFunct(Optional): Function with interface bdtPath->integDict. Default is plato_pylib getIntegralsFromBdt
+		"""
+		self.atomPairNames = [tuple(x) for x in atomPairNames]
+		self.bdtPaths = list(bdtPaths)
+		self.parseFunct = parseTbint.getIntegralsFromBdt if parseFunct is None else parseFunct
+		self._integDicts = [None for x in self.bdtPaths]
+		if len(self.atomPairNames) != len(self.bdtPaths):
+			raise ValueError("Got {} atom pairs but {} bdt paths".format(len(self.atomPairNames), len(self.bdtPaths)))
+
+	@property
+	def integDicts(self):
+		return [self.getIntegDict(idx) for idx in range(len(self.bdtPaths))]
+
+	@property
+	def loadedAtomPairs(self):
+		return [pair for pair,integDict in zip(self.atomPairNames,self._integDicts) if integDict is not None]
+
+	def getIntegDict(self, dictIdx):
+		if self._integDicts[dictIdx] is None:
+			integDict = self.parseFunct(self.bdtPaths[dictIdx])
+			self._integDicts[dictIdx] = {k.lower():v for k,v in integDict.items()}
+		return self._integDicts[dictIdx]
+
+
 def _isAtomicIntTable(intTable):
 	if all( [x is None for x in [intTable.shellA, intTable.shellB]] ):
 		return True
@@ -0,0 +1,103 @@
+
+""" Tracking the progress of a fit and stopping it once it stagnates (e.g. a noisy objective function on a plateau). Attach a
+ConvergenceMonitor to an ObjectiveFunction (convergenceMonitor attribute); once it detects stagnation the ObjectiveFunction raises
+StagnationStop, which carryOutOptimisationBasicOptions and carryOutOptimisationBlockCoordinate catch to finish with the best coeffs """
+
+import collections
+
+import numpy as np
+
+
+class StagnationStop(Exception):
+	""" Raised by ObjectiveFunction to stop an optimiser once its convergenceMonitor detects stagnation
+
+	Attributes (incl. @properties):
+		bestCoeffs (np array): Coefficients giving the lowest objective function value so far
+		bestVal (float): Lowest objective function value so far
+		nEvals (int): Number of evaluations the monitor has seen
+		lastVal (float): Objective function value of the evaluation that triggered the stop
+
+	"""
+
+	def __init__(self, message, bestCoeffs, bestVal, nEvals, lastVal):
+		super().__init__(message)
+		self.bestCoeffs = np.array(bestCoeffs, dtype=float)
+		self.bestVal = bestVal
+		self.nEvals = nEvals
+		self.lastVal = lastVal
+
+
+class ConvergenceMonitor():
+	""" Tracks the best objective function value (and coefficients) over a fit, and flags stagnation once the best value improves by
+	less than relTol (relative) over the last window evaluations. If driftTol is set, the best coefficients must also have moved by
+	less than driftTol (relative to max(abs(coeff),1)) over the same window
+
+	Attributes (incl. @properties):
+		window (int): Number of evaluations over which improvement/drift are measured
+		relTol (float): Stagnant if relative improvement over the window is below this
+		driftTol (float): If not None, also requires the coefficient drift over the window to be below this
+		minEvals (int): Never stagnant before this many evaluations
+		nEvals (int): Number of evaluations seen since the last reset()
+		bestVal (float): Lowest objective function value seen (np.inf before any evaluations)
+		bestCoeffs (np array): Coefficients giving bestVal (None before any evaluations)
+		bestValHistory (list): bestVal after each evaluation
+		stopped (bool): True once stagnation has been detected (until reset() is called)
+		stopReason (str): Description of why stagnation was flagged (None if it hasnt been)
+
+	"""
+
+	def __init__(self, window=20, relTol=1e-4, driftTol=None, minEvals=None):
+		self.window = window
+		self.relTol = relTol
+		self.driftTol = driftTol
+		self.minEvals = window+1 if minEvals is None else max(minEvals, window+1)
+		self.reset()
+
+	def reset(self):
+		""" Forget all evaluations; call at the start of each fit """
+		self.nEvals = 0
+		self.bestVal, self.bestCoeffs = np.inf, None
+		self.bestValHistory = list()
+		self._bestCoeffsWindow = collections.deque(maxlen=self.window+1)
+		self.stopped, self.stopReason = False, None
+
+	def update(self, coeffs, objVal):
+		""" Record one evaluation
+
+		Returns
+			newlyStopped (bool): True only for the evaluation at which stagnation is first detected
+		"""
+		self.nEvals += 1
+		if (self.bestCoeffs is None) or (objVal < self.bestVal):
+			self.bestVal, self.bestCoeffs = objVal, np.array(coeffs, dtype=float)
+		self.bestValHistory.append(self.bestVal)
+		self._bestCoeffsWindow.append(self.bestCoeffs)
+
+		if self.stopped or (self.nEvals < self.minEvals):
+			return False
+		relImprovement, coeffDrift = self.getRelImprovement(), self.getCoeffDrift()
+		if (relImprovement < self.relTol) and ((self.driftTol is None) or (coeffDrift < self.driftTol)):
+			self.stopped = True
+			self.stopReason = "Stagnated: relative improvement {:.3g} and coefficient drift {:.3g} over last {} evaluations".format(relImprovement,
+			                                                                                                                    coeffDrift, self.window)
+			return True
+		return False
+
+	def getRelImprovement(self):
+		""" Relative improvement of bestVal over the last window evaluations (np.inf if there havent been enough) """
+		if len(self.bestValHistory) <= self.window:
+			return np.inf
+		startVal, endVal = self.bestValHistory[-self.window-1], self.bestValHistory[-1]
+		if not np.isfinite(startVal):
+			return np.inf if np.isfinite(endVal) else 0.0
+		return (startVal-endVal) / max(abs(startVal), np.finfo(float).tiny)
+
+	def getCoeffDrift(self):
+		""" Max change in the best coefficients over the last window evaluations, relative to max(abs(coeff),1) """
+		if len(self._bestCoeffsWindow) <= self.window:
+			return np.inf
+		startCoeffs, endCoeffs = self._bestCoeffsWindow[0], self._bestCoeffsWindow[-1]
+		return float( np.max(np.abs(endCoeffs-startCoeffs) / np.maximum(np.abs(startCoeffs),1.0), initial=0.0) )
+
+	def getStagnationStop(self, lastVal):
+		return StagnationStop(self.stopReason, self.bestCoeffs, self.bestVal, self.nEvals, lastVal)
@@ -1,26 +1,64 @@
 
 import copy
-import itertools as it
-import math
 import numpy as np
 
 
 class AnalyticalIntRepr():
 
-	def evalAtListOfXVals(self,xVals:iter):
+	def evalAtListOfXVals(self,xVals:iter, out=None):
 		""" Evaluate function at list of x-values
 		
 		Args:
 			xVals: Iterable (e.g. list) of float values
+			out(Optional): Float array (or array view, e.g. a column of a table) of len(xVals) to write the values into
 				
 		Returns
-			yVals: Iterable of float values (function values at relevant xVals)
+			yVals: Iterable of float values (function values at relevant xVals). This is out if it was passed
 		
 		Raises:
 			NotImplementedError: If sub-class hasnt overwritten method
 		"""
 		raise NotImplementedError("evalAtListOfXVals not implemented on child class")
 
+	def evalAtListOfXValsForCoeffMatrix(self, xVals:iter, coeffMatrix):
+		""" Evaluate the function at a list of x-values for many sets of coefficients at once (e.g. a population of candidates).
+		Coefficients on the object are unchanged. Default implementation loops over candidates; child classes should override this
+		with a broadcast version where possible
+		
+		Args:
+			xVals: Iterable (e.g. list) of float values
+			coeffMatrix: (nCandidates, nCoeffs) array-like; each row is one set of coefficients, in the same order as coeffs
+				
+		Returns
+			yVals: (nCandidates, len(xVals)) array; row i has the function values for coeffMatrix[i]
+		
+		Raises:
+			TypeError: If the number of columns in coeffMatrix doesnt match nCoeffs
+		"""
+		coeffMatrix = _getCoeffMatrix(coeffMatrix, self.nCoeffs)
+		outArray = np.zeros( (coeffMatrix.shape[0], len(xVals)) )
+		origCoeffs = self.coeffs
+		try:
+			for idx,coeffs in enumerate(coeffMatrix):
+				self.coeffs = list(coeffs)
+				self.evalAtListOfXVals(xVals, out=outArray[idx])
+		finally:
+			self.coeffs = origCoeffs
+		return outArray
+
+	def bindCoeffs(self, coeffView):
+		""" Store coefficients in coeffView from now on; current values are copied in first. Afterwards, setting coeffs writes into
+		coeffView and any changes to coeffView (e.g. by the owner of a larger array it is a slice of) are used by the object
+		
+		Args:
+			coeffView: 1-D float64 numpy array (generally a view) of length nCoeffs
+		
+		Raises:
+			NotImplementedError: If sub-class doesnt store coefficients in an array. Setting the coeffs attribute still works
+			ValueError: If coeffView has the wrong shape or dtype
+		"""
+		raise NotImplementedError("bindCoeffs not implemented on child class")
+
 	@property
 	def nCoeffs(self):
 		raise NotImplementedError("nCoeffs property getter not implemented on child class")
@@ -81,11 +119,33 @@ class CompositeAnalyticalRepr(AnalyticalIntRepr):
 			aRep.coeffs = val[startIdx:startIdx+aRep.nCoeffs]
 			startIdx += aRep.nCoeffs
 
-	def evalAtListOfXVals(self,xVals:iter):
-		outVals = list()
-		for x in self._aRepList:
-			outVals.append( np.array(x.evalAtListOfXVals(xVals)) )
-		return sum(outVals)
+	def bindCoeffs(self, coeffView):
+		_checkCoeffView(coeffView, self.nCoeffs)
+		startIdx = 0
+		for aRep in self._aRepList:
+			aRep.bindCoeffs(coeffView[startIdx:startIdx+aRep.nCoeffs])
+			startIdx += aRep.nCoeffs
+
+	def evalAtListOfXVals(self,xVals:iter, out=None):
+		outArray = _getOutArray(xVals, out)
+		outArray[:] = 0.0
+		if len(self._aRepList) == 0:
+			return outArray
+		self._aRepList[0].evalAtListOfXVals(xVals, out=outArray)
+		if len(self._aRepList) > 1:
+			buffer = np.empty(len(outArray))
+			for x in self._aRepList[1:]:
+				outArray += x.evalAtListOfXVals(xVals, out=buffer)
+		return outArray
+
+	def evalAtListOfXValsForCoeffMatrix(self, xVals:iter, coeffMatrix):
+		coeffMatrix = _getCoeffMatrix(coeffMatrix, self.nCoeffs)
+		outArray = np.zeros( (coeffMatrix.shape[0], len(xVals)) )
+		startIdx = 0
+		for aRep in self._aRepList:
+			outArray += aRep.evalAtListOfXValsForCoeffMatrix(xVals, coeffMatrix[:,startIdx:startIdx+aRep.nCoeffs])
+			startIdx += aRep.nCoeffs
+		return outArray
 
 class Cawkwell17ModTailRepr(AnalyticalIntRepr):
 
@@ -101,15 +161,20 @@ class Cawkwell17ModTailRepr(AnalyticalIntRepr):
 			raise ValueError("Either nPoly or startCoeffs needs to be set")
 		elif nPoly is None:
 			self.nPoly = len(startCoeffs)
-			self._coeffs = startCoeffs
+			polyCoeffs = startCoeffs
 		elif startCoeffs is None:
-			self._coeffs = [0.0 for x in range(nPoly)]
+			polyCoeffs = [0.0 for x in range(nPoly)]
 			self.nPoly = nPoly
 		else:
 			self.nPoly = nPoly
-			self._coeffs = list(startCoeffs)
-			if len(self._coeffs) != self.nPoly:
-				raise TypeError("nPoly set to {} but {} startCoeffs passed".format(self.nPoly,len(self._coeffs)))
+			polyCoeffs = list(startCoeffs)
+			if len(polyCoeffs) != self.nPoly:
+				raise TypeError("nPoly set to {} but {} startCoeffs passed".format(self.nPoly,len(polyCoeffs)))
+
+		#All variable coefficients (polynomial coeffs, then valAtR0/nodePositions if promoted) are held in one array
+		self._coeffVals = np.array(polyCoeffs, dtype=float)
+		self._treatValAtR0AsVariable = False
+		self._treatNodePositionsAsVariables = False
 
 		#Set everything else
 		self.rCut = rCut
@@ -117,75 +182,116 @@ class Cawkwell17ModTailRepr(AnalyticalIntRepr):
 		self.valAtR0 = valAtR0
 		self.tailDelta = tailDelta
 		self.nodePositions = list(nodePositions) if nodePositions is not None else []
-		self._treatValAtR0AsVariable = False
-		self._treatNodePositionsAsVariables = False
 
 	def __repr__( self ):
 		return str(self.__dict__)
 
 
-	def evalAtListOfXVals(self,xVals):
-		outArray = np.zeros( (len(xVals)) )
-		nodeDenominators = [self.refR0 - nodePos for nodePos in self.nodePositions]
-		tailArray = applyTailFunctToListOfXVals(xVals, self.rCut, self.tailDelta)
-		for idx,x in enumerate(xVals):
-			if x >= self.rCut:
-				outArray[idx] = 0.0
-			else:
-				diffVal = x-self.refR0
-	
-				#Calc node factor
-				nodeFactor = 1.0
-				for nodePos,nodeDenom in it.zip_longest(self.nodePositions, nodeDenominators):
-					nodeFactor *= ( (x-nodePos) / (nodeDenom) )
-	
-				try:	
-					expTerm = sum([(diffVal**(expIdx+1))*x for expIdx,x in enumerate(self._coeffs)])
-					scaleFactor = math.exp(expTerm)
-					outArray[idx] = self.valAtR0*scaleFactor*nodeFactor*tailArray[idx]
-				except OverflowError:
-					outArray[idx] = 1e30
+	def evalAtListOfXVals(self,xVals, out=None):
+		outArray = _getOutArray(xVals, out)
+		outArray[:] = self.evalAtListOfXValsForCoeffMatrix(xVals, self._coeffVals[np.newaxis,:])[0]
+		return outArray
+
+	def evalAtListOfXValsForCoeffMatrix(self, xVals, coeffMatrix):
+		""" Values which overflow are set to 1e30 """
+		xVals = np.asarray(xVals, dtype=float)
+		coeffMatrix = _getCoeffMatrix(coeffMatrix, self.nCoeffs)
+		polyCoeffs, valsAtR0, nodePositions = self._getCoeffArraysFromMatrix(coeffMatrix)
+
+		with np.errstate(all="ignore"): #Overflowing values get replaced below
+			diffVals = (xVals-self.refR0)[np.newaxis,:]
+			expTerms = np.zeros( (coeffMatrix.shape[0], len(xVals)) )
+			for polyIdx in reversed(range(self.nPoly)): #Horner's method for sum_i coeff_i*diff^(i+1)
+				expTerms += polyCoeffs[:,polyIdx:polyIdx+1]
+				expTerms *= diffVals
+			scaleFactors = np.exp(expTerms, out=expTerms)
+			overflowed = ~np.isfinite(scaleFactors)
+			outArray = valsAtR0 * scaleFactors
+			for nodeIdx in range(nodePositions.shape[1]):
+				nodePos = nodePositions[:,nodeIdx:nodeIdx+1]
+				outArray *= (xVals[np.newaxis,:] - nodePos) / (self.refR0 - nodePos)
+			outArray *= applyTailFunctToListOfXVals(xVals, self.rCut, self.tailDelta)
+
+		outArray[overflowed] = 1e30
+		outArray[:, xVals>=self.rCut] = 0.0
 		return outArray
 
+	def _getCoeffArraysFromMatrix(self, coeffMatrix):
+		nCandidates = coeffMatrix.shape[0]
+		polyCoeffs, nextIdx = coeffMatrix[:,:self.nPoly], self.nPoly
+		valsAtR0 = np.full( (nCandidates,1), self.valAtR0, dtype=float )
+		nodePositions = np.tile( np.array(self.nodePositions, dtype=float), (nCandidates,1) ).reshape(nCandidates, len(self.nodePositions))
+		if self._treatValAtR0AsVariable:
+			valsAtR0 = coeffMatrix[:,nextIdx:nextIdx+1]
+			nextIdx += 1
+		if self._treatNodePositionsAsVariables:
+			nodePositions = coeffMatrix[:,nextIdx:]
+		return polyCoeffs, valsAtR0, nodePositions
+
+	#Promoting/demoting changes nCoeffs, so replaces the coefficient array (i.e. unbinds it from any view)
 	def promoteValAtR0ToVariable(self):
-		self._treatValAtR0AsVariable = True
+		if not self._treatValAtR0AsVariable:
+			self._coeffVals = np.insert(self._coeffVals, self.nPoly, self._valAtR0)
+			self._treatValAtR0AsVariable = True
 
 	def promoteNodePositionsToVariables(self):
-		self._treatNodePositionsAsVariables = True
+		if not self._treatNodePositionsAsVariables:
+			self._coeffVals = np.concatenate( [self._coeffVals, np.array(self._nodePositions, dtype=float)] )
+			self._treatNodePositionsAsVariables = True
 
 	def demoteValAtR0FromVariable(self):
-		self._treatValAtR0AsVariable = False
+		if self._treatValAtR0AsVariable:
+			self._valAtR0 = self.valAtR0
+			self._coeffVals = np.delete(self._coeffVals, self.nPoly)
+			self._treatValAtR0AsVariable = False
 
 	@property
-	def nCoeffs(self):
-		numbCoeffs = self.nPoly
+	def valAtR0(self):
 		if self._treatValAtR0AsVariable:
-			numbCoeffs += 1
+			return float(self._coeffVals[self.nPoly])
+		return self._valAtR0
+
+	@valAtR0.setter
+	def valAtR0(self, val):
+		if self._treatValAtR0AsVariable:
+			self._coeffVals[self.nPoly] = val
+		else:
+			self._valAtR0 = val
+
+	@property
+	def nodePositions(self):
 		if self._treatNodePositionsAsVariables:
-			numbCoeffs += len(self.nodePositions)
-		return numbCoeffs
+			return self._coeffVals[self._getNodeStartIdx():].tolist()
+		return self._nodePositions
+
+	@nodePositions.setter
+	def nodePositions(self, val):
+		if not self._treatNodePositionsAsVariables:
+			self._nodePositions = val
+		elif len(val) == len(self._coeffVals)-self._getNodeStartIdx():
+			self._coeffVals[self._getNodeStartIdx():] = val
+		else:
+			self._coeffVals = np.concatenate( [self._coeffVals[:self._getNodeStartIdx()], np.array(val, dtype=float)] )
+
+	def _getNodeStartIdx(self):
+		return self.nPoly + 1 if self._treatValAtR0AsVariable else self.nPoly
+
+	@property
+	def nCoeffs(self):
+		return len(self._coeffVals)
 
 	@property
 	def coeffs(self):
-		outCoeffs = list(self._coeffs)
-		if self._treatValAtR0AsVariable:
-			outCoeffs = outCoeffs + [self.valAtR0]
-		if self._treatNodePositionsAsVariables:
-			outCoeffs = outCoeffs + self.nodePositions
-		return outCoeffs
+		return self._coeffVals.tolist()
 
 	@coeffs.setter
 	def coeffs(self,val):
 		if len(val) != self.nCoeffs:
 			raise TypeError("Expected {} coeffs, but {} passed".format(self.nCoeffs,len(val)))
+		self._coeffVals[:] = val
 
-		self._coeffs = list(val[:self.nPoly])
-		nextListPos = self.nPoly
-		if self._treatValAtR0AsVariable:
-			self.valAtR0 = val[nextListPos]
-			nextListPos += 1
-		if self._treatNodePositionsAsVariables:
-			self.nodePositions = list(val[nextListPos:])
+	def bindCoeffs(self, coeffView):
+		self._coeffVals = _getBoundCoeffView(coeffView, self._coeffVals)
 
 
 
@@ -197,8 +303,7 @@ class ExpDecayFunct(AnalyticalIntRepr):
 			raise TypeError("Missing parameter when creating ExpDecayFunct")
 
 		self.r0 = r0
-		self._alpha = alpha
-		self._prefactor = prefactor
+		self._coeffVals = np.array([prefactor, alpha], dtype=float)
 		self._rCut = rCut
 		self._tailDelta = tailDelta
 
@@ -207,42 +312,97 @@ class ExpDecayFunct(AnalyticalIntRepr):
 		else:
 			self.applyTail = False
 
-	def evalAtListOfXVals(self,xVals:iter):
-		outArray = np.zeros( (len(xVals)) )
-		alphaSqr = self._alpha*self._alpha
-
+	def evalAtListOfXVals(self,xVals:iter, out=None):
+		""" Values which overflow are set to 1e30 """
+		xVals = np.asarray(xVals, dtype=float)
+		outArray = _getOutArray(xVals, out)
+		prefactor, alpha = self._coeffVals
+		alphaSqr = alpha*alpha
+
+		np.subtract(xVals, self.r0, out=outArray)
+		outArray *= -1*alphaSqr
+		with np.errstate(over="ignore", invalid="ignore"): #Overflowing values get replaced below
+			np.exp(outArray, out=outArray)
+			outArray *= prefactor
+		outArray[~np.isfinite(outArray)] = 1e30 #Before the tail, else inf*0 gives NaN beyond rCut
 		if self.applyTail:
-			tailArray = applyTailFunctToListOfXVals(xVals,self._rCut, self._tailDelta)
-		for idx,x in enumerate(xVals):
-			rDist = x - self.r0
-			outArray[idx] = self._prefactor * math.exp( (-1*alphaSqr*rDist) )
-			if self.applyTail:
-				outArray[idx] *= tailArray[idx]
+			outArray *= applyTailFunctToListOfXVals(xVals,self._rCut, self._tailDelta)
 
 		return outArray
 
+	def evalAtListOfXValsForCoeffMatrix(self, xVals:iter, coeffMatrix):
+		""" Values which overflow are set to 1e30 """
+		xVals = np.asarray(xVals, dtype=float)
+		coeffMatrix = _getCoeffMatrix(coeffMatrix, self.nCoeffs)
+		prefactors, alphas = coeffMatrix[:,0:1], coeffMatrix[:,1:2]
+		with np.errstate(over="ignore", invalid="ignore"): #Overflowing values get replaced below
+			outArray = prefactors * np.exp( -1*(alphas**2) * (xVals-self.r0)[np.newaxis,:] )
+		outArray[~np.isfinite(outArray)] = 1e30
+		if self.applyTail:
+			outArray *= applyTailFunctToListOfXVals(xVals, self._rCut, self._tailDelta)
+		return outArray
+
+	@property
+	def _prefactor(self):
+		return float(self._coeffVals[0])
+
+	@property
+	def _alpha(self):
+		return float(self._coeffVals[1])
+
 	@property
 	def nCoeffs(self):
-		return len(self.coeffs)
+		return len(self._coeffVals)
 
 	@property
 	def coeffs(self):
-		return [self._prefactor,self._alpha]
+		return self._coeffVals.tolist()
 
 	@coeffs.setter
 	def coeffs(self,val):
 		if len(val) != self.nCoeffs:
 			raise TypeError("Expected {} coeffs, but {} passed".format(self.nCoeffs,len(val)))
-		self._prefactor = val[0]
-		self._alpha = val[1]
+		self._coeffVals[:] = val
 
+	def bindCoeffs(self, coeffView):
+		self._coeffVals = _getBoundCoeffView(coeffView, self._coeffVals)
 
 
-def applyTailFunctToListOfXVals(xVals,rCut,tailDelta):
-	outArray = np.zeros( (len(xVals)) )
-	for idx,x in enumerate(xVals):
-		if x >= rCut:
-			outArray[idx] = 0.0
-		else:
-			outArray[idx] = math.exp( tailDelta/(x-rCut) ) #Approaches 0 as x approaches rCut
+
+def applyTailFunctToListOfXVals(xVals,rCut,tailDelta, out=None):
+	""" Tail function exp(tailDelta/(x-rCut)), which approaches 0 as x approaches rCut; values are 0 for x>=rCut. out is as for
+	AnalyticalIntRepr.evalAtListOfXVals """
+	xVals = np.asarray(xVals, dtype=float)
+	outArray = _getOutArray(xVals, out)
+	np.subtract(xVals, rCut, out=outArray)
+	with np.errstate(divide="ignore", over="ignore", invalid="ignore"): #Only for x>=rCut, which get zeroed below
+		np.divide(tailDelta, outArray, out=outArray)
+		np.exp(outArray, out=outArray)
+	outArray[xVals >= rCut] = 0.0
 	return outArray
+
+
+def _checkCoeffView(coeffView, nCoeffs):
+	if (not isinstance(coeffView, np.ndarray)) or (coeffView.dtype != np.float64) or (coeffView.shape != (nCoeffs,)):
+		raise ValueError("coeffView needs to be a 1-D float64 array of length {}".format(nCoeffs))
+
+
+def _getBoundCoeffView(coeffView, currCoeffVals):
+	_checkCoeffView(coeffView, len(currCoeffVals))
+	np.copyto(coeffView, currCoeffVals)
+	return coeffView
+
+
+def _getCoeffMatrix(coeffMatrix, nCoeffs):
+	outMatrix = np.atleast_2d( np.asarray(coeffMatrix, dtype=float) )
+	if outMatrix.shape[1] != nCoeffs:
+		raise TypeError("Expected {} coeffs, but coeffMatrix has {} columns".format(nCoeffs, outMatrix.shape[1]))
+	return outMatrix
+
+
+def _getOutArray(xVals, out):
+	if out is None:
+		return np.zeros( (len(xVals)) )
+	if len(out) != len(xVals):
+		raise ValueError("out has length {} but there are {} xVals".format(len(out), len(xVals)))
+	return out
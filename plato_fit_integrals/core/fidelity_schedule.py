@@ -0,0 +1,107 @@
+
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+
+
+class FidelitySchedule():
+	""" Runs a fit at increasing levels of accuracy; cheap settings (e.g. few k-points) are used early, and the schedule promotes to
+	the next level once the objective function stops improving. Input files are only regenerated at promotion points (by re-calling
+	the workflow factories with the new fidelity level set)
+
+	Attributes (incl. @properties):
+		fidelityLevels (list): FidelityLevel objects (see shared.workflow_helpers) in order of increasing accuracy. None means full accuracy
+		levelIdx (int): Index of the current fidelity level
+		currentFidelity: The current FidelityLevel (or None)
+		isFinalLevel (bool): True if there are no more levels to promote to
+		workFlowCoordinator: WorkFlowCoordinator for the current fidelity level
+
+	"""
+
+	def __init__(self, fidelityLevels:list, workFlowFactories:list, stallIters=20, relTol=1e-3, **coordKwargs):
+		""" Initialiser
+
+		Args:
+			fidelityLevels: List of FidelityLevel objects in order of increasing accuracy. Use None for full accuracy (usually the last entry)
+			workFlowFactories: List of callables that return a WorkFlow object. Factories with a "fidelity" attribute (e.g. CreateEosWorkFlow) get it set
+			                   to the current level before being called; others are called as they are
+			stallIters: Number of evaluations without significant improvement (see relTol) after which we promote to the next fidelity level
+			relTol: Relative improvement in the best objective function value required to reset the stall counter
+			coordKwargs: Passed to WorkFlowCoordinator when it is created for each fidelity level (e.g. nCores)
+
+		Raises:
+			ValueError: If fidelityLevels is empty
+		"""
+		if len(fidelityLevels) == 0:
+			raise ValueError("At least one fidelity level is needed")
+		self.fidelityLevels = list(fidelityLevels)
+		self.workFlowFactories = list(workFlowFactories)
+		self.stallIters = stallIters
+		self.relTol = relTol
+		self.coordKwargs = coordKwargs
+		self._levelIdx = 0
+		self._workFlowCoordinator = None
+		self._resetStallTracking()
+
+	@property
+	def levelIdx(self):
+		return self._levelIdx
+
+	@property
+	def currentFidelity(self):
+		return self.fidelityLevels[self._levelIdx]
+
+	@property
+	def isFinalLevel(self):
+		return self._levelIdx == len(self.fidelityLevels)-1
+
+	@property
+	def workFlowCoordinator(self):
+		if self._workFlowCoordinator is None:
+			self._workFlowCoordinator = self._createWorkFlowCoordinator()
+		return self._workFlowCoordinator
+
+	def _createWorkFlowCoordinator(self):
+		workFlows = list()
+		for factory in self.workFlowFactories:
+			if hasattr(factory, "fidelity"):
+				factory.fidelity = self.currentFidelity
+			workFlows.append( factory() ) #Workflows write their input files on creation
+		return wflowCoord.WorkFlowCoordinator(workFlows, **self.coordKwargs)
+
+	def _resetStallTracking(self):
+		self.bestObjVal = None
+		self.nItersSinceImprovement = 0
+
+	def updateWithObjVal(self, objVal):
+		""" Record an objective function value at the current fidelity level, promoting to the next level if the fit has stalled
+
+		Args:
+			objVal: The objective function value from the latest evaluation
+
+		Returns
+			promoted (bool): True if we moved to a new fidelity level (workFlowCoordinator will now be a new object)
+		"""
+		if (self.bestObjVal is None) or (objVal < self.bestObjVal - self.relTol*abs(self.bestObjVal)):
+			self.bestObjVal = objVal
+			self.nItersSinceImprovement = 0
+		else:
+			self.nItersSinceImprovement += 1
+
+		if (self.nItersSinceImprovement >= self.stallIters) and (not self.isFinalLevel):
+			self.promote()
+			return True
+		return False
+
+	def promote(self):
+		""" Move to the next fidelity level; input files are regenerated when workFlowCoordinator is next accessed """
+		if self.isFinalLevel:
+			raise ValueError("Already at the final fidelity level")
+		self._levelIdx += 1
+		self._workFlowCoordinator = None
+		self._resetStallTracking()
+
+	def promoteToFinal(self):
+		""" Move straight to the final (most accurate) fidelity level; does nothing if already there """
+		if not self.isFinalLevel:
+			self._levelIdx = len(self.fidelityLevels)-2
+			self.promote()
+
@@ -0,0 +1,152 @@
+
+""" Timing instrumentation for objective function evaluations. Objects that support it have a phaseTimer attribute, which defaults to
+NULL_PHASE_TIMER (does nothing). Set it to a PhaseTimer to record timings; e.g. objectiveFunction.phaseTimer = PhaseTimer() """
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class PhaseTimer():
+	""" Records wall/CPU time spent in named phases (e.g. "write_tables", "run_plato") of each objective function evaluation (iteration)
+
+	Phases can be nested (e.g. "eos_fit" happens inside "workflow_run"), so summing all phases can double count. Phases attributed to a
+	workflow are recorded separately from the global ones.
+
+	Attributes (incl. @properties):
+		history (list): One dict per completed iteration: {"iteration":int, "phases":{name:times}, "workflows":{label:{name:times}}}
+		                where times is a dict with keys wall, cpu (this process) and childCpu (e.g. plato processes)
+		jsonLinesPath (str): If not None, each completed iteration record is appended to this file as a line of JSON
+
+	"""
+
+	def __init__(self, rollingWindow=50, jsonLinesPath=None):
+		""" Initialiser
+
+		Args:
+			rollingWindow: Number of most recent iterations used for rolling statistics (and kept in history)
+			jsonLinesPath: Optional path to append one JSON line per iteration to
+		"""
+		self.rollingWindow = rollingWindow
+		self.jsonLinesPath = os.path.abspath(jsonLinesPath) if jsonLinesPath is not None else None
+		self._history = collections.deque(maxlen=rollingWindow)
+		self._nIters = 0
+		self._currRecord = self._getBlankRecord()
+		self._lock = threading.Lock() #Workflows may be run (and timed) in parallel
+
+	@property
+	def history(self):
+		return list(self._history)
+
+	def _getBlankRecord(self):
+		return {"iteration":self._nIters, "phases":dict(), "workflows":dict(), "counters":dict()}
+
+	@contextlib.contextmanager
+	def timePhase(self, phaseName, workFlowLabel=None):
+		startWall, startCpu, startChildCpu = time.perf_counter(), time.process_time(), _getChildCpuTime()
+		try:
+			yield
+		finally:
+			times = {"wall": time.perf_counter()-startWall, "cpu": time.process_time()-startCpu, "childCpu": _getChildCpuTime()-startChildCpu}
+			self._addTimes(phaseName, times, workFlowLabel)
+
+	def _addTimes(self, phaseName, times, workFlowLabel):
+		with self._lock:
+			self._addTimesThreadUnsafe(phaseName, times, workFlowLabel)
+
+	def _addTimesThreadUnsafe(self, phaseName, times, workFlowLabel):
+		if workFlowLabel is None:
+			phaseDict = self._currRecord["phases"]
+		else:
+			phaseDict = self._currRecord["workflows"].setdefault(workFlowLabel, dict())
+
+		if phaseName in phaseDict:
+			for key,val in times.items():
+				phaseDict[phaseName][key] += val
+		else:
+			phaseDict[phaseName] = dict(times)
+
+	def incrementCounter(self, counterName, increment=1):
+		""" Count events (e.g. rejected candidates) within the current iteration """
+		with self._lock:
+			counters = self._currRecord["counters"]
+			counters[counterName] = counters.get(counterName,0) + increment
+
+	def startIteration(self):
+		""" Discards anything recorded since the last endIteration() call """
+		self._currRecord = self._getBlankRecord()
+
+	def endIteration(self):
+		""" Store the timings recorded since startIteration() as one iteration (and write them to jsonLinesPath if set)
+
+		Returns
+			record: dict with the timings for the iteration; see history attribute for format
+		"""
+		outRecord = self._currRecord
+		self._history.append(outRecord)
+		self._nIters += 1
+		if self.jsonLinesPath is not None:
+			with open(self.jsonLinesPath,"a") as f:
+				f.write( json.dumps(outRecord) + "\n" )
+		self._currRecord = self._getBlankRecord()
+		return outRecord
+
+	def getRollingStats(self, workFlowLabel=None):
+		""" Statistics for each phase over the last rollingWindow iterations
+
+		Args:
+			workFlowLabel: If None, get stats for the global phases. Else get them for phases attributed to this workflow
+
+		Returns
+			outDict: keys are phase names, values are dicts with keys nSamples, meanWall, minWall, maxWall, totalWall, meanCpu, meanChildCpu
+		"""
+		allPhaseTimes = collections.OrderedDict()
+		for record in self._history:
+			phaseDict = record["phases"] if workFlowLabel is None else record["workflows"].get(workFlowLabel, dict())
+			for phaseName,times in phaseDict.items():
+				allPhaseTimes.setdefault(phaseName, list()).append(times)
+
+		outDict = collections.OrderedDict()
+		for phaseName,allTimes in allPhaseTimes.items():
+			wallTimes = np.array([x["wall"] for x in allTimes])
+			outDict[phaseName] = {"nSamples":len(allTimes), "meanWall":float(np.mean(wallTimes)), "minWall":float(np.min(wallTimes)),
+			                      "maxWall":float(np.max(wallTimes)), "totalWall":float(np.sum(wallTimes)),
+			                      "meanCpu":float(np.mean([x["cpu"] for x in allTimes])),
+			                      "meanChildCpu":float(np.mean([x["childCpu"] for x in allTimes]))}
+		return outDict
+
+	def getWorkFlowLabels(self):
+		outLabels = list()
+		for record in self._history:
+			outLabels.extend( [x for x in record["workflows"].keys() if x not in outLabels] )
+		return outLabels
+
+
+class NullPhaseTimer():
+	""" Same interface as PhaseTimer but records nothing; the default so instrumentation costs nothing unless switched on """
+
+	def timePhase(self, phaseName, workFlowLabel=None):
+		return contextlib.nullcontext()
+
+	def incrementCounter(self, counterName, increment=1):
+		pass
+
+	def startIteration(self):
+		pass
+
+	def endIteration(self):
+		return None
+
+
+NULL_PHASE_TIMER = NullPhaseTimer()
+
+
+def _getChildCpuTime():
+	allTimes = os.times()
+	return allTimes.children_user + allTimes.children_system
+
@@ -0,0 +1,398 @@
+
+""" Executors used by WorkFlowCoordinator to run plato jobs (shell commands) and the in-python post-processing of each workflow """
+
+import collections
+import concurrent.futures
+import contextlib
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import plato_fit_integrals.shared.lazy_imports as lazyImports
+
+jobRun = lazyImports.lazyImport("plato_pylib.utils.job_running_functs") #Keeps queue workers (see shared_fs_queue) light to start
+
+
+ShellJob = collections.namedtuple("ShellJob", ["comm", "nCores", "ompThreads", "workFolder", "expectedOutputs"])
+ShellJob.__new__.__defaults__ = (None, None, None, None)
+ShellJob.__doc__ = """ Shell command plus its resource requirements. Workflows can return these in place of strings from preRunShellComms.
+None for nCores/ompThreads means use the executor defaults. expectedOutputs are deleted before each attempt at the job and any missing
+afterwards mark it as failed; workFolder is used by executors that run jobs elsewhere (e.g. SharedFsQueueExecutor) """
+
+
+JobFailure = collections.namedtuple("JobFailure", ["index", "comm", "returnCode", "nAttempts", "reason"])
+JobFailure.__doc__ = """ Record of a shell job that failed on every attempt. index is its position in the list passed to runShellComms,
+returnCode is None for timed-out jobs and reason is one of "timeout", "return_code" or "missing_outputs" """
+
+
+class JobFailedError(RuntimeError):
+	pass
+
+
+def getShellCommStr(shellJob:"str or ShellJob"):
+	return shellJob.comm if isinstance(shellJob, ShellJob) else shellJob
+
+
+def getWorkFolder(shellJob:"str or ShellJob"):
+	return shellJob.workFolder if isinstance(shellJob, ShellJob) else None
+
+
+def getExpectedOutputs(shellJob:"str or ShellJob"):
+	if isinstance(shellJob, ShellJob) and (shellJob.expectedOutputs is not None):
+		return list(shellJob.expectedOutputs)
+	return list()
+
+
+class JobRunPolicy():
+	""" Settings for handling slow or failed shell jobs
+
+	Attributes (incl. @properties):
+		timeout (float): Max wall time (s) for one attempt at a job; the job (and any child processes) is killed after this. None means no limit
+		maxRetries (int): Number of times a failed (timed-out, non-zero return code or missing outputs) job is re-run
+		retryDelay (float): Wait (s) before the first retry of a job
+		backoffFactor (float): Each further retry of the same job waits this many times longer than the last
+		stragglerFactor (float): If not None, a job running longer than stragglerFactor times the median time of finished jobs (in the
+		                         same batch) gets a duplicate started on idle cores, once no jobs are waiting. Whichever copy finishes
+		                         first is used and the other killed. Only ShellJobs with a workFolder (in their command) and
+		                         expectedOutputs are duplicated; the copy runs in a scratch copy of workFolder so they dont share files
+		minJobsForStragglers (int): Number of finished jobs needed before the median is trusted for spotting stragglers
+		maxRelaunches (int): Max straggler duplicates started per job (these dont count as retries)
+
+	"""
+
+	def __init__(self, timeout=None, maxRetries=0, retryDelay=1.0, backoffFactor=2.0, stragglerFactor=None, minJobsForStragglers=3, maxRelaunches=1):
+		self.timeout = timeout
+		self.maxRetries = maxRetries
+		self.retryDelay = retryDelay
+		self.backoffFactor = backoffFactor
+		self.stragglerFactor = stragglerFactor
+		self.minJobsForStragglers = minJobsForStragglers
+		self.maxRelaunches = maxRelaunches
+
+	def getRetryDelay(self, nFailedAttempts):
+		""" Wait (s) before the next attempt at a job which has failed nFailedAttempts times """
+		return self.retryDelay * (self.backoffFactor**(nFailedAttempts-1))
+
+	def getStragglerTime(self, finishedJobTimes):
+		""" Run time (s) beyond which a job counts as a straggler; None if straggler duplicates are off or too few jobs have finished """
+		if (self.stragglerFactor is None) or (len(finishedJobTimes) < max(self.minJobsForStragglers,1)):
+			return None
+		return self.stragglerFactor * float(np.median(finishedJobTimes))
+
+
+class JobExecutorBase():
+
+	lastFailures = tuple() #JobFailure objects from the last runShellComms call; executors that cant detect failures leave this empty
+
+	def runShellComms(self, shellComms:"iter of str/ShellJob", quiet=True):
+		""" Run a batch of shell commands (usually plato jobs), returning once they have all finished
+
+		Args:
+			shellComms: Commands to run, either as str or ShellJob objects
+			quiet: If True, stdout/stderr of the commands is discarded
+
+		Returns
+			Nothing
+		"""
+		raise NotImplementedError()
+
+	def runFunctions(self, functs:"iter of callables"):
+		""" Call each function (no args), returning once they have all finished. If any raise, the first error is re-raised
+		after all have finished
+
+		Returns
+			outVals: list of return values, same order as functs
+		"""
+		raise NotImplementedError()
+
+	def close(self):
+		""" Release any resources (e.g. worker pools). Does nothing by default """
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+class RunCommsParallelExecutor(JobExecutorBase):
+	""" Original behaviour; plato_pylib runs each batch of shell commands on nCores, and post-processing is done in serial """
+
+	def __init__(self, nCores=1):
+		self.nCores = nCores
+
+	def runShellComms(self, shellComms, quiet=True):
+		jobRun.executeRunCommsParralel([getShellCommStr(x) for x in shellComms], self.nCores, quiet=quiet)
+
+	def runFunctions(self, functs):
+		return [funct() for funct in functs]
+
+
+class PersistentPoolExecutor(JobExecutorBase):
+	""" Runs shell commands and post-processing functions on one pool of workers, which is created on first use and kept
+	until close() is called. This avoids paying start-up costs each iteration when a fit has many short plato jobs.
+
+	Shell commands are scheduled so that the total cores requested by running jobs never exceeds nCores (a job needing more
+	than nCores runs on its own). Each job gets OMP_NUM_THREADS set to its ompThreads (or its number of cores if not set).
+
+	Workers are threads; shell commands still run as separate processes, while post-processing runs in this process so that
+	workflows can update themselves in place (as run() is expected to)
+
+	Timeouts, retries and straggler duplicates are controlled by jobPolicy. Jobs which fail on every attempt are recorded in
+	lastFailures rather than raising, so the caller can decide what to do (see WorkFlowCoordinator jobFailurePolicy)
+
+	Attributes (incl. @properties):
+		nCores (int): Total cores available for shell jobs at any one time; also the number of workers
+		coresPerJob (int): Default cores used by each shell job
+		ompThreads (int): Default value for OMP_NUM_THREADS in each shell job. None means use the cores per job
+		jobPolicy (JobRunPolicy): Timeout/retry/straggler settings. Default is no timeout, no retries and no straggler duplicates
+		isRunning (bool): True if the worker pool currently exists
+		lastFailures (list): JobFailure objects from the last call to runShellComms
+
+	"""
+
+	def __init__(self, nCores=1, coresPerJob=1, ompThreads=None, jobPolicy=None, pollInterval=0.05):
+		self.nCores = nCores
+		self.coresPerJob = coresPerJob
+		self.ompThreads = ompThreads
+		self.jobPolicy = jobPolicy if jobPolicy is not None else JobRunPolicy()
+		self.pollInterval = pollInterval
+		self.lastFailures = list()
+		self._pool = None
+		self._poolLock = threading.Lock()
+
+	@property
+	def isRunning(self):
+		return self._pool is not None
+
+	def _getPool(self):
+		with self._poolLock:
+			if self._pool is None:
+				self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.nCores, thread_name_prefix="plato_fit_worker")
+			return self._pool
+
+	def close(self):
+		with self._poolLock:
+			if self._pool is not None:
+				self._pool.shutdown(wait=True)
+				self._pool = None
+
+	def runShellComms(self, shellComms, quiet=True):
+		pool, policy = self._getPool(), self.jobPolicy
+		pending = collections.deque()
+		for idx,x in enumerate(shellComms):
+			nCores, env = self._getJobCoresAndEnv(x)
+			pending.append( _ShellJobAttempt(idx, getShellCommStr(x), nCores, env, getExpectedOutputs(x), workFolder=getWorkFolder(x)) )
+		delayed, running, freeCores = list(), dict(), self.nCores
+		finishedJobTimes, failures = list(), list()
+
+		while pending or running or delayed:
+			_moveReadyAttempts(delayed, pending)
+			#Start as many jobs as will fit; always start one if nothing is running (it may need more than nCores)
+			while pending and ( (pending[0].nCores <= freeCores) or (len(running)==0) ):
+				attempt = pending.popleft()
+				running[pool.submit(attempt.run, quiet, policy.timeout)] = attempt
+				freeCores -= attempt.nCores
+
+			if len(running) == 0: #Only jobs waiting to be retried
+				time.sleep( max(min([x[0] for x in delayed]) - time.perf_counter(), 0.0) )
+				continue
+
+			done, notDone = concurrent.futures.wait(list(running.keys()), timeout=self.pollInterval, return_when=concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				attempt = running.pop(future)
+				freeCores += attempt.nCores
+				returnCode = future.result() #Re-raises any errors from starting the process
+				if attempt.superseded: #The other copy of this job finished first
+					attempt.cleanUp()
+					continue
+				failReason = attempt.getFailureReason(returnCode)
+				otherCopy = attempt.otherCopy
+				if (otherCopy is not None) and (failReason is not None): #Leave the other copy to finish the job
+					otherCopy.otherCopy = None
+					attempt.cleanUp()
+					continue
+				if otherCopy is not None:
+					otherCopy.kill(superseded=True)
+				attempt.cleanUp(keepOutputs=(failReason is None))
+				if failReason is None:
+					finishedJobTimes.append(attempt.runTime)
+				elif attempt.nAttempts <= policy.maxRetries:
+					delayed.append( (time.perf_counter() + policy.getRetryDelay(attempt.nAttempts), attempt.getRetry()) )
+				else:
+					failures.append( JobFailure(attempt.index, attempt.comm, returnCode, attempt.nAttempts, failReason) )
+
+			if (not pending) and (not delayed) and (freeCores > 0):
+				for attempt in self._getStragglers(running.values(), finishedJobTimes, freeCores):
+					duplicate = attempt.getDuplicate()
+					running[pool.submit(duplicate.run, quiet, policy.timeout)] = duplicate
+					freeCores -= duplicate.nCores
+
+		self.lastFailures = sorted(failures)
+
+	def _getStragglers(self, runningAttempts, finishedJobTimes, freeCores):
+		""" Running attempts to start a duplicate of; limited to those which fit (in order) on freeCores """
+		stragglerTime = self.jobPolicy.getStragglerTime(finishedJobTimes)
+		if stragglerTime is None:
+			return list()
+		outAttempts = list()
+		for attempt in list(runningAttempts):
+			canDuplicate = attempt.canDuplicate and (attempt.nRelaunches < self.jobPolicy.maxRelaunches)
+			if canDuplicate and (attempt.runTime > stragglerTime) and (attempt.nCores <= freeCores):
+				outAttempts.append(attempt)
+				freeCores -= attempt.nCores
+		return outAttempts
+
+	def _getJobCoresAndEnv(self, shellJob):
+		nCores, ompThreads = self.coresPerJob, self.ompThreads
+		if isinstance(shellJob, ShellJob):
+			nCores = shellJob.nCores if shellJob.nCores is not None else nCores
+			ompThreads = shellJob.ompThreads if shellJob.ompThreads is not None else ompThreads
+		ompThreads = nCores if ompThreads is None else ompThreads
+		env = dict(os.environ)
+		env["OMP_NUM_THREADS"] = str(ompThreads)
+		return nCores, env
+
+	def runFunctions(self, functs):
+		futures = [self._getPool().submit(funct) for funct in functs]
+		concurrent.futures.wait(futures)
+		return [x.result() for x in futures]
+
+
+def _removeFiles(filePaths):
+	for x in filePaths:
+		with contextlib.suppress(FileNotFoundError):
+			os.remove(x)
+
+
+def _moveReadyAttempts(delayed, pending):
+	currTime = time.perf_counter()
+	for readyTime, attempt in sorted(delayed, key=lambda x:x[0]):
+		if readyTime <= currTime:
+			pending.append(attempt)
+			delayed.remove( (readyTime,attempt) )
+
+
+class _ShellJobAttempt():
+	""" One attempt at running a shell job. run() is called from a worker thread, kill() can be called from any thread. Each
+	job runs in its own process group, so killing it also kills plato (rather than just the shell which launched it).
+
+	A straggler duplicate (see getDuplicate) runs in a scratch copy of workFolder, with workFolder replaced by the scratch folder in
+	its command; if it finishes first its outputs are moved to expectedOutputs. otherCopy links an attempt and its duplicate while
+	both are running """
+
+	def __init__(self, index, comm, nCores, env, expectedOutputs, nAttempts=1, nRelaunches=0, workFolder=None, isDuplicate=False):
+		self.index = index
+		self.comm = comm
+		self.nCores = nCores
+		self.env = env
+		self.expectedOutputs = expectedOutputs
+		self.nAttempts = nAttempts
+		self.nRelaunches = nRelaunches
+		self.workFolder = workFolder
+		self.isDuplicate = isDuplicate
+		self.otherCopy = None
+		self.timedOut = False
+		self.superseded = False
+		self._scratchFolder = None
+		self._startTime, self._endTime = None, None
+		self._proc = None
+		self._lock = threading.Lock()
+
+	@property
+	def runTime(self):
+		if self._startTime is None:
+			return 0.0
+		return (self._endTime if self._endTime is not None else time.perf_counter()) - self._startTime
+
+	@property
+	def canDuplicate(self):
+		""" True if a duplicate can run without sharing files with this attempt (and none is running) """
+		if self.isDuplicate or (self.otherCopy is not None) or (self.workFolder is None) or (len(self.expectedOutputs)==0):
+			return False
+		workFolder = os.path.abspath(self.workFolder)
+		inWorkFolder = all([os.path.abspath(x).startswith(workFolder+os.sep) for x in self.expectedOutputs])
+		return inWorkFolder and (self.workFolder in self.comm)
+
+	@property
+	def runComm(self):
+		return self.comm if self._scratchFolder is None else self.comm.replace(self.workFolder, self._scratchFolder)
+
+	@property
+	def runOutputs(self):
+		if self._scratchFolder is None:
+			return self.expectedOutputs
+		return [os.path.join(self._scratchFolder, os.path.relpath(x, self.workFolder)) for x in self.expectedOutputs]
+
+	def run(self, quiet, timeout):
+		""" Returns the return code of the command, or None if it was killed """
+		outStream = subprocess.DEVNULL if quiet else None
+		if self.isDuplicate and (not self.superseded):
+			self._createScratchFolder()
+		with self._lock:
+			if self.superseded:
+				return None
+			_removeFiles(self.runOutputs) #Else a failed retry could leave (or append to) outputs from an earlier attempt
+			self._startTime = time.perf_counter()
+			self._proc = subprocess.Popen(self.runComm, shell=True, env=self.env, stdout=outStream, stderr=outStream, start_new_session=True)
+		try:
+			returnCode = self._proc.wait(timeout=timeout)
+		except subprocess.TimeoutExpired:
+			self.timedOut = True
+			self.kill()
+			returnCode = None
+		self._endTime = time.perf_counter()
+		return None if self.superseded else returnCode
+
+	def _createScratchFolder(self):
+		workFolder = os.path.abspath(self.workFolder)
+		scratchFolder = tempfile.mkdtemp(prefix=os.path.basename(workFolder)+"_duplicate_", dir=os.path.dirname(workFolder))
+		shutil.copytree(workFolder, scratchFolder, dirs_exist_ok=True)
+		self._scratchFolder = scratchFolder
+
+	def kill(self, superseded=False):
+		with self._lock:
+			self.superseded = self.superseded or superseded
+			if self._proc is None:
+				return None
+			with contextlib.suppress(ProcessLookupError):
+				os.killpg(self._proc.pid, signal.SIGKILL)
+		self._proc.wait()
+
+	def cleanUp(self, keepOutputs=False):
+		""" Remove any scratch folder; for a finished duplicate, keepOutputs=True first moves its outputs to expectedOutputs """
+		if self._scratchFolder is None:
+			return None
+		if keepOutputs:
+			for scratchPath, outPath in zip(self.runOutputs, self.expectedOutputs):
+				os.replace(scratchPath, outPath)
+		shutil.rmtree(self._scratchFolder, ignore_errors=True)
+		self._scratchFolder = None
+
+	def getFailureReason(self, returnCode):
+		if self.timedOut:
+			return "timeout"
+		if returnCode != 0:
+			return "return_code"
+		if any([not os.path.exists(x) for x in self.runOutputs]):
+			return "missing_outputs"
+		return None
+
+	def getRetry(self):
+		return _ShellJobAttempt(self.index, self.comm, self.nCores, self.env, self.expectedOutputs, nAttempts=self.nAttempts+1,
+		                        nRelaunches=self.nRelaunches, workFolder=self.workFolder)
+
+	def getDuplicate(self):
+		""" Duplicate of a straggling attempt, linked to it via otherCopy """
+		self.nRelaunches += 1
+		outAttempt = _ShellJobAttempt(self.index, self.comm, self.nCores, self.env, self.expectedOutputs, nAttempts=self.nAttempts,
+		                              nRelaunches=self.nRelaunches, workFolder=self.workFolder, isDuplicate=True)
+		self.otherCopy, outAttempt.otherCopy = outAttempt, self
+		return outAttempt
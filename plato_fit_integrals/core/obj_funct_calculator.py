@@ -1,27 +1,53 @@
 
+import collections
 import itertools as it
+import numbers
+
+import numpy as np
+
+from plato_fit_integrals.core.property_vector import PropertyVector
 
 #Base class
 class ObjectiveFunctCalculator():
 
+	supportsPropertyVector = False #True if calculateObjFunction can take a PropertyVector in place of a SimpleNamespace
+
 	def calculateObjFunction( self, calcValues:"types.SimpleNamespace" ):
 		""" Takes a set of values and calculates the objective function value
-		
+
 		Args:
 			calcValues: SimpleNamespace containing values of all parameters being fit to (e.g. bulk modulii,
 			            elastic constants)
-				
+
 		Returns
 			objVal: Value of the objective function based on the calcValues
-		
+
 		Raises:
 			AttributeError: If any required calcValues are missing
 		"""
 		raise NotImplementedError()
 
+	def getPlanEntries(self):
+		""" Describe this calculator as a flat list of weighted (property, target, comparison function) terms. Used to
+		compile nested calculators into a single ObjectiveFunctPlan
+
+		Returns
+			planEntries: list of ObjFunctPlanEntry objects. Objective function = sum( weight*objFunct(targVal, calcValues.prop) )
+
+		Raises:
+			NotImplementedError: If the calculator cant be represented this way
+		"""
+		raise NotImplementedError()
+
+
+ObjFunctPlanEntry = collections.namedtuple("ObjFunctPlanEntry", ["prop", "targVal", "objFunct", "weight"])
 
 
 class ObjectiveFunctTotal(ObjectiveFunctCalculator):
+	""" Weighted sum of other calculators. Evaluated with a compiled ObjectiveFunctPlan (see getCompiledPlan) when every component
+	implements getPlanEntries, else by calling each component in turn. The plan is rebuilt if objFuncts or weights change, but
+	not if a component calculator is modified in place after the first evaluation
+	"""
 
 	def __init__(self, objFuncts:"list", weights:list=None):
 		self.objFuncts =  list(objFuncts)
@@ -29,18 +55,54 @@ class ObjectiveFunctTotal(ObjectiveFunctCalculator):
 			self.weights = [1.0 for x in range(len(self.objFuncts))]
 		else:
 			self.weights = weights
+		self._compiledPlan, self._compiledPlanKey = None, None
+
+	@property
+	def supportsPropertyVector(self):
+		return self._getCompiledPlan() is not None
 
 	def calculateObjFunction( self, calcValues ):
+		compiledPlan = self._getCompiledPlan()
+		if compiledPlan is not None:
+			return compiledPlan.calculateObjFunction(calcValues)
 		totVal  = 0.0
 		for x,weight in it.zip_longest(self.objFuncts,self.weights):
 			totVal += x.calculateObjFunction(calcValues) * weight
 		return totVal
 
+	def _getCompiledPlan(self):
+		#Compiled once then re-used until objFuncts/weights change; None if any component cant be compiled
+		planKey = ( tuple([id(x) for x in self.objFuncts]), tuple(self.weights) )
+		if planKey != self._compiledPlanKey:
+			try:
+				self._compiledPlan = self.getCompiledPlan()
+			except NotImplementedError:
+				self._compiledPlan = None
+			self._compiledPlanKey = planKey
+		return self._compiledPlan
+
+	def getPlanEntries(self):
+		outEntries = list()
+		for x,weight in it.zip_longest(self.objFuncts,self.weights):
+			if not isinstance(x, ObjectiveFunctCalculator):
+				raise NotImplementedError("Cant get plan entries for {}".format(x))
+			outEntries.extend( [entry._replace(weight=entry.weight*weight) for entry in x.getPlanEntries()] )
+		return outEntries
+
+	def getCompiledPlan(self):
+		""" Get an ObjectiveFunctPlan equivalent to this calculator (nested calculators are flattened). The plan is a snapshot; later
+		changes to objFuncts/weights wont be reflected in it
+
+		Raises:
+			NotImplementedError: If any component calculator doesnt implement getPlanEntries
+		"""
+		return ObjectiveFunctPlan(self.getPlanEntries())
+
 
 class ObjectiveFunctionContrib(ObjectiveFunctCalculator):
 
 	#Note each objective function needs to take (targValue,actValue) as args
-	def __init__(self, targValuesWithObjFuncts:"types.SimpleNamespace"): 
+	def __init__(self, targValuesWithObjFuncts:"types.SimpleNamespace"):
 		self.targValuesWithObjFuncts = targValuesWithObjFuncts
 
 	def calculateObjFunction(self, calcValues):
@@ -53,5 +115,101 @@ class ObjectiveFunctionContrib(ObjectiveFunctCalculator):
 			objFunct = dictRepTargets[currAttr][1]
 			actVal = dictRepValues[currAttr]
 			totVal += objFunct(targVal,actVal)
-		
+
 		return totVal
+
+	def getPlanEntries(self):
+		dictRepTargets = vars(self.targValuesWithObjFuncts)
+		return [ObjFunctPlanEntry(key, val[0], val[1], 1.0) for key,val in dictRepTargets.items()]
+
+
+class ObjectiveFunctPlan(ObjectiveFunctCalculator):
+	""" Objective function calculator compiled from a flat list of ObjFunctPlanEntry objects. Property names, targets and weights are
+	stored once as arrays. Terms whose objFunct has an array version (npKernel attribute; see obj_functs_targ_vals.createSimpleTargValObjFunction)
+	are evaluated with one numpy call per kernel type, the rest are evaluated one at a time.
+
+	calcValues can be a SimpleNamespace or a PropertyVector; in the latter case values are gathered straight from its array
+	"""
+
+	supportsPropertyVector = True
+
+	def __init__(self, planEntries:"iter of ObjFunctPlanEntry"):
+		self._entries = tuple(planEntries)
+		self._props = tuple([x.prop for x in self._entries])
+		self._weights = np.array([x.weight for x in self._entries], dtype=float)
+		self._vectGroups, self._scalarIdxs = self._getVectorisedGroupsAndScalarIndices()
+		self._slotIdxCache = (None, None) #(propNames of the PropertyVector, slot indices for each vectorised group)
+
+	@property
+	def props(self):
+		return list(self._props)
+
+	def _getVectorisedGroupsAndScalarIndices(self):
+		groupedIdxs, outScalarIdxs = collections.OrderedDict(), list()
+		for idx,entry in enumerate(self._entries):
+			kernelKey = getattr(entry.objFunct, "kernelKey", None)
+			npKernel = getattr(entry.objFunct, "npKernel", None)
+			if (npKernel is None) or (kernelKey is None) or (not _isRealNumber(entry.targVal)):
+				outScalarIdxs.append(idx)
+			else:
+				groupedIdxs.setdefault(kernelKey, list()).append(idx)
+
+		outGroups = list()
+		for idxs in groupedIdxs.values():
+			targVals = np.array([self._entries[x].targVal for x in idxs], dtype=float)
+			npKernel = self._entries[idxs[0]].objFunct.npKernel
+			outGroups.append( (np.array(idxs), targVals, npKernel) )
+
+		return outGroups, outScalarIdxs
+
+	def calculateObjFunction(self, calcValues):
+		groupActVals = None
+		if isinstance(calcValues, PropertyVector):
+			groupActVals = self._getGroupActValsFromPropertyVector(calcValues)
+			if groupActVals is None:
+				calcValues = calcValues.asNamespace() #Some values arent in slots, so cant be gathered from the array
+
+		if groupActVals is not None:
+			getActVal = lambda idx: calcValues.getValue(self._props[idx])
+		else:
+			dictRepValues = vars(calcValues)
+			groupActVals = [np.array([dictRepValues[self._props[x]] for x in group[0]], dtype=float) for group in self._vectGroups]
+			getActVal = lambda idx: dictRepValues[self._props[idx]]
+
+		contribs = np.zeros( len(self._entries) )
+		for (idxs, targVals, npKernel), currActVals in it.zip_longest(self._vectGroups, groupActVals):
+			currContribs = npKernel(targVals, currActVals)
+			contribs[idxs] = currContribs
+
+			#Non-finite outputs from finite inputs mean an overflow (or similar); use the scalar function to get the exact error handling
+			needScalar = ~np.isfinite(currContribs) & np.isfinite(targVals) & np.isfinite(currActVals)
+			for pos in np.nonzero(needScalar)[0]:
+				entryIdx = idxs[pos]
+				contribs[entryIdx] = self._entries[entryIdx].objFunct(self._entries[entryIdx].targVal, getActVal(entryIdx))
+
+		for idx in self._scalarIdxs:
+			contribs[idx] = self._entries[idx].objFunct(self._entries[idx].targVal, getActVal(idx))
+
+		return float( np.dot(self._weights, contribs) )
+
+	def _getGroupActValsFromPropertyVector(self, propVector):
+		""" Returns None if any of the plan properties dont have a slot in propVector """
+		cachedNames, slotIdxs = self._slotIdxCache
+		if cachedNames is not propVector.propNames:
+			if set(self._props).issubset(propVector.propNames):
+				slotIdxs = [propVector.getSlotIndices([self._props[x] for x in group[0]]) for group in self._vectGroups]
+			else:
+				slotIdxs = None
+			self._slotIdxCache = (propVector.propNames, slotIdxs)
+
+		if slotIdxs is None:
+			return None
+		return [propVector.getValuesAtSlots(x) for x in slotIdxs]
+
+	def getPlanEntries(self):
+		return list(self._entries)
+
+
+def _isRealNumber(val):
+	return isinstance(val, numbers.Real) and not isinstance(val, bool)
+
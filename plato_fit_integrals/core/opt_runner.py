@@ -1,29 +1,459 @@
 
 
 """ Code to actually run the optimisation """
+import asyncio
+import collections
+import threading
 from types import SimpleNamespace
-from scipy.optimize import minimize
+
+import numpy as np
+
+import plato_fit_integrals.core.convergence_monitor as convMonitor
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.obj_funct_calculator as objCalculators
+import plato_fit_integrals.core.surrogate_models as surrogateModels
+import plato_fit_integrals.core.table_checks as tableChecks
+import plato_fit_integrals.shared.lazy_imports as lazyImports
+
+scipyOpt = lazyImports.lazyImport("scipy.optimize")
+__getattr__ = lazyImports.createModuleGetAttr(__name__, {"minimize":scipyOpt, "OptimizeResult":scipyOpt})
+
+DEF_N_ABORT_STAGES = 3 #Default number of cost tiers workflows are split into when abortThreshold is set
 
 class ObjectiveFunction:
 
-	def __init__(self, coeffTableConverter, workFlowCoordinator, objFunctCalculator):
+	def __init__(self, coeffTableConverter, workFlowCoordinator, objFunctCalculator, fidelitySchedule=None, phaseTimer=None, candidateSlots=None,
+	             abortThreshold=None, abortPenalty=np.inf, infeasiblePenalty=np.inf, convergenceMonitor=None, nStages=DEF_N_ABORT_STAGES):
+		""" Callable object that maps a set of coefficients to an objective function value
+		
+		Args:
+			coeffTableConverter: CoeffsTablesConverter object; coeffs get set on this and the tables written each call
+			workFlowCoordinator: WorkFlowCoordinator object, runs calculations to get property values. Ignored (can be None) if fidelitySchedule is set
+			objFunctCalculator: ObjectiveFunctCalculator object, converts property values to an objective function value
+			fidelitySchedule(Optional): FidelitySchedule object. If set, workflows come from the schedule and are replaced by higher accuracy ones
+			                            once the fit stalls. Objective function values are cached for each fidelity level, so repeated coeffs
+			                            dont trigger new calculations
+			phaseTimer(Optional): PhaseTimer object (see core.instrumentation) to record how long each part of an evaluation takes. It is also
+			                      passed to the coeffTableConverter and workFlowCoordinator. Can be set later via the phaseTimer attribute
+			candidateSlots(Optional): list of CandidateSlot objects (see core.candidate_slots). evaluateAsync uses these to evaluate up to
+			                          len(candidateSlots) sets of coeffs at once, each in its own folders. Without them, evaluateAsync
+			                          runs one evaluation at a time using coeffTableConverter/workFlowCoordinator
+			abortThreshold(Optional): If set, workflows are run in stages, cheapest first (see WorkFlowCoordinator.runInStages), and an
+			                          evaluation is abandoned once the objective function from the finished stages exceeds this. Needs
+			                          every objective function term to be non-negative and objFunctCalculator to implement getPlanEntries
+			                          (else all workflows are run as normal). Usually set (via the attribute) by the optimiser
+			abortPenalty: Value returned for abandoned evaluations
+			infeasiblePenalty: Value returned (without running any workflows) when the tables fail the converters tableChecks (see
+			                   core.table_checks)
+			convergenceMonitor(Optional): ConvergenceMonitor object (see core.convergence_monitor) updated on each call. Once it detects
+			                              stagnation, StagnationStop is raised (once) to stop the optimiser. Not updated by evaluateAsync
+			nStages: Max number of stages (cost tiers) workflows are split into when abortThreshold is set. More stages mean earlier aborts
+			         but fewer jobs from different workflows running at once. None means one stage per workflow
+
+		Raises:
+			ValueError: If both fidelitySchedule and candidateSlots are set
+		"""
 		self.coeffTableConverter = coeffTableConverter
 		self.workFlowCoordinator = workFlowCoordinator
 		self.objFunctCalculator = objFunctCalculator
+		self.fidelitySchedule = fidelitySchedule
+		self.abortThreshold = abortThreshold
+		self.abortPenalty = abortPenalty
+		self.infeasiblePenalty = infeasiblePenalty
+		self.convergenceMonitor = convergenceMonitor
+		self.nStages = nStages
+		self._partialPlans, self._partialPlansCalculator = dict(), None #frozenset(pendingProps): ObjectiveFunctPlan for the finished workflows
+		self._evalCache = dict()
+		self._iterLock = threading.Lock()
+		self._nInFlight = 0 #Number of candidate slot evaluations running
+		self._freeSlots, self._freeSlotsLoop = None, None
+
+		if (fidelitySchedule is not None) and (candidateSlots is not None):
+			raise ValueError("candidateSlots cant currently be combined with a fidelitySchedule")
+		self.candidateSlots = list(candidateSlots) if candidateSlots is not None else None
+
+		if self.fidelitySchedule is not None:
+			self.workFlowCoordinator = self.fidelitySchedule.workFlowCoordinator
+
+		self.phaseTimer = phaseTimer if phaseTimer is not None else instrumentation.NULL_PHASE_TIMER
+
+	@property
+	def phaseTimer(self):
+		return self._phaseTimer
+
+	@phaseTimer.setter
+	def phaseTimer(self, val):
+		self._phaseTimer = val
+		slotObjs = list()
+		for slot in (self.candidateSlots or list()):
+			slotObjs.extend( [slot.coeffTableConverter, slot.workFlowCoordinator] )
+		for x in [self.coeffTableConverter, self.workFlowCoordinator] + slotObjs:
+			if hasattr(x, "phaseTimer"):
+				x.phaseTimer = val
+
+	def __call__(self, coeffs, useCache=True):
+		objFunctVal = self._evaluateWithCache(coeffs, useCache=useCache)
+		if (self.convergenceMonitor is not None) and self.convergenceMonitor.update(coeffs, objFunctVal):
+			raise self.convergenceMonitor.getStagnationStop(objFunctVal)
+		return objFunctVal
+
+	def _evaluateWithCache(self, coeffs, useCache=True):
+		""" __call__ without updating the convergenceMonitor """
+		cacheKey = self._getEvalCacheKey(coeffs)
+		if useCache and (cacheKey in self._evalCache):
+			self.coeffTableConverter.coeffs = coeffs
+			return self._evalCache[cacheKey]
+
+		self._phaseTimer.startIteration()
+		objFunctVal, aborted = self._runEvaluation(self.coeffTableConverter, self.workFlowCoordinator, coeffs)
+		self._phaseTimer.endIteration()
+
+		if (cacheKey is not None) and (not aborted): #Aborted values depend on the threshold at the time, so arent re-used
+			self._evalCache[cacheKey] = objFunctVal
+			self._updateFidelity(objFunctVal)
+
+		return objFunctVal
+
+	def _runEvaluation(self, coeffTableConverter, workFlowCoordinator, coeffs):
+		""" Returns (objFunctVal, aborted); aborted is True for evaluations abandoned early or rejected as infeasible """
+		with self._phaseTimer.timePhase("evaluation"):
+			with self._phaseTimer.timePhase("set_coeffs"):
+				coeffTableConverter.coeffs = coeffs
+			try:
+				coeffTableConverter.writeTables()
+			except tableChecks.InfeasibleTablesError:
+				return self.infeasiblePenalty, True
+			with self._phaseTimer.timePhase("run_workflows"):
+				if self._canRunInStages(workFlowCoordinator):
+					abortThreshold = self.abortThreshold
+					stopFunct = lambda propStore, pendingProps: self._getPartialObjFunctVal(propStore, pendingProps) > abortThreshold
+					if not workFlowCoordinator.runInStages(stopFunct, nStages=self.nStages):
+						self._phaseTimer.incrementCounter("aborted_evaluations")
+						return self.abortPenalty, True
+					calcValues = workFlowCoordinator.propertyStore
+					if not getattr(self.objFunctCalculator, "supportsPropertyVector", False):
+						calcValues = calcValues.asNamespace()
+				elif getattr(self.objFunctCalculator, "supportsPropertyVector", False):
+					calcValues = workFlowCoordinator.runAndGetPropertyVector()
+				else:
+					calcValues = workFlowCoordinator.runAndGetPropertyValues()
+			with self._phaseTimer.timePhase("calc_obj_funct"):
+				objFunctVal = self.objFunctCalculator.calculateObjFunction(calcValues)
+		return objFunctVal, False
+
+	def _canRunInStages(self, workFlowCoordinator):
+		if (self.abortThreshold is None) or (not hasattr(workFlowCoordinator, "runInStages")):
+			return False
+		try:
+			self._getPartialPlan(frozenset())
+		except (AttributeError, NotImplementedError): #Calculator cant be split into per-property terms
+			return False
+		return True
+
+	def _getPartialObjFunctVal(self, propertyStore, pendingProps):
+		""" Objective function from the terms not involving pendingProps; a lower bound on the full value for non-negative terms """
+		return self._getPartialPlan(frozenset(pendingProps)).calculateObjFunction(propertyStore)
+
+	def _getPartialPlan(self, pendingProps:"frozenset"):
+		if self._partialPlansCalculator is not self.objFunctCalculator:
+			self._partialPlans, self._partialPlansCalculator = dict(), self.objFunctCalculator
+		if pendingProps not in self._partialPlans:
+			planEntries = self.objFunctCalculator.getPlanEntries()
+			self._partialPlans[pendingProps] = objCalculators.ObjectiveFunctPlan([x for x in planEntries if x.prop not in pendingProps])
+		return self._partialPlans[pendingProps]
+
+	async def evaluateAsync(self, coeffs):
+		""" Coroutine version of __call__, for optimisers that keep several candidates in flight (e.g. pattern search, parallel line
+		searches). Each evaluation runs in a worker thread using a free candidate slot (waiting for one if all are busy), so one
+		candidate can write tables/parse output while plato runs for another. Tables/property values left in coeffTableConverter
+		and workFlowCoordinator are NOT updated when slots are used; call the object directly with the chosen coeffs at the end
+
+		Args:
+			coeffs: iter of coefficients, same format as for __call__
+
+		Returns
+			objFunctVal: The objective function value for coeffs
+		"""
+		freeSlots = self._getFreeSlotsQueue()
+		slot = await freeSlots.get()
+		try:
+			return await asyncio.get_running_loop().run_in_executor(None, self._evaluateInSlot, slot, coeffs)
+		finally:
+			freeSlots.put_nowait(slot)
 
-	def __call__(self, coeffs):
-		self.coeffTableConverter.coeffs = coeffs
-		self.coeffTableConverter.writeTables()
-		calcValues = self.workFlowCoordinator.runAndGetPropertyValues()
-		objFunctVal = self.objFunctCalculator.calculateObjFunction(calcValues)
+	evaluate_async = evaluateAsync
+
+	def _getFreeSlotsQueue(self):
+		#asyncio queues belong to one event loop, so a new one is made if we're called from a different loop (e.g. separate asyncio.run calls)
+		currLoop = asyncio.get_running_loop()
+		if self._freeSlotsLoop is not currLoop:
+			self._freeSlots, self._freeSlotsLoop = asyncio.Queue(), currLoop
+			for slot in (self.candidateSlots if self.candidateSlots is not None else [None]):
+				self._freeSlots.put_nowait(slot)
+		return self._freeSlots
+
+	def _evaluateInSlot(self, slot, coeffs):
+		if slot is None: #Only one evaluation at a time in this case
+			return self._evaluateWithCache(coeffs)
+		#Iteration records hold phases from any candidates in flight, so are approximate when slots are used. We only start a new
+		#record when nothing is in flight, since startIteration() would otherwise discard phases from the other candidates
+		with self._iterLock:
+			if self._nInFlight == 0:
+				self._phaseTimer.startIteration()
+			self._nInFlight += 1
+		try:
+			objFunctVal, aborted = self._runEvaluation(slot.coeffTableConverter, slot.workFlowCoordinator, coeffs)
+		finally:
+			with self._iterLock:
+				self._nInFlight -= 1
+				self._phaseTimer.endIteration()
 		return objFunctVal
 
+	async def evaluateManyAsync(self, allCoeffs):
+		""" Evaluate several sets of coeffs concurrently (limited by the number of candidate slots). Returns values in the same order """
+		return list( await asyncio.gather(*[self.evaluateAsync(x) for x in allCoeffs]) )
+
+	def evaluateBatch(self, allCoeffs):
+		""" Blocking version of evaluateManyAsync; cant be called from inside a running event loop """
+		return asyncio.run( self.evaluateManyAsync(allCoeffs) )
+
+	def _getEvalCacheKey(self, coeffs):
+		#Only cache when using a fidelity schedule; keys include the fidelity level so values from lower levels are never re-used
+		if self.fidelitySchedule is None:
+			return None
+		return ( self.fidelitySchedule.levelIdx, tuple([float(x) for x in coeffs]) )
+
+	def _updateFidelity(self, objFunctVal):
+		promoted = self.fidelitySchedule.updateWithObjVal(objFunctVal)
+		if promoted:
+			self.workFlowCoordinator = self.fidelitySchedule.workFlowCoordinator
+			self.phaseTimer = self._phaseTimer
+			if self.convergenceMonitor is not None: #Values from lower fidelity levels arent comparable with new ones
+				self.convergenceMonitor.reset()
+
 
 #Mainly for initial testing
 def carryOutOptimisationBasicOptions(objectiveFunct,method=None, **kwargs):
-	fitRes = minimize(objectiveFunct, objectiveFunct.coeffTableConverter.coeffs,method=method, **kwargs)
-	objectiveFunct(fitRes.x) #Run once more to get the optimised parameters. Should also writeTables as a side-effect	
+	_resetConvergenceMonitor(objectiveFunct)
+	try:
+		fitRes = scipyOpt.minimize(objectiveFunct, objectiveFunct.coeffTableConverter.coeffs,method=method, **kwargs)
+	except convMonitor.StagnationStop as stopExc:
+		fitRes = scipyOpt.OptimizeResult(x=stopExc.bestCoeffs, fun=stopExc.bestVal, nfev=stopExc.nEvals, success=True, message=str(stopExc))
+	objectiveFunct(fitRes.x, useCache=False) #Run once more to get the optimised parameters. Should also writeTables as a side-effect	
 	output = SimpleNamespace(optRes=fitRes, calcVals=objectiveFunct.workFlowCoordinator.propertyValues )
 	objectiveFunct.coeffTableConverter.writeTables() #Most likely redundant
 	return output
 
+
+def carryOutOptimisationSurrogateAssisted(objectiveFunct, maxEvals=50, nInitPoints=None, initStepSize=0.1, surrogate="gp", nCandidates=500,
+                                          explorationWeight=1.0, minStepSize=1e-4, seed=0, abortFactor=None, maxStepSize=None):
+	""" Minimises objectiveFunct using a cheap surrogate model fitted to all evaluations so far. Each iteration samples many candidates around the
+	best point (within a trust region), ranks them on the surrogate and only evaluates the most promising one with objectiveFunct. The trust region
+	grows when this improves on the best value and shrinks when it doesnt. Also stops early if objectiveFunct.convergenceMonitor detects stagnation.
+	
+	Args:
+		objectiveFunct: ObjectiveFunction object. Starting coefficients are taken from objectiveFunct.coeffTableConverter.coeffs
+		maxEvals: Maximum number of calls to objectiveFunct (excluding the final call to write the best tables)
+		nInitPoints: Number of random points (as well as the start point) evaluated before the surrogate is first used. Default is nCoeffs+1
+		initStepSize: Initial trust-region size, relative to max(abs(coeff),1) for each coefficient
+		surrogate: "gp" (GaussianProcessSurrogate) or "quadratic" (QuadraticSurrogate); or any object with the SurrogateModelBase interface
+		nCandidates: Number of candidate points ranked on the surrogate each iteration
+		explorationWeight: Candidates are ranked on (predicted value - explorationWeight*predicted uncertainty)
+		minStepSize: Stop once the relative trust-region size falls below this
+		seed: Seed for the random number generator, so fits are repeatable
+		abortFactor(Optional): If set, candidates are abandoned once their partial objective function exceeds abortFactor times the best
+		                       value so far (see ObjectiveFunction abortThreshold)
+		maxStepSize(Optional): The trust region never grows beyond this (relative size). Default is 16*initStepSize
+
+	Returns
+		output: SimpleNamespace with optRes (scipy OptimizeResult, same as carryOutOptimisationBasicOptions; stepSize is the final
+		        trust-region size) and calcVals (property values at the best coefficients). The best coefficients are written to the tables
+	
+	Raises:
+		ValueError: If surrogate is an unrecognised string or maxEvals < 1
+	"""
+	if maxEvals < 1:
+		raise ValueError("maxEvals must be at least 1, not {}".format(maxEvals))
+	maxStepSize = 16*initStepSize if maxStepSize is None else maxStepSize
+	_resetConvergenceMonitor(objectiveFunct)
+	surrogateModel = _getSurrogateModelFromInput(surrogate)
+	randGen = np.random.RandomState(seed)
+	startCoeffs = np.array(objectiveFunct.coeffTableConverter.coeffs, dtype=float)
+	nCoeffs = len(startCoeffs)
+	nInitPoints = nCoeffs+1 if nInitPoints is None else nInitPoints
+	coeffScales = np.maximum(np.abs(startCoeffs), 1.0)
+	stepSize = initStepSize
+
+	#Initial design; the start point plus random points around it
+	initCoeffs = [startCoeffs] + [startCoeffs + stepSize*coeffScales*randGen.uniform(-1,1,nCoeffs) for x in range(nInitPoints)]
+	allCoeffs, allVals = list(), list()
+	def _evaluate(coeffs):
+		allCoeffs.append(coeffs) #Before evaluating, so coeffs that trigger a StagnationStop are recorded too
+		allVals.append( objectiveFunct(coeffs) )
+
+	nIters, stopMessage = 0, None
+	startThreshold = objectiveFunct.abortThreshold if abortFactor is not None else None
+	try:
+		for coeffs in initCoeffs[:maxEvals]:
+			_evaluate(coeffs)
+
+		while (len(allVals) < maxEvals) and (stepSize >= minStepSize):
+			nIters += 1
+			bestIdx = int(np.argmin(allVals))
+			bestCoeffs, bestVal = allCoeffs[bestIdx], allVals[bestIdx]
+
+			surrogateModel.fit(np.array(allCoeffs)/coeffScales, allVals)
+			candidates = bestCoeffs + stepSize*coeffScales*randGen.normal(0,1,(nCandidates,nCoeffs))
+			candidates = _getFeasibleCandidates(objectiveFunct.coeffTableConverter, candidates)
+			predMeans, predStds = surrogateModel.predict(candidates/coeffScales)
+			nextCoeffs = candidates[ int(np.argmin(predMeans - explorationWeight*predStds)) ]
+
+			if (abortFactor is not None) and np.isfinite(bestVal):
+				objectiveFunct.abortThreshold = abortFactor*bestVal
+			_evaluate(nextCoeffs)
+
+			if allVals[-1] < bestVal:
+				stepSize = min(2.0*stepSize, maxStepSize)
+			else:
+				stepSize *= 0.5
+	except convMonitor.StagnationStop as stopExc:
+		allVals.append(stopExc.lastVal)
+		stopMessage = str(stopExc)
+	finally:
+		if abortFactor is not None:
+			objectiveFunct.abortThreshold = startThreshold
+
+	bestIdx = int(np.argmin(allVals))
+	objectiveFunct(allCoeffs[bestIdx], useCache=False) #Makes sure the tables/property values correspond to the best coeffs, not the last ones tried
+	message = "Trust region below minStepSize" if stepSize < minStepSize else "Maximum number of evaluations reached"
+	message = stopMessage if stopMessage is not None else message
+	fitRes = scipyOpt.OptimizeResult(x=np.array(allCoeffs[bestIdx]), fun=allVals[bestIdx], nfev=len(allVals), nit=nIters, success=True, message=message,
+	                        allCoeffs=np.array(allCoeffs), allVals=np.array(allVals), stepSize=stepSize)
+	output = SimpleNamespace(optRes=fitRes, calcVals=objectiveFunct.workFlowCoordinator.propertyValues)
+	return output
+
+
+CoeffBlock = collections.namedtuple("CoeffBlock", ["label", "coeffIndices", "speciesSets"])
+CoeffBlock.__doc__ = """ Coefficients optimised together by carryOutOptimisationBlockCoordinate. speciesSets has one set of chemical symbols per
+integral table the coefficients affect; workflows need re-running if they depend on any of them """
+
+
+def getCoeffBlocksFromConverter(coeffTableConverter):
+	""" Get one CoeffBlock per integral table (IntegralTableInfo) in coeffTableConverter
+
+	Args:
+		coeffTableConverter: CoeffsTablesConverter (or TiedCoeffsTablesConverter) object
+
+	Returns
+		blocks: list of CoeffBlock objects. Tables sharing coefficients (via tying) give blocks whose speciesSets cover all those tables
+	"""
+	indicesPerTable = coeffTableConverter.getCoeffIndicesPerTable()
+	outBlocks = list()
+	for integInfo, coeffIndices in indicesPerTable:
+		affectedInfos = [info for info,indices in indicesPerTable if len(np.intersect1d(indices,coeffIndices))>0]
+		speciesSets = list()
+		for info in affectedInfos:
+			currSpecies = frozenset([info.atomA, info.atomB])
+			if currSpecies not in speciesSets:
+				speciesSets.append(currSpecies)
+		outBlocks.append( CoeffBlock(_getLabelForIntegInfo(integInfo), np.array(coeffIndices), speciesSets) )
+	return outBlocks
+
+
+def _getLabelForIntegInfo(integInfo):
+	labelParts = [integInfo.integStr, integInfo.atomA, integInfo.atomB]
+	labelParts += [str(x) for x in [integInfo.shellA, integInfo.shellB, integInfo.axAngMom] if x is not None]
+	return "_".join(labelParts)
+
+
+def getDependentWorkFlowIndices(workFlowCoordinator, block):
+	""" Indices of workflows in workFlowCoordinator whose results can change when the coefficients in block change """
+	outIndices = set()
+	for species in block.speciesSets:
+		outIndices.update( workFlowCoordinator.getWorkFlowIndicesDependingOnSpecies(species) )
+	return sorted(outIndices)
+
+
+def carryOutOptimisationBlockCoordinate(objectiveFunct, blocks=None, maxSweeps=3, method="Nelder-Mead", ftol=1e-6, **kwargs):
+	""" Minimises objectiveFunct one block of coefficients at a time (e.g. the Si-Si pair potential, then Si-C hopping). While a block is
+	optimised only the workflows that depend on it (see WorkFlowCoordinator.getWorkFlowIndicesDependingOnSpecies) are re-run; the rest
+	keep their outputs from earlier evaluations. Also stops early if objectiveFunct.convergenceMonitor detects stagnation.
+
+	Args:
+		objectiveFunct: ObjectiveFunction object. Starting coefficients are taken from objectiveFunct.coeffTableConverter.coeffs
+		blocks(Optional): list of CoeffBlock objects. Default is one block per integral table (see getCoeffBlocksFromConverter)
+		maxSweeps: Maximum number of passes over all blocks
+		method: scipy.optimize.minimize method used for each block
+		ftol: Stop once a full sweep improves the objective function by less than this
+		kwargs: Passed to scipy.optimize.minimize for each block (e.g. options={"maxiter":20})
+
+	Returns
+		output: SimpleNamespace with optRes (scipy OptimizeResult; nit is the number of sweeps) and calcVals (property values at the best
+		        coefficients). The best coefficients are written to the tables
+	"""
+	blocks = getCoeffBlocksFromConverter(objectiveFunct.coeffTableConverter) if blocks is None else blocks
+	bestCoeffs = np.array(objectiveFunct.coeffTableConverter.coeffs, dtype=float)
+	nCalls, nSweeps, stopMessage = 0, 0, None
+	_resetConvergenceMonitor(objectiveFunct)
+
+	def _evalWithActiveWorkFlows(coeffs, activeIndices, useCache=True):
+		nonlocal nCalls
+		nCalls += 1
+		objectiveFunct.workFlowCoordinator.activeWorkFlowIndices = activeIndices #Set every call since a fidelity schedule can swap the coordinator
+		return objectiveFunct(coeffs, useCache=useCache)
+
+	try:
+		bestVal = _evalWithActiveWorkFlows(bestCoeffs, None)
+		for sweepIdx in range(maxSweeps):
+			nSweeps += 1
+			startVal = bestVal
+			for block in blocks:
+				activeIndices = getDependentWorkFlowIndices(objectiveFunct.workFlowCoordinator, block)
+				def _blockFunct(blockCoeffs, block=block, activeIndices=activeIndices):
+					currCoeffs = np.array(bestCoeffs)
+					currCoeffs[block.coeffIndices] = blockCoeffs
+					return _evalWithActiveWorkFlows(currCoeffs, activeIndices)
+				blockRes = scipyOpt.minimize(_blockFunct, bestCoeffs[block.coeffIndices], method=method, **kwargs)
+				if blockRes.fun < bestVal:
+					bestCoeffs[block.coeffIndices] = blockRes.x
+					bestVal = blockRes.fun
+				#Dependent workflows must hold outputs for bestCoeffs (not the last ones tried) before other blocks re-use them; a cached
+				#value would skip running them
+				_evalWithActiveWorkFlows(bestCoeffs, activeIndices, useCache=False)
+			if startVal - bestVal < ftol:
+				break
+	except convMonitor.StagnationStop as stopExc:
+		bestCoeffs, bestVal, stopMessage = stopExc.bestCoeffs, stopExc.bestVal, str(stopExc)
+	finally:
+		objectiveFunct.workFlowCoordinator.activeWorkFlowIndices = None
+
+	objectiveFunct(bestCoeffs, useCache=False)
+	message = "Sweep improvement below ftol" if nSweeps < maxSweeps else "Maximum number of sweeps reached"
+	message = stopMessage if stopMessage is not None else message
+	fitRes = scipyOpt.OptimizeResult(x=bestCoeffs, fun=bestVal, nfev=nCalls, nit=nSweeps, success=True, message=message,
+	                                 blockLabels=[x.label for x in blocks])
+	output = SimpleNamespace(optRes=fitRes, calcVals=objectiveFunct.workFlowCoordinator.propertyValues)
+	return output
+
+
+def _resetConvergenceMonitor(objectiveFunct):
+	if getattr(objectiveFunct, "convergenceMonitor", None) is not None:
+		objectiveFunct.convergenceMonitor.reset()
+
+
+def _getFeasibleCandidates(coeffTableConverter, candidates):
+	#Cheap screening with the converters tableChecks (if any); all candidates are kept if none are feasible
+	if len(getattr(coeffTableConverter, "tableChecks", list())) == 0:
+		return candidates
+	infeasible = tableChecks.getInfeasibleCandidates(coeffTableConverter, candidates)
+	return candidates[~infeasible] if not np.all(infeasible) else candidates
+
+
+def _getSurrogateModelFromInput(surrogate):
+	if not isinstance(surrogate,str):
+		return surrogate
+	surrogateDict = {"gp":surrogateModels.GaussianProcessSurrogate, "quadratic":surrogateModels.QuadraticSurrogate}
+	try:
+		return surrogateDict[surrogate.lower()]()
+	except KeyError:
+		raise ValueError("{} is an invalid option for surrogate; options are {}".format(surrogate, list(surrogateDict.keys())))
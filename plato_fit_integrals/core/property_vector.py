@@ -0,0 +1,120 @@
+
+import numbers
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class PropertyVector():
+	""" Stores calculated property values in a preallocated float array, with a name-to-slot index fixed at creation.
+	Values that arent single numbers (e.g. lists of energies) are kept separately but are accessed the same way.
+
+	Attribute access (e.g. propVector.hcp_v0) works as for the SimpleNamespace objects used elsewhere, and asNamespace() gives a
+	SimpleNamespace copy for code that needs one.
+
+	Attributes (incl. @properties):
+		propNames (tuple): Names of all properties with a slot, in slot order
+		values (np.array): The underlying float array. Slots holding non-numeric values (or not yet set) contain NaN
+
+	"""
+
+	def __init__(self, propNames:"iter of str"):
+		propNames = tuple(propNames)
+		if len(set(propNames)) != len(propNames):
+			raise ValueError("Duplicate property names passed to PropertyVector: {}".format(propNames))
+		self._propNames = propNames
+		self._slotIdxs = {name:idx for idx,name in enumerate(propNames)}
+		self._values = np.full( len(propNames), np.nan )
+		self._isSet = np.zeros( len(propNames), dtype=bool )
+		self._objVals = dict() #Non-numeric values, plus any values without a slot
+
+	@property
+	def propNames(self):
+		return self._propNames
+
+	@property
+	def values(self):
+		return self._values
+
+	def getSlotIndex(self, propName):
+		return self._slotIdxs[propName]
+
+	def getSlotIndices(self, propNames):
+		return np.array([self._slotIdxs[x] for x in propNames], dtype=int)
+
+	def setValue(self, propName, value):
+		slotIdx = self._slotIdxs.get(propName, None)
+		if slotIdx is None:
+			self._objVals[propName] = value
+			return None
+
+		if _isRealNumber(value):
+			self._values[slotIdx] = value
+			self._objVals.pop(propName, None)
+		else:
+			self._values[slotIdx] = np.nan
+			self._objVals[propName] = value
+		self._isSet[slotIdx] = True
+
+	def setValuesFromNamespace(self, nSpace:"types.SimpleNamespace"):
+		""" Copy all fields of nSpace into this object (in place). Fields without a slot are still stored """
+		for key,val in vars(nSpace).items():
+			self.setValue(key, val)
+
+	def getValue(self, propName):
+		if propName in self._objVals:
+			return self._objVals[propName]
+		try:
+			slotIdx = self._slotIdxs[propName]
+		except KeyError:
+			raise AttributeError("No property named {}".format(propName))
+		if not self._isSet[slotIdx]:
+			raise AttributeError("Property {} has not been set".format(propName))
+		return float(self._values[slotIdx])
+
+	def getValuesAtSlots(self, slotIdxs):
+		""" Get a float array of values at the requested slot indices (e.g. from getSlotIndices)"""
+		return self._values[slotIdxs]
+
+	def reset(self, propNames=None):
+		""" Unset the values of propNames (default is all properties), so reading them raises AttributeError until set again """
+		if propNames is None:
+			self._values[:] = np.nan
+			self._isSet[:] = False
+			self._objVals = dict()
+			return None
+
+		for name in propNames:
+			slotIdx = self._slotIdxs.get(name, None)
+			if slotIdx is not None:
+				self._values[slotIdx] = np.nan
+				self._isSet[slotIdx] = False
+			self._objVals.pop(name, None)
+
+	def asNamespace(self):
+		""" SimpleNamespace containing all values which have been set """
+		outDict = dict()
+		for name,idx in self._slotIdxs.items():
+			if name in self._objVals:
+				outDict[name] = self._objVals[name]
+			elif self._isSet[idx]:
+				outDict[name] = float(self._values[idx])
+		for name,val in self._objVals.items():
+			outDict[name] = val
+		return SimpleNamespace(**outDict)
+
+	def __getattr__(self, name):
+		#Only called for names not found the normal way; avoid recursion when internal attrs dont exist yet (e.g. during copying)
+		if name.startswith("_"):
+			raise AttributeError(name)
+		return self.getValue(name)
+
+	def __eq__(self, other):
+		if isinstance(other, PropertyVector):
+			other = other.asNamespace()
+		return self.asNamespace() == other
+
+
+def _isRealNumber(val):
+	return isinstance(val, numbers.Real) and not isinstance(val, bool)
+
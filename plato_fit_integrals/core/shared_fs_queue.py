@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+""" Work queue on a shared filesystem, for running plato jobs across several nodes. The coordinator (via SharedFsQueueExecutor)
+writes one json descriptor per job into queueFolder/pending. Worker processes, started on any host that can see queueFolder, claim
+jobs by renaming them into queueFolder/claimed (rename is atomic, so each job is claimed by exactly one worker), run them, then
+write a result file to queueFolder/done. Workers touch their claimed file while a job runs; claims not touched for leaseTime seconds
+(i.e. the worker died) are put back into pending by the coordinator. Start a worker with
+
+	python -m plato_fit_integrals.core.shared_fs_queue /path/to/queue_folder
+
+and stop all workers using a queue folder by calling stopQueueWorkers (which creates a STOP file in the queue folder) """
+
+import argparse
+import contextlib
+import itertools as it
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import plato_fit_integrals.core.job_executors as jobExecutors
+
+
+STOP_FILE_NAME = "STOP"
+DEF_LEASE_TIME = 120.0 #seconds without a heartbeat before a claimed job is requeued
+DEF_HEARTBEAT_INTERVAL = 10.0 #seconds between workers touching the files for jobs they are running
+_SUB_FOLDERS = ("pending", "claimed", "done")
+
+
+class SharedFsQueueExecutor(jobExecutors.JobExecutorBase):
+	""" Executor which runs shell commands by putting them on a shared-filesystem queue (see module docstring). Post-processing
+	functions are run locally, in serial.
+
+	Attributes (incl. @properties):
+		queueFolder (str): Folder holding the queue; needs to be visible to all workers
+		pollInterval (float): Time (s) between checks for finished jobs
+		waitTimeout (float): Max time (s) to wait for a batch of jobs; None means wait forever
+		leaseTime (float): Jobs claimed by a worker which hasnt sent a heartbeat for this long (s) are requeued; None means never.
+		                   Needs to be well above the workers heartbeat interval (and any clock differences between hosts)
+		nLocalWorkers (int): Number of worker processes to start on this machine (0 means rely on workers started elsewhere)
+		lastResults (list): Result dicts (one per job, in submission order) from the last call to runShellComms. Keys include
+		                    returnCode, worker, host and missingOutputs
+		lastFailures (list): JobFailure objects (see core.job_executors) for jobs in lastResults with a non-zero return code or
+		                     missing outputs. Failed jobs are not re-submitted
+
+	"""
+
+	def __init__(self, queueFolder, pollInterval=0.1, waitTimeout=None, nLocalWorkers=0, leaseTime=DEF_LEASE_TIME):
+		self.queueFolder = os.path.abspath(queueFolder)
+		self.pollInterval = pollInterval
+		self.waitTimeout = waitTimeout
+		self.leaseTime = leaseTime
+		self.nLocalWorkers = nLocalWorkers
+		self.lastResults = list()
+		self.lastFailures = list()
+		self._localWorkers = list()
+		createQueueFolders(self.queueFolder)
+
+	def runShellComms(self, shellComms, quiet=True):
+		""" Raises TimeoutError if waitTimeout is set and the jobs dont finish in time (unfinished jobs are left on the queue) """
+		shellComms = list(shellComms)
+		self._startLocalWorkersIfNeeded()
+		jobIds = [submitJob(self.queueFolder, x, quiet=quiet) for x in shellComms]
+		self.lastResults = waitForJobs(self.queueFolder, jobIds, pollInterval=self.pollInterval, timeout=self.waitTimeout,
+		                               leaseTime=self.leaseTime)
+		self.lastFailures = getFailuresFromResults(self.lastResults, shellComms)
+
+	def runFunctions(self, functs):
+		return [funct() for funct in functs]
+
+	def _startLocalWorkersIfNeeded(self):
+		self._localWorkers = [x for x in self._localWorkers if x.poll() is None]
+		nToStart = self.nLocalWorkers - len(self._localWorkers)
+		if nToStart > 0:
+			self._localWorkers.extend( startLocalQueueWorkers(self.queueFolder, nToStart, pollInterval=self.pollInterval) )
+
+	def close(self):
+		if len(self._localWorkers) > 0:
+			stopQueueWorkers(self.queueFolder, self._localWorkers)
+			self._localWorkers = list()
+
+
+#Queue layout
+def createQueueFolders(queueFolder):
+	for x in _SUB_FOLDERS:
+		os.makedirs(os.path.join(queueFolder, x), exist_ok=True)
+
+
+def _getSubFolder(queueFolder, subFolder):
+	return os.path.join(queueFolder, subFolder)
+
+
+def _writeJsonAtomic(outPath, outDict):
+	""" Write to a hidden temporary file then rename, so readers never see a partly written file """
+	tempPath = os.path.join( os.path.dirname(outPath), ".tmp_" + os.path.basename(outPath) )
+	with open(tempPath,"wt") as f:
+		json.dump(outDict, f)
+	os.replace(tempPath, outPath)
+
+
+def _readJson(inpPath):
+	with open(inpPath,"rt") as f:
+		return json.load(f)
+
+
+#Coordinator side
+_SUBMIT_COUNTER = it.count()
+
+def submitJob(queueFolder, shellJob:"str or ShellJob", workFolder=None, expectedOutputs=None, quiet=True):
+	""" Put a job on the queue
+
+	Args:
+		queueFolder: Folder holding the queue
+		shellJob: str or ShellJob (see core.job_executors). nCores/ompThreads from a ShellJob set OMP_NUM_THREADS for the job
+		workFolder: Folder the command is run from; defaults to the ShellJob workFolder, then the current directory. Needs to be
+		            visible to the workers
+		expectedOutputs: Paths of files the job should create (default is the ShellJob expectedOutputs); any missing after it runs
+		                 are listed in the job result
+		quiet: If True the worker discards the commands stdout/stderr
+
+	Returns
+		jobId: str, unique label for the job (used to find its result)
+	"""
+	nCores, ompThreads = 1, None
+	if isinstance(shellJob, jobExecutors.ShellJob):
+		nCores = shellJob.nCores if shellJob.nCores is not None else nCores
+		ompThreads = shellJob.ompThreads
+		workFolder = shellJob.workFolder if workFolder is None else workFolder
+		expectedOutputs = shellJob.expectedOutputs if expectedOutputs is None else expectedOutputs
+	jobId = "{:020d}_{:06d}_{}".format(time.time_ns(), next(_SUBMIT_COUNTER), uuid.uuid4().hex[:8]) #Sorting by name gives submission order
+	descriptor = {"jobId":jobId, "comm":jobExecutors.getShellCommStr(shellJob), "nCores":nCores, "ompThreads":ompThreads,
+	              "workFolder":os.path.abspath(workFolder) if workFolder is not None else os.getcwd(),
+	              "expectedOutputs":[os.path.abspath(x) for x in expectedOutputs] if expectedOutputs is not None else list(), "quiet":quiet}
+	_writeJsonAtomic( os.path.join(_getSubFolder(queueFolder,"pending"), jobId + ".json"), descriptor )
+	return jobId
+
+
+def waitForJobs(queueFolder, jobIds, pollInterval=0.1, timeout=None, leaseTime=None):
+	""" Wait for jobs to finish, then remove their result files from the queue
+
+	Args:
+		queueFolder: Folder holding the queue
+		jobIds: Ids of the jobs to wait for (from submitJob)
+		pollInterval: Time (s) between checks for finished jobs
+		timeout: Max time (s) to wait; None means wait forever
+		leaseTime: If not None, claimed jobs with no worker heartbeat for this long (s) are requeued (see requeueStaleClaims)
+
+	Returns
+		results: list of result dicts, same order as jobIds
+
+	Raises:
+		TimeoutError: If timeout (s) is not None and some jobs havent finished in time
+	"""
+	startTime, doneFolder = time.perf_counter(), _getSubFolder(queueFolder, "done")
+	outResults, remaining = dict(), set(jobIds)
+	while len(remaining) > 0:
+		for jobId in list(remaining):
+			resultPath = os.path.join(doneFolder, jobId + ".json")
+			if os.path.exists(resultPath):
+				outResults[jobId] = _readJson(resultPath)
+				os.remove(resultPath)
+				remaining.remove(jobId)
+		if len(remaining) == 0:
+			break
+		if leaseTime is not None:
+			requeueStaleClaims(queueFolder, leaseTime)
+		if (timeout is not None) and (time.perf_counter()-startTime > timeout):
+			raise TimeoutError("{} of {} queued jobs didnt finish within {} s".format(len(remaining), len(jobIds), timeout))
+		time.sleep(pollInterval)
+	return [outResults[x] for x in jobIds]
+
+
+def requeueStaleClaims(queueFolder, leaseTime):
+	""" Move claimed jobs whose worker hasnt touched them for leaseTime (s) back to pending, so another worker can run them
+
+	Returns
+		jobIds: list of the requeued job ids
+	"""
+	pendingFolder, claimedFolder = _getSubFolder(queueFolder,"pending"), _getSubFolder(queueFolder,"claimed")
+	outIds, currTime = list(), time.time()
+	for fileName in sorted(os.listdir(claimedFolder)):
+		if fileName.startswith("."):
+			continue
+		claimedPath = os.path.join(claimedFolder, fileName)
+		try:
+			if currTime - os.path.getmtime(claimedPath) < leaseTime:
+				continue
+			jobFileName = fileName.rsplit("__",1)[-1] #Claimed files are named workerLabel__jobFileName
+			os.rename(claimedPath, os.path.join(pendingFolder, jobFileName))
+		except FileNotFoundError: #Job finished (or was requeued) in the meantime
+			continue
+		outIds.append( os.path.splitext(jobFileName)[0] )
+	return outIds
+
+
+def getFailuresFromResults(results, shellComms):
+	""" Get JobFailure objects (see core.job_executors) for failed jobs, given results from waitForJobs and the submitted shellComms """
+	outFailures = list()
+	for idx,(result,shellJob) in enumerate(zip(results,shellComms)):
+		reason = "return_code" if result["returnCode"] != 0 else ("missing_outputs" if len(result["missingOutputs"])>0 else None)
+		if reason is not None:
+			outFailures.append( jobExecutors.JobFailure(idx, jobExecutors.getShellCommStr(shellJob), result["returnCode"], 1, reason) )
+	return outFailures
+
+
+#Worker side
+def runQueueWorker(queueFolder, workerLabel=None, pollInterval=0.1, maxIdleTime=None, maxJobs=None, heartbeatInterval=DEF_HEARTBEAT_INTERVAL):
+	""" Claim and run jobs from the queue until a STOP file appears in queueFolder (or a limit below is reached)
+
+	Args:
+		queueFolder: Folder holding the queue
+		workerLabel: Unique label for this worker; defaults to hostname plus process id
+		pollInterval: Time (s) to wait between checks when the queue is empty
+		maxIdleTime: If not None, exit after this long (s) with no jobs available
+		maxJobs: If not None, exit after running this many jobs
+		heartbeatInterval: Time (s) between touching the claimed file of a running job (see requeueStaleClaims)
+
+	Returns
+		nJobs: Number of jobs run
+	"""
+	workerLabel = "{}-{}".format(socket.gethostname(), os.getpid()) if workerLabel is None else workerLabel
+	createQueueFolders(queueFolder)
+	nJobs, lastJobTime = 0, time.perf_counter()
+	while not os.path.exists(os.path.join(queueFolder, STOP_FILE_NAME)):
+		if (maxJobs is not None) and (nJobs >= maxJobs):
+			break
+		claimedPath = claimNextJob(queueFolder, workerLabel)
+		if claimedPath is None:
+			if (maxIdleTime is not None) and (time.perf_counter()-lastJobTime > maxIdleTime):
+				break
+			time.sleep(pollInterval)
+			continue
+		runClaimedJob(queueFolder, claimedPath, workerLabel, heartbeatInterval=heartbeatInterval)
+		nJobs += 1
+		lastJobTime = time.perf_counter()
+	return nJobs
+
+
+def claimNextJob(queueFolder, workerLabel):
+	""" Atomically move the oldest pending job into the claimed folder. Returns the claimed path, or None if no jobs are left """
+	pendingFolder, claimedFolder = _getSubFolder(queueFolder,"pending"), _getSubFolder(queueFolder,"claimed")
+	for fileName in sorted(os.listdir(pendingFolder)):
+		if fileName.startswith("."):
+			continue
+		claimedPath = os.path.join(claimedFolder, "{}__{}".format(workerLabel, fileName))
+		try:
+			os.rename(os.path.join(pendingFolder, fileName), claimedPath)
+		except FileNotFoundError: #Another worker claimed it first
+			continue
+		with contextlib.suppress(FileNotFoundError): #Rename keeps the submission time; the lease starts now
+			os.utime(claimedPath)
+		return claimedPath
+	return None
+
+
+def runClaimedJob(queueFolder, claimedPath, workerLabel, heartbeatInterval=DEF_HEARTBEAT_INTERVAL):
+	descriptor = _readJson(claimedPath)
+	env = dict(os.environ)
+	env["OMP_NUM_THREADS"] = str(descriptor["ompThreads"] if descriptor["ompThreads"] is not None else descriptor["nCores"])
+	outStream = subprocess.DEVNULL if descriptor["quiet"] else None
+
+	startTime = time.time()
+	process = subprocess.Popen(descriptor["comm"], shell=True, cwd=descriptor["workFolder"], env=env, stdout=outStream, stderr=outStream)
+	returnCode = None
+	while returnCode is None:
+		try:
+			returnCode = process.wait(timeout=heartbeatInterval)
+		except subprocess.TimeoutExpired:
+			with contextlib.suppress(FileNotFoundError):
+				os.utime(claimedPath)
+	result = {"jobId":descriptor["jobId"], "returnCode":returnCode, "worker":workerLabel, "host":socket.gethostname(),
+	          "startTime":startTime, "endTime":time.time(), "missingOutputs":[x for x in descriptor["expectedOutputs"] if not os.path.exists(x)]}
+
+	_writeJsonAtomic( os.path.join(_getSubFolder(queueFolder,"done"), descriptor["jobId"] + ".json"), result )
+	with contextlib.suppress(FileNotFoundError): #Requeued by the coordinator while we were running it
+		os.remove(claimedPath)
+	return result
+
+
+#Local stand-in for a multi-node setup
+def startLocalQueueWorkers(queueFolder, nWorkers, pollInterval=0.1):
+	""" Start nWorkers worker processes on this machine. Removes any existing STOP file first. Returns list of Popen objects """
+	createQueueFolders(queueFolder)
+	with contextlib.suppress(FileNotFoundError):
+		os.remove(os.path.join(queueFolder, STOP_FILE_NAME))
+	packageFolder = os.path.abspath( os.path.join(os.path.dirname(__file__), "..", "..") )
+	env = dict(os.environ)
+	env["PYTHONPATH"] = packageFolder + os.pathsep + env.get("PYTHONPATH","")
+	runComm = [sys.executable, "-m", "plato_fit_integrals.core.shared_fs_queue", queueFolder, "--poll-interval", str(pollInterval)]
+	return [subprocess.Popen(runComm, env=env) for x in range(nWorkers)]
+
+
+def stopQueueWorkers(queueFolder, localWorkers=None, timeout=10.0):
+	""" Tell all workers on queueFolder to stop once their current job finishes, and wait for any localWorkers (Popen objects) to exit """
+	with open(os.path.join(queueFolder, STOP_FILE_NAME),"wt") as f:
+		f.write("stop\n")
+	for x in (localWorkers or list()):
+		try:
+			x.wait(timeout=timeout)
+		except subprocess.TimeoutExpired:
+			x.kill()
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Worker that runs plato jobs from a shared-filesystem queue")
+	parser.add_argument("queueFolder", help="Folder holding the queue")
+	parser.add_argument("--worker-label", dest="workerLabel", default=None, help="Unique label for this worker (default=hostname-pid)")
+	parser.add_argument("--poll-interval", dest="pollInterval", type=float, default=0.1, help="Time (s) between checks of an empty queue")
+	parser.add_argument("--max-idle-time", dest="maxIdleTime", type=float, default=None, help="Exit after this long (s) with no jobs")
+	parser.add_argument("--max-jobs", dest="maxJobs", type=int, default=None, help="Exit after running this many jobs")
+	parser.add_argument("--heartbeat-interval", dest="heartbeatInterval", type=float, default=DEF_HEARTBEAT_INTERVAL,
+	                    help="Time (s) between heartbeats for a running job")
+	args = parser.parse_args(argv)
+	runQueueWorker(os.path.abspath(args.queueFolder), workerLabel=args.workerLabel, pollInterval=args.pollInterval,
+	               maxIdleTime=args.maxIdleTime, maxJobs=args.maxJobs, heartbeatInterval=args.heartbeatInterval)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit( main() )
+
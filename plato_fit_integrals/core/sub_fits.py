@@ -0,0 +1,209 @@
+
+""" Splitting a fit into independent sub-fits. If the workflows fall into groups that depend on disjoint sets of integral tables
+(e.g. pure Si structures and pure C structures in a Si/C model, with no structures containing both) the objective function is a sum
+of separate terms, each of which can be minimised on its own. carryOutOptimisationSeparable runs these sub-fits at the same time,
+each with its own share of the cores """
+
+import collections
+import concurrent.futures
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.obj_funct_calculator as objCalculators
+import plato_fit_integrals.core.opt_runner as optRunner
+
+
+SubFit = collections.namedtuple("SubFit", ["blocks", "coeffIndices", "workFlowIndices"])
+SubFit.__doc__ = """ Part of a fit that can be optimised independently of the rest. blocks are CoeffBlock objects (see opt_runner),
+coeffIndices the positions of their coefficients in coeffTableConverter.coeffs and workFlowIndices the workflows that depend on them """
+
+
+def findIndependentSubFits(coeffTableConverter, workFlowCoordinator, blocks=None):
+	""" Group coefficient blocks into sub-fits which share no workflows (or coefficients). Dependencies are found from the species in
+	each workflow and the atoms in each integral table (see opt_runner.getDependentWorkFlowIndices); workflows with unknown species
+	depend on every block, so a single one of them means the fit cant be split
+
+	Args:
+		coeffTableConverter: CoeffsTablesConverter (or TiedCoeffsTablesConverter) object
+		workFlowCoordinator: WorkFlowCoordinator object
+		blocks(Optional): list of CoeffBlock objects. Default is one block per integral table (see opt_runner.getCoeffBlocksFromConverter)
+
+	Returns
+		subFits: list of SubFit objects, ordered by their first block. Blocks with no dependent workflows cant affect the objective
+		         function and so arent included in any sub-fit
+	"""
+	blocks = optRunner.getCoeffBlocksFromConverter(coeffTableConverter) if blocks is None else blocks
+	workFlowIndices = [set(optRunner.getDependentWorkFlowIndices(workFlowCoordinator, x)) for x in blocks]
+	coeffIndices = [set(np.asarray(x.coeffIndices, dtype=int).tolist()) for x in blocks]
+	usedBlockIndices = [idx for idx,x in enumerate(workFlowIndices) if len(x) > 0]
+
+	#Union-find over blocks; two blocks are joined if they share any workflow or coefficient
+	parents = {idx:idx for idx in usedBlockIndices}
+	def _getRoot(idx):
+		while parents[idx] != idx:
+			idx = parents[idx]
+		return idx
+
+	for pos, idxA in enumerate(usedBlockIndices):
+		for idxB in usedBlockIndices[pos+1:]:
+			if (workFlowIndices[idxA] & workFlowIndices[idxB]) or (coeffIndices[idxA] & coeffIndices[idxB]):
+				rootA, rootB = _getRoot(idxA), _getRoot(idxB)
+				parents[max(rootA,rootB)] = min(rootA,rootB)
+
+	groupedIndices = collections.OrderedDict()
+	for idx in usedBlockIndices:
+		groupedIndices.setdefault(_getRoot(idx), list()).append(idx)
+
+	outSubFits = list()
+	for blockIndices in groupedIndices.values():
+		currCoeffIndices = sorted( set().union(*[coeffIndices[x] for x in blockIndices]) )
+		currWorkFlowIndices = sorted( set().union(*[workFlowIndices[x] for x in blockIndices]) )
+		outSubFits.append( SubFit([blocks[x] for x in blockIndices], np.array(currCoeffIndices, dtype=int), currWorkFlowIndices) )
+	return outSubFits
+
+
+class SubsetCoeffsTablesConverter():
+	""" View of a subset of the coefficients of a converter, for use by one sub-fit. Setting coeffs only sets this subset and
+	writeTables only updates (and writes the files for) the tables using them; so sub-fits with disjoint subsets can share a converter
+
+	Attributes (incl. @properties):
+		coeffTableConverter: The wrapped CoeffsTablesConverter (or TiedCoeffsTablesConverter) object
+		coeffIndices (int array): Positions of this subsets coefficients in coeffTableConverter.coeffs
+		tableIndices (list of int): Indices of the integral tables which use any of coeffIndices
+		coeffs (np array): Values of the coefficients at coeffIndices
+
+	"""
+
+	def __init__(self, coeffTableConverter, coeffIndices:"iter of int"):
+		self.coeffTableConverter = coeffTableConverter
+		self.coeffIndices = np.array(coeffIndices, dtype=int)
+		indicesPerTable = coeffTableConverter.getCoeffIndicesPerTable()
+		self.tableIndices = [idx for idx,(info,indices) in enumerate(indicesPerTable) if len(np.intersect1d(indices,self.coeffIndices))>0]
+
+	@property
+	def coeffs(self):
+		return np.asarray(self.coeffTableConverter.coeffs, dtype=float)[self.coeffIndices]
+
+	@coeffs.setter
+	def coeffs(self, val):
+		if len(val) != len(self.coeffIndices):
+			raise TypeError("Expected {} coeffs, but {} passed".format(len(self.coeffIndices), len(val)))
+		self.coeffTableConverter.setCoeffsAtIndices(self.coeffIndices, val)
+
+	def writeTables(self):
+		self.coeffTableConverter.writeTables(tableIndices=self.tableIndices)
+
+	def getCoeffIndicesPerTable(self):
+		""" Same as for the wrapped converter, but only for tables in tableIndices and with coeffIndices giving positions in this
+		subsets coeffs (so block-based optimisers can run on a sub-fit) """
+		subsetPositions = {idx:pos for pos,idx in enumerate(self.coeffIndices.tolist())}
+		indicesPerTable = self.coeffTableConverter.getCoeffIndicesPerTable()
+		outList = list()
+		for tableIdx in self.tableIndices:
+			info, indices = indicesPerTable[tableIdx]
+			outList.append( (info, np.array([subsetPositions[x] for x in np.asarray(indices).tolist() if x in subsetPositions], dtype=int)) )
+		return outList
+
+
+def splitCores(nCores, weights:"iter of float"):
+	""" Split nCores between tasks roughly in proportion to weights; every task gets at least one core """
+	weights = np.asarray(weights, dtype=float)
+	nTasks = len(weights)
+	if nCores <= nTasks:
+		return [1 for x in range(nTasks)]
+	shares = (nCores-nTasks) * weights / weights.sum()
+	outCores = 1 + np.floor(shares).astype(int)
+	nLeft = nCores - outCores.sum()
+	outCores[ np.argsort(np.floor(shares)-shares, kind="stable")[:nLeft] ] += 1 #Largest remainders first
+	return outCores.tolist()
+
+
+def createSubFitObjectiveFunctions(objectiveFunct, subFits, nCores=None, executorFactory=None):
+	""" Create an ObjectiveFunction for each sub-fit. Each gets a SubsetCoeffsTablesConverter, a WorkFlowCoordinator for its own
+	workflows and an ObjectiveFunctPlan holding only the terms for their properties
+
+	Args:
+		objectiveFunct: ObjectiveFunction for the full fit
+		subFits: list of SubFit objects (see findIndependentSubFits)
+		nCores(Optional): Total cores to split between the sub-fits (in proportion to their number of workflows). Default is
+		                  objectiveFunct.workFlowCoordinator.nCores
+		executorFactory(Optional): Function with interface nCores->executor used to create the executor for each sub-fit. Default
+		                           is the WorkFlowCoordinator default (RunCommsParallelExecutor)
+
+	Returns
+		subObjFuncts: list of ObjectiveFunction objects, one per sub-fit
+
+	Raises:
+		NotImplementedError: If objectiveFunct.objFunctCalculator doesnt implement getPlanEntries, so cant be split into terms
+	"""
+	coordinator = objectiveFunct.workFlowCoordinator
+	nCores = coordinator.nCores if nCores is None else nCores
+	if not hasattr(objectiveFunct.objFunctCalculator, "getPlanEntries"):
+		raise NotImplementedError("Cant split {} into per-property terms".format(objectiveFunct.objFunctCalculator))
+	planEntries = objectiveFunct.objFunctCalculator.getPlanEntries()
+	coresPerSubFit = splitCores(nCores, [len(x.workFlowIndices) for x in subFits])
+
+	outObjFuncts = list()
+	for subFit, currCores in zip(subFits, coresPerSubFit):
+		executor = executorFactory(currCores) if executorFactory is not None else None
+		subCoordinator = coordinator.getSubCoordinator(subFit.workFlowIndices, nCores=currCores, executor=executor)
+		subProps = set(subCoordinator.propertyStore.propNames)
+		subCalculator = objCalculators.ObjectiveFunctPlan([x for x in planEntries if x.prop in subProps])
+		subConverter = SubsetCoeffsTablesConverter(objectiveFunct.coeffTableConverter, subFit.coeffIndices)
+		outObjFuncts.append( optRunner.ObjectiveFunction(subConverter, subCoordinator, subCalculator) )
+	return outObjFuncts
+
+
+def carryOutOptimisationSeparable(objectiveFunct, optFunct=None, nCores=None, blocks=None, executorFactory=None, **kwargs):
+	""" Splits the fit into independent sub-fits (see findIndependentSubFits), runs optFunct on each at the same time, then merges
+	the best coefficients from each back into objectiveFunct.coeffTableConverter. Assumes the objective function is a weighted
+	sum of per-property terms (true for ObjectiveFunctTotal, ObjectiveFunctionContrib and ObjectiveFunctPlan)
+
+	Args:
+		objectiveFunct: ObjectiveFunction object. Starting coefficients are taken from objectiveFunct.coeffTableConverter.coeffs
+		optFunct(Optional): Optimiser run on each sub-fit, with interface optFunct(subObjectiveFunct, **kwargs)->output (output.optRes
+		                    needs x, fun and nfev). Default is opt_runner.carryOutOptimisationBasicOptions; the other opt_runner
+		                    optimisers (e.g. carryOutOptimisationBlockCoordinate) can also be used
+		nCores(Optional): Total cores split between the sub-fits. Default is objectiveFunct.workFlowCoordinator.nCores
+		blocks(Optional): list of CoeffBlock objects. Default is one block per integral table
+		executorFactory(Optional): Function with interface nCores->executor; creates the executor for each sub-fit
+		kwargs: Passed to optFunct for each sub-fit
+
+	Returns
+		output: SimpleNamespace with optRes (scipy OptimizeResult; subResults holds the optRes for each sub-fit and subFitLabels the
+		        block labels for each) and calcVals (property values at the best coefficients). The best coefficients are written to
+		        the tables. If the fit cant be split (fewer than two sub-fits, an objFunctCalculator without getPlanEntries or a
+		        fidelitySchedule/candidateSlots on objectiveFunct) this is simply the output of optFunct(objectiveFunct, **kwargs)
+	"""
+	optFunct = optRunner.carryOutOptimisationBasicOptions if optFunct is None else optFunct
+	if (objectiveFunct.fidelitySchedule is not None) or (objectiveFunct.candidateSlots is not None):
+		return optFunct(objectiveFunct, **kwargs)
+
+	subFits = findIndependentSubFits(objectiveFunct.coeffTableConverter, objectiveFunct.workFlowCoordinator, blocks=blocks)
+	if len(subFits) < 2:
+		return optFunct(objectiveFunct, **kwargs)
+	try:
+		subObjFuncts = createSubFitObjectiveFunctions(objectiveFunct, subFits, nCores=nCores, executorFactory=executorFactory)
+	except NotImplementedError:
+		return optFunct(objectiveFunct, **kwargs)
+
+	try:
+		with concurrent.futures.ThreadPoolExecutor(max_workers=len(subObjFuncts)) as pool:
+			futures = [pool.submit(optFunct, x, **kwargs) for x in subObjFuncts]
+			subOutputs = [x.result() for x in futures]
+	finally:
+		for x in subObjFuncts:
+			x.workFlowCoordinator.close()
+
+	bestCoeffs = np.array(objectiveFunct.coeffTableConverter.coeffs, dtype=float)
+	for subFit, subOutput in zip(subFits, subOutputs):
+		bestCoeffs[subFit.coeffIndices] = subOutput.optRes.x
+
+	bestVal = objectiveFunct(bestCoeffs, useCache=False)
+	subResults = [x.optRes for x in subOutputs]
+	fitRes = optRunner.scipyOpt.OptimizeResult(x=bestCoeffs, fun=bestVal, nfev=sum([x.nfev for x in subResults])+1,
+	                                           success=all([x.get("success",True) for x in subResults]), message="Merged {} sub-fits".format(len(subFits)),
+	                                           subResults=subResults, subFitLabels=[[block.label for block in x.blocks] for x in subFits])
+	output = SimpleNamespace(optRes=fitRes, calcVals=objectiveFunct.workFlowCoordinator.propertyValues)
+	return output
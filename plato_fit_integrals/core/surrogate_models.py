@@ -0,0 +1,118 @@
+
+""" Cheap surrogate models of the objective function, used to decide which coefficients are worth a full (plato) evaluation """
+
+import numpy as np
+
+
+class SurrogateModelBase():
+
+	def fit(self, xVals, yVals):
+		""" Fit the surrogate to a set of evaluated points
+
+		Args:
+			xVals: (nPoints,nDims) array of coefficient vectors
+			yVals: (nPoints) array of objective function values. Non-finite values are replaced by the largest finite value
+
+		Returns
+			Nothing; works in place
+		"""
+		raise NotImplementedError()
+
+	def predict(self, xVals):
+		""" Predict objective function values at a set of points
+
+		Args:
+			xVals: (nPoints,nDims) array of coefficient vectors
+
+		Returns
+			meanVals: (nPoints) array of predicted values
+			stdVals: (nPoints) array of uncertainties in predicted values (zeros if the model cant estimate them)
+		"""
+		raise NotImplementedError()
+
+
+class GaussianProcessSurrogate(SurrogateModelBase):
+	""" Gaussian process with a squared-exponential kernel. Length scale defaults to the median distance between fitted points """
+
+	def __init__(self, lengthScale=None, noise=1e-6):
+		self.lengthScale = lengthScale
+		self.noise = noise
+
+	def fit(self, xVals, yVals):
+		self._xVals = np.array(xVals, dtype=float)
+		yVals = getYValsWithNonFiniteReplaced(yVals)
+		self._yMean = np.mean(yVals)
+		self._yStd = np.std(yVals) if np.std(yVals) > 0 else 1.0
+		normYVals = (yVals - self._yMean) / self._yStd
+
+		self._currLengthScale = self.lengthScale if self.lengthScale is not None else _getMedianPairwiseDist(self._xVals)
+		kernelMatrix = self._getKernelMatrix(self._xVals, self._xVals) + self.noise*np.eye(len(self._xVals))
+		self._cholFactor = np.linalg.cholesky(kernelMatrix)
+		self._alpha = np.linalg.solve(self._cholFactor.T, np.linalg.solve(self._cholFactor, normYVals))
+
+	def predict(self, xVals):
+		xVals = np.atleast_2d( np.array(xVals, dtype=float) )
+		crossKernel = self._getKernelMatrix(xVals, self._xVals)
+		meanVals = crossKernel.dot(self._alpha)*self._yStd + self._yMean
+		vMatrix = np.linalg.solve(self._cholFactor, crossKernel.T)
+		variances = np.clip(1.0 - np.sum(vMatrix**2, axis=0), 0.0, None)
+		return meanVals, np.sqrt(variances)*self._yStd
+
+	def _getKernelMatrix(self, xValsA, xValsB):
+		sqrDists = np.sum(xValsA**2, axis=1)[:,np.newaxis] + np.sum(xValsB**2, axis=1)[np.newaxis,:] - 2*xValsA.dot(xValsB.T)
+		sqrDists = np.clip(sqrDists, 0.0, None)
+		return np.exp( -0.5*sqrDists/(self._currLengthScale**2) )
+
+
+class QuadraticSurrogate(SurrogateModelBase):
+	""" Least-squares quadratic response surface. Uses all cross terms if there are enough points, else only diagonal (x_i^2) terms.
+	Gives no uncertainty estimates """
+
+	def __init__(self, ridge=1e-8):
+		self.ridge = ridge
+
+	def fit(self, xVals, yVals):
+		xVals = np.array(xVals, dtype=float)
+		yVals = getYValsWithNonFiniteReplaced(yVals)
+		nPoints, nDims = xVals.shape
+		self._useCrossTerms = nPoints >= 1 + nDims + (nDims*(nDims+1))//2
+		self._xShift = xVals.mean(axis=0)
+		designMatrix = self._getDesignMatrix(xVals)
+		lhs = designMatrix.T.dot(designMatrix) + self.ridge*np.eye(designMatrix.shape[1])
+		self._coeffs = np.linalg.solve(lhs, designMatrix.T.dot(yVals))
+
+	def predict(self, xVals):
+		xVals = np.atleast_2d( np.array(xVals, dtype=float) )
+		meanVals = self._getDesignMatrix(xVals).dot(self._coeffs)
+		return meanVals, np.zeros(len(meanVals))
+
+	def _getDesignMatrix(self, xVals):
+		shiftedVals = xVals - self._xShift
+		nDims = shiftedVals.shape[1]
+		cols = [np.ones(len(shiftedVals)), shiftedVals]
+		if self._useCrossTerms:
+			rowIdxs, colIdxs = np.triu_indices(nDims)
+			cols.append( shiftedVals[:,rowIdxs]*shiftedVals[:,colIdxs] )
+		else:
+			cols.append( shiftedVals**2 )
+		return np.column_stack(cols)
+
+
+def getYValsWithNonFiniteReplaced(yVals):
+	""" Replace non-finite values (e.g. np.inf from failed calculations) with the largest finite value """
+	yVals = np.array(yVals, dtype=float)
+	finiteMask = np.isfinite(yVals)
+	if not np.any(finiteMask):
+		return np.zeros(len(yVals))
+	yVals[~finiteMask] = np.max(yVals[finiteMask])
+	return yVals
+
+
+def _getMedianPairwiseDist(xVals):
+	if len(xVals) < 2:
+		return 1.0
+	diffs = xVals[:,np.newaxis,:] - xVals[np.newaxis,:,:]
+	dists = np.sqrt( np.sum(diffs**2, axis=2) )[np.triu_indices(len(xVals), k=1)]
+	medianDist = np.median(dists)
+	return medianDist if medianDist > 0 else 1.0
+
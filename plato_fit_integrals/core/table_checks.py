@@ -0,0 +1,146 @@
+
+""" Feasibility checks on integral tables, run straight after they are updated from the coefficients. Candidates giving absurd tables
+(overflowed values, sign flips, non-monotonic repulsive pair potentials) are rejected before any files are written or plato jobs launched;
+e.g. coeffTableConverter.tableChecks = [MaxAbsValueCheck(), MonotonicCheck()] """
+
+import collections
+
+import numpy as np
+
+
+TableCheckFailure = collections.namedtuple("TableCheckFailure", ["checkName", "integInfo"])
+TableCheckFailure.__doc__ = """ Record of an integral table (integInfo is its IntegralTableInfo) failing the check named checkName """
+
+
+class InfeasibleTablesError(ValueError):
+	""" Raised by CoeffsTablesConverter.writeTables when any table fails a check; no files are written. failures attribute is a list
+	of TableCheckFailure objects """
+
+	def __init__(self, failures:"list of TableCheckFailure"):
+		self.failures = list(failures)
+		failStrs = ["{} ({} {} {})".format(x.checkName, x.integInfo.integStr, x.integInfo.atomA, x.integInfo.atomB) for x in self.failures]
+		super().__init__("Integral tables failed feasibility checks: {}".format("; ".join(failStrs)))
+
+
+class TableCheckBase():
+	""" Base class for table checks. Subclasses set name and overwrite getFailedRows
+
+	Attributes (incl. @properties):
+		name (str): Used to label failures and instrumentation counters
+		integStrs (tuple of str): Types of integral (e.g. "pairpot") the check applies to; None means all of them
+
+	"""
+
+	name = "table_check"
+	integStrs = None
+
+	def appliesTo(self, integInfo):
+		return (self.integStrs is None) or (integInfo.integStr.lower() in self.integStrs)
+
+	def getFailedRows(self, xVals, yValsMatrix):
+		""" Check many versions of one table at once
+
+		Args:
+			xVals: (nPoints) array of distances
+			yValsMatrix: (nCandidates, nPoints) array; each row holds the integral values of one candidate table
+
+		Returns
+			failed: (nCandidates) bool array, True where the table is infeasible
+		"""
+		raise NotImplementedError()
+
+
+class MaxAbsValueCheck(TableCheckBase):
+	""" Fails tables with non-finite values or any abs(value) above maxAbsVal (e.g. the 1e30 used for overflow in Cawkwell17ModTailRepr) """
+
+	name = "max_abs_value"
+
+	def __init__(self, maxAbsVal=1e20, integStrs=None):
+		self.maxAbsVal = maxAbsVal
+		self.integStrs = _getIntegStrsTuple(integStrs)
+
+	def getFailedRows(self, xVals, yValsMatrix):
+		with np.errstate(invalid="ignore"):
+			return np.any( ~(np.abs(yValsMatrix) <= self.maxAbsVal), axis=1 )
+
+
+class NoSignChangeCheck(TableCheckBase):
+	""" Fails tables containing both values above tol and values below -tol """
+
+	name = "no_sign_change"
+
+	def __init__(self, integStrs=("pairpot",), tol=0.0):
+		self.integStrs = _getIntegStrsTuple(integStrs)
+		self.tol = tol
+
+	def getFailedRows(self, xVals, yValsMatrix):
+		return np.any(yValsMatrix > self.tol, axis=1) & np.any(yValsMatrix < -1*self.tol, axis=1)
+
+
+class MonotonicCheck(TableCheckBase):
+	""" Fails tables that arent monotonic in distance; by default non-increasing, as expected for a repulsive pair potential. Steps in
+	the wrong direction smaller than tol are ignored """
+
+	name = "monotonic"
+
+	def __init__(self, integStrs=("pairpot",), increasing=False, tol=0.0):
+		self.integStrs = _getIntegStrsTuple(integStrs)
+		self.increasing = increasing
+		self.tol = tol
+
+	def getFailedRows(self, xVals, yValsMatrix):
+		steps = np.diff(yValsMatrix[:, np.argsort(xVals)], axis=1)
+		if self.increasing:
+			return np.any(steps < -1*self.tol, axis=1)
+		return np.any(steps > self.tol, axis=1)
+
+
+def _getIntegStrsTuple(integStrs):
+	return tuple([x.lower() for x in integStrs]) if integStrs is not None else None
+
+
+def getFailuresForTables(checks:"iter of TableCheckBase", integInfos:list, tables:list):
+	""" Run checks on a set of integral tables
+
+	Args:
+		checks: iter of TableCheckBase objects
+		integInfos: IntegralTableInfo object for each table
+		tables: (nPoints,2) array for each table; column 0 holds distances and column 1 integral values
+
+	Returns
+		failures: list of TableCheckFailure objects (empty if all tables are feasible)
+	"""
+	outFailures = list()
+	for integInfo, table in zip(integInfos, tables):
+		for check in checks:
+			if check.appliesTo(integInfo) and check.getFailedRows(table[:,0], table[np.newaxis,:,1])[0]:
+				outFailures.append( TableCheckFailure(check.name, integInfo) )
+	return outFailures
+
+
+def getInfeasibleCandidates(coeffTableConverter, coeffMatrix, checks=None):
+	""" Screen many sets of coefficients at once, without changing coeffs or writing tables (see getTableBlocksForCoeffMatrix)
+
+	Args:
+		coeffTableConverter: CoeffsTablesConverter (or TiedCoeffsTablesConverter) object
+		coeffMatrix: (nCandidates, nCoeffs) array-like; each row is a full set of coeffs
+		checks(Optional): iter of TableCheckBase objects. Default is coeffTableConverter.tableChecks
+
+	Returns
+		infeasible: (nCandidates) bool array, True for candidates with any table failing any check
+	"""
+	checks = coeffTableConverter.tableChecks if checks is None else checks
+	coeffMatrix = np.atleast_2d( np.asarray(coeffMatrix, dtype=float) )
+	integInfos = [info for info,unused in coeffTableConverter.getCoeffIndicesPerTable()]
+	outMask = np.zeros(coeffMatrix.shape[0], dtype=bool)
+	tableIndices = [idx for idx,info in enumerate(integInfos) if any([x.appliesTo(info) for x in checks])]
+	if len(tableIndices) == 0:
+		return outMask
+
+	tableBlocks = coeffTableConverter.getTableBlocksForCoeffMatrix(coeffMatrix, tableIndices=tableIndices)
+	xValsPerTable = coeffTableConverter.getTableXVals(tableIndices)
+	for idx, yValsMatrix, xVals in zip(tableIndices, tableBlocks, xValsPerTable):
+		for check in checks:
+			if check.appliesTo(integInfos[idx]):
+				outMask |= check.getFailedRows(xVals, yValsMatrix)
+	return outMask
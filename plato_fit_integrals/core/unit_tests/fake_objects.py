@@ -0,0 +1,71 @@
+
+""" Light stand-ins for workflows and coefficient/table converters, shared by the optimiser tests. They let optimisers run in
+milliseconds without plato, integral tables or files """
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+
+
+class FakeWorkFlow(wflowCoord.WorkFlowBase):
+	""" Workflow with a single output, outAttr, set to funct(coeffConv.coeffs) on each run
+
+	Attributes (incl. @properties):
+		species (set or None): Returned by speciesPresent; None means unknown (depends on every integral table)
+		nRuns (int): Number of times run() has been called
+
+	"""
+
+	def __init__(self, outAttr, coeffConv, funct, species=None):
+		self.outAttr, self.coeffConv, self.funct, self.species = outAttr, coeffConv, funct, species
+		self.output = SimpleNamespace()
+		self.nRuns = 0
+
+	@property
+	def workFolder(self):
+		return None
+
+	@property
+	def namespaceAttrs(self):
+		return [self.outAttr]
+
+	@property
+	def speciesPresent(self):
+		return self.species
+
+	def run(self):
+		self.nRuns += 1
+		setattr(self.output, self.outAttr, self.funct(self.coeffConv.coeffs))
+
+
+class FakeCoeffsTablesConverter():
+	""" Holds coeffs for a set of (fake) integral tables, without any analytical representations
+
+	Attributes (incl. @properties):
+		coeffs (np array): All coefficients
+		integInfo (list): Objects with the IntegralTableInfo attributes used to label tables/find their species (see createIntegInfo)
+		writtenTableIndices (list): tableIndices passed to each writeTables() call
+
+	"""
+
+	def __init__(self, coeffs, integInfo, coeffIndicesPerTable):
+		self.coeffs = np.array(coeffs, dtype=float)
+		self.integInfo = list(integInfo)
+		self._coeffIndicesPerTable = [np.array(x, dtype=int) for x in coeffIndicesPerTable]
+		self.writtenTableIndices = list()
+
+	def setCoeffsAtIndices(self, coeffIndices, vals):
+		self.coeffs[coeffIndices] = vals
+
+	def writeTables(self, tableIndices=None):
+		self.writtenTableIndices.append(tableIndices)
+
+	def getCoeffIndicesPerTable(self):
+		return list(zip(self.integInfo, self._coeffIndicesPerTable))
+
+
+def createIntegInfo(integStr, atomA, atomB, shellA=None, shellB=None, axAngMom=None):
+	return SimpleNamespace(integStr=integStr, atomA=atomA, atomB=atomB, shellA=shellA, shellB=shellB, axAngMom=axAngMom)
+
@@ -1,8 +1,11 @@
 #!/usr/bin/python3
 
 import itertools as it
+import math
 import unittest
 
+import numpy as np
+
 import plato_fit_integrals.core.create_analytical_reprs as tCode
 
 class TestCawk17ModTailFunctions(unittest.TestCase):
@@ -192,6 +195,108 @@ class TestCompositeAnalyticalFuncts(unittest.TestCase):
 		self.testObj.coeffs = newCoeffs
 		[self.assertAlmostEqual(exp,act) for exp,act in it.zip_longest(expCoeffs, self.testObj.coeffs)]
 
+	def testOutArrayUsedForTableColumn(self):
+		table = np.array([[float(x), -1.0] for x in self.testXVals])
+		expVals = self.runFunct()
+		outVals = self.testObj.evalAtListOfXVals(table[:,0], out=table[:,1])
+		self.assertTrue( np.shares_memory(outVals, table) )
+		self.assertTrue( np.allclose(expVals, table[:,1]) )
+
+	def testRaisesForWrongOutLength(self):
+		with self.assertRaises(ValueError):
+			self.testObj.evalAtListOfXVals(self.testXVals, out=np.zeros(len(self.testXVals)+1))
+
+
+class TestEvalForCoeffMatrix(unittest.TestCase):
+
+	def setUp(self):
+		self.xVals = np.linspace(0.5, 11.0, 25)
+		self.cawkFunct = tCode.Cawkwell17ModTailRepr(rCut=10, refR0=5, valAtR0=3.2, startCoeffs=[-0.2,-0.1], tailDelta=4.0, nodePositions=[3.5,5.7])
+		self.expFunct = tCode.ExpDecayFunct(r0=1.0, prefactor=5, alpha=0.6, rCut=10, tailDelta=1.0)
+
+	def _checkMatchesRowByRow(self, aRepr, coeffMatrix):
+		startCoeffs = list(aRepr.coeffs)
+		actVals = aRepr.evalAtListOfXValsForCoeffMatrix(self.xVals, coeffMatrix)
+		self.assertEqual(startCoeffs, aRepr.coeffs)
+		for coeffs,actRow in zip(coeffMatrix, actVals):
+			aRepr.coeffs = list(coeffs)
+			self.assertTrue( np.allclose(aRepr.evalAtListOfXVals(self.xVals), actRow) )
+
+	def testCawkwellWithVariableValAtR0AndNodes(self):
+		self.cawkFunct.promoteValAtR0ToVariable()
+		self.cawkFunct.promoteNodePositionsToVariables()
+		coeffMatrix = [[-0.2,-0.1,3.2,3.5,5.7], [0.1,-0.3,-1.0,2.0,6.0], [-0.05,0.0,2.0,4.0,7.5]]
+		self._checkMatchesRowByRow(self.cawkFunct, coeffMatrix)
+
+	def testCawkwellOverflowGivesLargeValue(self):
+		actVals = self.cawkFunct.evalAtListOfXValsForCoeffMatrix([0.5], [[0.0,500.0]])
+		self.assertEqual(1e30, actVals[0][0])
+
+	def testExpDecayOverflowGivesLargeValue(self):
+		self.expFunct.coeffs = [5.0, 50.0]
+		xVals = [-10.0, 11.0]
+		expVals = [1e30*tCode.applyTailFunctToListOfXVals([-10.0], 10, 1.0)[0], 0.0] #Clipped before the tail is applied
+		self.assertEqual(expVals, self.expFunct.evalAtListOfXVals(xVals).tolist())
+		self.assertEqual([expVals], self.expFunct.evalAtListOfXValsForCoeffMatrix(xVals, [[5.0,50.0]]).tolist())
+
+	def testCompositeMatchesRowByRow(self):
+		compFunct = tCode.getCombinedAnalyticalReprs([self.cawkFunct, self.expFunct])
+		coeffMatrix = [[-0.2,-0.1,5.0,0.6], [0.1,-0.3,2.0,1.2]]
+		self._checkMatchesRowByRow(compFunct, coeffMatrix)
+
+	def testRaisesForWrongNumbCoeffs(self):
+		with self.assertRaises(TypeError):
+			self.expFunct.evalAtListOfXValsForCoeffMatrix(self.xVals, [[1.0,2.0,3.0]])
+
+
+class TestBindCoeffs(unittest.TestCase):
+
+	def setUp(self):
+		self.xVals = np.linspace(0.5, 11.0, 25)
+		self.cawkFunct = tCode.Cawkwell17ModTailRepr(rCut=10, refR0=5, valAtR0=3.2, startCoeffs=[-0.2,-0.1], tailDelta=4.0, nodePositions=[3.5])
+		self.cawkFunct.promoteValAtR0ToVariable()
+		self.expFunct = tCode.ExpDecayFunct(r0=1.0, prefactor=5, alpha=0.6, rCut=10, tailDelta=1.0)
+		self.compFunct = tCode.getCombinedAnalyticalReprs([self.cawkFunct, self.expFunct], copyObjs=False)
+		self.coeffArray = np.zeros(6)
+		self.compFunct.bindCoeffs(self.coeffArray[1:])
+
+	def testCurrentCoeffsCopiedIntoView(self):
+		self.assertEqual([0.0, -0.2, -0.1, 3.2, 5.0, 0.6], self.coeffArray.tolist())
+
+	def testChangesToArraySeenByReprs(self):
+		newCoeffs = [0.1, -0.3, 2.0, 2.0, 1.2]
+		self.coeffArray[1:] = newCoeffs
+		self.assertEqual(newCoeffs, self.compFunct.coeffs)
+		self.assertEqual(2.0, self.cawkFunct.valAtR0)
+		self.assertTrue( np.allclose(self.compFunct.evalAtListOfXValsForCoeffMatrix(self.xVals, [newCoeffs])[0],
+		                             self.compFunct.evalAtListOfXVals(self.xVals)) )
+
+	def testSettingCoeffsWritesIntoArray(self):
+		self.expFunct.coeffs = [1.5, 2.5]
+		self.assertEqual([1.5,2.5], self.coeffArray[-2:].tolist())
+
+	def testPromotingUnbindsArray(self):
+		self.cawkFunct.promoteNodePositionsToVariables()
+		self.cawkFunct.coeffs = [1.0, 2.0, 3.0, 4.0]
+		self.assertEqual([-0.2, -0.1, 3.2], self.coeffArray[1:4].tolist())
+		self.assertEqual(4.0, self.cawkFunct.nodePositions[0])
+
+	def testRaisesForWrongSizeView(self):
+		with self.assertRaises(ValueError):
+			self.expFunct.bindCoeffs(np.zeros(3))
+
+
+class TestTailFunct(unittest.TestCase):
+
+	def setUp(self):
+		self.rCut, self.tailDelta = 5.0, 0.5
+		self.testXVals = [0.5, 2.0, 4.9, 5.0, 6.0]
+
+	def testMatchesScalarFormula(self):
+		expVals = [math.exp(self.tailDelta/(x-self.rCut)) if x<self.rCut else 0.0 for x in self.testXVals]
+		actVals = tCode.applyTailFunctToListOfXVals(self.testXVals, self.rCut, self.tailDelta)
+		[self.assertAlmostEqual(exp,act) for exp,act in it.zip_longest(expVals,actVals)]
+
 
 if __name__ == '__main__':
 	unittest.main()
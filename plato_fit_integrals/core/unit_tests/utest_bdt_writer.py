@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.bdt_writer as tCode
+
+
+class TestBdtWriterFixedWidthFormat(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.outPath = os.path.join(self.tempDir.name, "Xa_Xb.bdt")
+		self.referenceWriter = _writeFakeBdtFixedWidth
+		self.integDict = _createFakeIntegDict()
+		self.createTestObj()
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def createTestObj(self):
+		self.testObj = tCode.BdtWriter(referenceWriter=self.referenceWriter)
+
+	def _getExpText(self):
+		expPath = os.path.join(self.tempDir.name, "exp_file")
+		self.referenceWriter(self.integDict, expPath)
+		with open(expPath,"rt") as f:
+			return f.read()
+
+	def _getActText(self):
+		with open(self.outPath,"rt") as f:
+			return f.read()
+
+	def testMatchesReferenceAfterValuesChange(self):
+		self.testObj.writeFile(self.integDict, self.outPath)
+		nRefWrites = self.testObj.nReferenceWrites
+		self.integDict["hopcorrection0"][1].integrals[:,1] = [-0.5, 0.25, 1e-3]
+		self.integDict["pairpotcorrection0"][0].integrals[:,1] = [12.5, -3.0, 0.0]
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.assertEqual(self._getExpText(), self._getActText())
+		self.assertEqual(nRefWrites, self.testObj.nReferenceWrites)
+
+	def testLayoutRelearntWhenStructureChanges(self):
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.integDict["pairpotcorrection0"] = None
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.assertEqual(self._getExpText(), self._getActText())
+
+	def testFallsBackForVariablePrecisionFormat(self):
+		self.referenceWriter = _writeFakeBdtReprFormat
+		self.createTestObj()
+		self.integDict["hopping"][0].integrals[:,1] = [0.1, 0.25, 1.0/3]
+		self.testObj.writeFile(self.integDict, self.outPath)
+		nRefWrites = self.testObj.nReferenceWrites
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.assertEqual(self._getExpText(), self._getActText())
+		self.assertEqual(nRefWrites+1, self.testObj.nReferenceWrites)
+
+	def testThreadedWritesLeaveNoTempFiles(self):
+		self.testObj.nThreads = 3
+		outPaths = [os.path.join(self.tempDir.name, "file_{}.bdt".format(x)) for x in range(4)]
+		self.testObj.writeFiles([self.integDict for x in outPaths], outPaths)
+		self.testObj.writeFiles([self.integDict for x in outPaths], outPaths)
+		self.assertEqual(sorted([os.path.basename(x) for x in outPaths]), sorted(os.listdir(self.tempDir.name)))
+
+
+class TestBdtWriterPatchInPlace(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.outPath = os.path.join(self.tempDir.name, "Xa_Xb.bdt")
+		self.integDict = _createFakeIntegDict()
+		self.testObj = tCode.BdtWriter(referenceWriter=_writeFakeBdtFixedWidth, patchInPlace=True)
+		self.testObj.writeFile(self.integDict, self.outPath)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def _checkFileMatchesFullWrite(self):
+		expPath = os.path.join(self.tempDir.name, "exp_file.bdt")
+		tCode.BdtWriter(referenceWriter=_writeFakeBdtFixedWidth, patchInPlace=True).writeFile(self.integDict, expPath)
+		with open(expPath,"rt") as f:
+			expText = f.read()
+		with open(self.outPath,"rt") as f:
+			actText = f.read()
+		self.assertEqual(expText, actText)
+
+	def testCorrectionValuesWrittenFixedWidth(self):
+		with open(self.outPath,"rt") as f:
+			fileLines = f.readlines()
+		self.assertEqual("    1.000000   0.0000000000e+00\n", fileLines[fileLines.index("ppcorr 3\n")+1])
+
+	def testOnlyCorrectionsChangedPatchesFile(self):
+		self.integDict["hopcorrection0"][1].integrals[:,1] = [-0.5, 0.25, -1e-12]
+		self.integDict["pairpotcorrection0"][0].integrals[:,1] = [12.5, -3.0, 0.0]
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.integDict["hopcorrection0"][0].integrals[:,1] = [2.0, 1.0, 0.5]
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.assertEqual(2, self.testObj.nPatchedWrites)
+		self._checkFileMatchesFullWrite()
+
+	def testNonCorrectionChangeGivesFullWrite(self):
+		self.integDict["hopping"][0].integrals[:,1] = [-2.0, -1.0, -0.5]
+		self.integDict["hopcorrection0"][0].integrals[:,1] = [2.0, 1.0, 0.5]
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.assertEqual(0, self.testObj.nPatchedWrites)
+		self._checkFileMatchesFullWrite()
+
+	def testExternallyModifiedFileGivesFullWrite(self):
+		with open(self.outPath,"at") as f:
+			f.write("extra line\n")
+		self.integDict["hopcorrection0"][0].integrals[:,1] = [2.0, 1.0, 0.5]
+		self.testObj.writeFile(self.integDict, self.outPath)
+		self.assertEqual(0, self.testObj.nPatchedWrites)
+		self._checkFileMatchesFullWrite()
+
+
+class TestInferRowFormat(unittest.TestCase):
+
+	def testPaddedColumns(self):
+		rowLines = ["  1.500000 -0.250000\n", " 10.500000  0.125000\n"]
+		self.assertEqual("%10.6f%10.6f\n", tCode._inferRowFormat(rowLines))
+
+	def testConstantSeparator(self):
+		rowLines = ["1.50e+00 -2.50e-01\n", "-1.05e+01 1.25e-01\n"]
+		self.assertEqual("%.2e %.2e\n", tCode._inferRowFormat(rowLines))
+
+	def testInconsistentPrecision(self):
+		rowLines = ["1.5 0.25\n", "2.5 0.125\n"]
+		self.assertEqual(None, tCode._inferRowFormat(rowLines))
+
+
+def _createFakeIntegDict():
+	xVals = np.array([1.0, 2.0, 3.0])
+	def _createTable(yVals, label):
+		return SimpleNamespace(integrals=np.column_stack([xVals, yVals]), label=label)
+	return {"pairpot": [_createTable([3.0,1.0,0.2], "pp")],
+	        "pairpotcorrection0": [_createTable(np.zeros(3), "ppcorr")],
+	        "hopping": [_createTable([-1.0,-0.5,-0.1], "sss"), _createTable([0.8,0.4,0.05], "sps")],
+	        "hopcorrection0": [_createTable(np.zeros(3), "sss"), _createTable(np.zeros(3), "sps")],
+	        "numbshells": 2}
+
+
+def _writeFakeBdtFixedWidth(integDict, outPath):
+	_writeFakeBdt(integDict, outPath, lambda row: "{:12.6f}{:16.8e}\n".format(*row))
+
+
+def _writeFakeBdtReprFormat(integDict, outPath):
+	_writeFakeBdt(integDict, outPath, lambda row: "{} {}\n".format(*row))
+
+
+def _writeFakeBdt(integDict, outPath, rowFormatter):
+	outLines = ["#Fake bdt file\n", "{}\n".format(integDict["numbshells"])]
+	for key in ["pairpot", "pairpotcorrection0", "hopping", "hopcorrection0"]:
+		if integDict[key] is None:
+			continue
+		outLines.append("{}\n".format(key))
+		for table in integDict[key]:
+			outLines.append("{} {}\n".format(table.label, len(table.integrals)))
+			outLines.extend( [rowFormatter(row) for row in table.integrals] )
+	with open(outPath,"wt") as f:
+		f.write("".join(outLines))
+
+
+if __name__ == '__main__':
+	unittest.main()
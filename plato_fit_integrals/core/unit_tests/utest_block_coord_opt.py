@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.opt_runner as tCode
+import plato_fit_integrals.core.unit_tests.fake_objects as fakeObjs
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+
+
+class TestBlockCoordinateOptimiser(unittest.TestCase):
+
+	def setUp(self):
+		integInfo = [fakeObjs.createIntegInfo("pairpot", "Aa", "Aa"), fakeObjs.createIntegInfo("hopping", "Aa", "Bb", 0, 1, 0)]
+		self.coeffConv = fakeObjs.FakeCoeffsTablesConverter([0.0, 0.0, 0.0], integInfo, [[0,1],[2]])
+		self.workFlowA = fakeObjs.FakeWorkFlow("valA", self.coeffConv, lambda c: (c[0]-1)**2 + (c[1]+0.5)**2, species={"Aa"})
+		self.workFlowB = fakeObjs.FakeWorkFlow("valB", self.coeffConv, lambda c: (c[2]-2)**2 + 0.1*(c[0]-1)**2, species={"Aa","Bb"})
+		self.coordinator = wflowCoord.WorkFlowCoordinator([self.workFlowA, self.workFlowB])
+		objCalculator = SimpleNamespace(calculateObjFunction=lambda vals: vals.valA + vals.valB)
+		self.objFunct = tCode.ObjectiveFunction(self.coeffConv, self.coordinator, objCalculator)
+
+	def runTestFunct(self):
+		return tCode.carryOutOptimisationBlockCoordinate(self.objFunct, options={"xatol":1e-6, "fatol":1e-10})
+
+	def testBlocksFromConverter(self):
+		actBlocks = tCode.getCoeffBlocksFromConverter(self.coeffConv)
+		self.assertEqual(["pairpot_Aa_Aa", "hopping_Aa_Bb_0_1_0"], [x.label for x in actBlocks])
+		self.assertEqual([[0,1],[2]], [x.coeffIndices.tolist() for x in actBlocks])
+		self.assertEqual([[frozenset(["Aa"])], [frozenset(["Aa","Bb"])]], [x.speciesSets for x in actBlocks])
+
+	def testDependentWorkFlows(self):
+		blockAa, blockAb = tCode.getCoeffBlocksFromConverter(self.coeffConv)
+		self.assertEqual([0,1], tCode.getDependentWorkFlowIndices(self.coordinator, blockAa))
+		self.assertEqual([1], tCode.getDependentWorkFlowIndices(self.coordinator, blockAb))
+
+	def testFindsMinimumAndSetsBestCoeffs(self):
+		output = self.runTestFunct()
+		self.assertTrue( np.allclose([1.0,-0.5,2.0], output.optRes.x, atol=1e-3) )
+		self.assertTrue( np.allclose(output.optRes.x, self.coeffConv.coeffs) )
+		self.assertAlmostEqual(output.optRes.fun, output.calcVals.valA + output.calcVals.valB)
+		self.assertEqual(None, self.coordinator.activeWorkFlowIndices)
+
+	def testIndependentWorkFlowsNotRerun(self):
+		output = self.runTestFunct()
+		self.assertEqual(output.optRes.nfev+1, self.workFlowB.nRuns) #+1 for final evaluation
+		self.assertTrue( self.workFlowA.nRuns < self.workFlowB.nRuns )
+
+	def testRefreshNotSkippedByEvalCache(self):
+		useCacheArgs = list()
+		objFunct = self.objFunct
+		class _RecordingObjFunct(tCode.ObjectiveFunction):
+			def __call__(self, coeffs, useCache=True):
+				useCacheArgs.append(useCache)
+				return super().__call__(coeffs, useCache=useCache)
+		self.objFunct = _RecordingObjFunct(self.coeffConv, self.coordinator, objFunct.objFunctCalculator)
+		tCode.carryOutOptimisationBlockCoordinate(self.objFunct, maxSweeps=1)
+		self.assertEqual(3, useCacheArgs.count(False)) #One refresh per block plus the final evaluation
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -7,6 +7,8 @@ from types import SimpleNamespace
 
 
 import plato_fit_integrals.core.obj_funct_calculator as tCode
+import plato_fit_integrals.core.property_vector as propVect
+import plato_fit_integrals.initialise.obj_functs_targ_vals as objCmpFuncts
 
 
 class TestTotalObjectiveFunctClass(unittest.TestCase):
@@ -79,6 +81,68 @@ def createMeanSqrDiffObjFunctOneVal():
 
 
 
+class TestCompiledObjectiveFunctPlan(unittest.TestCase):
+
+	def setUp(self):
+		sqrDevFunct = objCmpFuncts.createSimpleTargValObjFunction("sqrdev")
+		absDevFunct = objCmpFuncts.createSimpleTargValObjFunction("absdev")
+		self.contribA = tCode.ObjectiveFunctionContrib( SimpleNamespace(hcp_v0=(20,sqrDevFunct), hcp_b0=(15,absDevFunct)) )
+		self.contribB = createObjFunctContribObjA() #Plain python functions, so evaluated as scalars within the plan
+		self.calcVals = SimpleNamespace(hcp_v0=19, hcp_b0=17)
+		self.weights = [2.0,0.5]
+		self.createTestObj()
+
+	def createTestObj(self):
+		innerTotal = tCode.ObjectiveFunctTotal( [self.contribA], weights=[3.0] )
+		self.totalObj = tCode.ObjectiveFunctTotal( [innerTotal, self.contribB], weights=self.weights )
+
+	def testPlanMatchesNestedTotal(self):
+		expVal = self.totalObj.calculateObjFunction(self.calcVals)
+		actVal = self.totalObj.getCompiledPlan().calculateObjFunction(self.calcVals)
+		self.assertAlmostEqual(expVal, actVal)
+
+	def testPlanGivesSameValueForPropertyVector(self):
+		propVector = propVect.PropertyVector(["hcp_b0","hcp_v0"])
+		propVector.setValuesFromNamespace(self.calcVals)
+		testPlan = self.totalObj.getCompiledPlan()
+		expVal = testPlan.calculateObjFunction(self.calcVals)
+		actVal = testPlan.calculateObjFunction(propVector)
+		self.assertAlmostEqual(expVal, actVal)
+
+	def testPlanFlattensAllTerms(self):
+		expProps = ["hcp_v0","hcp_b0","hcp_v0","hcp_b0"]
+		actProps = self.totalObj.getCompiledPlan().props
+		self.assertEqual(sorted(expProps), sorted(actProps))
+
+	def testOverflowHandledSameAsScalarFunct(self):
+		self.calcVals = SimpleNamespace(hcp_v0=1e199, hcp_b0=15)
+		self.totalObj = tCode.ObjectiveFunctTotal( [self.contribA] )
+		expVal = 1e30 #Default value returned on overflow
+		actVal = self.totalObj.getCompiledPlan().calculateObjFunction(self.calcVals)
+		self.assertEqual(expVal, actVal)
+
+	def testTotalUsesPlanWithPropertyVector(self):
+		expVal = 2.0*3.0*(1 + 2) + 0.5*self.contribB.calculateObjFunction(self.calcVals)
+		propVector = propVect.PropertyVector(["hcp_b0","hcp_v0"])
+		propVector.setValuesFromNamespace(self.calcVals)
+		self.assertTrue(self.totalObj.supportsPropertyVector)
+		self.assertAlmostEqual(expVal, self.totalObj.calculateObjFunction(propVector))
+
+	def testPlanRebuiltWhenWeightsChange(self):
+		self.totalObj.calculateObjFunction(self.calcVals)
+		self.totalObj.weights = [0.0, 1.0]
+		expVal = self.contribB.calculateObjFunction(self.calcVals)
+		self.assertAlmostEqual(expVal, self.totalObj.calculateObjFunction(self.calcVals))
+
+	def testFallsBackToLoopIfComponentCantBeCompiled(self):
+		mockedTotal = tCode.ObjectiveFunctTotal( [self.contribA, createMockObjFunctContribA()] )
+		self.assertFalse(mockedTotal.supportsPropertyVector)
+		self.assertAlmostEqual(1 + 2 + 5, mockedTotal.calculateObjFunction(self.calcVals))
+
+	def testRaisesIfComponentCantBeCompiled(self):
+		mockedTotal = tCode.ObjectiveFunctTotal( [self.contribA, createMockObjFunctContribA()] )
+		with self.assertRaises(NotImplementedError):
+			mockedTotal.getCompiledPlan()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+from types import SimpleNamespace
+
+import plato_fit_integrals.core.candidate_slots as tCode
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.opt_runner as optRunner
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+import plato_fit_integrals.shared.workflow_helpers as wFlowHelpers
+
+
+class TestCreateCandidateSlots(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.nSlots = 3
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def testSlotsGetSeparateFolders(self):
+		slots = tCode.createCandidateSlots(_createFakeSlotObjs, self.nSlots, self.tempDir.name)
+		expFolders = [os.path.join(self.tempDir.name, "slot_{}".format(x)) for x in range(self.nSlots)]
+		self.assertEqual(expFolders, [x.folder for x in slots])
+		self.assertTrue( all([os.path.isdir(x) for x in expFolders]) )
+
+	def testRaisesForSharedWorkFolder(self):
+		sharedFolder = os.path.join(self.tempDir.name, "shared")
+		slotFactory = lambda slotFolder: _createFakeSlotObjs(slotFolder, workFolder=sharedFolder)
+		with self.assertRaises(ValueError):
+			tCode.createCandidateSlots(slotFactory, self.nSlots, self.tempDir.name)
+
+
+class TestCreateCandidateSlotsFromExisting(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.modelFolder = os.path.join(self.tempDir.name, "orig", "model")
+		self.workRoot = os.path.join(self.tempDir.name, "orig", "work")
+		self.nSlots = 2
+		os.makedirs(self.modelFolder)
+		with open(os.path.join(self.modelFolder,"Mg_Mg.bdt"),"w") as f:
+			f.write("table")
+		integInfo = SimpleNamespace(filePath=os.path.join(self.modelFolder,"Mg_Mg.bdt"))
+		self.coeffConv = mock.Mock()
+		self.coeffConv.getCoeffIndicesPerTable.return_value = [(integInfo, [0,1])]
+		self.coeffConv.getCopyInModelFolder.side_effect = lambda modelFolder: SimpleNamespace(modelFolder=modelFolder)
+		workFlows = [_ReRootableWorkFlow(os.path.join(self.workRoot,x)) for x in ["eos","ecurve"]]
+		self.coordinator = wflowCoord.WorkFlowCoordinator(workFlows)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def _runTestFunct(self, **kwargs):
+		return tCode.createCandidateSlotsFromExisting(self.coeffConv, self.coordinator, self.nSlots, self.tempDir.name, **kwargs)
+
+	def testModelCopiedAndTablesPointAtCopy(self):
+		slots = self._runTestFunct()
+		for slot in slots:
+			expModelFolder = os.path.join(slot.folder, "model")
+			self.assertEqual(expModelFolder, slot.coeffTableConverter.modelFolder)
+			self.assertTrue( os.path.isfile(os.path.join(expModelFolder,"Mg_Mg.bdt")) )
+
+	def testWorkFlowsReRootedIntoSlots(self):
+		slots = self._runTestFunct()
+		for slot in slots:
+			expFolders = set([os.path.join(slot.folder,"workflows",x) for x in ["eos","ecurve"]])
+			self.assertEqual(expFolders, slot.workFolders)
+			self.assertTrue( all([x.dataset==os.path.join(slot.folder,"model") for x in slot.workFlowCoordinator._workFlows]) )
+
+	def testDatasetFunctAndExecutorFactoryUsed(self):
+		executor = mock.Mock()
+		slots = self._runTestFunct(datasetFunct=os.path.basename, executorFactory=lambda nCores: executor)
+		self.assertTrue( all([x.dataset=="model" for x in slots[0].workFlowCoordinator._workFlows]) )
+		self.assertIs(executor, slots[0].workFlowCoordinator.executor)
+
+	def testRaisesForTablesInSeveralFolders(self):
+		otherInfo = SimpleNamespace(filePath=os.path.join(self.workRoot,"Mg_Mg.bdt"))
+		self.coeffConv.getCoeffIndicesPerTable.return_value.append( (otherInfo, [2]) )
+		with self.assertRaises(ValueError):
+			self._runTestFunct()
+
+
+class TestEvaluateAsync(unittest.TestCase):
+
+	def setUp(self):
+		self.nSlots = 2
+		self.runTime = 0.1
+		self.objFunctCalc = mock.Mock()
+		self.objFunctCalc.supportsPropertyVector = False
+		self.objFunctCalc.calculateObjFunction.side_effect = lambda calcVals: sum(calcVals.coeffs)
+		self.nRunning, self.maxRunning, self.lock = 0, 0, threading.Lock()
+		slots = [self._createSlot() for x in range(self.nSlots)]
+		self.testObj = optRunner.ObjectiveFunction(mock.Mock(), mock.Mock(), self.objFunctCalc, candidateSlots=slots)
+
+	def _createSlot(self):
+		coeffConv = SimpleNamespace(coeffs=None, writeTables=lambda: None)
+		def _runWorkFlows():
+			with self.lock:
+				self.nRunning += 1
+				self.maxRunning = max(self.maxRunning, self.nRunning)
+			time.sleep(self.runTime)
+			with self.lock:
+				self.nRunning -= 1
+			return SimpleNamespace(coeffs=coeffConv.coeffs)
+		coordinator = SimpleNamespace(runAndGetPropertyValues=_runWorkFlows)
+		return tCode.CandidateSlot(coeffConv, coordinator)
+
+	def testValuesInInputOrder(self):
+		allCoeffs = [[1.0,2.0], [3.0,4.0], [5.0,6.0]]
+		self.assertEqual([3.0,7.0,11.0], self.testObj.evaluateBatch(allCoeffs))
+
+	def testConcurrencyLimitedBySlots(self):
+		self.testObj.evaluateBatch([[float(x)] for x in range(5)])
+		self.assertEqual(self.nSlots, self.maxRunning)
+
+	def testReusableAcrossEventLoops(self):
+		self.assertEqual(1.0, asyncio.run(self.testObj.evaluateAsync([1.0])))
+		self.assertEqual(2.0, asyncio.run(self.testObj.evaluate_async([2.0])))
+
+	def testOneIterationRecordPerCandidate(self):
+		phaseTimer = instrumentation.PhaseTimer()
+		with phaseTimer.timePhase("stale"): #Recorded outside of any iteration, so should be discarded
+			pass
+		self.testObj.phaseTimer = phaseTimer
+		self.testObj.evaluateBatch([[float(x)] for x in range(3)])
+		self.assertEqual(3, len(phaseTimer.history))
+		self.assertTrue( all(["stale" not in x["phases"] for x in phaseTimer.history]) )
+
+	def testRaisesWithFidelitySchedule(self):
+		with self.assertRaises(ValueError):
+			optRunner.ObjectiveFunction(mock.Mock(), None, self.objFunctCalc, fidelitySchedule=mock.Mock(), candidateSlots=list())
+
+
+class _ReRootableWorkFlow(wflowCoord.WorkFlowBase):
+
+	def __init__(self, workFolder, dataset=None):
+		self._workFolder = os.path.abspath(workFolder)
+		self.dataset = dataset
+
+	@property
+	def workFolder(self):
+		return self._workFolder
+
+	@property
+	def namespaceAttrs(self):
+		return [os.path.basename(self.workFolder)]
+
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None):
+		return _ReRootableWorkFlow(wFlowHelpers.getReRootedPath(self.workFolder, oldRoot, newRoot), dataset=dataset)
+
+
+def _createFakeSlotObjs(slotFolder, workFolder=None):
+	workFolder = os.path.join(slotFolder, "work") if workFolder is None else workFolder
+	coeffConv = SimpleNamespace(_integInfo=[SimpleNamespace(filePath=os.path.join(slotFolder,"model","Mg_Mg.bdt"))])
+	coordinator = SimpleNamespace(_workFlows=[SimpleNamespace(workFolder=workFolder)])
+	return coeffConv, coordinator
+
+
+if __name__ == '__main__':
+	unittest.main()
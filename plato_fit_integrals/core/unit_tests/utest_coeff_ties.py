@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+import unittest
+import unittest.mock as mock
+from types import SimpleNamespace
+
+import plato_fit_integrals.core.coeff_ties as tCode
+
+
+class TestTiedCoeffsTablesConverter(unittest.TestCase):
+
+	def setUp(self):
+		self.innerConverter = SimpleNamespace(coeffs=[1.0, 2.0, 3.0, 4.0, 5.0], writeTables=mock.Mock())
+		self.tiedGroups = [[3,0], [1,4]]
+		self.createTestObj()
+
+	def createTestObj(self):
+		self.testObj = tCode.TiedCoeffsTablesConverter(self.innerConverter, self.tiedGroups)
+
+	def testFreeParamsFromFirstOfEachGroup(self):
+		self.assertEqual(3, self.testObj.nFreeParams)
+		self.assertEqual([1.0, 2.0, 3.0], self.testObj.coeffs.tolist())
+
+	def testSettingFreeParamsSetsAllTiedCoeffs(self):
+		self.testObj.coeffs = [7.0, 8.0, 9.0]
+		self.assertEqual([7.0, 8.0, 9.0, 7.0, 8.0], list(self.innerConverter.coeffs))
+
+	def testSetCoeffsAtIndicesSetsTiedCoeffs(self):
+		self.innerConverter.setCoeffsAtIndices = mock.Mock()
+		self.testObj.setCoeffsAtIndices([0], [7.0])
+		actIndices, actVals = self.innerConverter.setCoeffsAtIndices.call_args[0]
+		self.assertEqual([0,3], actIndices.tolist())
+		self.assertEqual([7.0,7.0], actVals.tolist())
+
+	def testOtherAttributesPassedThrough(self):
+		self.testObj.writeTables()
+		self.innerConverter.writeTables.assert_called_once_with()
+
+	def testFullCoeffsForMatrix(self):
+		actMatrix = self.testObj.getFullCoeffs([[1.0,2.0,3.0], [4.0,5.0,6.0]])
+		self.assertEqual([[1.0,2.0,3.0,1.0,2.0], [4.0,5.0,6.0,4.0,5.0]], actMatrix.tolist())
+
+	def testRaisesForRepeatedIndex(self):
+		self.tiedGroups = [[0,1], [1,2]]
+		with self.assertRaises(ValueError):
+			self.createTestObj()
+
+	def testRaisesForWrongNumbFreeParams(self):
+		with self.assertRaises(TypeError):
+			self.testObj.coeffs = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+class TestGetTiedGroupsForReprs(unittest.TestCase):
+
+	def testTwoPairsOfReprs(self):
+		nCoeffsPerRepr = [2,1,2,1]
+		expGroups = [[0,3], [1,4], [2,5]]
+		self.assertEqual(expGroups, tCode.getTiedGroupsForReprs(nCoeffsPerRepr, [[0,2], [1,3]]))
+
+	def testSelectedCoeffsOnly(self):
+		self.assertEqual([[1,4]], tCode.getTiedGroupsForReprs([3,3], [[0,1]], coeffIndices=[1]))
+
+	def testRaisesForDifferentNumbCoeffs(self):
+		with self.assertRaises(ValueError):
+			tCode.getTiedGroupsForReprs([2,1], [[0,1]])
+
+
+if __name__ == '__main__':
+	unittest.main()
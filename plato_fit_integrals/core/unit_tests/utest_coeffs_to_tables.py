@@ -3,13 +3,18 @@
 import copy
 import itertools as it
 import os
+import threading
 import unittest
 import unittest.mock as mock
+from types import SimpleNamespace
 
+import numpy as np
 
 import plato_pylib.plato.parse_tbint_files as parseTbint
 import plato_pylib.plato.private.tbint_test_data as tData
 import plato_fit_integrals.core.coeffs_to_tables as tCode
+import plato_fit_integrals.core.create_analytical_reprs as aReprs
+import plato_fit_integrals.core.table_checks as tableChecks
 
 class TestIntegralHolder(unittest.TestCase):
 	
@@ -107,6 +112,43 @@ class TestIntegralHolder(unittest.TestCase):
 
 
 
+class TestLazyIntegralHolder(unittest.TestCase):
+
+	def setUp(self):
+		self.atomPairNames = [("Mg","Mg"), ("Xa","Xb")]
+		self.bdtPaths = ["Mg_Mg.bdt", "Xa_Xb.bdt"]
+		self.integDict = {k.lower():v for k,v in tData.loadTestBdtFileAExpectedVals_format4().items()}
+		self.parsedPaths = list()
+		self.testObj = tCode.LazyIntegralsHolder(self.atomPairNames, self.bdtPaths, parseFunct=self._fakeParseFunct)
+
+	def _fakeParseFunct(self, bdtPath):
+		self.parsedPaths.append(bdtPath)
+		return copy.deepcopy(self.integDict)
+
+	def testNoFilesParsedOnCreation(self):
+		self.assertEqual(list(), self.parsedPaths)
+		self.assertEqual(list(), self.testObj.loadedAtomPairs)
+
+	def testOnlyRequestedFileParsed(self):
+		expTable = tCode.IntegralsHolder([("Xa","Xb")], [self.integDict]).getIntegTable("pairpot", "Xa", "Xb")
+		actTable = self.testObj.getIntegTable("pairpot", "Xa", "Xb")
+		self.testObj.getIntegTable("hopping", "Xa", "Xb", shellA=1, shellB=1, axAngMom=2)
+		self.assertEqual(expTable, actTable)
+		self.assertEqual(["Xa_Xb.bdt"], self.parsedPaths)
+		self.assertEqual([("Xa","Xb")], self.testObj.loadedAtomPairs)
+
+	def testSetterChangesLoadedDict(self):
+		testSetTable = self.testObj.getIntegTable("pairpot", "Mg", "Mg")
+		testSetTable.integrals[:,1] *= -1
+		self.testObj.setIntegTable(testSetTable, "pairpot", "Mg", "Mg")
+		self.assertEqual(testSetTable, self.testObj.getIntegTable("pairpot", "Mg", "Mg"))
+		self.assertEqual(["Mg_Mg.bdt"], self.parsedPaths)
+
+	def testMismatchedPathsRaises(self):
+		with self.assertRaises(ValueError):
+			tCode.LazyIntegralsHolder(self.atomPairNames, self.bdtPaths[:1], parseFunct=self._fakeParseFunct)
+
+
 class TestCoeffsTableConverterWriteTables(unittest.TestCase):
 
 	def setUp(self):
@@ -167,6 +209,159 @@ class TestCoeffsTableConverterPassCoeffs(unittest.TestCase):
 		actCoeffs = self.testObj.coeffs
 		[self.assertEqual(exp,act) for exp,act in it.zip_longest(expCoeffs,actCoeffs)]
 
+
+class TestCoeffsTableConverterCopyInModelFolder(unittest.TestCase):
+
+	def setUp(self):
+		self.oldFolder, self.newFolder = os.path.abspath("old_model"), os.path.abspath("new_model")
+		analyticalRepr = mock.Mock(nCoeffs=2, coeffs=[1,2])
+		integHolder = tCode.LazyIntegralsHolder([("Xa","Xb")], [os.path.join(self.oldFolder,"Xa_Xb.bdt")], parseFunct=lambda path: dict())
+		self.testObj = tCode.CoeffsTablesConverter([analyticalRepr], [createIntegTableInfoXaXbPairPot(self.oldFolder)], integHolder)
+
+	def testCopyUsesNewModelFolder(self):
+		outObj = self.testObj.getCopyInModelFolder(self.newFolder)
+		expPath = os.path.join(self.newFolder, "Xa_Xb.bdt")
+		self.assertEqual([expPath], [x.filePath for x,unused in outObj.getCoeffIndicesPerTable()])
+		self.assertEqual([expPath], outObj._integHolder.bdtPaths)
+
+	def testOriginalUnchanged(self):
+		outObj = self.testObj.getCopyInModelFolder(self.newFolder)
+		outObj.coeffs = [5,6]
+		expPath = os.path.join(self.oldFolder, "Xa_Xb.bdt")
+		self.assertEqual([expPath], [x.filePath for x,unused in self.testObj.getCoeffIndicesPerTable()])
+		self.assertEqual([1,2], list(self.testObj.coeffs))
+		self.assertIs(self.testObj.phaseTimer, outObj.phaseTimer)
+
+
+class TestCoeffsTableConverterCoeffViews(unittest.TestCase):
+
+	def setUp(self):
+		self.expFunct = aReprs.ExpDecayFunct(r0=1.0, prefactor=5, alpha=0.6)
+		self.cawkFunct = aReprs.Cawkwell17ModTailRepr(rCut=10, refR0=5, valAtR0=3.2, startCoeffs=[-0.2,-0.1], tailDelta=4.0)
+		self.mockRepr = mock.Mock(spec=["coeffs","nCoeffs"])
+		self.mockRepr.coeffs, self.mockRepr.nCoeffs = [7.0], 1
+		self.testObj = tCode.CoeffsTablesConverter([self.expFunct, self.cawkFunct, self.mockRepr], [None,None,None], None)
+
+	def testSetCoeffsSeenByAllReprs(self):
+		self.testObj.coeffs = [1.0, 2.0, 3.0, 4.0, 5.0]
+		self.assertEqual([1.0,2.0], self.expFunct.coeffs)
+		self.assertEqual([3.0,4.0], self.cawkFunct.coeffs)
+		self.assertEqual([5.0], self.mockRepr.coeffs)
+
+	def testChangesOnReprsSeenByGetter(self):
+		self.testObj.coeffs = [1.0, 2.0, 3.0, 4.0, 5.0]
+		self.cawkFunct.coeffs = [-1.0, -2.0]
+		self.mockRepr.coeffs = [-3.0]
+		self.assertEqual([1.0, 2.0, -1.0, -2.0, -3.0], self.testObj.coeffs.tolist())
+
+	def testReprChangingNumbCoeffsHandled(self):
+		self.testObj.coeffs = [1.0, 2.0, 3.0, 4.0, 5.0]
+		self.cawkFunct.promoteValAtR0ToVariable()
+		self.assertEqual([1.0, 2.0, 3.0, 4.0, 3.2, 5.0], self.testObj.coeffs.tolist())
+		self.testObj.coeffs = [1.0, 2.0, 3.0, 4.0, 6.0, 5.0]
+		self.assertEqual(6.0, self.cawkFunct.valAtR0)
+
+	def testRaisesForWrongNumbCoeffs(self):
+		with self.assertRaises(TypeError):
+			self.testObj.coeffs = [1.0, 2.0]
+
+	def testSetCoeffsAtIndicesLeavesOthersAlone(self):
+		self.testObj.coeffs = [1.0, 2.0, 3.0, 4.0, 5.0]
+		self.testObj.setCoeffsAtIndices([1,4], [-2.0, -5.0])
+		self.assertEqual([1.0, -2.0, 3.0, 4.0, -5.0], self.testObj.coeffs.tolist())
+		self.assertEqual([-5.0], self.mockRepr.coeffs)
+
+	def testConcurrentSetCoeffsAtIndices(self):
+		reprA, reprB = mock.Mock(spec=["coeffs","nCoeffs"]), mock.Mock(spec=["coeffs","nCoeffs"])
+		reprA.coeffs, reprA.nCoeffs, reprB.coeffs, reprB.nCoeffs = [0.0,0.0], 2, [0.0,0.0], 2
+		testObj = tCode.CoeffsTablesConverter([reprA, reprB], [None,None], None)
+		def _setRepeatedly(coeffIndices):
+			for val in range(200):
+				testObj.setCoeffsAtIndices(coeffIndices, [float(val) for x in coeffIndices])
+				testObj.coeffs
+		threads = [threading.Thread(target=_setRepeatedly, args=(x,)) for x in [[0,1],[2,3]]]
+		for x in threads:
+			x.start()
+		for x in threads:
+			x.join()
+		self.assertEqual([199.0, 199.0, 199.0, 199.0], testObj.coeffs.tolist())
+		self.assertEqual([[199.0,199.0],[199.0,199.0]], [reprA.coeffs, reprB.coeffs])
+
+	def testDeepCopyAfterAccessingCoeffsRebinds(self):
+		testObj = tCode.CoeffsTablesConverter([self.expFunct, self.cawkFunct], [None,None], None)
+		testObj.coeffs = [1.0, 0.5, 3.0, 0.9]
+		copiedObj = copy.deepcopy(testObj)
+		self.assertEqual([1.0, 0.5, 3.0, 0.9], copiedObj.coeffs.tolist())
+		copiedObj.coeffs = [2.0, 0.6, 4.0, 1.1]
+		self.assertEqual([2.0, 0.6, 4.0, 1.1], copiedObj.coeffs.tolist())
+		self.assertEqual([4.0, 1.1], copiedObj._analyticalReps[1].coeffs)
+		self.assertEqual([1.0, 0.5, 3.0, 0.9], testObj.coeffs.tolist())
+		self.assertEqual([3.0, 0.9], self.cawkFunct.coeffs)
+
+
+class TestCoeffsTableConverterCoeffMatrix(unittest.TestCase):
+
+	def setUp(self):
+		self.xVals = np.array([1.0,2.0,3.0])
+		integHolder = mock.Mock()
+		integHolder.getIntegTableFromInfoObj.return_value = SimpleNamespace(integrals=np.column_stack([self.xVals, np.zeros(3)]))
+		self.aReprs = [_FakeLinearRepr(), _FakeLinearRepr()]
+		self.testObj = tCode.CoeffsTablesConverter(self.aReprs, [mock.Mock(), mock.Mock()], integHolder)
+
+	def testBlocksSplitCoeffsBetweenTables(self):
+		coeffMatrix = [[1.0,2.0], [3.0,4.0]]
+		expBlocks = [np.array([1.0*self.xVals, 3.0*self.xVals]), np.array([2.0*self.xVals, 4.0*self.xVals])]
+		actBlocks = self.testObj.getTableBlocksForCoeffMatrix(coeffMatrix)
+		[self.assertTrue(np.allclose(exp,act)) for exp,act in it.zip_longest(expBlocks,actBlocks)]
+
+	def testOnlyRequestedTablesReturned(self):
+		actBlocks = self.testObj.getTableBlocksForCoeffMatrix([[1.0,2.0]], tableIndices=[1])
+		self.assertEqual(1, len(actBlocks))
+		self.assertTrue( np.allclose([2.0*self.xVals], actBlocks[0]) )
+
+	def testRaisesForWrongNumbCoeffs(self):
+		with self.assertRaises(TypeError):
+			self.testObj.getTableBlocksForCoeffMatrix([[1.0,2.0,3.0]])
+
+
+class TestCoeffsTableConverterTableChecks(unittest.TestCase):
+
+	def setUp(self):
+		integHolder = mock.Mock()
+		integHolder.getIntegTable.side_effect = lambda *args: SimpleNamespace(integrals=np.array([[1.0,0.0],[2.0,0.0]]))
+		self.aRepr = mock.Mock()
+		self.aRepr.evalAtListOfXVals = _evalOverflowIntoOut
+		self.integInfo = createIntegTableInfoXaXbPairPot( os.getcwd() )
+		self.testObj = tCode.CoeffsTablesConverter([self.aRepr], [self.integInfo], integHolder)
+		self.testObj._writeTables = mock.Mock()
+		self.testObj.tableChecks = [tableChecks.MaxAbsValueCheck()]
+
+	def testInfeasibleTablesNotWritten(self):
+		with self.assertRaises(tableChecks.InfeasibleTablesError) as ctx:
+			self.testObj.writeTables()
+		self.assertEqual(["max_abs_value"], [x.checkName for x in ctx.exception.failures])
+		self.testObj._writeTables.assert_not_called()
+
+	def testFeasibleTablesWritten(self):
+		self.aRepr.evalAtListOfXVals = _evalZerosIntoOut
+		self.testObj.writeTables()
+		self.testObj._writeTables.assert_called_once_with(range(1))
+
+
+class _FakeLinearRepr():
+	nCoeffs = 1
+	def evalAtListOfXValsForCoeffMatrix(self, xVals, coeffMatrix):
+		return np.asarray(coeffMatrix)[:,0:1] * np.asarray(xVals)[np.newaxis,:]
+
+
+def _evalZerosIntoOut(xVals, out=None):
+	out[:] = 0
+	return out
+
+def _evalOverflowIntoOut(xVals, out=None):
+	out[:] = 1e30
+	return out
+
 def createIntegTableInfoXaXbPairPot(modelFolder):
 	return tCode.IntegralTableInfo(modelFolder, "pairpot", "Xa", "Xb")
 
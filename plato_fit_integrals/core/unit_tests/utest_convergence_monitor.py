@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.convergence_monitor as tCode
+import plato_fit_integrals.core.opt_runner as optRunner
+import plato_fit_integrals.core.unit_tests.fake_objects as fakeObjs
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+
+
+class TestConvergenceMonitor(unittest.TestCase):
+
+	def setUp(self):
+		self.testObj = tCode.ConvergenceMonitor(window=3, relTol=1e-2)
+
+	def testTracksBestSoFar(self):
+		for coeffs, val in [([1.0],5.0), ([2.0],3.0), ([3.0],4.0)]:
+			self.testObj.update(coeffs, val)
+		self.assertEqual(3.0, self.testObj.bestVal)
+		self.assertEqual([2.0], self.testObj.bestCoeffs.tolist())
+		self.assertEqual([5.0, 3.0, 3.0], self.testObj.bestValHistory)
+
+	def testStopsOnceImprovementBelowTol(self):
+		newlyStopped = [self.testObj.update([float(x)], val) for x,val in enumerate([10.0, 5.0, 4.99, 4.98, 4.98, 4.97])]
+		self.assertEqual([False, False, False, False, True, False], newlyStopped)
+		self.assertTrue(self.testObj.stopped)
+
+	def testDriftTolPreventsStopWhileCoeffsMoving(self):
+		self.testObj.driftTol = 1e-3
+		newlyStopped = [self.testObj.update([float(x)], 10.0-1e-4*x) for x in range(8)]
+		self.assertFalse( any(newlyStopped) )
+		self.assertAlmostEqual(0.75, self.testObj.getCoeffDrift()) #Moved 4->7, relative to max(abs(4),1)
+
+	def testResetForgetsEvaluations(self):
+		[self.testObj.update([1.0], 1.0) for x in range(5)]
+		self.testObj.reset()
+		self.assertEqual( (0, np.inf, False), (self.testObj.nEvals, self.testObj.bestVal, self.testObj.stopped) )
+
+
+class TestOptimiserStopsOnStagnation(unittest.TestCase):
+
+	def setUp(self):
+		self.coeffConv = SimpleNamespace(coeffs=[3.0, 3.0], writeTables=lambda: None)
+		self.workFlow = fakeObjs.FakeWorkFlow("val", self.coeffConv, lambda c: max( (c[0]-1)**2 + (c[1]+2)**2, 0.5 )) #Plateau near the minimum
+		coordinator = wflowCoord.WorkFlowCoordinator([self.workFlow])
+		objCalculator = SimpleNamespace(calculateObjFunction=lambda vals: vals.val)
+		self.monitor = tCode.ConvergenceMonitor(window=10, relTol=1e-6)
+		self.objFunct = optRunner.ObjectiveFunction(self.coeffConv, coordinator, objCalculator, convergenceMonitor=self.monitor)
+
+	def testStopsEarlyWithBestCoeffsWritten(self):
+		output = optRunner.carryOutOptimisationBasicOptions(self.objFunct, method="Nelder-Mead", options={"maxfev":1000})
+		self.assertTrue(self.monitor.stopped)
+		self.assertTrue(output.optRes.nfev < 200)
+		self.assertEqual(self.monitor.bestCoeffs.tolist(), list(self.coeffConv.coeffs))
+		self.assertAlmostEqual(0.5, output.optRes.fun)
+		self.assertAlmostEqual(0.5, output.calcVals.val)
+
+	def testSurrogateOptimiserStopsEarly(self):
+		self.monitor.update([0.0,0.0], -1.0) #Left from an earlier fit; should be reset
+		output = optRunner.carryOutOptimisationSurrogateAssisted(self.objFunct, maxEvals=200, surrogate="quadratic", initStepSize=1.0)
+		self.assertTrue(self.monitor.stopped)
+		self.assertTrue(output.optRes.nfev < 200)
+		self.assertAlmostEqual(0.5, output.optRes.fun)
+		self.assertEqual(output.optRes.x.tolist(), list(self.coeffConv.coeffs))
+		self.assertAlmostEqual(0.5, output.calcVals.val)
+
+	def testNotUpdatedByEvaluateAsync(self):
+		self.assertEqual([0.5, 0.5], self.objFunct.evaluateBatch([[1.0,-2.0], [1.0,-2.0]]))
+		self.assertEqual(0, self.monitor.nEvals)
+
+
+if __name__ == '__main__':
+	unittest.main()
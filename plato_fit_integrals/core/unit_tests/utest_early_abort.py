@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.obj_funct_calculator as objCalculators
+import plato_fit_integrals.core.opt_runner as tCode
+import plato_fit_integrals.core.unit_tests.fake_objects as fakeObjs
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+
+
+class TestObjectiveFunctionEarlyAbort(unittest.TestCase):
+
+	def setUp(self):
+		self.coeffConv = SimpleNamespace(coeffs=[0.0, 0.0], writeTables=lambda: None)
+		self.cheapWorkFlow = fakeObjs.FakeWorkFlow("valA", self.coeffConv, lambda c: (c[0]-1)**2)
+		self.costlyWorkFlow = fakeObjs.FakeWorkFlow("valB", self.coeffConv, lambda c: (c[1]-2)**2)
+		self.coordinator = wflowCoord.WorkFlowCoordinator([self.costlyWorkFlow, self.cheapWorkFlow])
+		self.coordinator._workFlowCosts = {0:10.0, 1:1.0}
+		self.targVals = SimpleNamespace(valA=(0.0, lambda targ,act: act-targ), valB=(0.0, lambda targ,act: act-targ))
+		self.objFunct = tCode.ObjectiveFunction(self.coeffConv, self.coordinator, objCalculators.ObjectiveFunctionContrib(self.targVals),
+		                                        abortThreshold=0.5)
+
+	def testAbortsAfterCheapStage(self):
+		self.objFunct.phaseTimer = instrumentation.PhaseTimer()
+		actVal = self.objFunct([3.0, 0.0])
+		self.assertEqual(np.inf, actVal)
+		self.assertEqual([1,0], [self.cheapWorkFlow.nRuns, self.costlyWorkFlow.nRuns])
+		self.assertEqual(1, self.objFunct.phaseTimer.history[-1]["counters"]["aborted_evaluations"])
+
+	def testFullValueWhenOnlyLastStageExceedsThreshold(self):
+		actVal = self.objFunct([1.0, 3.0])
+		self.assertAlmostEqual(1.0, actVal) #No later stages left to skip, so the full value is returned
+		self.assertEqual([1,1], [self.cheapWorkFlow.nRuns, self.costlyWorkFlow.nRuns])
+
+	def testNoAbortWithSingleStage(self):
+		self.objFunct.nStages = 1
+		actVal = self.objFunct([3.0, 0.0])
+		self.assertAlmostEqual(8.0, actVal)
+		self.assertEqual([1,1], [self.cheapWorkFlow.nRuns, self.costlyWorkFlow.nRuns])
+
+	def testRunsNormallyWithoutPlanEntries(self):
+		self.objFunct.objFunctCalculator = SimpleNamespace(calculateObjFunction=lambda vals: vals.valA + vals.valB)
+		actVal = self.objFunct([3.0, 0.0])
+		self.assertAlmostEqual(8.0, actVal)
+
+	def testSurrogateOptimiserRestoresThreshold(self):
+		self.objFunct.abortThreshold = None
+		output = tCode.carryOutOptimisationSurrogateAssisted(self.objFunct, maxEvals=12, surrogate="quadratic", abortFactor=2.0)
+		self.assertEqual(None, self.objFunct.abortThreshold)
+		self.assertTrue( np.isfinite(output.optRes.fun) )
+
+
+if __name__ == '__main__':
+	unittest.main()
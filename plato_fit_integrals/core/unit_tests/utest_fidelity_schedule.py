@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+import unittest
+import unittest.mock as mock
+
+from types import SimpleNamespace
+
+import plato_fit_integrals.core.convergence_monitor as convMonitor
+import plato_fit_integrals.core.fidelity_schedule as tCode
+import plato_fit_integrals.core.opt_runner as optRunner
+
+
+class TestFidelitySchedulePromotion(unittest.TestCase):
+
+	def setUp(self):
+		self.fidelityLevels = ["coarse", None] #Strings are fine; the schedule just passes them to the factories
+		self.stallIters = 2
+		self.relTol = 1e-3
+		self.factoryA = createMockFactory("folder_a", ["prop_a"])
+		self.createTestObj()
+
+	def createTestObj(self):
+		self.testObj = tCode.FidelitySchedule(self.fidelityLevels, [self.factoryA], stallIters=self.stallIters, relTol=self.relTol)
+
+	def testFactoryFidelitySetOnCoordinatorCreation(self):
+		self.testObj.workFlowCoordinator
+		self.assertEqual("coarse", self.factoryA.fidelity)
+
+	def testPromotesAfterStall(self):
+		objVals = [5.0, 4.0, 4.0, 4.0]
+		promoted = [self.testObj.updateWithObjVal(x) for x in objVals]
+		self.assertEqual([False,False,False,True], promoted)
+		self.assertTrue(self.testObj.isFinalLevel)
+
+	def testNewCoordinatorCreatedOnPromotion(self):
+		startCoord = self.testObj.workFlowCoordinator
+		self.testObj.promote()
+		self.assertFalse(startCoord is self.testObj.workFlowCoordinator)
+		self.assertEqual(None, self.factoryA.fidelity)
+
+	def testNoPromotionPastFinalLevel(self):
+		self.testObj.promoteToFinal()
+		promoted = [self.testObj.updateWithObjVal(x) for x in [3.0,3.0,3.0,3.0]]
+		self.assertFalse(any(promoted))
+		with self.assertRaises(ValueError):
+			self.testObj.promote()
+
+
+class TestObjectiveFunctionCacheWithFidelity(unittest.TestCase):
+
+	def setUp(self):
+		self.coeffConv = mock.Mock()
+		self.objFunctCalc = mock.Mock()
+		self.objFunctCalc.supportsPropertyVector = False
+		self.objFunctCalc.calculateObjFunction.return_value = 4.0
+		self.schedule = tCode.FidelitySchedule(["coarse",None], [createMockFactory("folder_a", ["prop_a"])], stallIters=10)
+		self.testObj = optRunner.ObjectiveFunction(self.coeffConv, None, self.objFunctCalc, fidelitySchedule=self.schedule)
+
+	def testRepeatedCoeffsUseCache(self):
+		self.testObj([1.0,2.0])
+		self.testObj([1.0,2.0])
+		self.assertEqual(1, self.coeffConv.writeTables.call_count)
+
+	def testCacheNotUsedAfterPromotion(self):
+		self.testObj([1.0,2.0])
+		self.schedule.promote()
+		self.testObj.workFlowCoordinator = self.schedule.workFlowCoordinator
+		self.testObj([1.0,2.0])
+		self.assertEqual(2, self.coeffConv.writeTables.call_count)
+
+	def testConvergenceMonitorResetOnPromotion(self):
+		self.testObj.convergenceMonitor = convMonitor.ConvergenceMonitor(window=5)
+		self.testObj([1.0,2.0])
+		self.testObj([3.0,4.0])
+		with mock.patch.object(self.schedule, "updateWithObjVal", return_value=True):
+			self.testObj([5.0,6.0])
+		self.assertEqual(1, self.testObj.convergenceMonitor.nEvals)
+		self.assertEqual([5.0,6.0], self.testObj.convergenceMonitor.bestCoeffs.tolist())
+
+
+def createMockFactory(workFolder, namespaceAttrs):
+	def createWorkFlow():
+		outObj = SimpleNamespace(workFolder=workFolder, namespaceAttrs=list(namespaceAttrs), preRunShellComms=None)
+		outObj.run = lambda: None
+		outObj.output = SimpleNamespace(**{x:1.0 for x in namespaceAttrs})
+		return outObj
+	factory = mock.Mock(side_effect=createWorkFlow)
+	factory.fidelity = "unset"
+	return factory
+
+
+if __name__ == '__main__':
+	unittest.main()
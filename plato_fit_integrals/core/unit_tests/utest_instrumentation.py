@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+import json
+import os
+import tempfile
+import unittest
+
+import plato_fit_integrals.core.instrumentation as tCode
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+	def setUp(self):
+		self.rollingWindow = 3
+		self.jsonLinesPath = None
+		self.createTestObj()
+
+	def createTestObj(self):
+		self.testObj = tCode.PhaseTimer(rollingWindow=self.rollingWindow, jsonLinesPath=self.jsonLinesPath)
+
+	def _runOneIter(self, nRepeats=1):
+		self.testObj.startIteration()
+		for x in range(nRepeats):
+			with self.testObj.timePhase("write_tables"):
+				pass
+		with self.testObj.timePhase("workflow_run", workFlowLabel="0_eos"):
+			pass
+		return self.testObj.endIteration()
+
+	def testPhasesRecordedSeparatelyForWorkflows(self):
+		record = self._runOneIter()
+		self.assertEqual(["write_tables"], list(record["phases"].keys()))
+		self.assertEqual(["workflow_run"], list(record["workflows"]["0_eos"].keys()))
+		self.assertEqual(["0_eos"], self.testObj.getWorkFlowLabels())
+
+	def testRepeatedPhaseTimesAreSummed(self):
+		self._runOneIter(nRepeats=3)
+		stats = self.testObj.getRollingStats()
+		self.assertEqual(1, stats["write_tables"]["nSamples"])
+
+	def testHistoryLimitedToRollingWindow(self):
+		for x in range(self.rollingWindow+2):
+			self._runOneIter()
+		self.assertEqual(self.rollingWindow, len(self.testObj.history))
+		self.assertEqual(self.rollingWindow+1, self.testObj.history[-1]["iteration"])
+		self.assertEqual(self.rollingWindow, self.testObj.getRollingStats(workFlowLabel="0_eos")["workflow_run"]["nSamples"])
+
+	def testCountersStoredInRecord(self):
+		self.testObj.startIteration()
+		self.testObj.incrementCounter("rejected")
+		self.testObj.incrementCounter("rejected", increment=2)
+		record = self.testObj.endIteration()
+		self.assertEqual({"rejected":3}, record["counters"])
+
+	def testPhaseRecordedWhenExceptionRaised(self):
+		with self.assertRaises(ValueError):
+			with self.testObj.timePhase("run_plato"):
+				raise ValueError("")
+		record = self.testObj.endIteration()
+		self.assertTrue("run_plato" in record["phases"])
+
+	def testJsonLinesWritten(self):
+		with tempfile.TemporaryDirectory() as tempDir:
+			self.jsonLinesPath = os.path.join(tempDir, "timings.jsonl")
+			self.createTestObj()
+			self._runOneIter()
+			self._runOneIter()
+			with open(self.jsonLinesPath,"rt") as f:
+				records = [json.loads(x) for x in f.readlines()]
+		self.assertEqual([0,1], [x["iteration"] for x in records])
+
+
+class TestNullPhaseTimer(unittest.TestCase):
+
+	def testRecordsNothing(self):
+		testObj = tCode.NULL_PHASE_TIMER
+		testObj.startIteration()
+		with testObj.timePhase("write_tables"):
+			pass
+		self.assertEqual(None, testObj.endIteration())
+
+
+if __name__ == '__main__':
+	unittest.main()
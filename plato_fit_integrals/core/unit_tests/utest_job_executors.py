@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import plato_fit_integrals.core.job_executors as tCode
+
+
+class TestPersistentPoolExecutor(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.nCores = 2
+		self.coresPerJob = 1
+		self.ompThreads = None
+		self.createTestObj()
+
+	def tearDown(self):
+		self.testObj.close()
+		self.tempDir.cleanup()
+
+	def createTestObj(self):
+		self.testObj = tCode.PersistentPoolExecutor(nCores=self.nCores, coresPerJob=self.coresPerJob, ompThreads=self.ompThreads)
+
+	def _getOmpWriteComm(self, fileName):
+		return "echo $OMP_NUM_THREADS > {}".format( os.path.join(self.tempDir.name, fileName) )
+
+	def _readFile(self, fileName):
+		with open(os.path.join(self.tempDir.name, fileName),"rt") as f:
+			return f.read().strip()
+
+	def testOmpThreadsSetPerJob(self):
+		self.ompThreads = 3
+		self.createTestObj()
+		shellComms = [self._getOmpWriteComm("a"), tCode.ShellJob(self._getOmpWriteComm("b"), ompThreads=1), tCode.ShellJob(self._getOmpWriteComm("c"), nCores=4)]
+		self.testObj.runShellComms(shellComms)
+		self.assertEqual(["3","1","3"], [self._readFile(x) for x in ["a","b","c"]])
+
+	def testOmpThreadsDefaultToJobCores(self):
+		self.testObj.runShellComms([tCode.ShellJob(self._getOmpWriteComm("a"), nCores=2)])
+		self.assertEqual("2", self._readFile("a"))
+
+	def testPoolPersistsBetweenBatches(self):
+		self.testObj.runShellComms(["true"])
+		startPool = self.testObj._pool
+		self.testObj.runFunctions([lambda: None])
+		self.assertTrue(startPool is self.testObj._pool)
+		self.testObj.close()
+		self.assertFalse(self.testObj.isRunning)
+
+	def testCoreLimitRespected(self):
+		nRunning, maxRunning, lock = [0], [0], threading.Lock()
+		def _trackConcurrency():
+			with lock:
+				nRunning[0] += 1
+				maxRunning[0] = max(maxRunning[0], nRunning[0])
+			time.sleep(0.02)
+			with lock:
+				nRunning[0] -= 1
+		self.testObj.runFunctions([_trackConcurrency for x in range(6)])
+		self.assertEqual(self.nCores, maxRunning[0])
+
+	def testRunFunctionsKeepsOrderAndRaises(self):
+		self.assertEqual([0,1,2], self.testObj.runFunctions([lambda x=x: x for x in range(3)]))
+		def _raiseError():
+			raise ValueError("")
+		with self.assertRaises(ValueError):
+			self.testObj.runFunctions([lambda: 1, _raiseError])
+
+
+class TestPersistentPoolExecutorJobPolicy(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.jobPolicy = tCode.JobRunPolicy(retryDelay=0.01)
+		self.createTestObj()
+
+	def tearDown(self):
+		self.testObj.close()
+		self.tempDir.cleanup()
+
+	def createTestObj(self):
+		self.testObj = tCode.PersistentPoolExecutor(nCores=2, jobPolicy=self.jobPolicy, pollInterval=0.01)
+
+	def _getPath(self, fileName):
+		return os.path.join(self.tempDir.name, fileName)
+
+	def testFailuresRecordedWithReasons(self):
+		shellComms = ["true", "exit 3", tCode.ShellJob("true", expectedOutputs=[self._getPath("fake_file")])]
+		self.testObj.runShellComms(shellComms)
+		actFailures = [(x.index, x.returnCode, x.reason) for x in self.testObj.lastFailures]
+		self.assertEqual([(1,3,"return_code"), (2,0,"missing_outputs")], actFailures)
+
+	def testTimeoutKillsJob(self):
+		self.jobPolicy.timeout = 0.1
+		startTime = time.perf_counter()
+		self.testObj.runShellComms(["sleep 10"])
+		self.assertLess(time.perf_counter()-startTime, 5)
+		self.assertEqual("timeout", self.testObj.lastFailures[0].reason)
+
+	def testRetrySucceedsSecondTime(self):
+		#Command fails the first time (creating the marker file) then succeeds
+		self.jobPolicy.maxRetries = 2
+		markerPath = self._getPath("marker")
+		self.testObj.runShellComms(["if [ -e {0} ]; then exit 0; else touch {0}; exit 1; fi".format(markerPath)])
+		self.assertEqual(list(), self.testObj.lastFailures)
+
+	def testOutputsDeletedBeforeEachAttempt(self):
+		#Each attempt appends to the output and fails unless it started from an empty file; stale outputs shouldnt survive a retry
+		self.jobPolicy.maxRetries = 1
+		outPath, markerPath = self._getPath("out_file"), self._getPath("marker")
+		with open(outPath,"w") as f:
+			f.write("stale\n")
+		comm = "if [ -e {1} ]; then echo new >> {0}; else touch {1}; echo partial >> {0}; exit 1; fi".format(outPath, markerPath)
+		self.testObj.runShellComms([tCode.ShellJob(comm, expectedOutputs=[outPath])])
+		self.assertEqual(list(), self.testObj.lastFailures)
+		with open(outPath,"r") as f:
+			self.assertEqual("new\n", f.read())
+
+	def testRetryDelayBacksOff(self):
+		self.jobPolicy.retryDelay, self.jobPolicy.backoffFactor = 0.5, 3.0
+		self.assertEqual([0.5,1.5,4.5], [self.jobPolicy.getRetryDelay(x) for x in [1,2,3]])
+
+	def _getStragglerJob(self, folderName):
+		#First copy of the job hangs (after creating the marker file); any copy started later writes its output quickly
+		workFolder = self._getPath(folderName)
+		os.mkdir(workFolder)
+		comm = "cd {};if [ -e marker ]; then echo done > out_file; else touch marker; sleep 10; fi".format(workFolder)
+		return tCode.ShellJob(comm, workFolder=workFolder, expectedOutputs=[os.path.join(workFolder,"out_file")])
+
+	def testStragglerDuplicateUsed(self):
+		self.jobPolicy.stragglerFactor, self.jobPolicy.minJobsForStragglers = 5.0, 2
+		stragglerJob = self._getStragglerJob("straggler")
+		startTime = time.perf_counter()
+		self.testObj.runShellComms(["sleep 0.05", "sleep 0.05", stragglerJob])
+		self.assertLess(time.perf_counter()-startTime, 5)
+		self.assertEqual(list(), self.testObj.lastFailures)
+		with open(stragglerJob.expectedOutputs[0],"r") as f:
+			self.assertEqual("done\n", f.read())
+		self.assertEqual(["straggler"], os.listdir(self.tempDir.name)) #Scratch copy removed
+
+	def testDuplicateKilledIfOriginalFinishesFirst(self):
+		self.jobPolicy.stragglerFactor, self.jobPolicy.minJobsForStragglers = 5.0, 2
+		workFolder = self._getPath("straggler")
+		os.mkdir(workFolder)
+		comm = "cd {};if [ -e marker ]; then sleep 10; else touch marker; sleep 0.6; echo original > out_file; fi".format(workFolder)
+		stragglerJob = tCode.ShellJob(comm, workFolder=workFolder, expectedOutputs=[os.path.join(workFolder,"out_file")])
+		startTime = time.perf_counter()
+		self.testObj.runShellComms(["sleep 0.05", "sleep 0.05", stragglerJob])
+		self.assertLess(time.perf_counter()-startTime, 5)
+		with open(stragglerJob.expectedOutputs[0],"r") as f:
+			self.assertEqual("original\n", f.read())
+		self.assertEqual(["straggler"], os.listdir(self.tempDir.name))
+
+	def testStragglerNotDuplicatedWithoutOutputs(self):
+		self.jobPolicy.stragglerFactor, self.jobPolicy.minJobsForStragglers, self.jobPolicy.timeout = 5.0, 2, 1.0
+		stragglerJob = self._getStragglerJob("straggler")._replace(expectedOutputs=None)
+		self.testObj.runShellComms(["sleep 0.05", "sleep 0.05", stragglerJob])
+		self.assertEqual(["timeout"], [x.reason for x in self.testObj.lastFailures])
+
+
+class TestGetShellCommStr(unittest.TestCase):
+
+	def testStrAndShellJob(self):
+		self.assertEqual(["a","b"], [tCode.getShellCommStr(x) for x in ["a", tCode.ShellJob("b", nCores=2)]])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+
+import unittest
+
+from types import SimpleNamespace
+
+import plato_fit_integrals.core.property_vector as tCode
+
+
+class TestPropertyVector(unittest.TestCase):
+
+	def setUp(self):
+		self.propNames = ["hcp_v0","hcp_b0","energy_vals"]
+		self.createTestObj()
+
+	def createTestObj(self):
+		self.testObj = tCode.PropertyVector(self.propNames)
+
+	def testRaisesForDuplicatePropNames(self):
+		self.propNames.append(self.propNames[0])
+		with self.assertRaises(ValueError):
+			self.createTestObj()
+
+	def testNumericValuesStoredInSlots(self):
+		self.testObj.setValuesFromNamespace( SimpleNamespace(hcp_v0=4.0, hcp_b0=2) )
+		expVals = [2.0,4.0]
+		actVals = list( self.testObj.getValuesAtSlots(self.testObj.getSlotIndices(["hcp_b0","hcp_v0"])) )
+		self.assertEqual(expVals, actVals)
+
+	def testAttributeAccessForNonNumericValues(self):
+		expVals = [1.0,2.0,3.0]
+		self.testObj.setValue("energy_vals", expVals)
+		self.assertEqual(expVals, self.testObj.energy_vals)
+
+	def testRaisesAttributeErrorForUnsetValue(self):
+		with self.assertRaises(AttributeError):
+			self.testObj.hcp_v0
+
+	def testNamespaceViewMatchesSetValues(self):
+		expNamespace = SimpleNamespace(hcp_v0=4.0, energy_vals=[1.0], extra_val=3.0)
+		self.testObj.setValuesFromNamespace(expNamespace)
+		self.assertEqual(expNamespace, self.testObj.asNamespace())
+
+	def testResetOnlyRequestedProps(self):
+		self.testObj.setValuesFromNamespace( SimpleNamespace(hcp_v0=4.0, hcp_b0=2.0, energy_vals=[1.0]) )
+		self.testObj.reset(["hcp_v0","energy_vals"])
+		self.assertEqual(SimpleNamespace(hcp_b0=2.0), self.testObj.asNamespace())
+		with self.assertRaises(AttributeError):
+			self.testObj.hcp_v0
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import plato_fit_integrals.core.job_executors as jobExecutors
+import plato_fit_integrals.core.shared_fs_queue as tCode
+
+
+class TestQueueClaiming(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.queueFolder = os.path.join(self.tempDir.name, "queue")
+		tCode.createQueueFolders(self.queueFolder)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def testEachJobClaimedOnce(self):
+		[tCode.submitJob(self.queueFolder, "true") for x in range(2)]
+		claimedPaths = [tCode.claimNextJob(self.queueFolder, label) for label in ["workerA", "workerB", "workerC"]]
+		self.assertEqual(None, claimedPaths[-1])
+		self.assertEqual(2, len(set(claimedPaths[:2])))
+
+	def testJobsClaimedInSubmissionOrder(self):
+		jobIds = [tCode.submitJob(self.queueFolder, "true") for x in range(3)]
+		claimedPath = tCode.claimNextJob(self.queueFolder, "workerA")
+		self.assertTrue(claimedPath.endswith(jobIds[0] + ".json"))
+
+	def testResultListsMissingOutputs(self):
+		outPaths = [os.path.join(self.tempDir.name, x) for x in ["a.out","b.out"]]
+		shellJob = jobExecutors.ShellJob("touch a.out", workFolder=self.tempDir.name, expectedOutputs=outPaths)
+		jobId = tCode.submitJob(self.queueFolder, shellJob)
+		nJobs = tCode.runQueueWorker(self.queueFolder, maxJobs=1)
+		result = tCode.waitForJobs(self.queueFolder, [jobId], timeout=1.0)[0]
+		self.assertEqual(1, nJobs)
+		self.assertEqual(0, result["returnCode"])
+		self.assertEqual([outPaths[1]], result["missingOutputs"])
+
+	def testWaitRaisesOnTimeout(self):
+		jobId = tCode.submitJob(self.queueFolder, "true")
+		with self.assertRaises(TimeoutError):
+			tCode.waitForJobs(self.queueFolder, [jobId], pollInterval=0.01, timeout=0.05)
+
+	def testStaleClaimRequeued(self):
+		jobId = tCode.submitJob(self.queueFolder, "true")
+		claimedPath = tCode.claimNextJob(self.queueFolder, "deadWorker")
+		self.assertEqual(list(), tCode.requeueStaleClaims(self.queueFolder, leaseTime=60.0))
+		os.utime(claimedPath, (time.time()-120, time.time()-120))
+		self.assertEqual([jobId], tCode.requeueStaleClaims(self.queueFolder, leaseTime=60.0))
+		self.assertTrue( tCode.claimNextJob(self.queueFolder, "workerB").endswith(jobId + ".json") )
+
+	def testWaitFinishesJobFromDeadWorker(self):
+		jobId = tCode.submitJob(self.queueFolder, "true")
+		claimedPath = tCode.claimNextJob(self.queueFolder, "deadWorker")
+		os.utime(claimedPath, (time.time()-120, time.time()-120))
+		worker = threading.Thread(target=tCode.runQueueWorker, args=(self.queueFolder,), kwargs={"pollInterval":0.01, "maxJobs":1, "maxIdleTime":5.0})
+		worker.start()
+		result = tCode.waitForJobs(self.queueFolder, [jobId], pollInterval=0.01, timeout=5.0, leaseTime=60.0)[0]
+		worker.join()
+		self.assertEqual(0, result["returnCode"])
+		self.assertEqual(list(), os.listdir(os.path.join(self.queueFolder,"claimed")))
+
+	def testRunningJobKeepsLease(self):
+		tCode.submitJob(self.queueFolder, "sleep 0.3")
+		claimedPath = tCode.claimNextJob(self.queueFolder, "workerA")
+		os.utime(claimedPath, (time.time()-120, time.time()-120))
+		worker = threading.Thread(target=tCode.runClaimedJob, args=(self.queueFolder, claimedPath, "workerA"), kwargs={"heartbeatInterval":0.05})
+		worker.start()
+		time.sleep(0.15)
+		self.assertEqual(list(), tCode.requeueStaleClaims(self.queueFolder, leaseTime=60.0))
+		worker.join()
+
+
+class TestSharedFsQueueExecutorLocalWorkers(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.queueFolder = os.path.join(self.tempDir.name, "queue")
+		self.testObj = tCode.SharedFsQueueExecutor(self.queueFolder, pollInterval=0.02, waitTimeout=30.0, nLocalWorkers=2)
+
+	def tearDown(self):
+		self.testObj.close()
+		self.tempDir.cleanup()
+
+	def testJobsRunByMultipleWorkerProcesses(self):
+		nJobs = 6
+		shellComms = ["sleep 0.1; touch {}".format(os.path.join(self.tempDir.name,"job_{}".format(x))) for x in range(nJobs)]
+		self.testObj.runShellComms(shellComms)
+		self.assertTrue( all([os.path.exists(os.path.join(self.tempDir.name,"job_{}".format(x))) for x in range(nJobs)]) )
+		self.assertEqual(2, len(set([x["worker"] for x in self.testObj.lastResults])))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.obj_funct_calculator as objCalculators
+import plato_fit_integrals.core.opt_runner as optRunner
+import plato_fit_integrals.core.sub_fits as tCode
+import plato_fit_integrals.core.unit_tests.fake_objects as fakeObjs
+import plato_fit_integrals.core.workflow_coordinator as wflowCoord
+
+
+class TestFindIndependentSubFits(unittest.TestCase):
+
+	def setUp(self):
+		integInfo = [fakeObjs.createIntegInfo("pairpot", "Aa", "Aa"), fakeObjs.createIntegInfo("pairpot", "Bb", "Bb"),
+		             fakeObjs.createIntegInfo("hopping", "Aa", "Bb", 0, 1, 0)]
+		self.coeffConv = fakeObjs.FakeCoeffsTablesConverter([0.0, 0.0, 0.0, 0.0], integInfo, [[0,1],[2],[3]])
+		self.workFlowA = fakeObjs.FakeWorkFlow("valA", self.coeffConv, lambda c: (c[0]-1)**2 + (c[1]+0.5)**2, species={"Aa"})
+		self.workFlowB = fakeObjs.FakeWorkFlow("valB", self.coeffConv, lambda c: (c[2]-2)**2, species={"Bb"})
+		self.workFlows = [self.workFlowA, self.workFlowB]
+		self.createTestObjs()
+
+	def createTestObjs(self):
+		self.coordinator = wflowCoord.WorkFlowCoordinator(self.workFlows, nCores=3)
+		targVals = SimpleNamespace(**{x.outAttr:(0.0, lambda targ,act: act-targ) for x in self.workFlows})
+		self.objFunct = optRunner.ObjectiveFunction(self.coeffConv, self.coordinator, objCalculators.ObjectiveFunctionContrib(targVals))
+
+	def testSplitsBySpecies(self):
+		actSubFits = tCode.findIndependentSubFits(self.coeffConv, self.coordinator)
+		self.assertEqual([["pairpot_Aa_Aa"], ["pairpot_Bb_Bb"]], [[x.label for x in sub.blocks] for sub in actSubFits])
+		self.assertEqual([[0,1],[2]], [x.coeffIndices.tolist() for x in actSubFits])
+		self.assertEqual([[0],[1]], [x.workFlowIndices for x in actSubFits])
+
+	def testMixedWorkFlowJoinsSubFits(self):
+		self.workFlows.append( fakeObjs.FakeWorkFlow("valAB", self.coeffConv, lambda c: c[3]**2, species={"Aa","Bb"}) )
+		self.createTestObjs()
+		actSubFits = tCode.findIndependentSubFits(self.coeffConv, self.coordinator)
+		self.assertEqual(1, len(actSubFits))
+		self.assertEqual([0,1,2,3], actSubFits[0].coeffIndices.tolist())
+
+	def testUnknownSpeciesJoinsSubFits(self):
+		self.workFlowB.species = None
+		actSubFits = tCode.findIndependentSubFits(self.coeffConv, self.coordinator)
+		self.assertEqual(1, len(actSubFits))
+		self.assertEqual([0,1,2,3], actSubFits[0].coeffIndices.tolist()) #Hopping block now has a dependent workflow
+
+	def testSubFitsRunConcurrentlyAndMerge(self):
+		output = tCode.carryOutOptimisationSeparable(self.objFunct, method="Nelder-Mead", options={"xatol":1e-6, "fatol":1e-10})
+		self.assertTrue( np.allclose([1.0,-0.5,2.0,0.0], output.optRes.x, atol=1e-3) )
+		self.assertTrue( np.allclose(output.optRes.x, self.coeffConv.coeffs) )
+		self.assertEqual(2, len(output.optRes.subResults))
+		self.assertAlmostEqual(output.optRes.fun, output.calcVals.valA + output.calcVals.valB)
+
+	def testSubFitsOnlyWriteTheirOwnTables(self):
+		tCode.carryOutOptimisationSeparable(self.objFunct, method="Nelder-Mead", options={"maxiter":5})
+		subFitWrites = [x for x in self.coeffConv.writtenTableIndices if x is not None]
+		self.assertEqual(set([(0,),(1,)]), set([tuple(x) for x in subFitWrites]))
+
+	def testSubsetCoeffIndicesPerTable(self):
+		subConverter = tCode.SubsetCoeffsTablesConverter(self.coeffConv, [2,3])
+		actIndices = subConverter.getCoeffIndicesPerTable()
+		self.assertEqual([1,2], subConverter.tableIndices)
+		self.assertEqual([[0],[1]], [x[1].tolist() for x in actIndices])
+		self.assertEqual(["Bb","Aa"], [x[0].atomA for x in actIndices])
+
+	def testBlockCoordinateOptimiserOnSubFits(self):
+		output = tCode.carryOutOptimisationSeparable(self.objFunct, optFunct=optRunner.carryOutOptimisationBlockCoordinate,
+		                                             options={"xatol":1e-6, "fatol":1e-10})
+		self.assertTrue( np.allclose([1.0,-0.5,2.0,0.0], output.optRes.x, atol=1e-3) )
+		self.assertEqual([["pairpot_Aa_Aa"],["pairpot_Bb_Bb"]], [x.blockLabels for x in output.optRes.subResults])
+
+	def testSubFitsLeaveWorkFlowTimersAlone(self):
+		self.objFunct.phaseTimer = instrumentation.PhaseTimer()
+		tCode.createSubFitObjectiveFunctions(self.objFunct, tCode.findIndependentSubFits(self.coeffConv, self.coordinator))
+		self.assertEqual([self.objFunct.phaseTimer,self.objFunct.phaseTimer], [x.phaseTimer for x in self.workFlows])
+
+	def testFallsBackWithoutPlanEntries(self):
+		self.objFunct.objFunctCalculator = SimpleNamespace(calculateObjFunction=lambda vals: vals.valA + vals.valB)
+		output = tCode.carryOutOptimisationSeparable(self.objFunct, method="Nelder-Mead")
+		self.assertFalse( hasattr(output.optRes, "subResults") )
+
+
+class TestSplitCores(unittest.TestCase):
+
+	def testProportionalToWeights(self):
+		self.assertEqual([6,2], tCode.splitCores(8, [3,1]))
+
+	def testAtLeastOneEach(self):
+		self.assertEqual([1,1,1], tCode.splitCores(2, [5,1,1]))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.opt_runner as tCode
+import plato_fit_integrals.core.surrogate_models as surrogateModels
+
+
+class TestSurrogateModels(unittest.TestCase):
+
+	def setUp(self):
+		randGen = np.random.RandomState(1)
+		self.xVals = randGen.uniform(-1,1,(20,2))
+		self.yVals = _quadraticTestFunct(self.xVals)
+		self.testXVals = np.array([[0.2,0.3],[-0.4,0.1]])
+
+	def testQuadraticSurrogateExactForQuadratic(self):
+		testModel = surrogateModels.QuadraticSurrogate()
+		testModel.fit(self.xVals, self.yVals)
+		expVals = _quadraticTestFunct(self.testXVals)
+		actVals, unused = testModel.predict(self.testXVals)
+		[self.assertAlmostEqual(exp,act,places=5) for exp,act in zip(expVals,actVals)]
+
+	def testGaussianProcessInterpolatesFittedPoints(self):
+		testModel = surrogateModels.GaussianProcessSurrogate()
+		testModel.fit(self.xVals, self.yVals)
+		actVals, actStds = testModel.predict(self.xVals[:3])
+		[self.assertAlmostEqual(exp,act,places=3) for exp,act in zip(self.yVals[:3],actVals)]
+		[self.assertAlmostEqual(0.0,act,places=2) for act in actStds]
+
+	def testNonFiniteValuesReplacedByMaxFinite(self):
+		expVals = [1.0,3.0,3.0]
+		actVals = list( surrogateModels.getYValsWithNonFiniteReplaced([1.0,3.0,np.inf]) )
+		self.assertEqual(expVals, actVals)
+
+
+class TestSurrogateAssistedOptimiser(unittest.TestCase):
+
+	def setUp(self):
+		self.objFunct = _FakeObjectiveFunction([0.5,-0.5])
+		self.maxEvals = 40
+
+	def runTestFunct(self, surrogate):
+		return tCode.carryOutOptimisationSurrogateAssisted(self.objFunct, maxEvals=self.maxEvals, surrogate=surrogate)
+
+	def testFindsMinimumOfQuadratic_gp(self):
+		output = self.runTestFunct("gp")
+		self.assertTrue( output.optRes.fun < 1e-2 )
+
+	def testFindsMinimumOfQuadratic_quadratic(self):
+		output = self.runTestFunct("quadratic")
+		self.assertTrue( output.optRes.fun < 1e-2 )
+
+	def testBestCoeffsSetOnFinish(self):
+		output = self.runTestFunct("gp")
+		self.assertEqual( list(output.optRes.x), list(self.objFunct.coeffTableConverter.coeffs) )
+
+	def testNumberOfEvaluationsLimited(self):
+		self.runTestFunct("gp")
+		self.assertEqual(self.maxEvals+1, self.objFunct.nCalls) #+1 is the final evaluation at the best coeffs
+
+	def testStepSizeCapped(self):
+		self.objFunct.funct = lambda x: -1*float(np.sum(x)) #Keeps improving, so the trust region keeps growing
+		output = tCode.carryOutOptimisationSurrogateAssisted(self.objFunct, maxEvals=self.maxEvals, surrogate="quadratic", maxStepSize=0.4)
+		self.assertTrue( output.optRes.stepSize <= 0.4 )
+
+	def testRaisesForNoEvals(self):
+		with self.assertRaises(ValueError):
+			tCode.carryOutOptimisationSurrogateAssisted(self.objFunct, maxEvals=0)
+
+	def testRaisesForInvalidSurrogateStr(self):
+		with self.assertRaises(ValueError):
+			self.runTestFunct("fake_surrogate")
+
+
+def _quadraticTestFunct(xVals):
+	xVals = np.atleast_2d(xVals)
+	return 2*(xVals[:,0]-0.1)**2 + (xVals[:,1]+0.2)**2 + 0.5*xVals[:,0]*xVals[:,1]
+
+
+class _FakeObjectiveFunction():
+
+	def __init__(self, startCoeffs):
+		self.coeffTableConverter = SimpleNamespace(coeffs=list(startCoeffs))
+		self.workFlowCoordinator = SimpleNamespace(propertyValues=SimpleNamespace())
+		self.nCalls = 0
+
+	def __call__(self, coeffs, useCache=True):
+		self.nCalls += 1
+		self.coeffTableConverter.coeffs = list(coeffs)
+		return float( (coeffs[0]-0.3)**2 + (coeffs[1]-0.1)**2 )
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+import unittest
+import unittest.mock as mock
+
+from types import SimpleNamespace
+
+import numpy as np
+
+import plato_fit_integrals.core.opt_runner as optRunner
+import plato_fit_integrals.core.table_checks as tCode
+
+
+class TestTableChecks(unittest.TestCase):
+
+	def setUp(self):
+		self.xVals = np.array([1.0, 2.0, 3.0, 4.0])
+		self.yVals = np.array([[4.0, 2.0, 1.0, 0.0],    #Fine
+		                       [4.0, 2.0, 1e30, 0.0],   #Overflow sentinel
+		                       [4.0, -2.0, 1.0, 0.0],   #Sign flip and not monotonic
+		                       [4.0, 2.0, 3.0, np.nan]])
+
+	def testMaxAbsValue(self):
+		actFailed = tCode.MaxAbsValueCheck().getFailedRows(self.xVals, self.yVals)
+		self.assertEqual([False, True, False, True], actFailed.tolist())
+
+	def testNoSignChange(self):
+		actFailed = tCode.NoSignChangeCheck().getFailedRows(self.xVals, self.yVals)
+		self.assertEqual([False, False, True, False], actFailed.tolist())
+
+	def testMonotonicDecreasing(self):
+		actFailed = tCode.MonotonicCheck().getFailedRows(self.xVals, self.yVals[[0,2,3]])
+		self.assertEqual([False, True, True], actFailed.tolist())
+
+	def testAppliesToIntegStrs(self):
+		testCheck = tCode.MonotonicCheck(integStrs=["PairPot"])
+		self.assertTrue( testCheck.appliesTo(_createInfo("pairpot")) )
+		self.assertFalse( testCheck.appliesTo(_createInfo("hopping")) )
+
+
+class TestScreenCandidates(unittest.TestCase):
+
+	def setUp(self):
+		self.xVals = np.array([1.0, 2.0, 3.0])
+		self.coeffConv = mock.Mock()
+		self.coeffConv.tableChecks = [tCode.MonotonicCheck()]
+		self.coeffConv.getCoeffIndicesPerTable.return_value = [(_createInfo("pairpot"), np.array([0])), (_createInfo("hopping"), np.array([1]))]
+		self.coeffConv.getTableXVals.side_effect = lambda tableIndices: [self.xVals for x in tableIndices]
+		self.coeffConv.getTableBlocksForCoeffMatrix.side_effect = self._getTableBlocks
+
+	def _getTableBlocks(self, coeffMatrix, tableIndices=None):
+		allBlocks = [np.asarray(coeffMatrix)[:,idx:idx+1] / self.xVals[np.newaxis,:] for idx in range(2)]
+		return [allBlocks[idx] for idx in tableIndices]
+
+	def testInfeasibleCandidatesFound(self):
+		actMask = tCode.getInfeasibleCandidates(self.coeffConv, [[1.0, 1.0], [-1.0, 1.0], [2.0, -1.0]])
+		self.assertEqual([False, True, False], actMask.tolist())
+
+	def testOnlyCheckedTablesCalculated(self):
+		tCode.getInfeasibleCandidates(self.coeffConv, [[1.0, 1.0]])
+		self.assertEqual([0], self.coeffConv.getTableBlocksForCoeffMatrix.call_args[1]["tableIndices"])
+
+
+class TestObjectiveFunctionInfeasiblePenalty(unittest.TestCase):
+
+	def setUp(self):
+		self.coeffConv = SimpleNamespace(coeffs=[0.0], writeTables=self._raiseInfeasible)
+		self.coordinator = mock.Mock()
+		self.objFunct = optRunner.ObjectiveFunction(self.coeffConv, self.coordinator, mock.Mock(), infeasiblePenalty=1e10)
+
+	def _raiseInfeasible(self):
+		raise tCode.InfeasibleTablesError([tCode.TableCheckFailure("monotonic", _createInfo("pairpot"))])
+
+	def testPenaltyReturnedWithoutRunningWorkFlows(self):
+		self.assertEqual(1e10, self.objFunct([1.0]))
+		self.coordinator.runAndGetPropertyValues.assert_not_called()
+
+
+def _createInfo(integStr):
+	return SimpleNamespace(integStr=integStr, atomA="Xa", atomB="Xb", shellA=None, shellB=None, axAngMom=None)
+
+
+if __name__ == '__main__':
+	unittest.main()
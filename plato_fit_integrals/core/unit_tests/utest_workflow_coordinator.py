@@ -5,6 +5,7 @@ from types import SimpleNamespace
 import unittest
 import unittest.mock as mock
 
+import plato_fit_integrals.core.job_executors as jobExecutors
 import plato_fit_integrals.core.workflow_coordinator as tCode
 
 
@@ -52,6 +53,147 @@ class TestWorkFlowCoordinatorNamespaceGeneration(unittest.TestCase):
 		actNamespace = testCoord.propertyValues
 		self.assertEqual(expNamespace, actNamespace)
 
+	def testPropertyStoreUpdatedInPlace(self):
+		testCoord = tCode.WorkFlowCoordinator([self.workFlowA, self.workFlowB])
+		propStore = testCoord.propertyStore
+		testCoord.run()
+		self.workFlowB.run = fakeWorkFlowRunMethod(self.workFlowB, SimpleNamespace(bcc_v0=5))
+		testCoord.run()
+		self.assertTrue(propStore is testCoord.propertyStore)
+		self.assertEqual(5, propStore.bcc_v0)
+
+	def testMissingOutputNotKeptFromPreviousRun(self):
+		testCoord = tCode.WorkFlowCoordinator([self.workFlowA, self.workFlowB])
+		testCoord.run()
+		self.workFlowB.run = fakeWorkFlowRunMethod(self.workFlowB, SimpleNamespace())
+		testCoord.run()
+		with self.assertRaises(AttributeError):
+			testCoord.propertyStore.bcc_v0
+		self.assertEqual(1, testCoord.propertyStore.hcp_v0)
+
+	def testPersistentPoolExecutorGivesSameOutput(self):
+		expNamespace = SimpleNamespace(hcp_v0=1,fcc_v0=2,bcc_v0=3)
+		executor = jobExecutors.PersistentPoolExecutor(nCores=2)
+		testCoord = tCode.WorkFlowCoordinator([self.workFlowA, self.workFlowB], executor=executor)
+		testCoord.run()
+		testCoord.close()
+		self.assertEqual(expNamespace, testCoord.propertyValues)
+		self.assertFalse(executor.isRunning)
+
+
+class TestWorkFlowCoordinatorJobFailures(unittest.TestCase):
+
+	def setUp(self):
+		self.workFlowA = createMockWorkFlowA()
+		self.workFlowB = createMockWorkFlowB()
+		self.workFlowA.preRunShellComms = ["true"]
+		self.workFlowB.preRunShellComms = ["true", "false"]
+		del self.workFlowB.setOutputForFailedJobs #Mock would otherwise provide a do-nothing version
+		self.workFlowB.output = SimpleNamespace()
+		self.jobFailurePolicy = "penalty"
+		self.createTestObj()
+
+	def tearDown(self):
+		self.testObj.close()
+
+	def createTestObj(self):
+		executor = jobExecutors.PersistentPoolExecutor(nCores=2)
+		self.testObj = tCode.WorkFlowCoordinator([self.workFlowA, self.workFlowB], executor=executor, jobFailurePolicy=self.jobFailurePolicy)
+
+	def testPenaltyPolicySetsFailedWorkFlowOutputsToInf(self):
+		expNamespace = SimpleNamespace(hcp_v0=1,fcc_v0=2,bcc_v0=float("inf"))
+		self.testObj.run()
+		self.assertEqual(expNamespace, self.testObj.propertyValues)
+		self.assertEqual(["1_test_folderB"], self.testObj.failedWorkFlowLabels)
+
+	def testPenaltyPolicyKeepsLengthOfListOutputs(self):
+		self.workFlowB.run = fakeWorkFlowRunMethod(self.workFlowB, SimpleNamespace(bcc_v0=[3,4]))
+		self.jobFailurePolicy = "ignore"
+		self.createTestObj()
+		self.testObj.run()
+		self.testObj.jobFailurePolicy = "penalty"
+		self.testObj.run()
+		self.assertEqual([float("inf"), float("inf")], self.testObj.propertyValues.bcc_v0)
+
+	def testRaisePolicy(self):
+		self.jobFailurePolicy = "raise"
+		self.createTestObj()
+		with self.assertRaises(jobExecutors.JobFailedError):
+			self.testObj.run()
+
+	def testIgnorePolicyRunsAllWorkFlows(self):
+		self.jobFailurePolicy = "ignore"
+		self.createTestObj()
+		self.testObj.run()
+		self.assertEqual(3, self.testObj.propertyValues.bcc_v0)
+
+	def testRaisesForUnknownPolicy(self):
+		with self.assertRaises(ValueError):
+			tCode.WorkFlowCoordinator([self.workFlowA], jobFailurePolicy="fake_policy")
+
+
+class TestWorkFlowCoordinatorActiveWorkFlows(unittest.TestCase):
+
+	def setUp(self):
+		self.workFlowA = createMockWorkFlowA()
+		self.workFlowB = createMockWorkFlowB()
+		self.workFlowA.speciesPresent, self.workFlowB.speciesPresent = {"Mg"}, None
+		self.testObj = tCode.WorkFlowCoordinator([self.workFlowA, self.workFlowB])
+		self.testObj.activeWorkFlowIndices = [1]
+
+	def testAllWorkFlowsRunFirstTime(self):
+		self.testObj.run()
+		self.assertEqual(1, self.testObj.propertyValues.hcp_v0)
+
+	def testInactiveWorkFlowKeepsOldOutput(self):
+		self.testObj.run()
+		self.workFlowA.run = fakeWorkFlowRunMethod(self.workFlowA, SimpleNamespace(hcp_v0=5, fcc_v0=6))
+		self.workFlowB.run = fakeWorkFlowRunMethod(self.workFlowB, SimpleNamespace(bcc_v0=7))
+		self.testObj.run()
+		self.assertEqual([1,2,7], [self.testObj.propertyValues.hcp_v0, self.testObj.propertyValues.fcc_v0, self.testObj.propertyValues.bcc_v0])
+
+	def testDependentWorkFlowIndices(self):
+		self.assertEqual([0,1], self.testObj.getWorkFlowIndicesDependingOnSpecies(["Mg"]))
+		self.assertEqual([1], self.testObj.getWorkFlowIndicesDependingOnSpecies(["Mg","Si"]))
+
+
+class TestWorkFlowCoordinatorRunInStages(unittest.TestCase):
+
+	def setUp(self):
+		self.workFlowA = createMockWorkFlowA()
+		self.workFlowB = createMockWorkFlowB()
+		self.testObj = tCode.WorkFlowCoordinator([self.workFlowA, self.workFlowB])
+		self.stopCalls = list()
+
+	def _stopFunct(self, propStore, pendingProps):
+		self.stopCalls.append(pendingProps)
+		return True
+
+	def testCheapestWorkFlowRunFirst(self):
+		self.testObj._workFlowCosts = {0:2.0, 1:1.0}
+		self.assertEqual([[1],[0]], self.testObj.getStagesByCost([0,1]))
+		self.assertEqual([[1,0]], self.testObj.getStagesByCost([0,1], nStages=1))
+
+	def testUntimedWorkFlowsRunLast(self):
+		self.testObj._workFlowCosts = {1:5.0}
+		self.assertEqual([[1],[0]], self.testObj.getStagesByCost([0,1]))
+
+	def testStoppingSkipsRemainingStages(self):
+		self.testObj._workFlowCosts = {0:2.0, 1:1.0}
+		self.workFlowA.run = mock.Mock()
+		completed = self.testObj.runInStages(self._stopFunct)
+		self.assertFalse(completed)
+		self.assertEqual([set(["hcp_v0","fcc_v0"])], self.stopCalls)
+		self.workFlowA.run.assert_not_called()
+		self.assertEqual(3, self.testObj.propertyValues.bcc_v0)
+
+	def testCompletesWithoutStopping(self):
+		completed = self.testObj.runInStages(lambda propStore, pendingProps: False)
+		self.assertTrue(completed)
+		self.assertEqual([1,2,3], [self.testObj.propertyValues.hcp_v0, self.testObj.propertyValues.fcc_v0, self.testObj.propertyValues.bcc_v0])
+		self.assertTrue( all([x is not None for x in self.testObj.workFlowCosts]) )
+
+
 def createMockWorkFlowA():
 	workFlowA = mock.Mock()
 	workFlowA.workFolder = "test_folderA"
@@ -1,30 +1,237 @@
 
-import plato_pylib.utils.job_running_functs as jobRun
+import os
+import time
+from types import SimpleNamespace
 
-from plato_fit_integrals.shared.workflow_helpers import getCombinedNamespaceNoDuplicatedKeys
+import numpy as np
 
-from types import SimpleNamespace
+import plato_fit_integrals.core.instrumentation as instrumentation
+import plato_fit_integrals.core.job_executors as jobExecutors
+from plato_fit_integrals.core.property_vector import PropertyVector
+
+JOB_FAILURE_POLICIES = ("penalty", "raise", "ignore")
+COST_AVERAGE_WEIGHT = 0.3 #Weight of the newest timing in the moving average of workflow costs (see WorkFlowCoordinator.runInStages)
 
 class WorkFlowCoordinator():
-	def __init__(self, workFlows:"list of WorkFlow objects", nCores=1, quietPreShellComms=True):
+	def __init__(self, workFlows:"list of WorkFlow objects", nCores=1, quietPreShellComms=True, executor=None, jobFailurePolicy="penalty"):
+		""" Initialiser
+
+		Args:
+			workFlows: list of WorkFlow objects
+			nCores: Number of cores used to run plato jobs with the default executor
+			quietPreShellComms: If True, output of the plato jobs isnt printed
+			executor(Optional): JobExecutorBase object (see core.job_executors) used to run plato jobs and workflow post-processing.
+			                    Default runs jobs in batches on nCores and post-processing in serial. Use PersistentPoolExecutor to keep
+			                    workers alive between iterations (call close() when finished with it)
+			jobFailurePolicy: What to do with a workflow when any of its plato jobs fail (only detected by executors which report
+			                  lastFailures). "penalty" skips its run() and sets all its outputs to penalty values (np.inf unless the
+			                  workflow defines setOutputForFailedJobs), "raise" raises JobFailedError and "ignore" calls run() as normal
+
+		Raises:
+			ValueError: If jobFailurePolicy is not in JOB_FAILURE_POLICIES
+		"""
 		self._workFlows = workFlows
 		self._ensureNoDuplicationBetweenWorkFlows()
 		self.nCores = nCores
 		self.quietPreShellComms = quietPreShellComms
+		self.executor = executor if executor is not None else jobExecutors.RunCommsParallelExecutor(nCores)
+		if jobFailurePolicy not in JOB_FAILURE_POLICIES:
+			raise ValueError("{} is not a valid jobFailurePolicy; options are {}".format(jobFailurePolicy, JOB_FAILURE_POLICIES))
+		self.jobFailurePolicy = jobFailurePolicy
+		self.activeWorkFlowIndices = None
+		self._failedWorkFlowIndices = set()
+		self._hasRunIndices = set()
+		self._workFlowCosts = dict()
+		self._phaseTimer = instrumentation.NULL_PHASE_TIMER
+		self._setsWorkFlowTimers = True #False for sub-coordinators, which share their workflows with the parent
+		self._createPropertyStore()
 
 	def runAndGetPropertyValues(self, inclPreRun=True):
 		self.run(inclPreRun)
 		return self.propertyValues
 
+	def runAndGetPropertyVector(self, inclPreRun=True):
+		""" Same as runAndGetPropertyValues, but returns the PropertyVector the values are stored in rather than a SimpleNamespace copy """
+		self.run(inclPreRun)
+		return self.propertyStore
+
 	def run(self,inclPreRun=True):
+		""" Run the workflows (only those in activeWorkFlowIndices, plus any not run before, if activeWorkFlowIndices is set) """
+		self._failedWorkFlowIndices = set()
+		self._runWorkFlowIndices(self._getWorkFlowIndicesToRun(), inclPreRun)
+
+	def runInStages(self, stopFunct, nStages=None, inclPreRun=True):
+		""" Run the same workflows as run(), but in stages ordered by measured cost (see workFlowCosts); cheapest first. After each
+		stage stopFunct is called, and if it returns True the remaining stages are skipped (so their plato jobs are never started)
+
+		Args:
+			stopFunct: Function with interface stopFunct(propertyStore, pendingProps)->bool. pendingProps is a set of the property
+			           names whose workflows havent run yet; their values in propertyStore are out of date
+			nStages: Max number of stages. Default is one stage per workflow (which gives up running jobs from different workflows at once)
+			inclPreRun: Same as for run()
+
+		Returns
+			completed (bool): False if stopFunct stopped the run before all stages were done
+		"""
+		self._failedWorkFlowIndices = set()
+		stages = self.getStagesByCost(self._getWorkFlowIndicesToRun(), nStages=nStages)
+		for stageIdx, stage in enumerate(stages):
+			startTime = time.perf_counter()
+			self._runWorkFlowIndices(stage, inclPreRun)
+			self._updateWorkFlowCosts(stage, time.perf_counter()-startTime)
+			pendingIndices = [idx for x in stages[stageIdx+1:] for idx in x]
+			if (len(pendingIndices) > 0) and stopFunct(self._propertyStore, self._getPropNamesForWorkFlows(pendingIndices)):
+				self._hasRunIndices.difference_update(pendingIndices) #Their outputs dont match the current tables
+				return False
+		return True
+
+	def _runWorkFlowIndices(self, runIndices, inclPreRun):
 		if inclPreRun:
-			self._doPreRunComms()
+			self._doPreRunComms(runIndices)
+		runFuncts = list()
+		allLabels = self.workFlowLabels
+		for idx in runIndices:
+			x, label = self._workFlows[idx], allLabels[idx]
+			if idx in self._failedWorkFlowIndices:
+				runFuncts.append( lambda x=x: setWorkFlowOutputForFailedJobs(x) )
+			else:
+				runFuncts.append( self._getRunFunctForWorkFlow(x,label) )
+		self.executor.runFunctions(runFuncts)
+		self._propertyStore.reset(self._getPropNamesForWorkFlows(runIndices)) #So missing outputs raise rather than keep old values
+		for idx in runIndices:
+			self._propertyStore.setValuesFromNamespace(self._workFlows[idx].output)
+		self._hasRunIndices.update(runIndices)
+
+	@property
+	def workFlowCosts(self):
+		""" Moving average of the wall time (s) taken to run each workflow in runInStages (None for those not yet timed). Workflows
+		sharing a stage split its time evenly """
+		return [self._workFlowCosts.get(idx,None) for idx in range(len(self._workFlows))]
+
+	def _updateWorkFlowCosts(self, indices, wallTime):
+		for idx in indices:
+			currCost = wallTime / len(indices)
+			prevCost = self._workFlowCosts.get(idx, currCost)
+			self._workFlowCosts[idx] = COST_AVERAGE_WEIGHT*currCost + (1-COST_AVERAGE_WEIGHT)*prevCost
+
+	def getStagesByCost(self, workFlowIndices, nStages=None):
+		""" Split workFlowIndices into at most nStages stages (lists of indices), cheapest first. Workflows not yet timed are
+		assumed to be the most expensive """
+		workFlowIndices = list(workFlowIndices)
+		allCosts = self.workFlowCosts
+		sortKey = lambda idx: (allCosts[idx] is None, allCosts[idx] if allCosts[idx] is not None else 0.0, idx)
+		orderedIndices = sorted(workFlowIndices, key=sortKey)
+		nStages = len(orderedIndices) if nStages is None else min(nStages, len(orderedIndices))
+		return [x.tolist() for x in np.array_split(np.array(orderedIndices, dtype=int), nStages)] if nStages > 0 else list()
+
+	def _getPropNamesForWorkFlows(self, workFlowIndices):
+		outNames = set()
+		for idx in workFlowIndices:
+			outNames.update( self._workFlows[idx].namespaceAttrs )
+		return outNames
+
+	def _getWorkFlowIndicesToRun(self):
+		#Inactive workflows keep their output from the last time they ran, so they need running at least once
+		if self.activeWorkFlowIndices is None:
+			return list(range(len(self._workFlows)))
+		activeIndices = set(self.activeWorkFlowIndices)
+		return [idx for idx in range(len(self._workFlows)) if (idx in activeIndices) or (idx not in self._hasRunIndices)]
+
+	def _getRunFunctForWorkFlow(self, workFlow, label):
+		def runFunct():
+			with self._phaseTimer.timePhase("workflow_run", workFlowLabel=label):
+				workFlow.run()
+		return runFunct
+
+	def _doPreRunComms(self, runIndices):
+		preRunComms, commWorkFlowIndices = list(), list()
+		allLabels = self.workFlowLabels
+		for idx in runIndices:
+			x, label = self._workFlows[idx], allLabels[idx]
+			with self._phaseTimer.timePhase("pre_run_comms", workFlowLabel=label): #Includes deleting old output files
+				currShellComms = x.preRunShellComms
+			if currShellComms is not None:
+				preRunComms.extend(currShellComms)
+				commWorkFlowIndices.extend( [idx for comm in currShellComms] )
+
+		if len(preRunComms) == 0: #e.g. only inactive workflows have jobs
+			return None
+		with self._phaseTimer.timePhase("run_plato"):
+			self.executor.runShellComms(preRunComms, quiet=self.quietPreShellComms)
+		self._handleJobFailures(self.executor.lastFailures, commWorkFlowIndices)
+
+	def _handleJobFailures(self, failures, commWorkFlowIndices):
+		if len(failures) == 0:
+			return None
+		self._phaseTimer.incrementCounter("failed_jobs", len(failures))
+		if self.jobFailurePolicy == "raise":
+			failStrs = ["{} ({}, {} attempts)".format(x.comm, x.reason, x.nAttempts) for x in failures]
+			raise jobExecutors.JobFailedError("{} plato jobs failed: {}".format(len(failures), "; ".join(failStrs)))
+		elif self.jobFailurePolicy == "penalty":
+			self._failedWorkFlowIndices.update( [commWorkFlowIndices[x.index] for x in failures] )
+
+	@property
+	def failedWorkFlowLabels(self):
+		""" Labels (see workFlowLabels) of workflows given penalty values in the last run() because some of their jobs failed """
+		return [label for idx,label in enumerate(self.workFlowLabels) if idx in self._failedWorkFlowIndices]
+
+	def close(self):
+		""" Release resources held by the executor (e.g. a persistent worker pool) """
+		self.executor.close()
+
+	@property
+	def phaseTimer(self):
+		""" PhaseTimer (see core.instrumentation) used to record timings. Setting this also sets it on all workflows derived from WorkFlowBase,
+		except for sub-coordinators (see getSubCoordinator) whose workflows keep the parents timer """
+		return self._phaseTimer
+
+	@phaseTimer.setter
+	def phaseTimer(self, val):
+		self._phaseTimer = val
+		if not self._setsWorkFlowTimers:
+			return None
 		for x in self._workFlows:
-			x.run()
+			if isinstance(x, WorkFlowBase):
+				x.phaseTimer = val
 
-	def _doPreRunComms(self):
-		preRunComms = self.preRunShellComms
-		jobRun.executeRunCommsParralel(preRunComms,self.nCores,quiet=self.quietPreShellComms)
+	@property
+	def workFlowLabels(self):
+		""" Labels used to identify each workflow in timing records; index plus workFolder name (or class name if no workFolder) """
+		outLabels = list()
+		for idx,x in enumerate(self._workFlows):
+			baseName = os.path.basename(x.workFolder) if isinstance(x.workFolder,str) else type(x).__name__
+			outLabels.append( "{}_{}".format(idx,baseName) )
+		return outLabels
+
+	@property
+	def speciesPerWorkFlow(self):
+		""" Set of chemical symbols in the structures of each workflow (None where it isnt known; see getSpeciesForWorkFlow) """
+		return [getSpeciesForWorkFlow(x) for x in self._workFlows]
+
+	def getWorkFlowIndicesDependingOnSpecies(self, species:"iter of str"):
+		""" Indices of workflows whose structures contain ALL of species (e.g. both atoms of a pair integral), plus any workflows
+		with unknown species """
+		species = set(species)
+		return [idx for idx,currSpecies in enumerate(self.speciesPerWorkFlow) if (currSpecies is None) or species.issubset(currSpecies)]
+
+	def getSubCoordinator(self, workFlowIndices:"iter of int", nCores=None, executor=None):
+		""" Get a WorkFlowCoordinator for a subset of the workflows (the workflow objects are shared, not copied). Uses the same
+		quietPreShellComms and jobFailurePolicy; executor defaults to a new RunCommsParallelExecutor on nCores (default self.nCores).
+		Setting phaseTimer on the sub-coordinator doesnt change the (shared) workflows timers """
+		nCores = self.nCores if nCores is None else nCores
+		outCoordinator = WorkFlowCoordinator([self._workFlows[idx] for idx in workFlowIndices], nCores=nCores, quietPreShellComms=self.quietPreShellComms,
+		                                     executor=executor, jobFailurePolicy=self.jobFailurePolicy)
+		outCoordinator._setsWorkFlowTimers = False
+		return outCoordinator
+
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None, executor=None):
+		""" Get a WorkFlowCoordinator for copies of the workflows (see WorkFlowBase.getReRootedCopy), which run under newRoot rather
+		than oldRoot. Uses the same nCores, quietPreShellComms and jobFailurePolicy; executor defaults to a new RunCommsParallelExecutor """
+		outWorkFlows = [x.getReRootedCopy(oldRoot, newRoot, dataset=dataset) for x in self._workFlows]
+		outCoordinator = WorkFlowCoordinator(outWorkFlows, nCores=self.nCores, quietPreShellComms=self.quietPreShellComms, executor=executor,
+		                                     jobFailurePolicy=self.jobFailurePolicy)
+		outCoordinator.activeWorkFlowIndices = self.activeWorkFlowIndices
+		return outCoordinator
 
 	@property
 	def preRunShellComms(self):
@@ -38,10 +245,19 @@ class WorkFlowCoordinator():
 
 	@property
 	def propertyValues(self):
-		currNamespace = SimpleNamespace()
+		""" SimpleNamespace with all property values calculated in the last call to run() """
+		return self._propertyStore.asNamespace()
+
+	@property
+	def propertyStore(self):
+		""" PropertyVector holding the property values calculated in the last call to run(); updated in place by each run() call """
+		return self._propertyStore
+
+	def _createPropertyStore(self):
+		allProps = list()
 		for x in self._workFlows:
-			currNamespace = getCombinedNamespaceNoDuplicatedKeys(currNamespace, x.output)
-		return currNamespace
+			allProps.extend(x.namespaceAttrs)
+		self._propertyStore = PropertyVector(allProps)
 
 	def addWorkFlow(self,wFlow):
 		""" Add a workFlow
@@ -58,6 +274,8 @@ class WorkFlowCoordinator():
 		"""
 		self._workFlows.append(wFlow)
 		self._ensureNoDuplicationBetweenWorkFlows()
+		self._createPropertyStore()
+		self.phaseTimer = self._phaseTimer
 	
 	def _ensureNoDuplicationBetweenWorkFlows(self):
 		self._ensureWorkFlowsContainNoDuplicatedFields()
@@ -83,6 +301,14 @@ class WorkFlowCoordinator():
 
 class WorkFlowBase():
 
+	phaseTimer = instrumentation.NULL_PHASE_TIMER #Set by WorkFlowCoordinator; allows timing of sub-steps within run()
+	failurePenaltyValue = np.inf #Value given to all outputs when the workflows jobs fail (or its output cant be parsed)
+
+	def setOutputForFailedJobs(self):
+		""" Set all output values to failurePenaltyValue; used in place of run() when the workflows plato jobs failed. List outputs
+		from a previous run keep their length; override this if list outputs need the right length before the first run """
+		_setAllOutputValues(self, self.failurePenaltyValue)
+
 	@property
 	def preRunShellComms(self):
 		""" List of string commands that will get run before run() is called. Higher-level functions can therefore 
@@ -92,6 +318,12 @@ class WorkFlowBase():
 		"""
 		return None
 
+	@property
+	def speciesPresent(self):
+		""" Set of chemical symbols present in the structures this workflow runs calculations on. None (the default) means
+		unknown, in which case the workflow is treated as depending on every integral table """
+		return None
+
 	@property
 	def namespaceAttrs(self):
 		""" List of attribute names for the properties this workspace calculates + places in a Namespace. See run()
@@ -103,6 +335,12 @@ class WorkFlowBase():
 	def workFolder(self):
 		raise NotImplementedError()
 
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None):
+		""" Copy of this workflow whose workFolder is at the same place under newRoot as this ones is under oldRoot (input files are
+		written there). dataset(Optional) replaces the plato "dataset" option, so the copy can read tables from a copy of the model.
+		Used to create candidate slots from existing workflows (see core.candidate_slots) """
+		raise NotImplementedError("{} cant be copied into a new folder".format(type(self).__name__))
+
 	def run(self):
 		""" Runs the workflow and populates the output attr wtih a Namespace
 		containing calculated properties/values as fields/values. Field names should match those in namespaceAttrs
@@ -112,6 +350,45 @@ class WorkFlowBase():
 		raise NotImplementedError()
 
 
+def getSpeciesForWorkFlow(workFlow):
+	""" workFlow.speciesPresent as a set, or None if not known (including workflows without the attribute) """
+	species = getattr(workFlow, "speciesPresent", None)
+	return set(species) if species is not None else None
+
+
+def getSpeciesFromStructs(structs:"iter of UnitCell objects"):
+	""" Set of chemical symbols in structs (taken from fractCoords, where each entry is [x,y,z,symbol]) """
+	outSpecies = set()
+	for struct in structs:
+		outSpecies.update( [x[-1] for x in struct.fractCoords] )
+	return outSpecies
+
+
+def setWorkFlowOutputForFailedJobs(workFlow):
+	""" Use workFlow.setOutputForFailedJobs() if defined; else set every value in workFlow.output (see WorkFlowBase.run) to np.inf
+	(list outputs from a previous run become lists of np.inf) """
+	if hasattr(workFlow, "setOutputForFailedJobs"):
+		workFlow.setOutputForFailedJobs()
+	else:
+		_setAllOutputValues(workFlow, np.inf)
+
+
+def _setAllOutputValues(workFlow, value):
+	#List/array outputs left by a previous run keep their length, so objective functions comparing them elementwise still work
+	if getattr(workFlow, "output", None) is None:
+		workFlow.output = SimpleNamespace()
+	for attr in workFlow.namespaceAttrs:
+		setattr(workFlow.output, attr, _getValueWithShapeOf(getattr(workFlow.output, attr, None), value))
+
+
+def _getValueWithShapeOf(oldVal, value):
+	if isinstance(oldVal, np.ndarray):
+		return np.full(oldVal.shape, value)
+	elif isinstance(oldVal, (list,tuple)):
+		return [value for x in oldVal]
+	return value
+
+
 def decorateWorkFlowWithPrintOutputsEveryNSteps(inpObj,printInterval=5):
     f = inpObj.run
     stepNumb = 0
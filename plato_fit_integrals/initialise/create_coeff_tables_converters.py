@@ -8,9 +8,13 @@ import plato_fit_integrals.core.coeffs_to_tables as coeffTableConv
 
 #Creating integral holders
 
-def createIntegHolderFromModelFolderPath(modelFolderPath):
+def createIntegHolderFromModelFolderPath(modelFolderPath, lazy=False):
+	""" Create an IntegralsHolder containing all .bdt files in modelFolderPath. If lazy=True, a LazyIntegralsHolder is returned
+	instead; each file is only parsed when its integrals are first needed """
 	allBdtPaths = _getAllBdtPathsInAFolder(modelFolderPath)
 	atomPairNames = _getAtomPairNamesFromBdtPaths(allBdtPaths)
+	if lazy:
+		return coeffTableConv.LazyIntegralsHolder(atomPairNames, allBdtPaths)
 	integTables = _getAllIntegDictsFromBdtPaths(allBdtPaths)
 	outObj = coeffTableConv.IntegralsHolder(atomPairNames, integTables)
 	return outObj
@@ -147,7 +147,7 @@ def _getEqualizeZerosForRelEnergiesFunct():
 
 #Factory has as similar as possible an interface with the EOS one at time of writing
 class CreateStructEnergiesWorkFlow():
-	def __init__(self, structList, modOptsDict, workFolder, platoCode, varyType="pairPot", outAttr="energy_vals", eType="electronicCohesiveE", ePerAtom=False, relEnergies=False):
+	def __init__(self, structList, modOptsDict, workFolder, platoCode, varyType="pairPot", outAttr="energy_vals", eType="electronicCohesiveE", ePerAtom=False, relEnergies=False, fidelity=None):
 		""" Create the StructureEnergies Factory instance. Follow initiation straight by a call to just get the relevant workflow
 		
 		Args:
@@ -161,6 +161,8 @@ class CreateStructEnergiesWorkFlow():
 			eType: String denoting the type of energy to take from the outfile. See plato_pylib EnergyVals class for options
 			ePerAtom: Bool, if True the total energy is divided by number of atoms in the simulation cell
 			relEnergies: Bool, if True then try to fit to energies relative to the lowest energy of structList (i.e. absolute values irrelevant)
+			fidelity: FidelityLevel object (see shared.workflow_helpers) to reduce calculation accuracy (e.g. k-points) for speed. None means full accuracy.
+			          Overwrites options from modOptsDict
 
 		Raises:
 			Errors
@@ -175,12 +177,14 @@ class CreateStructEnergiesWorkFlow():
 		self.eType = eType
 		self.ePerAtom = ePerAtom
 		self.relEnergies = relEnergies
+		self.fidelity = fidelity
 
 	@property
 	def optDict(self):
 		outDict = {k.lower():v for k,v in modInp.getDefOptDict(self.platoCode).items()}
 		wFlowHelpers.modOptDictBasedOnCorrTypeAndPlatoCode(outDict, self.varyType, self.platoCode)
 		outDict.update(self.modOptsDict)
+		wFlowHelpers.modOptDictBasedOnFidelity(outDict, self.fidelity, self.platoCode)
 		return outDict
 
 	def __call__(self):
@@ -202,17 +206,28 @@ class StructEnergiesWorkFlow(wflowCoord.WorkFlowBase):
 		self.varyType=varyType
 		self.ePerAtom = ePerAtom
 		self.relEnergies = relEnergies	
+		self._jobManifest = None
  
 		#Need to create input files only once, on initiation
 		pathlib.Path(self.workFolder).mkdir(exist_ok=True,parents=True)
 		self._writeInpFiles()
+
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None):
+		outObj = copy.copy(self)
+		outObj._workFolder = wFlowHelpers.getReRootedPath(self.workFolder, oldRoot, newRoot)
+		outObj.runOpts = wFlowHelpers.getOptDictWithDataset(self.runOpts, dataset)
+		outObj.output = SimpleNamespace()
+		outObj._jobManifest = None
+		pathlib.Path(outObj.workFolder).mkdir(exist_ok=True,parents=True)
+		outObj._writeInpFiles()
+		return outObj
 		
 	@property
 	def preRunShellComms(self):
 		#Remove any previous jobs to stop the *.out files becoming too long (new jobs append to them)
 		with contextlib.suppress(FileNotFoundError):
 			[os.remove(x) for x in self.outFilePaths]
-		return jobRun.pathListToPlatoRunComms(self.inpFilePaths, self.platoCodeStr)
+		return self.jobManifest.getShellJobs( jobRun.pathListToPlatoRunComms(self.inpFilePaths, self.platoCodeStr) )
 		
 	@property
 	def workFolder(self):
@@ -221,11 +236,31 @@ class StructEnergiesWorkFlow(wflowCoord.WorkFlowBase):
 	@property
 	def namespaceAttrs(self):
 		return [self.outAttr]
+
+	@property
+	def speciesPresent(self):
+		return wflowCoord.getSpeciesFromStructs(self.structList)
+
+	@property
+	def jobManifest(self):
+		""" JobManifest (see shared.workflow_helpers) for this workflow. Built once (when input files are first written) then re-used """
+		if self._jobManifest is None:
+			fileNameFmt = "struct_energies_{}"
+			allJobs = list()
+			for idx,struct in enumerate(self.structList):
+				currName = fileNameFmt.format(idx)
+				allJobs.append( wFlowHelpers.createPlatoJob(currName, struct, self.workFolder, currName) )
+			self._jobManifest = wFlowHelpers.JobManifest(allJobs, self.namespaceAttrs)
+		return self._jobManifest
 	
+	def setOutputForFailedJobs(self):
+		setattr(self.output, self.outAttr, [self.failurePenaltyValue for x in self.structList])
+
 	def run(self):
 		allEnergies = list()
 		for x in self.outFilePaths:
-			parsedFile = platoOut.parsePlatoOutFile(x)
+			with self.phaseTimer.timePhase("parse_output"):
+				parsedFile = platoOut.parsePlatoOutFile(x)
 			currEnergy = getattr(parsedFile["energies"],self.eType)
 			if self.ePerAtom:
 				currEnergy = currEnergy / parsedFile["numbAtoms"]
@@ -246,17 +281,13 @@ class StructEnergiesWorkFlow(wflowCoord.WorkFlowBase):
 
 	@property
 	def baseFileNames(self):
-		outNames = list()
-		fileNameFmt = "struct_energies_{}"
-		for x in range( len(self.structList) ):
-			outNames.append(  fileNameFmt.format(x)  )
-		return outNames
+		return [x.structKey for x in self.jobManifest.jobs]
 	
 	@property
 	def inpFilePaths(self):
-		return [os.path.join(self.workFolder,x)+".in" for x in self.baseFileNames]
+		return list(self.jobManifest.inpPaths)
 	
 	@property
 	def outFilePaths(self):
-		return [os.path.join(self.workFolder,x)+".out" for x in self.baseFileNames]
+		return list(self.jobManifest.outPaths)
 
@@ -9,22 +9,24 @@ import math
 import pathlib
 from types import SimpleNamespace, MethodType
 
-import numpy as np
 
+import plato_fit_integrals.core.job_executors as jobExecutors
 import plato_fit_integrals.core.workflow_coordinator as wflowCoord
 import plato_fit_integrals.core.obj_funct_calculator as objFunctCalc
 import plato_fit_integrals.initialise.obj_functs_targ_vals as objCmpFuncts
+import plato_fit_integrals.shared.lazy_imports as lazyImports
 import plato_fit_integrals.shared.workflow_helpers as wFlowHelpers
 
 import plato_pylib.plato.mod_plato_inp_files as modInp
 import plato_pylib.plato.parse_plato_out_files as parsePlatoOut
-import plato_pylib.utils.fit_eos as fitBMod
 import plato_pylib.utils.job_running_functs as jobRun
 
+fitBMod = lazyImports.lazyImport("plato_pylib.utils.fit_eos") #Pulls in ase
+
 class CreateEosWorkFlow():
 
 	def __init__(self, structDict, modOptDicts, workFolder, platoCode, varyType="pairPot", eosModel="murnaghan", 
-	             onlyCalcE0=False, nonE0EnergyDict=None):
+	             onlyCalcE0=False, nonE0EnergyDict=None, fidelity=None):
 		""" Create the EosWorkFlow Factory instance. Follow initiation straight by a call to just get the relevant workflow
 		
 		Args:
@@ -38,6 +40,8 @@ class CreateEosWorkFlow():
 			onlyCalcE0: Optimisation for fitting to pair-pots. If True various run settings that dont affect E0 (e.g. k-points) will be changed for
 			            for speed. These Will Overwrite options from modOptDicts.
 			nonE0EnergyDict: Only needed when using onlyCalcE0=True. Dict with same structure as structDict, with structures replaced with values of energies
+			fidelity: FidelityLevel object (see shared.workflow_helpers) to reduce calculation accuracy (e.g. k-points) for speed. None means full accuracy.
+			          Overwrites options from modOptDicts, but is itself overwritten by onlyCalcE0 settings
 		
 		Raises:
 			Errors
@@ -52,6 +56,7 @@ class CreateEosWorkFlow():
 
 		self.nonE0EnergyDict = nonE0EnergyDict
 		self.onlyCalcE0 = onlyCalcE0
+		self.fidelity = fidelity
 
 	@property
 	def onlyCalcE0(self):
@@ -71,6 +76,7 @@ class CreateEosWorkFlow():
 			baseDict = {k.lower():v for k,v in modInp.getDefOptDict(self.platoCode).items()}
 			currModDict = {k.lower():v for k,v in self.modOptsDict[key].items()}
 			self._modDictBasedOnCorrType(currModDict)
+			wFlowHelpers.modOptDictBasedOnFidelity(currModDict, self.fidelity, self.platoCode)
 			if self.onlyCalcE0:
 				self._modDictForE0Only(currModDict)
 			baseDict.update(currModDict)
@@ -81,14 +87,7 @@ class CreateEosWorkFlow():
 		wFlowHelpers.modOptDictBasedOnCorrTypeAndPlatoCode(inpDict, self.varyType, self.platoCode)
 
 	def _modDictForE0Only(self,inpDict):
-		inpDict["blochstates"] = [1,1,1]
-		if self.platoCode=="dft2":
-			inpDict["xtalxcmethod"] = -1
-			inpDict["hopxcmethod"] = -1
-			inpDict["xtalVnaMethod".lower()] = 1
-			inpDict["hopVnaMethod".lower()] = -1
-			inpDict["xtalVnlMethod".lower()] = 1
-			inpDict["hopVnlMethod".lower()] = -1
+		wFlowHelpers.FidelityLevel("e0_only", blochStates=[1,1,1], cheapMethods=True).modOptDict(inpDict, self.platoCode)
 
 	def __call__(self):
 		if self.onlyCalcE0:
@@ -120,6 +119,7 @@ class EosWorkFlow(wflowCoord.WorkFlowBase):
 
 		self.energiesMinusE0 = energiesMinusE0
 
+		self._jobManifest = None
 		self._createFilesOnInit()
 
 	def _createFilesOnInit(self):
@@ -127,71 +127,91 @@ class EosWorkFlow(wflowCoord.WorkFlowBase):
 		pathlib.Path(self.workFolder).mkdir(exist_ok=True,parents=True)
 		self._writeFiles()
 
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None):
+		outObj = copy.copy(self)
+		outObj._workFolder = wFlowHelpers.getReRootedPath(self.workFolder, oldRoot, newRoot)
+		outObj.runOptsDicts = collections.OrderedDict( [(k,wFlowHelpers.getOptDictWithDataset(v,dataset)) for k,v in self.runOptsDicts.items()] )
+		outObj.output, outObj.extraOutput = SimpleNamespace(), SimpleNamespace()
+		outObj._getEosOneStruct = MethodType(self._getEosOneStruct.__func__, outObj)
+		outObj._jobManifest = None
+		outObj._createFilesOnInit()
+		return outObj
+
 	@property
 	def preRunShellComms(self):
 		#Need to delete previous out-files, since they get appended to (which slows down the parsing MASSIVELY)
-		outPaths = [x.replace(".in",".out") for x in self._inpFilePaths]
-		with contextlib.suppress(FileNotFoundError):
-			[os.remove(x) for x in outPaths]
-		inpPaths = self._inpFilePaths
-		runComms = jobRun.pathListToPlatoRunComms(inpPaths, self.platoCodeStr)
-		return runComms
+		for x in self._outFilePaths:
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(x)
+		runComms = jobRun.pathListToPlatoRunComms(self._inpFilePaths, self.platoCodeStr)
+		return self.jobManifest.getShellJobs(runComms)
 
 	@property
 	def workFolder(self):
 		return os.path.abspath(self._workFolder)
 
+	@property
+	def jobManifest(self):
+		""" JobManifest (see shared.workflow_helpers) for this workflow. Built once (when input files are first written) then re-used """
+		if self._jobManifest is None:
+			self._jobManifest = self._createJobManifest()
+		return self._jobManifest
+
+	def _createJobManifest(self):
+		allJobs = list()
+		for sKey in self.structDict.keys():
+			for struct in self.structDict[sKey]:
+				currFName = "{}_vol_{:.2f}".format(sKey,struct.volume).replace(".","pt")
+				allJobs.append( wFlowHelpers.createPlatoJob(sKey, struct, self.workFolder, currFName) )
+
+		outAttrs = list()
+		for key in self.structDict:
+			for outVal in self._outVals:
+				outAttrs.append( key + "_" + outVal )
+
+		return wFlowHelpers.JobManifest(allJobs, outAttrs)
+
 	@property
 	def _baseFileNames(self):
-		namesDict = self._baseFileNameDict
-		outNames = list()
-		for sKey in namesDict.keys():
-			for fName in namesDict[sKey]:
-				outNames.append( fName )
-		return outNames
+		return [os.path.splitext(os.path.basename(x.inpPath))[0] for x in self.jobManifest.jobs]
 
 	@property
 	def _inpFilePaths(self):
-		inpPaths = list()
-		for x in self._baseFileNames:
-			currPath = os.path.join(self.workFolder, x+".in") 
-			inpPaths.append(currPath)
-		return inpPaths
+		return list(self.jobManifest.inpPaths)
 
+	@property
+	def _outFilePaths(self):
+		return list(self.jobManifest.outPaths)
+
+	@property
+	def speciesPresent(self):
+		return wflowCoord.getSpeciesFromStructs(self.structDict.values())
 
 	@property
 	def namespaceAttrs(self):
-		outAttrs = list()
-		for key in self.structDict:
-			for outVal in self._outVals:
-				outAttrs.append( key + "_" + outVal )
-		return outAttrs
+		return list(self.jobManifest.namespaceAttrs)
 
 	@property
 	def _baseFileNameDict(self):
 		outDict = collections.OrderedDict()
 		for sKey in self.structDict.keys():
-			outDict[sKey] = list()
-			for struct in self.structDict[sKey]:
-				currVol = struct.volume
-				currFName = "{}_vol_{:.2f}".format(sKey,currVol).replace(".","pt")
-				outDict[sKey].append( currFName )
+			outDict[sKey] = [os.path.splitext(os.path.basename(x.inpPath))[0] for x in self.jobManifest.getJobsForStructKey(sKey)]
 		return outDict
 
 	@property
 	def _inpFilePathsDict(self):
-		outDict = self._baseFileNameDict
-		for key,val in outDict.items():
-			for idx,baseName in enumerate(val):
-				val[idx] = os.path.join(self.workFolder,baseName + ".in")
+		outDict = collections.OrderedDict()
+		for sKey in self.structDict.keys():
+			outDict[sKey] = [x.inpPath for x in self.jobManifest.getJobsForStructKey(sKey)]
 		return outDict
-				
+
+	def _getOutFilePathsForStructKey(self, structKey):
+		return [x.outPath for x in self.jobManifest.getJobsForStructKey(structKey)]
 
 	def _writeFiles(self):
-		pathDict = self._inpFilePathsDict
 		for sKey in self.runOptsDicts.keys():
-			for idx,geom in enumerate(self.structDict[sKey]):
-				currPath = pathDict[sKey][idx]
+			for geom,job in it.zip_longest(self.structDict[sKey], self.jobManifest.getJobsForStructKey(sKey)):
+				currPath = job.inpPath
 				currStrDict = modInp.getStrDictFromOptDict(self.runOptsDicts[sKey], self.platoCodeStr)
 				geomSection = modInp.getPlatoGeomDictFromUnitCell(geom)
 				currStrDict.update(geomSection)
@@ -200,10 +220,10 @@ class EosWorkFlow(wflowCoord.WorkFlowBase):
 	def run(self):
 		for key in self.structDict.keys():
 			try:
-				fittedEos = self._getEosOneStruct(key)
-			except RuntimeError or ValueError: #ValueError is called in the case of NaN values appearing in ase somewhere
-				for attr in self.namespaceAttrs:
-					setattr(self.output, attr, np.inf)
+				with self.phaseTimer.timePhase("eos_fit"): #Includes parse_output; the standard fit also parses within plato_pylib
+					fittedEos = self._getEosOneStruct(key)
+			except (RuntimeError, ValueError): #ValueError is called in the case of NaN values appearing in ase somewhere
+				self.setOutputForFailedJobs()
 				return None
 			self._setAttrsFromEosModelOneStruct(key,fittedEos)
 			setattr(self.extraOutput,"full_eos", fittedEos)
@@ -227,14 +247,15 @@ class EosWorkFlow(wflowCoord.WorkFlowBase):
 
 
 def standardGetEosOneStruct(self:"eos WorkFlow class", structKey):
-	outFilePaths = [x.replace(".in",".out") for x in self._inpFilePathsDict[structKey]]
-	with contextlib.redirect_stdout(None):
+	outFilePaths = self._getOutFilePathsForStructKey(structKey)
+	with wFlowHelpers.suppressStdout():
 		fittedEos = fitBMod.getBulkModFromOutFilesAseWrapper(outFilePaths, eosModel=self._eosModel)
 	return fittedEos
 
 def getEosOneStructWhenE1Known(self, structKey):
-	outFilePaths = [x.replace(".in",".out") for x in self._inpFilePathsDict[structKey]]
-	parsedFiles = [parsePlatoOut.parsePlatoOutFile(x) for x in outFilePaths]
+	outFilePaths = self._getOutFilePathsForStructKey(structKey)
+	with self.phaseTimer.timePhase("parse_output"):
+		parsedFiles = [parsePlatoOut.parsePlatoOutFile(x) for x in outFilePaths]
 	allE0Vals = [x["energies"].e0Coh for x in parsedFiles]
 	allTotalEnergies = [e0+eOther for e0,eOther in it.zip_longest(allE0Vals, self.energiesMinusE0[structKey])] #in Ry
 	allTotalEnergiesPerAtom = [x/parsed["numbAtoms"] for x,parsed in it.zip_longest(allTotalEnergies,parsedFiles)]
@@ -247,22 +268,19 @@ def getEosOneStructWhenE1Known(self, structKey):
 	energiesInEv = [rydToEv*x for x in allTotalEnergiesPerAtom]
 
 	#Fit, answers are in bohr^3 and eV
-	with contextlib.redirect_stdout(None):
+	with wFlowHelpers.suppressStdout():
 		fittedEos = fitBMod.getBulkModFromVolsAndEnergies(volInAng, energiesInEv)
 
 	return fittedEos
 
 def calcNonE0EnergyDict(structDict, modOptDicts, workFolder, platoCode, nCores=1,quiet=True,varyType="pairpot"):
 	eosWorkFlow = CreateEosWorkFlow(structDict, modOptDicts, workFolder, platoCode, varyType=varyType) ()#Note this will write the files and create the folder upon initiation
-	inpFilesDict = eosWorkFlow._inpFilePathsDict 
 	runComms = eosWorkFlow.preRunShellComms
-	jobRun.executeRunCommsParralel(runComms, nCores, quiet=quiet)
+	jobRun.executeRunCommsParralel([jobExecutors.getShellCommStr(x) for x in runComms], nCores, quiet=quiet)
 
-	outEnergies = copy.deepcopy(inpFilesDict)
-	for key in outEnergies.keys():
-		for idx in range(len(outEnergies[key])):
-			outPath = outEnergies[key][idx].replace(".in",".out")
-			outEnergies[key][idx] = _getNonE0EnergyOneOutFile(outPath)
+	outEnergies = collections.OrderedDict()
+	for key in eosWorkFlow.structDict.keys():
+		outEnergies[key] = [_getNonE0EnergyOneOutFile(x) for x in eosWorkFlow._getOutFilePathsForStructKey(key)]
 	return outEnergies
 
 
@@ -284,6 +302,9 @@ def decorateEosWorkFlowWithPrintOutputsEveryNSteps(inpObj,printInterval=5):
 
 
 class EosObjFunctCalculator(objFunctCalc.ObjectiveFunctCalculator):
+
+	supportsPropertyVector = True
+
 	def __init__(self,propList, structList, targVals, weightList, objFunctList):
 		self._propList = list(propList)
 		self._structList = list(structList)
@@ -292,7 +313,7 @@ class EosObjFunctCalculator(objFunctCalc.ObjectiveFunctCalculator):
 		self._targVals = list(targVals)
 
 		self._checkValidFields()
-		self._compositeObjFunctCalc = self._createObjFunctCalculator
+		self._compiledPlan = None
 
 	@classmethod
 	def createEmptyInstance(cls):
@@ -322,18 +343,19 @@ class EosObjFunctCalculator(objFunctCalc.ObjectiveFunctCalculator):
 			raise ValueError("Duplicate properties present in list {}".format(self.props))
 
 	def calculateObjFunction(self, calcVals):
-		calculator = self._createObjFunctCalculator()
-		return calculator.calculateObjFunction(calcVals)
+		return self._getCompiledPlan().calculateObjFunction(calcVals)
+
+	def getPlanEntries(self):
+		outEntries = list()
+		for prop,targVal,objFunct,weight in it.zip_longest(self.props, self._targVals, self._objFunctList, self._weightList):
+			outEntries.append( objFunctCalc.ObjFunctPlanEntry(prop, targVal, objFunct, weight) )
+		return outEntries
 
-	def _createObjFunctCalculator(self):
-		allContribs = list()
-		propList = self.props
-		for idx in range(len(self._propList)):
-			currPropTargObjFuncts = SimpleNamespace( **{propList[idx]:(self._targVals[idx],self._objFunctList[idx])} )
-			currContrib = objFunctCalc.ObjectiveFunctionContrib(currPropTargObjFuncts)
-			allContribs.append( currContrib )
-		totalCalculator = objFunctCalc.ObjectiveFunctTotal(allContribs, self._weightList)
-		return totalCalculator
+	def _getCompiledPlan(self):
+		#Compiled once then re-used until properties are added
+		if self._compiledPlan is None:
+			self._compiledPlan = objFunctCalc.ObjectiveFunctPlan(self.getPlanEntries())
+		return self._compiledPlan
 
 
 	def addProp(self, structKey, prop:"v0,e0,b0", targVal, weight=1.0, objFunct=None ):
@@ -345,6 +367,7 @@ class EosObjFunctCalculator(objFunctCalc.ObjectiveFunctCalculator):
 		self._objFunctList.append(objFunct)
 		self._weightList.append(weight)
 		self._targVals.append(targVal)
+		self._compiledPlan = None
 
 		self._checkAllListsEqualLen()
 		self._checkNoDuplicateProperties()
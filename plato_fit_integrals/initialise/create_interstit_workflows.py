@@ -6,6 +6,7 @@ import pathlib
 from types import SimpleNamespace
 
 import plato_fit_integrals.core.workflow_coordinator as wFlowCoord
+import plato_fit_integrals.shared.workflow_helpers as wFlowHelpers
 from plato_fit_integrals.shared.workflow_helpers import getCombinedNamespaceNoDuplicatedKeys
 
 
@@ -15,7 +16,7 @@ import plato_pylib.plato.parse_plato_out_files as parsePlatoOut
 import plato_pylib.utils.defects as defects
 
 class CreateInterstitialWorkFlow():
-	def __init__(self, structRef, structInter, startFolder, modOptDict, platoComm, genPreShellComms=True, relaxed="relaxed", interType="generic", cellDims=None, eType="electronicCohesiveE"):
+	def __init__(self, structRef, structInter, startFolder, modOptDict, platoComm, genPreShellComms=True, relaxed="relaxed", interType="generic", cellDims=None, eType="electronicCohesiveE", fidelity=None):
 		""" Creates InterstitialWorkFlow Factory instance. Follow initiation straight by a call to just get the relevant workflow 
 		
 		Args:
@@ -28,6 +29,8 @@ class CreateInterstitialWorkFlow():
 			genPreShellComms(Optional): Bool, whether the created objects can generate plato-run commands. If False, no plato jobs will be run.
 			                            Purpose is to make workFlows easier to use outside fitting code. Default=True
 			eType(Optional): str, the energy type to use. See energies object in plato_pylib. One possible option is electronicTotalE
+			fidelity(Optional): FidelityLevel object (see shared.workflow_helpers) to reduce calculation accuracy (e.g. k-points) for speed.
+			                    Default of None means full accuracy. Overwrites options from modOptDict
 
 		Optional Args for object labelling:
 		These optional arguments are all used to label the created object, such that you calculate multiple
@@ -54,10 +57,12 @@ class CreateInterstitialWorkFlow():
 		self.platoComm = platoComm
 		self.genPreShellComms = genPreShellComms
 		self.eType = eType
+		self.fidelity = fidelity
 
 	def getRunOptsDict(self):
-		outDict = modInp.getDefOptDict(self.platoComm)
-		outDict.update(self.modOptDict)	
+		outDict = {k.lower():v for k,v in modInp.getDefOptDict(self.platoComm).items()}
+		outDict.update( {k.lower():v for k,v in self.modOptDict.items()} )
+		wFlowHelpers.modOptDictBasedOnFidelity(outDict, self.fidelity, self.platoComm)
 		return outDict
 
 	def __call__(self):
@@ -116,6 +121,28 @@ class CompositeInterstitialWorkFlow(wFlowCoord.WorkFlowBase):
 		""" Not meaningful for the case of a composite object """
 		return None
 
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None):
+		outObj = copy.copy(self)
+		outObj._workFlows = [x.getReRootedCopy(oldRoot, newRoot, dataset=dataset) for x in self._workFlows]
+		return outObj
+
+	@property
+	def phaseTimer(self):
+		return getattr(self, "_phaseTimer", wFlowCoord.WorkFlowBase.phaseTimer)
+
+	@phaseTimer.setter
+	def phaseTimer(self, val):
+		self._phaseTimer = val
+		for x in self._workFlows:
+			x.phaseTimer = val
+
+	@property
+	def speciesPresent(self):
+		allSpecies = [wFlowCoord.getSpeciesForWorkFlow(x) for x in self._workFlows]
+		if any([x is None for x in allSpecies]):
+			return None
+		return set().union(*allSpecies)
+
 
 	@property
 	def preRunShellComms(self):
@@ -159,20 +186,31 @@ class InterstitialWorkFlow(wFlowCoord.WorkFlowBase):
 		self._eType = eType
 		self.label = label
 		self.genPreShellComms = genPreShellComms
+		self._jobManifest = None
 
 		#Only need to create the input files at initiation time
 		pathlib.Path(self.workFolder).mkdir(exist_ok=True,parents=True)
 		self._writeFiles()
 
+	def getReRootedCopy(self, oldRoot, newRoot, dataset=None):
+		outObj = copy.copy(self)
+		outObj._workFolder = wFlowHelpers.getReRootedPath(self.workFolder, oldRoot, newRoot)
+		outObj._runOptsDict = wFlowHelpers.getOptDictWithDataset(self._runOptsDict, dataset)
+		outObj.output = SimpleNamespace()
+		outObj._jobManifest = None
+		pathlib.Path(outObj.workFolder).mkdir(exist_ok=True,parents=True)
+		outObj._writeFiles()
+		return outObj
+
 	@property
 	def preRunShellComms(self):
 		if self.genPreShellComms is False:
 			return None
-		outPaths = [x.replace(".in",".out") for x in self._inpFilePaths]
-		with contextlib.suppress(FileNotFoundError):
-			[os.remove(x) for x in outPaths]
+		for x in self.jobManifest.outPaths:
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(x)
 		runComms = jobRun.pathListToPlatoRunComms(self._inpFilePaths, self._platoComm)
-		return runComms
+		return self.jobManifest.getShellJobs(runComms)
 
 	@property
 	def workFolder(self):
@@ -182,25 +220,38 @@ class InterstitialWorkFlow(wFlowCoord.WorkFlowBase):
 	def namespaceAttrs(self):
 		return [self.label + "_interstit_e"]
 
+	@property
+	def speciesPresent(self):
+		return wFlowCoord.getSpeciesFromStructs([self._interstitStruct, self._refStruct])
+
+	@property
+	def jobManifest(self):
+		""" JobManifest (see shared.workflow_helpers) for this workflow. Built once (when input files are first written) then re-used """
+		if self._jobManifest is None:
+			allJobs = [wFlowHelpers.createPlatoJob("inter", self._interstitStruct, self.workFolder, "inter"),
+			           wFlowHelpers.createPlatoJob("no_inter", self._refStruct, self.workFolder, "no_inter")]
+			self._jobManifest = wFlowHelpers.JobManifest(allJobs, self.namespaceAttrs)
+		return self._jobManifest
+
 	@property
 	def _inpFilePaths(self):
-		return [x+".in" for x in self._baseFilePaths]
+		return list(self.jobManifest.inpPaths)
 
 	@property
 	def _baseFilePaths(self):
-		baseNames = self._baseFileNames
-		basePaths = [os.path.join(self.workFolder,x) for x in baseNames]
-		return basePaths
+		return [os.path.splitext(x)[0] for x in self.jobManifest.inpPaths]
 
 	@property
 	def _baseFileNames(self):
-		return ["inter","no_inter"]
+		return [x.structKey for x in self.jobManifest.jobs]
 
 	@property
 	def _inpFilePathDict(self):
-		fileList = self._inpFilePaths
-		outDict = {"inter":fileList[0], "no_inter":fileList[1]}
-		return outDict
+		return {x.structKey:x.inpPath for x in self.jobManifest.jobs}
+
+	@property
+	def _outFilePathDict(self):
+		return {x.structKey:x.outPath for x in self.jobManifest.jobs}
 
 	@property
 	def _strOptDict(self):
@@ -225,9 +276,10 @@ class InterstitialWorkFlow(wFlowCoord.WorkFlowBase):
 		modInp.writePlatoOutFileFromDict(outPath,strDict)
 
 	def _parseOutputFiles(self):
-		inpPaths = self._inpFilePathDict
-		parsedInter = parsePlatoOut.parsePlatoOutFile_energiesInEv(inpPaths["inter"].replace(".in",".out"))
-		parsedNoInter = parsePlatoOut.parsePlatoOutFile_energiesInEv(inpPaths["no_inter"].replace(".in",".out"))
+		outPaths = self._outFilePathDict
+		with self.phaseTimer.timePhase("parse_output"):
+			parsedInter = parsePlatoOut.parsePlatoOutFile_energiesInEv(outPaths["inter"])
+			parsedNoInter = parsePlatoOut.parsePlatoOutFile_energiesInEv(outPaths["no_inter"])
 		
 		parsedEnergies = [getattr(x["energies"], self._eType) for x in [parsedInter,parsedNoInter]]
 		parsedNAtoms = [x["numbAtoms"] for x in [parsedInter,parsedNoInter]]
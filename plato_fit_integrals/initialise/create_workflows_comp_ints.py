@@ -116,6 +116,45 @@ def _createMaeObjFunct():
 	return maeFunct
 
 
+def calcObjFunctValsForTableBlock(refInts, xVals, tableBlock, objFunct="rmsd"):
+	""" Batched equivalent of the default rmsd/mae comparison functions, for many candidate tables on the same x-values (e.g. from
+	CoeffsTablesConverter.getTableBlocksForCoeffMatrix)
+
+	Args:
+		refInts: 2-column array of reference integrals (x-values, y-values)
+		xVals: Increasing x-values of the candidate tables
+		tableBlock: (nCandidates, len(xVals)) array of candidate y-values
+		objFunct(str): "rmsd" or "mae"
+
+	Returns
+		objVals: (nCandidates,) array of objective function values
+
+	Raises:
+		ValueError: If objFunct isnt a recognised string
+	"""
+	refInts = np.array(refInts)
+	assert np.all(np.diff(xVals) > 0), "x-values must be increasing"
+	interpVals = np.asarray(tableBlock) @ _getLinearInterpMatrix(refInts[:,0], np.asarray(xVals, dtype=float)).T
+	diffs = interpVals - refInts[np.newaxis,:,1]
+	if objFunct == "rmsd":
+		return np.sqrt( np.mean(diffs**2, axis=1) )
+	elif objFunct == "mae":
+		return np.mean( np.abs(diffs), axis=1 )
+	raise ValueError("{} is an invalid option for objFunct; options are rmsd and mae".format(objFunct))
+
+
+def _getLinearInterpMatrix(targXVals, gridXVals):
+	""" Matrix M such that M @ gridYVals is the same as np.interp(targXVals, gridXVals, gridYVals) (including clamping at the ends) """
+	lowerIdxs = np.clip( np.searchsorted(gridXVals, targXVals, side="right")-1, 0, len(gridXVals)-2 )
+	gridSpacing = gridXVals[lowerIdxs+1] - gridXVals[lowerIdxs]
+	fractions = np.clip( (targXVals-gridXVals[lowerIdxs])/gridSpacing, 0.0, 1.0 )
+	outMatrix = np.zeros( (len(targXVals), len(gridXVals)) )
+	rowIdxs = np.arange(len(targXVals))
+	outMatrix[rowIdxs, lowerIdxs] = 1.0 - fractions
+	outMatrix[rowIdxs, lowerIdxs+1] += fractions
+	return outMatrix
+
+
 def _calcDistToNearestWeightsSorted1DimArray(inpData:"sorted,ascending 1-dim array"):
 	outArray = np.array(inpData)
 	outArray[0] = inpData[1]-inpData[0]
@@ -4,15 +4,17 @@ import functools
 from types import SimpleNamespace
 import numpy as np
 
-from scipy.optimize import brentq
-from scipy.interpolate import interp1d
-
 
 import plato_fit_integrals.core.workflow_coordinator as wFlow
 import plato_fit_integrals.core.opt_runner as runOpts
 import plato_fit_integrals.core.obj_funct_calculator as objFunctCalc
 
 import plato_fit_integrals.initialise.obj_functs_targ_vals as objFuncts
+import plato_fit_integrals.shared.lazy_imports as lazyImports
+
+scipyOpt = lazyImports.lazyImport("scipy.optimize")
+scipyInterp = lazyImports.lazyImport("scipy.interpolate")
+__getattr__ = lazyImports.createModuleGetAttr(__name__, {"brentq":scipyOpt, "interp1d":scipyInterp})
 
 def fitAnalyticFormToStartIntegrals( coeffTableConverter, intIdx=0, method=None, objFunct="rmsd",optKwargs=None,):
 	""" Fits the required analytical form directly to a set of tabulated integrals
@@ -34,7 +36,7 @@ def fitAnalyticFormToStartIntegrals( coeffTableConverter, intIdx=0, method=None,
 	#Optimisation Step - we dont need to write the output tables until the end
 	origWriteFunct = copy.deepcopy( coeffTableConverter._writeTables )
 	copiedTableConv = copy.deepcopy( coeffTableConverter )
-	copiedTableConv._writeTables = lambda : None
+	copiedTableConv._writeTables = lambda *args : None
 
 	workFlow = _createWorkflowCompareTwoSetsTabulatedIntegrals(copiedTableConv, intIdx, objFunctStr=objFunct)
 	workFlowCoordinator = wFlow.WorkFlowCoordinator([workFlow])
@@ -52,6 +54,37 @@ def fitAnalyticFormToStartIntegrals( coeffTableConverter, intIdx=0, method=None,
 
 
 
+def calcObjFunctValsForCoeffMatrix(coeffTableConverter, coeffMatrix, intIdx=0, objFunct="rmsd"):
+	""" Batched version of the objective function minimised by fitAnalyticFormToStartIntegrals; evaluates many candidate coefficient
+	sets with array operations (useful for population-based optimisers)
+
+	Args:
+		coeffTableConverter: CoeffTableConverter object, as for fitAnalyticFormToStartIntegrals. Its coeffs/tables are unchanged
+		coeffMatrix: (nCandidates, nCoeffs) array-like. Each row is a full set of coeffs for coeffTableConverter
+		intIdx: The index of the integral table in coeffTableConverter
+		objFunct(str): Same meaning as for fitAnalyticFormToStartIntegrals
+
+	Returns
+		objVals: (nCandidates,) array of objective function values
+
+	Raises:
+		ValueError: If objFunct has no array version (see obj_functs_targ_vals.createNumpyTargValObjFunction)
+	"""
+	outObjStr = _getCmpFunctStrFromObjFunctStr(objFunct)
+	npCmpFunct = objFuncts.createNumpyTargValObjFunction(outObjStr)
+	if npCmpFunct is None:
+		raise ValueError("No array version of the comparison function {}".format(outObjStr))
+
+	refInts = coeffTableConverter._integHolder.getIntegTableFromInfoObj(coeffTableConverter._integInfo[intIdx], inclCorrs=False).integrals
+	tableBlock = coeffTableConverter.getTableBlocksForCoeffMatrix(coeffMatrix, tableIndices=[intIdx])[0]
+	return np.mean( npCmpFunct(tableBlock, refInts[np.newaxis,:,1]), axis=1 )
+
+
+def _getCmpFunctStrFromObjFunctStr(objFunctStr):
+	strConvDict = {"rmsd":"sqrdev"}
+	return strConvDict.get(objFunctStr, objFunctStr)
+
+
 def _createWorkflowCompareTwoSetsTabulatedIntegrals( coeffTableConverter, intIdx, objFunctStr="rmsd" ):
 	#Step 1  = get our reference data
 	intInfo = coeffTableConverter._integInfo[intIdx]
@@ -65,11 +98,7 @@ def _createWorkflowCompareTwoSetsTabulatedIntegrals( coeffTableConverter, intIdx
 
 
 	#Step 2 = convert the objFunctStr to a valid string
-	strConvDict = {"rmsd":"sqrdev"}
-	try:
-		outObjStr = strConvDict[objFunctStr]
-	except KeyError: 
-		outObjStr = objFunctStr
+	outObjStr = _getCmpFunctStrFromObjFunctStr(objFunctStr)
 
 	return WorkFlowCompareIntegralTableToReference(startIntegrals, integralsGetter, cmpFunctStr=outObjStr)
 
@@ -113,15 +142,15 @@ def findCrossings(inpArray):
 	"""function thet finds positions of the nodes along x axis using linear interpolation between sign changes"""
 	x,y = inpArray[:,0], inpArray[:,1]
 	zero_crossings = np.where(np.diff(np.signbit(y[:-1])))[0]
-	finterp=interp1d(x, y, kind='linear')
+	finterp=scipyInterp.interp1d(x, y, kind='linear')
 	x_nodes= list()
 	for cross in zero_crossings:
-		x_nodes.append(brentq(finterp,x[cross],x[cross+1]))
+		x_nodes.append(scipyOpt.brentq(finterp,x[cross],x[cross+1]))
 	return x_nodes
 
 
 def getInterpYValGivenXValandInpData(xVal, inpData):
-	finterp = interp1d(inpData[:,0],inpData[:,1])
+	finterp = scipyInterp.interp1d(inpData[:,0],inpData[:,1])
 	return finterp(xVal)
 
 
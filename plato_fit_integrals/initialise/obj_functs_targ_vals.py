@@ -2,7 +2,10 @@ import copy
 import itertools as it
 import math
 
+import numpy as np
+
 OBJ_FUNCT_DICT = dict()
+NP_OBJ_FUNCT_DICT = dict() #Array versions of OBJ_FUNCT_DICT functions; same keys
 
 
 def registerObjFunctTargVals(key):
@@ -11,6 +14,12 @@ def registerObjFunctTargVals(key):
 		return funct
 	return decorate
 
+def registerNumpyObjFunctTargVals(key):
+	def decorate(funct):
+		NP_OBJ_FUNCT_DICT[key.lower()] = funct
+		return funct
+	return decorate
+
 
 def catchOverflowDecorator(funct, overflowRetVal):
 	def overflowSafeFunct(*args,**kwargs):
@@ -149,9 +158,46 @@ def createSimpleTargValObjFunction(functTypeStr:str, catchOverflow=True, errorRe
 	if catchOverflow:
 		basicObjFunct = catchOverflowDecorator(basicObjFunct, errorRetVal)
 
+	#Lets compiled objective function plans (core.obj_funct_calculator) evaluate many of these with a single array operation
+	basicObjFunct.npKernel = createNumpyTargValObjFunction(functTypeStr, greaterThanIsOk=greaterThanIsOk, lessThanIsOk=lessThanIsOk, useAbsVals=useAbsVals)
+	basicObjFunct.kernelKey = (functTypeStr.lower(), catchOverflow, errorRetVal, greaterThanIsOk, lessThanIsOk, useAbsVals)
+
 	return basicObjFunct
 
 
+def createNumpyTargValObjFunction(functTypeStr:str, greaterThanIsOk=False, lessThanIsOk=False, useAbsVals=False):
+	""" Creates the array equivalent of createSimpleTargValObjFunction; i.e. interface (targArray, actArray)->array of objective function values
+	
+	Args:
+		functTypeStr: String (Case insensitive) indicating the type of function required. See NP_OBJ_FUNCT_DICT.keys() for available options
+		greaterThanIsOk/lessThanIsOk/useAbsVals: Same meaning as in createSimpleTargValObjFunction
+
+	Returns
+		objFunct: Function with interface (targArray, actArray)->outArray. None if no array version exists for functTypeStr
+
+	Notes:
+		Overflows are NOT caught; they lead to inf/nan values in the output array. The caller should re-evaluate those elements with the
+		equivalent scalar function if the exact error-handling behaviour is required
+	"""
+	try:
+		basicObjFunct = NP_OBJ_FUNCT_DICT[functTypeStr.lower()]()
+	except KeyError:
+		return None
+
+	def outFunct(targVals, actVals):
+		with np.errstate(all="ignore"):
+			if useAbsVals:
+				targVals, actVals = np.abs(targVals), np.abs(actVals)
+			outVals = basicObjFunct(targVals, actVals)
+			if greaterThanIsOk:
+				outVals = np.where(actVals>targVals, 0.0, outVals)
+			if lessThanIsOk:
+				outVals = np.where(actVals<targVals, 0.0, outVals)
+		return outVals
+
+	return outFunct
+
+
 @registerObjFunctTargVals("sqrdev")
 def _createSqrDevFunct():
 	def sqrDev(valA,valB):
@@ -192,3 +238,38 @@ def _createActMinusTargFunct():
 
 
 
+@registerNumpyObjFunctTargVals("sqrdev")
+def _createNumpySqrDevFunct():
+	def sqrDev(valsA,valsB):
+		return (valsA-valsB)**2
+	return sqrDev
+
+@registerNumpyObjFunctTargVals("absdev")
+def _createNumpyAbsDevFunct():
+	def absDev(valsA,valsB):
+		return np.abs(valsA-valsB)
+	return absDev
+
+@registerNumpyObjFunctTargVals("sqrRootAbsDev".lower())
+def _createNumpySqrRootAbsDevFunct():
+	def sqrRootAbsDev(valsA, valsB):
+		return np.sqrt( np.abs(valsA-valsB) )
+	return sqrRootAbsDev
+
+@registerNumpyObjFunctTargVals("blank")
+def _createNumpyBlankObjFunct():
+	def blankObjFunct(targVals,actVals):
+		return np.array(actVals, dtype=float)
+	return blankObjFunct
+
+@registerNumpyObjFunctTargVals("relRootSqrDev".lower())
+def _createNumpyRelRootSqrDevFunct():
+	def relRootSqrDevFunct(targVals,actVals):
+		return np.abs( np.abs(targVals-actVals)/targVals )
+	return relRootSqrDevFunct
+
+@registerNumpyObjFunctTargVals("actMinusTarg".lower())
+def _createNumpyActMinusTargFunct():
+	def actMinusTargFunct(targVals, actVals):
+		return actVals-targVals
+	return actMinusTargFunct
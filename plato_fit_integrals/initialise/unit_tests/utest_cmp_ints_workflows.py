@@ -24,6 +24,27 @@ class TestConvertVectorObjFunctFor2dArray(unittest.TestCase):
 		self.assertAlmostEqual(expAnswer, actAnswer)
 
 
+class TestBatchedObjFunctsForTableBlock(unittest.TestCase):
+
+	def setUp(self):
+		self.xVals = np.linspace(1.0, 5.0, 9)
+		self.refInts = np.array( [[x, np.exp(-x)] for x in [0.5, 1.3, 2.0, 4.71, 5.5]] ) #Includes points outside the x-range
+		self.tableBlock = np.array( [np.exp(-1.1*self.xVals), 0.5*np.exp(-self.xVals), np.zeros(len(self.xVals))] )
+
+	def _getExpVals(self, scalarFunct):
+		return [scalarFunct(self.refInts, np.column_stack([self.xVals,row])) for row in self.tableBlock]
+
+	def testRmsdMatchesScalarVersion(self):
+		expVals = self._getExpVals( tCode._createRmsdObjFunct() )
+		actVals = tCode.calcObjFunctValsForTableBlock(self.refInts, self.xVals, self.tableBlock, objFunct="rmsd")
+		self.assertTrue( np.allclose(expVals, actVals) )
+
+	def testMaeMatchesScalarVersion(self):
+		expVals = self._getExpVals( tCode._createMaeObjFunct() )
+		actVals = tCode.calcObjFunctValsForTableBlock(self.refInts, self.xVals, self.tableBlock, objFunct="mae")
+		self.assertTrue( np.allclose(expVals, actVals) )
+
+
 if __name__ == '__main__':
 	unittest.main()
 
@@ -2,6 +2,7 @@
 
 import os
 import itertools as it
+import tempfile
 import unittest
 import unittest.mock as mock
 from types import SimpleNamespace
@@ -162,6 +163,22 @@ class TestStructEnergiesWorkFlow(unittest.TestCase):
 		for exp,act in it.zip_longest(expEnergyVals, actEnergyVals):
 			self.assertAlmostEqual(exp,act)
 
+	def testReRootedCopyUsesNewFolderAndDataset(self):
+		self.modOptsDict = {"dataset":"old_model"}
+		self.createTestObj()
+		with tempfile.TemporaryDirectory() as newRoot:
+			outObj = self.testObjA.getReRootedCopy(os.path.dirname(self.workFolder), newRoot, dataset="new_model")
+			self.assertEqual(os.path.join(newRoot, os.path.basename(self.workFolder)), outObj.workFolder)
+			self.assertTrue(os.path.isdir(outObj.workFolder))
+		self.assertEqual("new_model", outObj.runOpts["dataset"])
+		self.assertEqual("old_model", self.testObjA.runOpts["dataset"])
+		self.assertEqual(os.path.abspath(self.workFolder), self.testObjA.workFolder)
+
+	def testFailedJobsGiveOnePenaltyPerStruct(self):
+		self.testObjA.structList = [mock.Mock(), mock.Mock()]
+		self.testObjA.setOutputForFailedJobs()
+		self.assertEqual([float("inf"), float("inf")], getattr(self.testObjA.output, self.outAttr))
+
 
 def getParsePlatoFakeDictA():
 	outDict = dict()
@@ -2,6 +2,9 @@
 
 import os
 import itertools as it
+import sys
+import threading
+import time
 import unittest
 import unittest.mock as mock
 
@@ -11,6 +14,7 @@ from types import SimpleNamespace
 
 import plato_pylib.plato.mod_plato_inp_files as modInp
 
+import plato_fit_integrals.core.job_executors as jobExecutors
 import plato_fit_integrals.initialise.obj_functs_targ_vals as objCmpFuncts
 import plato_fit_integrals.initialise.create_eos_workflows as tCode
 
@@ -41,7 +45,8 @@ class TestCreateEosProperties(unittest.TestCase):
 		expFileNames = [x.replace(".","pt")+".in" for x in expFileNames]
 		expRunComms = ["cd {};dft2 {} > outFile".format(workFolder,fName.replace(".in","")) for fName in expFileNames]
 		actRunComms = self.workFlowA.preRunShellComms
-		[self.assertEqual(exp,act) for exp,act in it.zip_longest(expRunComms,actRunComms)]
+		[self.assertEqual(exp,act.comm) for exp,act in it.zip_longest(expRunComms,actRunComms)]
+		self.assertEqual([[x] for x in self.workFlowA._outFilePaths], [x.expectedOutputs for x in actRunComms])
 
 	def testModOptsCorrectInOutFile(self):
 		inpFilePaths = self.workFlowA._inpFilePaths
@@ -145,6 +150,46 @@ class TestEosDeltaE0(unittest.TestCase):
 
 
 
+class TestEosPostProcessingInParallel(unittest.TestCase):
+
+	def setUp(self):
+		self.origStdout = sys.stdout
+		self.barrier = threading.Barrier(2)
+		self.nEntered, self.enterLock = 0, threading.Lock()
+		stubData = np.zeros((2,2))
+		self.fittedEos = {"e0":1, "b0":10, "v0":10, "data":stubData, "fitatdatapoints":stubData}
+		self.workFlows = [self._createWorkFlow() for x in range(2)]
+		self.executor = jobExecutors.PersistentPoolExecutor(nCores=2)
+
+	def tearDown(self):
+		self.executor.close()
+		sys.stdout = self.origStdout
+
+	@unittest.mock.patch("plato_fit_integrals.initialise.create_eos_workflows.EosWorkFlow._createFilesOnInit")
+	def _createWorkFlow(self, patchedCreate):
+		outWorkFlow = tCode.EosWorkFlow({"hcp":[mock.Mock()]}, dict(), os.getcwd(), "dft2")
+		outWorkFlow._getOutFilePathsForStructKey = lambda structKey: list()
+		return outWorkFlow
+
+	def _fakeFit(self, outFilePaths, eosModel=None):
+		#Both threads are in the fit at once, and the one which entered 2nd leaves last
+		with self.enterLock:
+			self.nEntered += 1
+			enterIdx = self.nEntered
+		print("ase output")
+		self.barrier.wait(timeout=5)
+		if enterIdx == 2:
+			time.sleep(0.05)
+		return self.fittedEos
+
+	def testStdoutRestoredAfterParallelRuns(self):
+		with mock.patch.object(tCode, "fitBMod") as patchedFitMod:
+			patchedFitMod.getBulkModFromOutFilesAseWrapper.side_effect = self._fakeFit
+			self.executor.runFunctions([x.run for x in self.workFlows])
+		self.assertIs(self.origStdout, sys.stdout)
+		self.assertEqual([1,1], [x.output.hcp_e0 for x in self.workFlows])
+
+
 class TestCreateObjFunct(unittest.TestCase):
 
 	def setUp(self):
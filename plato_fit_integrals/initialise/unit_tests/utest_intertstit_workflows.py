@@ -11,6 +11,7 @@ import plato_pylib.plato.mod_plato_inp_files as modInp
 import plato_pylib.shared.ucell_class as UCell
 
 import plato_fit_integrals.initialise.create_interstit_workflows as tCode
+import plato_fit_integrals.shared.workflow_helpers as wFlowHelpers
 
 
 class TestCreateInterProperties(unittest.TestCase):
@@ -60,7 +61,8 @@ class TestCreateInterProperties(unittest.TestCase):
 		runFormat = "cd " + self.expWorkFolder + ";" + self.platoProg + " {} > outFile"
 		expPreShellComms = [runFormat.format(x) for x in ["inter","no_inter"]]
 		actPreShellComms = self.workFlow.preRunShellComms
-		self.assertEqual(expPreShellComms, actPreShellComms)
+		self.assertEqual(expPreShellComms, [x.comm for x in actPreShellComms])
+		self.assertEqual([[os.path.join(self.expWorkFolder, x+".out")] for x in ["inter","no_inter"]], [x.expectedOutputs for x in actPreShellComms])
 
 	def testExpectedModOptsPresent(self):
 		#Note - the files are written upon object initiation 
@@ -84,6 +86,28 @@ class TestCreateInterProperties(unittest.TestCase):
 
 
 
+class TestInterstitRunOptsDict(unittest.TestCase):
+
+	def setUp(self):
+		self.modOptDict = {"BlochStates":[4,4,4], "dataset":"fake_dataset"}
+		self.fidelity = None
+
+	def _runTestFunct(self):
+		factoryInstance = tCode.CreateInterstitialWorkFlow(mock.Mock(), mock.Mock(), os.getcwd(), self.modOptDict, "tb1", fidelity=self.fidelity)
+		return factoryInstance.getRunOptsDict()
+
+	def testKeysLowerCaseWithoutFidelity(self):
+		actDict = self._runTestFunct()
+		self.assertEqual([4,4,4], actDict["blochstates"])
+		self.assertNotIn("BlochStates", actDict)
+
+	def testFidelityOverwritesMixedCaseUserKey(self):
+		self.fidelity = wFlowHelpers.FidelityLevel("low", blochStates=[2,2,2])
+		actDict = self._runTestFunct()
+		self.assertEqual([2,2,2], actDict["blochstates"])
+		self.assertNotIn("BlochStates", actDict)
+
+
 class TestInterstitCompositeWorkFlow(unittest.TestCase):
 
 	def setUp(self):
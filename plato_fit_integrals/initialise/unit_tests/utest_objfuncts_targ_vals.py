@@ -1,6 +1,10 @@
 #!/usr/bin/python3
 
+import itertools as it
 import unittest
+
+import numpy as np
+
 import plato_fit_integrals.initialise.obj_functs_targ_vals as tCode 
 
 
@@ -107,6 +111,32 @@ class TestVectorisedDecoratorOptions(unittest.TestCase):
 		actVal = self.runFunct()
 		self.assertAlmostEqual(expVal, actVal)
 
+class TestNumpyKernelsMatchScalarFuncts(unittest.TestCase):
+
+	def setUp(self):
+		self.targVals = [1.0, 3.0, -5.0, 2.0]
+		self.actVals = [2.0, 8.0, 3.0, -1.0]
+		self.kwargs = dict()
+
+	def _checkMatchForFunctStr(self, functStr):
+		scalarFunct = tCode.createSimpleTargValObjFunction(functStr, **self.kwargs)
+		expVals = [scalarFunct(t,a) for t,a in it.zip_longest(self.targVals, self.actVals)]
+		actVals = scalarFunct.npKernel( np.array(self.targVals), np.array(self.actVals) )
+		[self.assertAlmostEqual(exp,act) for exp,act in it.zip_longest(expVals,actVals)]
+
+	def testAllRegisteredFunctsMatch(self):
+		for key in tCode.NP_OBJ_FUNCT_DICT.keys():
+			self._checkMatchForFunctStr(key)
+
+	def testMatchWithGreaterThanOkAndAbsVals(self):
+		self.kwargs = {"greaterThanIsOk":True, "useAbsVals":True}
+		self._checkMatchForFunctStr("sqrdev")
+
+	def testMatchWithLessThanOk(self):
+		self.kwargs = {"lessThanIsOk":True}
+		self._checkMatchForFunctStr("absdev")
+
+
 if __name__ == '__main__':
 	unittest.main()
 
@@ -0,0 +1,64 @@
+
+""" Deferred imports for heavy optional dependencies (scipy, matplotlib, ase). Many short-lived helper processes import this
+package without ever fitting or plotting, so these modules are only imported on first attribute access """
+
+import importlib
+
+
+class LazyModule():
+	""" Stands in for a module; the real module is imported the first time any attribute is accessed
+
+	Attributes (incl. @properties):
+		moduleName (str): Full name of the module (e.g. "scipy.optimize")
+		isLoaded (bool): True if the real module has been imported
+
+	"""
+
+	def __init__(self, moduleName):
+		self.__dict__["moduleName"] = moduleName
+		self.__dict__["_module"] = None
+
+	@property
+	def isLoaded(self):
+		return self._module is not None
+
+	def _load(self):
+		if self._module is None:
+			self.__dict__["_module"] = importlib.import_module(self.moduleName)
+		return self._module
+
+	def __getattr__(self, name):
+		#Only called for names not found the normal way (i.e. anything belonging to the real module)
+		if name.startswith("__") and name.endswith("__"):
+			raise AttributeError(name)
+		return getattr(self._load(), name)
+
+	def __dir__(self):
+		return dir(self._load())
+
+	def __repr__(self):
+		return "<LazyModule {} ({})>".format(self.moduleName, "loaded" if self.isLoaded else "not loaded")
+
+
+def lazyImport(moduleName):
+	""" Get a LazyModule for moduleName. Import errors (e.g. matplotlib not installed) are raised on first use rather than here """
+	return LazyModule(moduleName)
+
+
+def createModuleGetAttr(moduleName, lazyAttrs):
+	""" Create a module level __getattr__ (PEP 562) so names once imported with "from x import y" are still module attributes,
+	without importing x until they are first used
+
+	Args:
+		moduleName (str): Name of the module the function is for (used in error messages)
+		lazyAttrs (dict): Keys are attribute names, values are the LazyModule objects they are taken from
+
+	Returns
+		getAttrFunct: Function with interface name->attribute value. Assign it to __getattr__ in the module
+	"""
+	def _getAttr(name):
+		if name in lazyAttrs:
+			return getattr(lazyAttrs[name], name)
+		raise AttributeError("module {!r} has no attribute {!r}".format(moduleName, name))
+	return _getAttr
+
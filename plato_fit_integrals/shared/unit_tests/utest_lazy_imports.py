@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import plato_fit_integrals.shared.lazy_imports as tCode
+
+
+HEAVY_MODULES = ["scipy", "matplotlib", "ase"]
+IMPORT_TIME_BUDGET = 1.5 #seconds; generous, since the budget mainly guards against heavy modules creeping back in
+PLATO_PYLIB_MISSING = subprocess.call([sys.executable, "-c", "import plato_pylib"], stderr=subprocess.DEVNULL) != 0
+PACKAGE_FOLDER = os.path.abspath( os.path.join(os.path.dirname(__file__), "..", "..", "..") )
+
+
+def _getImportTimeAndHeavyModules(moduleName):
+	""" Import moduleName in a fresh interpreter; returns import time (s) and any HEAVY_MODULES that got imported """
+	runStr = "import sys,time,json; startTime=time.perf_counter(); import {}; outTime=time.perf_counter()-startTime;"
+	runStr += "print(json.dumps([outTime, [x for x in {} if x in sys.modules]]))"
+	runStr = runStr.format(moduleName, HEAVY_MODULES)
+	outStr = subprocess.check_output([sys.executable, "-c", runStr], cwd=PACKAGE_FOLDER)
+	return json.loads(outStr)
+
+
+class TestLazyModule(unittest.TestCase):
+
+	def testModuleLoadedOnFirstAttributeAccess(self):
+		testObj = tCode.lazyImport("json")
+		self.assertFalse(testObj.isLoaded)
+		self.assertEqual(json.dumps([1]), testObj.dumps([1]))
+		self.assertTrue(testObj.isLoaded)
+
+	def testMissingModuleRaisesOnFirstUse(self):
+		testObj = tCode.lazyImport("fake_module_that_doesnt_exist")
+		with self.assertRaises(ImportError):
+			testObj.someFunct
+
+	def testModuleGetAttr(self):
+		getAttrFunct = tCode.createModuleGetAttr("fake_module", {"dumps":tCode.lazyImport("json")})
+		self.assertIs(json.dumps, getAttrFunct("dumps"))
+		with self.assertRaises(AttributeError):
+			getAttrFunct("loads")
+
+
+class TestImportTimeBudget(unittest.TestCase):
+
+	def _checkModuleImportsWithinBudget(self, moduleName):
+		importTime, heavyModules = _getImportTimeAndHeavyModules(moduleName)
+		self.assertEqual(list(), heavyModules)
+		self.assertLess(importTime, IMPORT_TIME_BUDGET)
+
+	def testOldScipyNamesStillAvailable(self):
+		import scipy.optimize
+		import plato_fit_integrals.core.opt_runner as optRunner
+		self.assertIs(scipy.optimize.minimize, optRunner.minimize)
+		self.assertIs(scipy.optimize.OptimizeResult, optRunner.OptimizeResult)
+
+	def testCoreModules(self):
+		for moduleName in ["plato_fit_integrals.core.opt_runner", "plato_fit_integrals.core.obj_funct_calculator",
+		                   "plato_fit_integrals.benchmarks.fake_plato"]:
+			self._checkModuleImportsWithinBudget(moduleName)
+
+	@unittest.skipIf(PLATO_PYLIB_MISSING, "plato_pylib not installed")
+	def testModulesUsingPlatoPylib(self):
+		for moduleName in ["plato_fit_integrals.initialise.create_eos_workflows", "plato_fit_integrals.initialise.fit_analytic_to_initial_tables",
+		                   "plato_fit_integrals.utils.plot_functs"]:
+			self._checkModuleImportsWithinBudget(moduleName)
+
+
+if __name__ == '__main__':
+	unittest.main()
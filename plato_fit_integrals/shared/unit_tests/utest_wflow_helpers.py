@@ -1,6 +1,12 @@
 #!/usr/bin/python3
 import copy
+import io
+import os
+import sys
+import threading
 import unittest
+import unittest.mock as mock
+from types import SimpleNamespace
 
 import plato_fit_integrals.shared.workflow_helpers as tCode
 
@@ -59,6 +65,124 @@ class TestModOptDict(unittest.TestCase):
 		with self.assertRaises(ValueError):
 			self.runTestFunction()
 
+
+class TestJobManifest(unittest.TestCase):
+
+	def setUp(self):
+		self.workFolder = os.path.abspath("fake_folder")
+		self.structA, self.structB = SimpleNamespace(volume=20.0), SimpleNamespace(volume=30.0)
+		self.namespaceAttrs = ["hcp_v0","hcp_b0"]
+		self.createTestObj()
+
+	def createTestObj(self):
+		jobs = [tCode.createPlatoJob("hcp", self.structA, self.workFolder, "hcp_a"),
+		        tCode.createPlatoJob("hcp", self.structB, self.workFolder, "hcp_b")]
+		self.testObj = tCode.JobManifest(jobs, self.namespaceAttrs)
+
+	def testExpectedPathsFromCreatePlatoJob(self):
+		expInpPaths = ( os.path.join(self.workFolder,"hcp_a.in"), os.path.join(self.workFolder,"hcp_b.in") )
+		expOutPaths = ( os.path.join(self.workFolder,"hcp_a.out"), os.path.join(self.workFolder,"hcp_b.out") )
+		self.assertEqual(expInpPaths, self.testObj.inpPaths)
+		self.assertEqual(expOutPaths, self.testObj.outPaths)
+
+	def testJobsGroupedByStructKey(self):
+		expVols = [20.0,30.0]
+		actVols = [x.volume for x in self.testObj.getJobsForStructKey("hcp")]
+		self.assertEqual(expVols, actVols)
+		self.assertEqual(tuple(), self.testObj.getJobsForStructKey("bcc"))
+
+	def testManifestUnaffectedByModifyingInputAttrs(self):
+		self.namespaceAttrs.append("fake_attr")
+		self.assertEqual( ("hcp_v0","hcp_b0"), self.testObj.namespaceAttrs )
+
+	def testEqualManifestsHashEqual(self):
+		testObjA = self.testObj
+		self.createTestObj()
+		self.assertEqual(testObjA, self.testObj)
+		self.assertEqual(1, len(set([testObjA, self.testObj])))
+
+	def testShellJobsHaveFolderAndOutputs(self):
+		actJobs = self.testObj.getShellJobs(["comm_a","comm_b"], nCores=2)
+		self.assertEqual(["comm_a","comm_b"], [x.comm for x in actJobs])
+		self.assertEqual([[x] for x in self.testObj.outPaths], [x.expectedOutputs for x in actJobs])
+		self.assertEqual([self.workFolder,self.workFolder], [x.workFolder for x in actJobs])
+		self.assertEqual([2,2], [x.nCores for x in actJobs])
+
+	def testNotEqualToOtherTypes(self):
+		self.assertNotEqual(self.testObj, "fake_manifest")
+		self.assertNotEqual(self.testObj, None)
+
+
+class TestFidelityLevel(unittest.TestCase):
+
+	def setUp(self):
+		self.optDict = {"blochstates":[8,8,8], "xtalxcmethod":0}
+		self.testObj = tCode.FidelityLevel("coarse", blochStates=[2,2,2], cheapMethods=True)
+
+	def testModifiesKPointsAndMethodsForDft2(self):
+		self.testObj.modOptDict(self.optDict, "dft2")
+		self.assertEqual([2,2,2], self.optDict["blochstates"])
+		self.assertEqual(-1, self.optDict["xtalxcmethod"])
+
+	def testCheapMethodsIgnoredForTb1(self):
+		self.testObj.modOptDict(self.optDict, "tb1")
+		self.assertEqual(0, self.optDict["xtalxcmethod"])
+
+	def testNoneFidelityLeavesDictUnchanged(self):
+		expDict = copy.deepcopy(self.optDict)
+		tCode.modOptDictBasedOnFidelity(self.optDict, None, "dft2")
+		self.assertEqual(expDict, self.optDict)
+
+
+class TestReRootingHelpers(unittest.TestCase):
+
+	def testGetReRootedPath(self):
+		expPath = os.path.abspath(os.path.join("new","eos","Mg"))
+		self.assertEqual(expPath, tCode.getReRootedPath(os.path.join("old","eos","Mg"), "old", "new"))
+
+	def testGetReRootedPathRaisesOutsideOldRoot(self):
+		with self.assertRaises(ValueError):
+			tCode.getReRootedPath(os.path.join("other","eos"), "old", "new")
+
+	def testGetOptDictWithDatasetReplacesAnyCase(self):
+		optDict = {"DataSet":"old_model", "nLoops":"3"}
+		self.assertEqual({"dataset":"new_model","nLoops":"3"}, tCode.getOptDictWithDataset(optDict, "new_model"))
+		self.assertEqual({"DataSet":"old_model", "nLoops":"3"}, optDict)
+
+	def testGetOptDictWithNoneDatasetUnchanged(self):
+		optDict = {"dataset":"old_model"}
+		self.assertEqual(optDict, tCode.getOptDictWithDataset(optDict, None))
+
+
+class TestSuppressStdout(unittest.TestCase):
+
+	def setUp(self):
+		self.outStream = io.StringIO()
+		self.patchedStdout = mock.patch.object(sys, "stdout", self.outStream)
+		self.patchedStdout.start()
+
+	def tearDown(self):
+		self.patchedStdout.stop()
+
+	def testOnlyCallingThreadSilenced(self):
+		otherThread = threading.Thread(target=print, args=("other thread",))
+		with tCode.suppressStdout():
+			print("silenced")
+			otherThread.start()
+			otherThread.join()
+		print("after")
+		self.assertEqual("other thread\nafter\n", self.outStream.getvalue())
+		self.assertIs(self.outStream, sys.stdout)
+
+	def testNestedBlocksRestoreStdout(self):
+		with tCode.suppressStdout():
+			with tCode.suppressStdout():
+				print("silenced")
+			print("still silenced")
+		self.assertEqual("", self.outStream.getvalue())
+		self.assertIs(self.outStream, sys.stdout)
+
+
 if __name__ == '__main__':
 	unittest.main()
 
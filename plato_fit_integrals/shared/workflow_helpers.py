@@ -1,6 +1,13 @@
 
+import collections
+import contextlib
+import os
+import sys
+import threading
 from types import SimpleNamespace
 
+import plato_fit_integrals.core.job_executors as jobExecutors
+
 VALID_PLATO_CODE_STRS = ["dft2","tb1","dft"]
 VALID_CORR_TYPES = ["pairPot".lower(),"hopping", None]
 
@@ -43,6 +50,65 @@ def modOptDictBasedOnCorrTypeAndPlatoCode(optDict, corrType:str, platoCode:str):
 		raise ValueError(_getErrorStrForModOptDict(corrType=corrType)) #shouldnt ever be called really
 
 
+class FidelityLevel():
+	""" Describes a (usually reduced) accuracy level for plato calculations; used to make early stages of a fit cheaper
+
+	Attributes:
+		label (str): Name for the fidelity level
+		blochStates (list/None): k-point mesh to use (e.g. [2,2,2]). None means keep whatever is in the option dict
+		cheapMethods (bool): If True, cheaper xc/Vna/Vnl methods are used (dft2 only; ignored for other codes)
+
+	"""
+
+	def __init__(self, label, blochStates=None, cheapMethods=False):
+		self.label = label
+		self.blochStates = list(blochStates) if blochStates is not None else None
+		self.cheapMethods = cheapMethods
+
+	def modOptDict(self, optDict, platoCode:str):
+		""" Modifies optDict (keys lower case) in place to use this fidelity level """
+		if self.blochStates is not None:
+			optDict["blochstates"] = list(self.blochStates)
+		if self.cheapMethods and (platoCode.lower()=="dft2"):
+			optDict["xtalxcmethod"] = -1
+			optDict["hopxcmethod"] = -1
+			optDict["xtalvnamethod"] = 1
+			optDict["hopvnamethod"] = -1
+			optDict["xtalvnlmethod"] = 1
+			optDict["hopvnlmethod"] = -1
+
+	def __repr__(self):
+		return "FidelityLevel(label={}, blochStates={}, cheapMethods={})".format(self.label, self.blochStates, self.cheapMethods)
+
+
+def modOptDictBasedOnFidelity(optDict, fidelity:"FidelityLevel or None", platoCode:str):
+	""" Modifies optDict in place for a given fidelity level; fidelity=None means full accuracy (optDict is unchanged) """
+	if fidelity is not None:
+		fidelity.modOptDict(optDict, platoCode)
+
+
+def getOptDictWithDataset(optDict, dataset):
+	""" Copy of optDict with the plato "dataset" option (key is case insensitive) set to dataset; dataset=None leaves it unchanged """
+	outDict = dict(optDict)
+	if dataset is not None:
+		for key in [k for k in outDict.keys() if k.lower()=="dataset"]:
+			outDict.pop(key)
+		outDict["dataset"] = dataset
+	return outDict
+
+
+def getReRootedPath(path, oldRoot, newRoot):
+	""" Path at the same place under newRoot as path is under oldRoot
+
+	Raises:
+		ValueError: If path isnt inside oldRoot
+	"""
+	relPath = os.path.relpath(os.path.abspath(path), os.path.abspath(oldRoot))
+	if relPath.split(os.sep)[0] == os.pardir:
+		raise ValueError("{} is not inside {}".format(path, oldRoot))
+	return os.path.normpath( os.path.join(os.path.abspath(newRoot), relPath) )
+
+
 def _getErrorStrForModOptDict(corrType=None,platoCode=None):
 	if (corrType is None) and (platoCode is None):
 		return None
@@ -65,3 +131,120 @@ def getCombinedNamespaceNoDuplicatedKeys(nSpaceA:"types.SimpleNamespace", nSpace
 	dictA.update(dictB)
 	return SimpleNamespace(**dictA)
 
+
+
+PlatoJob = collections.namedtuple("PlatoJob", ["structKey", "volume", "inpPath", "outPath"])
+
+
+class JobManifest():
+	""" Immutable record of the plato jobs a workflow runs; built once so file paths/attribute names dont need re-deriving every iteration
+
+	Attributes (incl. @properties):
+		jobs (tuple): PlatoJob namedtuples (structKey, volume, inpPath, outPath) in the order the jobs should be run
+		namespaceAttrs (tuple): Output attribute names of the workflow the manifest belongs to
+		inpPaths (tuple): Input file paths for all jobs
+		outPaths (tuple): Output file paths for all jobs
+
+	"""
+
+	def __init__(self, jobs:"iter of PlatoJob", namespaceAttrs:"iter of str"):
+		self._jobs = tuple(jobs)
+		self._namespaceAttrs = tuple(namespaceAttrs)
+		self._inpPaths = tuple([x.inpPath for x in self._jobs])
+		self._outPaths = tuple([x.outPath for x in self._jobs])
+		self._jobsByStructKey = collections.OrderedDict()
+		for job in self._jobs:
+			self._jobsByStructKey.setdefault(job.structKey, list()).append(job)
+		self._jobsByStructKey = collections.OrderedDict( [(k,tuple(v)) for k,v in self._jobsByStructKey.items()] )
+
+	@property
+	def jobs(self):
+		return self._jobs
+
+	@property
+	def namespaceAttrs(self):
+		return self._namespaceAttrs
+
+	@property
+	def inpPaths(self):
+		return self._inpPaths
+
+	@property
+	def outPaths(self):
+		return self._outPaths
+
+	@property
+	def structKeys(self):
+		return tuple(self._jobsByStructKey.keys())
+
+	def getJobsForStructKey(self, structKey):
+		return self._jobsByStructKey.get(structKey, tuple())
+
+	def getShellJobs(self, runComms:"iter of str", nCores=None, ompThreads=None):
+		""" Wrap the run command for each job (same order as jobs) in a ShellJob (see core.job_executors), so executors know the
+		folder each job runs in and the output file it should create """
+		return [jobExecutors.ShellJob(comm, nCores=nCores, ompThreads=ompThreads, workFolder=os.path.dirname(job.inpPath), expectedOutputs=[job.outPath])
+		        for comm, job in zip(runComms, self._jobs)]
+
+	def __eq__(self, other):
+		if not isinstance(other, JobManifest):
+			return NotImplemented
+		return (self.jobs == other.jobs) and (self.namespaceAttrs == other.namespaceAttrs)
+
+	def __hash__(self):
+		return hash( (self.jobs, self.namespaceAttrs) )
+
+
+def createPlatoJob(structKey, struct, workFolder, baseFileName):
+	""" Create a PlatoJob entry for a single structure; input/output paths are workFolder/baseFileName + ".in"/".out"
+	
+	Args:
+		structKey: Label for the structure (e.g. "hcp" for EoS workflows)
+		struct: UnitCell object for the job. Volume is None if the object doesnt have one
+		workFolder: Folder the job is run in
+		baseFileName: File name without extension
+
+	Returns
+		outJob: PlatoJob namedtuple
+	"""
+	basePath = os.path.join(os.path.abspath(workFolder), baseFileName)
+	volume = getattr(struct, "volume", None)
+	return PlatoJob(structKey, volume, basePath + ".in", basePath + ".out")
+
+
+_STDOUT_LOCK = threading.Lock()
+_SILENCED_THREADS = dict() #Thread identifier: number of (nested) suppressStdout blocks it is in
+
+class _ThreadFilteredStdout():
+	""" Stands in for sys.stdout while any thread is in a suppressStdout block; drops writes from those threads only """
+
+	def __init__(self, stream):
+		self.stream = stream
+
+	def write(self, text):
+		if threading.get_ident() in _SILENCED_THREADS:
+			return len(text)
+		return self.stream.write(text)
+
+	def __getattr__(self, attr):
+		return getattr(self.stream, attr)
+
+
+@contextlib.contextmanager
+def suppressStdout():
+	""" Thread-safe replacement for contextlib.redirect_stdout(None). Only output from the calling thread is dropped (workflows may
+	be post-processed in parallel, see core.job_executors) and sys.stdout is restored once no thread is in one of these blocks """
+	threadId = threading.get_ident()
+	with _STDOUT_LOCK:
+		if len(_SILENCED_THREADS) == 0:
+			sys.stdout = _ThreadFilteredStdout(sys.stdout)
+		_SILENCED_THREADS[threadId] = _SILENCED_THREADS.get(threadId, 0) + 1
+	try:
+		yield
+	finally:
+		with _STDOUT_LOCK:
+			_SILENCED_THREADS[threadId] -= 1
+			if _SILENCED_THREADS[threadId] == 0:
+				_SILENCED_THREADS.pop(threadId)
+			if (len(_SILENCED_THREADS) == 0) and isinstance(sys.stdout, _ThreadFilteredStdout):
+				sys.stdout = sys.stdout.stream
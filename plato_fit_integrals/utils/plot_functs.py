@@ -1,8 +1,9 @@
 
 
 import plato_fit_integrals.initialise.create_ecurve_workflows as ecurves
+import plato_fit_integrals.shared.lazy_imports as lazyImports
 
-import matplotlib.pyplot as plt
+plt = lazyImports.lazyImport("matplotlib.pyplot")
 
 
 def plotFittedIntsVsInitial(integInfo,coeffsToTablesObj):
@@ -5,6 +5,6 @@ setup(name='plato_fit_integrals',
 	  author='Richard Fogarty',
 	  author_email = 'richard.m.fogarty@gmail.com',
 	  packages = ['plato_fit_integrals', "plato_fit_integrals.core", "plato_fit_integrals.initialise",
-	              "plato_fit_integrals.shared", "plato_fit_integrals.utils"]
+	              "plato_fit_integrals.shared", "plato_fit_integrals.utils", "plato_fit_integrals.benchmarks"]
 	 )
 